@@ -1,7 +1,15 @@
 __all__ = [
     'CTypeFactory',
     'build_array', 'build_struct',
+    'parse_files',
+    'Target', 'struct_layout', 'format_layout',
+    'struct_dtype',
+    'struct_packer', 'struct_format',
 ]
 
 from .ctypefactory import CTypeFactory
 from .builders import build_array, build_struct
+from .parallel import parse_files
+from .layout import Target, struct_layout, format_layout
+from .dtypes import struct_dtype
+from .packers import struct_packer, struct_format
@@ -0,0 +1,116 @@
+"""
+ast2ctypes command-line
+
+    python -m ast2ctypes generate mycode-preproc.c -o mycode_types.py
+    python -m ast2ctypes layout mycode-preproc.c --struct 'myprj_*' --target native --target avr
+"""
+import os
+import sys
+import fnmatch
+import argparse
+import logging
+from ctypes import Structure
+
+from .ctypefactory import CTypeFactory
+from .generator import generate_module
+from .layout import TARGETS, struct_layout, format_layout
+
+
+def factory_arguments(parser):
+    parser.add_argument('filenames', nargs='+', metavar='filename',
+                        help="preprocessed c file(s) (eg: from `gcc -E`), one per translation unit")
+    parser.add_argument('--typedef', dest='typedef_patterns', action='append', metavar='PATTERN',
+                        help="only map typedefs matching PATTERN (fnmatch), may be repeated (default: all)")
+    parser.add_argument('--funcdef', dest='funcdef_patterns', action='append', metavar='PATTERN',
+                        help="only map functions matching PATTERN (fnmatch), may be repeated (default: all)")
+    parser.add_argument('--pack', action='store_true', default=False,
+                        help="pack structures tight (instead of padding based on the architecture)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="type graph cache directory (see CTypeFactory.from_file)")
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help="processes parsing files in parallel (default: cpu count)")
+
+
+def build_factory(args):
+    kwargs = {'pack': args.pack}
+    if args.typedef_patterns:
+        kwargs['typedef_patterns'] = args.typedef_patterns
+    if args.funcdef_patterns:
+        kwargs['funcdef_patterns'] = args.funcdef_patterns
+    if len(args.filenames) == 1:
+        return CTypeFactory.from_file(args.filenames[0], cache_dir=args.cache_dir, **kwargs)
+    return CTypeFactory.from_files(args.filenames, cache_dir=args.cache_dir, processes=args.jobs, **kwargs)
+
+
+# ---- Commands
+def generate(args):
+    factory = build_factory(args)
+    source = b''
+    for filename in args.filenames:
+        with open(filename, 'rb') as fh:
+            source += fh.read()
+    if args.output in (None, '-'):
+        module_name = 'module'
+    else:
+        module_name = os.path.splitext(os.path.basename(args.output))[0]
+    code = generate_module(
+        factory,
+        source_name=', '.join(os.path.basename(f) for f in args.filenames),
+        source=source,
+        module_name=module_name,
+    )
+    if args.output in (None, '-'):
+        sys.stdout.write(code)
+    else:
+        with open(args.output, 'w') as fh:
+            fh.write(code)
+
+
+def layout(args):
+    factory = build_factory(args)
+    targets = [TARGETS[name] for name in (args.targets or ['native', 'packed'])]
+    reported = set()  # ids of classes already reported (a structure may have many typedefs)
+    for (name, cls) in factory.ctypes_map.items():
+        if (name not in factory.typedef_map) or (not isinstance(cls, type)) or (not issubclass(cls, Structure)):
+            continue
+        if args.struct_patterns and (not any(fnmatch.fnmatch(name, p) for p in args.struct_patterns)):
+            continue
+        if id(cls) in reported:
+            continue
+        reported.add(id(cls))
+        for target in targets:
+            sys.stdout.write(format_layout(struct_layout(cls, target), suggest=(target.max_alignment != 1)) + '\n\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ast2ctypes', description="ctypes from c code")
+    parser.add_argument('--verbose', '-v', action='store_true', default=False, help="debug logging")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    # generate
+    generate_parser = subparsers.add_parser(
+        'generate', help="generate a python module of ctypes definitions (no parser needed to import it)",
+    )
+    factory_arguments(generate_parser)
+    generate_parser.add_argument('--output', '-o', default=None, help="python file to write (default: stdout)")
+    generate_parser.set_defaults(func=generate)
+
+    # layout
+    layout_parser = subparsers.add_parser(
+        'layout', help="report structure sizes, field offsets & padding (and field orders with less padding)",
+    )
+    factory_arguments(layout_parser)
+    layout_parser.add_argument('--struct', dest='struct_patterns', action='append', metavar='PATTERN',
+                               help="only report structures matching PATTERN (fnmatch), may be repeated (default: all)")
+    layout_parser.add_argument('--target', dest='targets', action='append', choices=sorted(TARGETS.keys()),
+                               help="layout(s) to report, may be repeated (default: native & packed)")
+    layout_parser.set_defaults(func=layout)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks: ast2ctypes builders
+
+Each case is compared against the original implementation (one dict(cls._fields_)
+per keyword, and one element assignment per array item).
+
+Usage:
+    python bench_builders.py [--number N]
+"""
+import os
+import sys
+import array
+import timeit
+import inspect
+import argparse
+import ctypes
+from ctypes import c_uint8, c_uint16, c_uint32, c_float, POINTER, Structure
+
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from builders import build_struct, build_array
+
+
+# ---- Original Implementations (reference)
+def original_build_struct(cls, **kwargs):
+    obj = cls()
+    for (key, value) in kwargs.items():
+        if key.endswith('__exact'):
+            key = key[:-len('__exact')]
+            assert key in dict(cls._fields_), "%s struct has no %s attribute" % (cls.__name__, key)
+            setattr(obj, key, value)
+        else:
+            setattr(obj, key, dict(cls._fields_)[key](value))
+    return obj
+
+
+def original_build_array(cls, elements):
+    elements = list(elements)  # only lists & tuples were accepted
+    array = (cls * len(elements))()
+    for (i, value) in enumerate(elements):
+        array[i] = value
+    return array
+
+
+# ---- Test Data
+class Datagram(Structure):  # resembles prlsc_datagram_t
+    _fields_ = [
+        ('serviceIndex', c_uint8),
+        ('subServiceIndex', c_uint8),
+        ('length', c_uint16),
+        ('data', POINTER(c_uint8)),
+        ('checksum', c_uint8),
+    ]
+
+LENGTH = 255
+PAYLOAD = bytes(i & 0xFF for i in range(LENGTH))
+DATA = (c_uint8 * LENGTH)()
+SOURCES = [
+    # (name, class, source)
+    ("uint8 list", c_uint8, list(PAYLOAD)),
+    ("uint8 bytes", c_uint8, PAYLOAD),
+    ("uint8 memoryview", c_uint8, memoryview(PAYLOAD)),
+    ("uint16 array.array", c_uint16, array.array('H', list(PAYLOAD))),
+    ("uint32 array.array", c_uint32, array.array('I', list(PAYLOAD))),
+    ("float array.array", c_float, array.array('f', list(PAYLOAD))),
+]
+
+CASES = [
+    # (name, original, new)
+    (
+        "build_struct (5 fields)",
+        lambda: original_build_struct(Datagram, serviceIndex=1, subServiceIndex=2, length=LENGTH, data__exact=DATA, checksum=3),
+        lambda: build_struct(Datagram, serviceIndex=1, subServiceIndex=2, length=LENGTH, data__exact=DATA, checksum=3),
+    ),
+] + [
+    (
+        "build_array %s" % name,
+        (lambda cls=cls, source=source: original_build_array(cls, source)),
+        (lambda cls=cls, source=source: build_array(cls, source)),
+    )
+    for (name, cls, source) in SOURCES
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ast2ctypes builder micro-benchmarks")
+    parser.add_argument('--number', type=int, default=10000, help="calls per measurement")
+    args = parser.parse_args()
+
+    print("ast2ctypes builders (microseconds per call, arrays of %i elements)" % LENGTH)
+    print("%-32s%12s%12s%10s" % ('', 'original', 'new', 'speedup'))
+    for (name, original, new) in CASES:
+        (t_original, t_new) = [
+            min(timeit.repeat(func, number=args.number, repeat=3)) / args.number
+            for func in (original, new)
+        ]
+        print("%-32s%12.2f%12.2f%9.1fx" % (name, t_original * 1e6, t_new * 1e6, t_original / t_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Benchmark: column access to recorded structures, ctypes vs numpy structured dtype
+
+A buffer of N datagram headers (resembling prlsc_datagram_t) is read:
+    ctypes: (Datagram * N).from_buffer(data), then a python loop over the records
+    numpy:  numpy.frombuffer(data, dtype=struct_dtype(Datagram)), then column operations
+
+Usage:
+    python bench_dtypes.py [--records N] [--repeat N]
+"""
+import os
+import sys
+import time
+import inspect
+import argparse
+import ctypes
+from ctypes import c_uint8, c_uint16, POINTER, Structure
+
+import numpy
+
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from dtypes import struct_dtype
+
+
+class Datagram(Structure):  # resembles prlsc_datagram_t
+    _fields_ = [
+        ('serviceIndex', c_uint8),
+        ('subServiceIndex', c_uint8),
+        ('length', c_uint16),
+        ('data', POINTER(c_uint8)),
+        ('checksum', c_uint8),
+    ]
+
+
+def ctypes_columns(data, count):
+    records = (Datagram * count).from_buffer(data)
+    total_length = 0
+    per_service = [0] * 8
+    for record in records:
+        total_length += record.length
+        per_service[record.serviceIndex] += 1
+    return (total_length, per_service)
+
+
+def numpy_columns(data, dtype):
+    records = numpy.frombuffer(data, dtype=dtype)
+    total_length = int(records['length'].sum(dtype=numpy.uint64))
+    per_service = numpy.bincount(records['serviceIndex'], minlength=8).tolist()
+    return (total_length, per_service)
+
+
+def best_time(func, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return (min(times), result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="structured dtype column access benchmark")
+    parser.add_argument('--records', type=int, default=1000000, help="number of records")
+    parser.add_argument('--repeat', type=int, default=3, help="best of N")
+    args = parser.parse_args()
+
+    # recorded data
+    records = numpy.zeros(args.records, dtype=struct_dtype(Datagram))
+    records['serviceIndex'] = numpy.arange(args.records) % 8
+    records['length'] = numpy.arange(args.records) % 0x200
+    data = bytearray(records.tobytes())
+
+    dtype = struct_dtype(Datagram)
+    (ctypes_time, ctypes_result) = best_time(lambda: ctypes_columns(data, args.records), args.repeat)
+    (numpy_time, numpy_result) = best_time(lambda: numpy_columns(data, dtype), args.repeat)
+    assert ctypes_result == numpy_result, "results differ"
+
+    print("column access: %i records (%i bytes each)" % (args.records, ctypes.sizeof(Datagram)))
+    print("%-10s%12s" % ('', 'time (ms)'))
+    print("%-10s%12.1f" % ('ctypes', ctypes_time * 1e3))
+    print("%-10s%12.1f  (%.0fx)" % ('numpy', numpy_time * 1e3, ctypes_time / numpy_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Benchmark: encoding & decoding batches of struct payloads, ctypes Structure vs struct.Struct
+
+Payload resembles a stream service's position report:
+    ctypes encode: Payload(...) per record, bytes() of each, joined
+    packer encode: StructPacker.pack_batch (one struct.Struct.pack_into per record)
+    ctypes decode: Payload.from_buffer_copy per record, reading each field
+    packer decode: StructPacker.iter_unpack
+
+Usage:
+    python bench_packers.py [--records N] [--repeat N]
+"""
+import os
+import sys
+import time
+import inspect
+import argparse
+from ctypes import c_uint8, c_int16, c_uint32, Structure, sizeof
+
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from layout import TARGETS
+from packers import struct_packer
+
+
+class Payload(Structure):
+    _pack_ = 1
+    _fields_ = [
+        ('id', c_uint8),
+        ('position', c_uint32),
+        ('velocity', c_int16),
+        ('status', c_uint8),
+    ]
+
+FIELDS = [name for (name, cls) in Payload._fields_]
+
+
+def ctypes_encode(records):
+    return b''.join(bytes(Payload(*r)) for r in records)
+
+
+def ctypes_decode(data):
+    size = sizeof(Payload)
+    return [
+        tuple(getattr(p, f) for f in FIELDS)
+        for p in (Payload.from_buffer_copy(data, i) for i in range(0, len(data), size))
+    ]
+
+
+def best_time(func, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return (min(times), result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="struct payload packing benchmark")
+    parser.add_argument('--records', type=int, default=100000, help="records per batch")
+    parser.add_argument('--repeat', type=int, default=3, help="best of N")
+    args = parser.parse_args()
+
+    packer = struct_packer(Payload, target=TARGETS['packed'], byteorder='<')
+    records = [(i % 256, i * 7, (i % 200) - 100, i % 3) for i in range(args.records)]
+
+    (ctypes_encode_time, ctypes_data) = best_time(lambda: ctypes_encode(records), args.repeat)
+    (packer_encode_time, packer_data) = best_time(lambda: packer.pack_batch(records), args.repeat)
+    assert bytes(packer_data) == ctypes_data, "encoded data differs"
+    (ctypes_decode_time, ctypes_records) = best_time(lambda: ctypes_decode(ctypes_data), args.repeat)
+    (packer_decode_time, packer_records) = best_time(lambda: list(packer.iter_unpack(packer_data)), args.repeat)
+    assert ctypes_records == packer_records == records, "decoded records differ"
+
+    print("payload packing: %i records of %i bytes (%s)" % (args.records, packer.size, packer.format))
+    print("%-10s%14s%14s" % ('', 'encode (ms)', 'decode (ms)'))
+    print("%-10s%14.1f%14.1f" % ('ctypes', ctypes_encode_time * 1e3, ctypes_decode_time * 1e3))
+    print("%-10s%14.1f%14.1f" % ('packer', packer_encode_time * 1e3, packer_decode_time * 1e3))
+    print("%-10s%13.1fx%13.1fx" % (
+        'speedup', ctypes_encode_time / packer_encode_time, ctypes_decode_time / packer_decode_time,
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Benchmark: parsing multiple translation units with CTypeFactory.from_files
+
+Each file is a synthetic header (see bench_resolve.py); all files share their first
+typedefs (as if they included a common header), the rest are unique to each file.
+Files are parsed with 1, 2, 4 ... processes (up to the cpu count); with enough files, wall
+time should fall in proportion to the number of processes.
+
+Usage:
+    python bench_parallel.py [--files N] [--typedefs N] [--repeat N] [--max-processes N]
+"""
+import os
+import sys
+import time
+import shutil
+import inspect
+import argparse
+import tempfile
+
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from ctypefactory import CTypeFactory
+from bench_resolve import synthetic_header, best_time
+
+
+def write_files(directory, count, typedefs):
+    shared = synthetic_header(typedefs // 2, 20)
+    filenames = []
+    for i in range(count):
+        filenames.append(os.path.join(directory, 'module%i-preproc.c' % i))
+        with open(filenames[-1], 'w') as fh:
+            fh.write(shared + synthetic_header(typedefs // 2, 20, prefix='module%i_' % i))
+    return filenames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CTypeFactory.from_files benchmark")
+    parser.add_argument('--files', type=int, default=8, help="number of translation units")
+    parser.add_argument('--typedefs', type=int, default=2000, help="(approximate) typedefs per file")
+    parser.add_argument('--repeat', type=int, default=3, help="best of N")
+    parser.add_argument('--max-processes', type=int, default=None, help="default: cpu count")
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    process_counts = [1]
+    while process_counts[-1] * 2 <= min(args.max_processes or cpu_count, args.files):
+        process_counts.append(process_counts[-1] * 2)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        filenames = write_files(temp_dir, args.files, args.typedefs)
+        print("CTypeFactory.from_files: %i files, ~%i typedefs each (%i cpus)" % (args.files, args.typedefs, cpu_count))
+        print("%10s%12s%10s" % ('processes', 'time (ms)', 'speedup'))
+        baseline = None
+        for processes in process_counts:
+            t = best_time(lambda: CTypeFactory.from_files(filenames, processes=processes), args.repeat)
+            baseline = baseline or t
+            print("%10i%12.1f%9.2fx" % (processes, t * 1e3, baseline / t))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Benchmark: CTypeFactory type resolution on large, synthetic headers
+
+Each header has COUNT typedefs:
+    - chains of scalar typedefs, CHAIN long:    typedef c0_0 c0_1; typedef c0_1 c0_2; ...
+    - structs referring to the end of a chain, and to the previous struct (by value & pointer)
+    - function pointers taking both
+Time per typedef should stay (roughly) constant as COUNT grows (ie: linear scaling).
+Parsing (pycparser) isn't included; it's timed separately for reference.
+
+(prior to memoised, topologically ordered resolution, chains longer than ~20 failed
+with "too many things", and every reference to a typedef re-walked its chain)
+
+Usage:
+    python bench_resolve.py [--chain N] [--repeat N] [COUNT ...]
+"""
+import os
+import sys
+import time
+import inspect
+import argparse
+import pycparser
+
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from ctypefactory import CTypeFactory
+
+
+def synthetic_header(count, chain, prefix=''):
+    lines = ['typedef unsigned char %sc_0;' % prefix]
+    previous_struct = None
+    index = 0
+    while len(lines) < count:
+        # chain
+        lines += ['typedef {p}c_{i} {p}c{i}_0;'.format(p=prefix, i=index)]
+        lines += ['typedef {p}c{i}_{j} {p}c{i}_{k};'.format(p=prefix, i=index, j=k - 1, k=k) for k in range(1, chain)]
+        last = '%sc%i_%i' % (prefix, index, chain - 1)
+        index += 1
+        lines += ['typedef %s %sc_%i;' % (last, prefix, index)]
+        # struct & function pointer
+        fields = ['%s value;' % last]
+        if previous_struct:
+            fields += ['%s previous;' % previous_struct, '%s *previous_ptr;' % previous_struct]
+        previous_struct = '%ss_%i' % (prefix, index)
+        lines += ['typedef struct { %s } %s;' % (' '.join(fields), previous_struct)]
+        lines += ['typedef %s (*%sf_%i)(%s *, %s);' % (last, prefix, index, previous_struct, last)]
+    return '\n'.join(lines) + '\n'
+
+
+def best_time(func, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CTypeFactory resolution benchmark")
+    parser.add_argument('counts', nargs='*', type=int, default=[1000, 2000, 4000, 8000],
+                        help="(approximate) number of typedefs in each header")
+    parser.add_argument('--chain', type=int, default=200, help="length of each typedef chain")
+    parser.add_argument('--repeat', type=int, default=3, help="best of N")
+    args = parser.parse_args()
+
+    print("CTypeFactory resolution (typedef chains of %i)" % args.chain)
+    print("%10s%12s%12s%16s" % ('typedefs', 'parse (ms)', 'build (ms)', 'build/typedef'))
+    for count in args.counts:
+        source = synthetic_header(count, args.chain)
+        parse = lambda: pycparser.c_parser.CParser().parse(source)
+        parse_time = best_time(parse, 1)
+        ast = parse()
+        typedef_count = len(CTypeFactory(ast, lazy=True).typedef_map)
+        build_time = best_time(lambda: CTypeFactory(ast), args.repeat)
+        print("%10i%12.1f%12.1f%13.2f us" % (
+            typedef_count, parse_time * 1e3, build_time * 1e3, (build_time / typedef_count) * 1e6,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Benchmark: CTypeFactory startup, cold vs warm type cache
+
+Each measurement is a fresh python process that imports ast2ctypes and builds a factory
+from a preprocessed c file (as a module like test/tests/data_types.py does on import):
+    no cache: CTypeFactory.from_file(filename)
+    cold:     CTypeFactory.from_file(filename, cache_dir=<empty directory>)
+    warm:     CTypeFactory.from_file(filename, cache_dir=<populated directory>)
+    lazy:     CTypeFactory.from_file(filename, lazy=True), then one type requested (--type)
+    generated: import of a module written by `python -m ast2ctypes generate` (no parser)
+
+Usage:
+    python bench_startup.py [--repeat N] [--type NAME] [preprocessed c file]
+(the default file is prlsc's test/test-preproc.c; run `make preproc` in ./test first)
+"""
+import os
+import sys
+import time
+import shutil
+import inspect
+import argparse
+import tempfile
+import subprocess
+
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+LIB_PATH = os.path.join(_this_path, '../..')
+DEFAULT_FILENAME = os.path.join(_this_path, '../../../../test/test-preproc.c')
+
+STARTUP_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from ast2ctypes import CTypeFactory
+CTypeFactory.from_file(sys.argv[2], cache_dir=(sys.argv[3] or None))
+"""
+
+LAZY_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from ast2ctypes import CTypeFactory
+CTypeFactory.from_file(sys.argv[2], lazy=True)[sys.argv[3]]
+"""
+
+GENERATED_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import generated_types
+"""
+
+
+def startup_time(filename, cache_dir):
+    start = time.perf_counter()
+    subprocess.check_call([sys.executable, '-c', STARTUP_SCRIPT, LIB_PATH, filename, cache_dir or ''])
+    return time.perf_counter() - start
+
+
+def lazy_startup_time(filename, type_name):
+    start = time.perf_counter()
+    subprocess.check_call([sys.executable, '-c', LAZY_SCRIPT, LIB_PATH, filename, type_name])
+    return time.perf_counter() - start
+
+
+def generated_startup_time(module_dir):
+    start = time.perf_counter()
+    subprocess.check_call([sys.executable, '-B', '-c', GENERATED_SCRIPT, module_dir])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CTypeFactory startup benchmark")
+    parser.add_argument('filename', nargs='?', default=DEFAULT_FILENAME, help="preprocessed c file")
+    parser.add_argument('--repeat', type=int, default=10, help="processes started per measurement")
+    parser.add_argument('--type', default='prlsc_config_t', help="type requested from the lazy factory")
+    args = parser.parse_args()
+    assert os.path.isfile(args.filename), "'%s' does not exist (has it been preprocessed?)" % args.filename
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        cold_dirs = [os.path.join(temp_dir, 'cold-%i' % i) for i in range(args.repeat)]
+        warm_dir = os.path.join(temp_dir, 'warm')
+        startup_time(args.filename, warm_dir)  # populate
+        subprocess.check_call(
+            [sys.executable, '-m', 'ast2ctypes', 'generate', args.filename,
+             '-o', os.path.join(temp_dir, 'generated_types.py')],
+            cwd=LIB_PATH,
+        )
+
+        results = [
+            ('no cache', [startup_time(args.filename, None) for i in range(args.repeat)]),
+            ('cold', [startup_time(args.filename, d) for d in cold_dirs]),
+            ('warm', [startup_time(args.filename, warm_dir) for i in range(args.repeat)]),
+            ('lazy', [lazy_startup_time(args.filename, args.type) for i in range(args.repeat)]),
+            ('generated', [generated_startup_time(temp_dir) for i in range(args.repeat)]),
+        ]
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print("CTypeFactory startup: %s (milliseconds per process)" % os.path.relpath(args.filename))
+    print("%-12s%10s%10s" % ('', 'min', 'median'))
+    for (name, times) in results:
+        times = sorted(times)
+        print("%-12s%10.1f%10.1f" % (name, times[0] * 1e3, times[len(times) // 2] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
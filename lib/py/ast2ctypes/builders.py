@@ -1,6 +1,50 @@
+import sys
 import ctypes
 
 
+# ---- Field Maps
+def _field_types(cls):
+    """
+    Map of a Structure class' field names to their types (cached on the class)
+    :param cls: ctypes Structure class
+    :return: dict of {name: ctype class}
+    """
+    fields = cls.__dict__.get('_field_types_', None)  # not inherited; subclasses may add fields
+    if fields is None:
+        fields = {}
+        for base in reversed(cls.__mro__):
+            fields.update(dict(base.__dict__.get('_fields_', [])))
+        cls._field_types_ = fields
+    return fields
+
+
+# ---- Bulk Copying
+# memoryview format type codes by kind (see the struct module)
+_FORMAT_KINDS = {}
+_FORMAT_KINDS.update((c, 'signed') for c in 'bhilqn')
+_FORMAT_KINDS.update((c, 'unsigned') for c in 'BHILQN?c')
+_FORMAT_KINDS.update((c, 'float') for c in 'efdg')
+
+_BYTE_CLASSES = set([ctypes.c_uint8, ctypes.c_ubyte])  # lists of values may be converted with bytes(list)
+
+_NATIVE_BYTE_ORDERS = ('', '@', '=', '<' if (sys.byteorder == 'little') else '>')
+
+
+def _bulk_copyable(cls, view):
+    """
+    Can the given buffer be copied directly into an array of cls?
+    :param cls: ctypes scalar class (eg: c_uint8)
+    :param view: memoryview of source
+    :return: True if the buffer's items are in the same representation as cls
+    """
+    if view.itemsize != ctypes.sizeof(cls):
+        return False
+    if view.itemsize == 1:
+        return True  # bytes are bytes
+    (byte_order, type_code) = (view.format[:-1], view.format[-1:])
+    return (byte_order in _NATIVE_BYTE_ORDERS) and (_FORMAT_KINDS.get(type_code) == _FORMAT_KINDS.get(cls._type_))
+
+
 # ---- ctype Builders / Helpers
 def build_struct(cls, **kwargs):
     """
@@ -10,14 +54,15 @@ def build_struct(cls, **kwargs):
     :return: populated instance of cls
     """
     assert issubclass(cls, ctypes.Structure), "bad paramter"
+    fields = _field_types(cls)
     obj = cls()
     for (key, value) in kwargs.items():
         if key.endswith('__exact'):
             key = key[:-len('__exact')]
-            assert key in dict(cls._fields_), "%s struct has no %s attribute" % (cls.__name__, key)
+            assert key in fields, "%s struct has no %s attribute" % (cls.__name__, key)
             setattr(obj, key, value)
         else:
-            setattr(obj, key, dict(cls._fields_)[key](value))
+            setattr(obj, key, fields[key](value))
     return obj
 
 
@@ -25,11 +70,24 @@ def build_array(cls, elements):
     """
     Build an array of the given class with the given values
     :param cls: ctypes class of array to build
-    :param elements: list of values (python list)
+    :param elements: list of values (python list / tuple), or for scalar classes, any object supporting
+                     the buffer protocol (bytes, bytearray, memoryview, array.array, etc) with the same
+                     item representation as cls; these are copied in bulk
     :return:
     """
-    assert isinstance(elements, (tuple, list)), "bad parameter"
-    array = (cls * len(elements))()
-    for (i, value) in enumerate(elements):
-        array[i] = value
-    return array
+    if isinstance(elements, (tuple, list)):
+        if cls in _BYTE_CLASSES:
+            try:
+                return (cls * len(elements)).from_buffer_copy(bytes(elements))
+            except (ValueError, TypeError):
+                pass  # not all in range(0x100); set individually (to be truncated, as ctypes does)
+        array = (cls * len(elements))()
+        for (i, value) in enumerate(elements):
+            array[i] = value
+        return array
+
+    assert issubclass(cls, ctypes._SimpleCData), "bad parameter"
+    view = memoryview(elements)
+    assert _bulk_copyable(cls, view), "bad parameter: %r items can't be copied to a %s array" % (view.format, cls.__name__)
+    view = view.cast('B') if view.c_contiguous else memoryview(view.tobytes())
+    return (cls * (view.nbytes // ctypes.sizeof(cls))).from_buffer_copy(view)
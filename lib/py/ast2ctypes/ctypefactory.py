@@ -1,15 +1,13 @@
-try:
-    from StringIO import StringIO
-except ImportError:
-    from io import StringIO
 import logging
+import hashlib
 import pycparser
 from pycparser.c_ast import (
     NodeVisitor,
     Typedef,
-    PtrDecl, TypeDecl, FuncDecl, FuncDef,
+    PtrDecl, TypeDecl, FuncDecl, FuncDef, ArrayDecl,
     Struct,
     IdentifierType,
+    Constant, BinaryOp,
 )
 import fnmatch
 from ctypes import (
@@ -21,6 +19,17 @@ from ctypes import (
     POINTER, CFUNCTYPE,
 )
 
+try:
+    from . import typegraph
+    from . import parallel
+    from . import dtypes
+    from . import packers
+except ImportError:  # imported as a top-level module (eg: by tests)
+    import typegraph
+    import parallel
+    import dtypes
+    import packers
+
 log = logging.getLogger(__name__)
 
 
@@ -44,6 +53,19 @@ class CTypeFactory(NodeVisitor):
             ast = parser.parse(cfilehandle.read())
             factory = CTypeFactory(ast)
         checksum = factory['myprj_checksum_t'](0x00)
+
+    Or, to cache the built type graph between runs (see from_file):
+        factory = CTypeFactory.from_file('mycode-preproc.c', cache_dir='.ast2ctypes-cache')
+
+    Or, from several translation units (parsed in parallel, see from_files):
+        factory = CTypeFactory.from_files(['mycode-preproc.c', 'othercode-preproc.c'])
+
+    Lazy construction:
+        By default every matching typedef & function is built on construction (including
+        everything pulled in from system headers). With lazy=True nothing is built until it's
+        requested; each type (and the types it depends on) is built on first access:
+            factory = CTypeFactory(ast, lazy=True)
+            checksum_t = factory['myprj_checksum_t']  # or factory.myprj_checksum_t
     """
 
     # Map types
@@ -69,7 +91,8 @@ class CTypeFactory(NodeVisitor):
         ('long', 'double',):            c_longdouble,
     }
 
-    def __init__(self, ast, typedef_patterns=('*',), funcdef_patterns=('*',), ctypes_class_map=None, pack=False):
+    def __init__(self, ast, typedef_patterns=('*',), funcdef_patterns=('*',), ctypes_class_map=None, pack=False,
+                 lazy=False):
         """
         Parse given C-Code and maps typedefs matching pattern to self.ctypes_map
         :param ast: Abstract Syntax Tree provided by pycparser (pycparser.c_ast.FileAST instance)
@@ -78,6 +101,8 @@ class CTypeFactory(NodeVisitor):
         :param ctypes_class_map: dict of c-types (as a tuple of strings) to ctype base classes
                                     (defaults to self.BASE_CTYPES_CLASS_MAP)
         :param pack: if True, structures will be packed tight, instead of being padded based on the architecture
+        :param lazy: if True, types are only built when requested (see __getitem__), otherwise all
+                     matching types are built now
         """
         assert isinstance(ast, pycparser.c_ast.FileAST), "bad parameter type"
         self.ast = ast
@@ -89,6 +114,7 @@ class CTypeFactory(NodeVisitor):
             self.ctypes_class_map = self.BASE_CTYPES_CLASS_MAP
 
         self.pack = pack
+        self.lazy = lazy
 
         # AST node maps from visitors
         self.typedef_map = {}
@@ -96,17 +122,26 @@ class CTypeFactory(NodeVisitor):
 
         # Built classes
         self.ctypes_map = {}
+        self._node_ctypes = {}  # {id(Typedef or FuncDef node): built class}
 
         # populate
         #   - self.typedef_map
         #   - self.funcdef_map
         self.visit(self.ast)
 
+        if not self.lazy:
+            self.build_all()
+
+    def build_all(self):
+        """
+        Build all typedefs & functions matching the factory's patterns (populates self.ctypes_map)
+        Called on construction, unless the factory is lazy.
+        """
         for (name, node) in self.typedef_map.items():
             log.debug("finding ctype for typedef: %s", name)
             if self._name_match(name, self.typedef_patterns):
                 if name not in self.ctypes_map:
-                    self._build_ctype(node, buffer=True)  # populates self.ctypes_map
+                    self._build_node(node)  # populates self.ctypes_map
                 else:
                     log.debug("(%s is already buffered)", name)
 
@@ -114,10 +149,203 @@ class CTypeFactory(NodeVisitor):
             log.debug("finding ctype for function: %s", name)
             if self._name_match(name, self.funcdef_patterns):
                 if name not in self.ctypes_map:
-                    self._build_ctype(node, buffer=True)
+                    self._build_node(node)
                 else:
                     log.debug("(%s is already buffered)", name)
 
+    def __getitem__(self, name):
+        """
+        ctypes class for the named typedef or function, built (and retained) on first request
+        :param name: typedef or function name
+        :return: ctypes class
+        :raises KeyError: if name isn't a typedef or function matching the factory's patterns
+        """
+        if name in self.ctypes_map:
+            return self.ctypes_map[name]
+        # typedef_map & funcdef_map values are None for factories loaded from cache, but their
+        # ctypes_map is complete, so reaching here means there's nothing to build
+        if (self.typedef_map.get(name, None) is not None) and self._name_match(name, self.typedef_patterns):
+            log.debug("building ctype for typedef: %s", name)
+            return self._build_node(self.typedef_map[name])
+        if (self.funcdef_map.get(name, None) is not None) and self._name_match(name, self.funcdef_patterns):
+            log.debug("building ctype for function: %s", name)
+            return self._build_node(self.funcdef_map[name])
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        if name in self.ctypes_map:
+            return True
+        elif name in self.typedef_map:
+            return self._name_match(name, self.typedef_patterns)
+        return (name in self.funcdef_map) and self._name_match(name, self.funcdef_patterns)
+
+    def numpy_dtype(self, name, **kwargs):
+        """
+        numpy.dtype equivalent of a struct typedef (numpy is required, see dtypes.struct_dtype)
+        The factory's pack option is honoured.
+        :param name: struct typedef name
+        :param kwargs: passed to dtypes.struct_dtype (eg: pointers='address')
+        :return: numpy.dtype instance
+        """
+        ctype_class = self[name]
+        assert isinstance(ctype_class, type) and issubclass(ctype_class, Structure), "%s is not a struct" % name
+        return dtypes.struct_dtype(ctype_class, **kwargs)
+
+    def numpy_dtypes(self, **kwargs):
+        """
+        numpy.dtype equivalents of all struct typedefs in self.ctypes_map
+        (for a lazy factory, only those already built)
+        :param kwargs: passed to dtypes.struct_dtype
+        :return: dict of {name: numpy.dtype}
+        """
+        return dict(
+            (name, dtypes.struct_dtype(ctype_class, **kwargs))
+            for (name, ctype_class) in self.ctypes_map.items()
+            if (name in self.typedef_map) and isinstance(ctype_class, type) and issubclass(ctype_class, Structure)
+        )
+
+    def struct_packer(self, name, **kwargs):
+        """
+        Precompiled struct.Struct equivalent of a struct typedef (see packers.struct_packer)
+        The factory's pack option is honoured.
+        :param name: struct typedef name (the struct can't have pointer fields)
+        :param kwargs: passed to packers.struct_packer (eg: byteorder='<')
+        :return: packers.StructPacker instance
+        """
+        ctype_class = self[name]
+        assert isinstance(ctype_class, type) and issubclass(ctype_class, Structure), "%s is not a struct" % name
+        return packers.struct_packer(ctype_class, **kwargs)
+
+    def struct_packers(self, **kwargs):
+        """
+        Packers of all struct typedefs in self.ctypes_map without pointer fields
+        (for a lazy factory, only those already built)
+        :param kwargs: passed to packers.struct_packer
+        :return: dict of {name: packers.StructPacker}
+        """
+        return dict(
+            (name, packers.struct_packer(ctype_class, **kwargs))
+            for (name, ctype_class) in self.ctypes_map.items()
+            if (name in self.typedef_map) and isinstance(ctype_class, type) and issubclass(ctype_class, Structure)
+            and (not packers.has_pointers(ctype_class))
+        )
+
+    def __getattr__(self, name):
+        # only called for names that aren't attributes (eg: factory.myprj_checksum_t)
+        if name.startswith('_') or name.startswith('visit_') or ('ctypes_map' not in self.__dict__):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError("%r has no type '%s'" % (self, name))
+
+    @classmethod
+    def from_file(cls, filename, cache_dir=None, **kwargs):
+        """
+        Build from a preprocessed c file, optionally using an on-disk cache
+
+        The cache is keyed by a hash of the file's content and the factory options; a cache hit
+        rebuilds the ctypes classes without parsing the file (pycparser isn't run at all).
+        A factory loaded from cache has no ast, and its typedef_map & funcdef_map values are
+        None (names are retained).
+
+        A lazy factory will use a cached graph (where one exists), but won't write one; its
+        graph is incomplete until all types have been requested.
+
+        :param filename: preprocessed c file
+        :param cache_dir: directory to store cached type graphs in (None disables caching)
+        :param kwargs: passed to CTypeFactory(ast, **kwargs)
+        :return: CTypeFactory instance
+        """
+        with open(filename, 'r') as fh:
+            source = fh.read()
+        parse = lambda: pycparser.c_parser.CParser().parse(source, filename)
+        return cls._from_source(source.encode('utf-8'), parse, cache_dir, filename, **kwargs)
+
+    @classmethod
+    def from_files(cls, filenames, cache_dir=None, processes=None, **kwargs):
+        """
+        Build from multiple preprocessed c files (translation units), parsed in parallel
+
+        Each file is parsed on its own (in a process pool, see parallel.parse_files), then their
+        typedefs & function definitions are merged; where a name is defined in more than one
+        file, its first definition (in the order given) is used.
+
+        :param filenames: list of preprocessed c files
+        :param cache_dir: directory to store cached type graphs in (None disables caching),
+                          keyed by the content of all files (see from_file)
+        :param processes: number of worker processes (default: os.cpu_count())
+        :param kwargs: passed to CTypeFactory(ast, **kwargs)
+        :return: CTypeFactory instance
+        """
+        filenames = list(filenames)
+        digests = []
+        for filename in filenames:
+            with open(filename, 'rb') as fh:
+                digests.append(hashlib.sha256(fh.read()).hexdigest())
+        parse = lambda: parallel.parse_files(filenames, processes=processes)
+        return cls._from_source(' '.join(digests).encode('utf-8'), parse, cache_dir, ', '.join(filenames), **kwargs)
+
+    @classmethod
+    def _from_source(cls, source, parse, cache_dir, label, **kwargs):
+        # factory from cache (keyed by source), or from the ast returned by parse()
+        if cache_dir is not None:
+            options = cls._cache_options(**kwargs)
+            key = typegraph.cache_key(source, options)
+            graph = typegraph.read_cache(cache_dir, key)
+            if graph is not None:
+                try:
+                    return cls._from_graph(graph, **kwargs)
+                except Exception as e:
+                    log.warning("ignoring unusable cache for %s: %s", label, e)
+
+        factory = cls(parse(), **kwargs)
+
+        if (cache_dir is not None) and (not factory.lazy):
+            try:
+                typegraph.write_cache(cache_dir, key, typegraph.dump_graph(factory))
+            except (NotImplementedError, IOError, OSError) as e:
+                log.warning("unable to cache types for %s: %s", label, e)
+
+        return factory
+
+    @classmethod
+    def _cache_options(cls, typedef_patterns=('*',), funcdef_patterns=('*',), ctypes_class_map=None, pack=False,
+                       lazy=False):
+        # factory options (see __init__) in a serialisable form
+        #   (lazy is excluded; it doesn't change the types built, only when they're built)
+        if ctypes_class_map is None:
+            ctypes_class_map = cls.BASE_CTYPES_CLASS_MAP
+        return {
+            'typedef_patterns': list(typedef_patterns),
+            'funcdef_patterns': list(funcdef_patterns),
+            'ctypes_class_map': sorted(
+                [list(names), typegraph.class_reference(c) if (c is not None) else None]
+                for (names, c) in ctypes_class_map.items()
+            ),
+            'pack': pack,
+        }
+
+    @classmethod
+    def _from_graph(cls, graph, typedef_patterns=('*',), funcdef_patterns=('*',), ctypes_class_map=None, pack=False,
+                    lazy=False):
+        # factory populated from a graph returned by typegraph.dump_graph (without an ast)
+        #   (a lazy factory is given the complete graph; loading it is cheaper than parsing)
+        factory = cls.__new__(cls)
+        factory.ast = None
+        factory.typedef_patterns = typedef_patterns
+        factory.funcdef_patterns = funcdef_patterns
+        factory.ctypes_class_map = ctypes_class_map
+        if factory.ctypes_class_map is None:
+            factory.ctypes_class_map = cls.BASE_CTYPES_CLASS_MAP
+        factory.pack = pack
+        factory.lazy = lazy
+        factory.typedef_map = dict.fromkeys(graph['typedefs'])
+        factory.funcdef_map = dict.fromkeys(graph['funcdefs'])
+        factory.ctypes_map = typegraph.load_graph(graph)
+        factory._node_ctypes = {}
+        return factory
+
     def _buffer_ctype(self, ctype_class, buffer=False):
         if ctype_class is None:
             return None
@@ -133,41 +361,73 @@ class CTypeFactory(NodeVisitor):
         else:
             return ctype_class
 
+    def _typedef_dependencies(self, node):
+        """
+        Typedefs directly referred to by a Typedef or FuncDef node (not those they refer to)
+        :param node: pycparser.c_ast.Typedef or pycparser.c_ast.FuncDef instance
+        :return: list of Typedef nodes
+        """
+        dependencies = []
+        stack = [node.decl.type if isinstance(node, FuncDef) else node.type]  # (a function's body is ignored)
+        while stack:
+            n = stack.pop()
+            if isinstance(n, IdentifierType):
+                if (tuple(n.names) not in self.ctypes_class_map) and (len(n.names) == 1) and (n.names[0] in self.typedef_map):
+                    dependencies.append(self.typedef_map[n.names[0]])
+            else:
+                stack += [child for (child_name, child) in n.children()]
+        return dependencies
+
+    def _build_node(self, node):
+        """
+        Build the ctype for a Typedef or FuncDef node, and every typedef it depends on
+        Dependencies are built first (in topological order, without recursion), so when a type is
+        built, the typedefs it refers to are already memoised; the depth of _build_ctype's recursion
+        is limited to that of a single declaration, however long a chain of typedefs is.
+        :param node: pycparser.c_ast.Typedef or pycparser.c_ast.FuncDef instance
+        :return: built class
+        """
+        stack = [(node, False)]
+        in_progress = set()  # ids of nodes whose dependencies are being built (ie: ancestors)
+        while stack:
+            (n, expanded) = stack.pop()
+            if expanded:
+                in_progress.discard(id(n))
+                self._build_ctype(n)
+            elif id(n) not in self._node_ctypes:
+                if id(n) in in_progress:
+                    raise NotImplementedError("circular typedef: %s" % self.get_decl_name(n))
+                in_progress.add(id(n))
+                stack.append((n, True))
+                stack += [(d, False) for d in self._typedef_dependencies(n) if id(d) not in self._node_ctypes]
+        return self._build_ctype(node)  # memoised (re-applies name)
+
     def _build_ctype(self, node, **kwargs):
         """
         Recursively calls down the given AST (node)
+        Typedef & FuncDef nodes are memoised (by node identity); use _build_node to build a type
+        whose typedef dependencies may not be built yet.
         :param node: AST node for which to build a ctype (instance of class inheriting from pycparser.c_ast.Node)
         :return: class inheriting from relevant ctype (dynamically built)
         """
-        if isinstance(kwargs.get('recursive_depth', None), int):
-            kwargs['recursive_depth'] += 1
-        else:
-            kwargs['recursive_depth'] = 0
-        assert kwargs['recursive_depth'] < 60, "too many things"
-
-        # debug stuff
-        #str_buffer = StringIO()
-        #node.show(buf=str_buffer, offset=kwargs['recursive_depth'])
-        #print(str_buffer.getvalue().split('\n')[0])
-
         # args
         class_name = kwargs.get('class_name', None)
 
-        if class_name and class_name in self.ctypes_map:
-            return self.ctypes_map[class_name]
-
-        if isinstance(node, Typedef):
+        if isinstance(node, (Typedef, FuncDef)):
             # type definition wrapper, pass down to type
-            kwargs.update({'class_name': node.name})
-            ctype_class = self._build_ctype(node.type, **kwargs)
-            ctype_class.__name__ = node.name
-            return self._buffer_ctype(ctype_class, True)  # always buffer typedefs (they're all global)
-
-        elif isinstance(node, FuncDef):
-            kwargs.update({'class_name': node.decl.name})
-            ctype_class = self._build_ctype(node.decl.type, **kwargs)
-            ctype_class.__name__ = node.decl.name
-            return self._buffer_ctype(ctype_class, True)  # always buffer function def's (they're all global)
+            # function definition, pass down to its declaration (ie: a function pointer)
+            if isinstance(node, Typedef):
+                (name, decl_type) = (node.name, node.type)
+            else:
+                (name, decl_type) = (node.decl.name, node.decl.type)
+            ctype_class = self._node_ctypes.get(id(node), None)
+            if ctype_class is None:
+                kwargs.update({'class_name': name})
+                ctype_class = self._build_ctype(decl_type, **kwargs)
+                self._node_ctypes[id(node)] = ctype_class
+            # base classes are shared between typedefs, they're named after the last one referenced
+            ctype_class.__name__ = name
+            return self._buffer_ctype(ctype_class, True)  # always buffer typedefs & function def's (they're all global)
 
         elif isinstance(node, TypeDecl):
             # type declaration wrapper, pass down to type
@@ -181,6 +441,11 @@ class CTypeFactory(NodeVisitor):
                 return self._build_ctype(node.type, **kwargs)
             return POINTER(self._build_ctype(node.type, **kwargs))
 
+        elif isinstance(node, ArrayDecl):
+            # array (of a constant length):
+            # uint8_t buffer[(4u) * 2];
+            return self._build_ctype(node.type, **kwargs) * self._array_length(node.dim)
+
         elif isinstance(node, IdentifierType):
             if tuple(node.names) in self.ctypes_class_map:
                 # base type:
@@ -229,14 +494,41 @@ class CTypeFactory(NodeVisitor):
 
         raise NotImplementedError("%r not supported" % node)
 
+    # integer operators an array's length may be calculated with (after preprocessing, macros are expressions)
+    ARRAY_LENGTH_OPERATORS = {
+        '+': lambda a, b: a + b,
+        '-': lambda a, b: a - b,
+        '*': lambda a, b: a * b,
+        '/': lambda a, b: a // b,
+        '%': lambda a, b: a % b,
+        '<<': lambda a, b: a << b,
+        '>>': lambda a, b: a >> b,
+    }
+
+    def _array_length(self, node):
+        """
+        Evaluate an array's dimension
+        :param node: ArrayDecl.dim node
+        :return: int
+        """
+        if isinstance(node, Constant) and ('int' in node.type.split()):
+            value = node.value.rstrip('uUlL')
+            if (len(value) > 1) and value.startswith('0') and value[1] not in 'xXbB':
+                return int(value, 8)
+            return int(value, 0)
+        elif isinstance(node, BinaryOp) and (node.op in self.ARRAY_LENGTH_OPERATORS):
+            return self.ARRAY_LENGTH_OPERATORS[node.op](self._array_length(node.left), self._array_length(node.right))
+        raise NotImplementedError("array length %r not supported (must be an integer constant expression)" % node)
+
     def _name_match(self, name, patterns):
         """
-        Returns true if name matches one of self.patterns
+        Returns true if name matches one of patterns
         :param name: string to test
-        :return: True if name matches one or more of the fnmatch patterns in self.patterns
+        :param patterns: list of fnmatch patterns
+        :return: True if name matches one or more of the fnmatch patterns
         """
         if isinstance(name, str):
-            return any(fnmatch.fnmatch(name, p) for p in self.typedef_patterns)
+            return any(fnmatch.fnmatch(name, p) for p in patterns)
         return False
 
     # ------ Visitors:
@@ -0,0 +1,81 @@
+import ctypes
+from ctypes import Structure
+
+try:
+    from .layout import TARGETS, struct_layout, type_name, _is_pointer
+except ImportError:  # imported as a top-level module (eg: by tests)
+    from layout import TARGETS, struct_layout, type_name, _is_pointer
+
+# How pointer fields (and function pointers) are represented:
+#   skip:    omitted (their bytes are left as unnamed padding, other fields keep their offsets)
+#   address: unsigned integer of the target's pointer size, flagged with dtype metadata {'pointer': <type name>}
+#   error:   NotImplementedError is raised
+POINTER_OPTIONS = ('skip', 'address', 'error')
+
+
+def _numpy():
+    # numpy is optional; it's only imported when a dtype is requested
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("numpy is required for dtype generation (pip install numpy)")
+    return numpy
+
+
+def _field_dtype(numpy, cls, target, pointers, byteorder):
+    # numpy.dtype of a field's ctypes class (None if it's to be skipped)
+    if _is_pointer(cls):
+        if pointers == 'skip':
+            return None
+        elif pointers == 'error':
+            raise NotImplementedError("pointer (%s) has no dtype equivalent" % type_name(cls))
+        return numpy.dtype('%su%i' % (byteorder, target.pointer_size), metadata={'pointer': type_name(cls)})
+    elif issubclass(cls, ctypes.Array):
+        element = _field_dtype(numpy, cls._type_, target, pointers, byteorder)
+        if element is None:
+            return None
+        return numpy.dtype((element, (cls._length_,)))
+    elif issubclass(cls, Structure):
+        return struct_dtype(cls, target=target, pointers=pointers, byteorder=byteorder)
+    elif issubclass(cls, ctypes.c_char):
+        return numpy.dtype('S1')
+    return numpy.dtype(cls).newbyteorder(byteorder)
+
+
+def struct_dtype(cls, target=None, pointers='skip', byteorder='='):
+    """
+    numpy.dtype equivalent of a ctypes Structure
+
+    Fields are placed at the offsets they have on the target (see layout.struct_layout), so a
+    structure's _pack_ (eg: from CTypeFactory(..., pack=True)) is honoured; the dtype's itemsize
+    is the structure's size, so records can be read straight from captured memory:
+        records = numpy.frombuffer(data, dtype=struct_dtype(prlsc_datagram_t))
+        records['serviceIndex']  # column of every record's serviceIndex
+
+    :param cls: ctypes Structure class
+    :param target: ast2ctypes.layout.Target the data was laid out by (default: this host)
+    :param pointers: how pointer fields are represented (see POINTER_OPTIONS)
+    :param byteorder: byte order of multi-byte fields; '=' native, '<' little, '>' big endian
+    :return: numpy.dtype instance
+    """
+    numpy = _numpy()
+    assert pointers in POINTER_OPTIONS, "pointers must be one of %r" % (POINTER_OPTIONS,)
+    target = target or TARGETS['native']
+    layout = struct_layout(cls, target)
+    field_types = dict(cls._fields_)
+
+    (names, formats, offsets) = ([], [], [])
+    for field in layout.fields:
+        field_dtype = _field_dtype(numpy, field_types[field.name], target, pointers, byteorder)
+        if field_dtype is None:
+            continue
+        names.append(field.name)
+        formats.append(field_dtype)
+        offsets.append(field.offset)
+
+    return numpy.dtype({
+        'names': names,
+        'formats': formats,
+        'offsets': offsets,
+        'itemsize': layout.size,
+    })
@@ -1,7 +1,6 @@
 import os
 import sys
 import inspect
-import pycparser
 import ctypes as _ctypes
 
 # Any variables defined here are prefixed with a '_'.
@@ -29,6 +28,8 @@ _DLL_PATH_ABS = os.path.join(_this_path, _DLL_PATH_LOCAL)
 _PREPROC_PATH_LOCAL = 'something-preproc.c'
 _PREPROC_PATH_ABS = os.path.join(_this_path, _PREPROC_PATH_LOCAL)
 
+_CACHE_DIR = os.path.join(_this_path, '.ast2ctypes-cache')
+
 # to enable useful debugging user prompts
 for check_file in [_DLL_PATH_ABS, _PREPROC_PATH_ABS]:
     assert os.path.isfile(check_file), "required file '%s' does not exist; run 'make' in that directory" % (check_file)
@@ -37,9 +38,9 @@ for check_file in [_DLL_PATH_ABS, _PREPROC_PATH_ABS]:
 # --- Build ctypes from ast
 # ok, this is the meat you actually want; everything above is just house-keeping.
 
-# Make AST from preprocessed c file
-_ast = pycparser.parse_file(_PREPROC_PATH_ABS)
-_factory = CTypeFactory(_ast)
+# Make AST from preprocessed c file, and build ctypes from it
+#   (the result is cached in _CACHE_DIR, so the file is only parsed again when it changes)
+_factory = CTypeFactory.from_file(_PREPROC_PATH_ABS, cache_dir=_CACHE_DIR)
 
 # Import dll
 _dynamic_lib = _ctypes.cdll.LoadLibrary(_DLL_PATH_ABS)
@@ -0,0 +1,160 @@
+import keyword
+import hashlib
+
+try:
+    from . import typegraph
+except ImportError:  # imported as a top-level module (eg: by tests)
+    import typegraph
+
+
+MODULE_HEADER = '''"""
+ctypes definitions of {source}
+
+Generated by ast2ctypes; do not edit.
+    source sha256: {digest}
+
+Usage:
+    import {module_name}
+    lib = {module_name}.load_library('path/to/library.so')
+    lib.some_function(...)  # restype & argtypes are set
+"""
+import ctypes
+from ctypes import Structure, POINTER, CFUNCTYPE
+'''
+
+LOADER = '''
+
+def load_library(filename, namespace=None):
+    """
+    Load the shared library, setting each function's restype & argtypes
+    :param filename: shared library file
+    :param namespace: optional dict (eg: globals()) to add the library's functions to
+    :return: ctypes.CDLL instance
+    """
+    library = ctypes.cdll.LoadLibrary(filename)
+    for (name, function_type) in FUNCTION_TYPES.items():
+        function = getattr(library, name)
+        function.restype = function_type._restype_
+        function.argtypes = function_type._argtypes_
+        if namespace is not None:
+            namespace[name] = function
+    return library
+'''
+
+
+class _ModuleWriter(object):
+    def __init__(self, graph):
+        self.graph = graph
+        self.nodes = graph['nodes']
+        self.funcdefs = set(graph['funcdefs'])
+        self.lines = []
+        self.exports = []
+        self.identifiers = {}  # {node index: python identifier bound to it}
+        self.modules = set()  # modules of base classes (other than ctypes)
+
+        # names bound to each node
+        self.names = dict((i, []) for i in range(len(self.nodes)))
+        for (name, i) in graph['ctypes_map'].items():  # in the order they were built
+            self.names[i].append(name + '__t' if (name in self.funcdefs) else name)
+
+    def expression(self, i):
+        """python expression evaluating to node i's class"""
+        if i is None:
+            return 'None'
+        if i in self.identifiers:
+            return self.identifiers[i]
+        node = self.nodes[i]
+        kind = node['kind']
+        if kind == 'base':
+            (module_name, qualname) = node['ref']
+            if module_name != 'ctypes':
+                self.modules.add(module_name)
+            return '%s.%s' % (module_name, qualname)
+        elif kind == 'pointer':
+            return 'POINTER(%s)' % self.expression(node['type'])
+        elif kind == 'array':
+            return '(%s * %i)' % (self.expression(node['type']), node['length'])
+        elif kind == 'function':
+            return 'CFUNCTYPE(%s)' % ', '.join(
+                [self.expression(node['restype'])] + [self.expression(a) for a in node['argtypes']]
+            )
+        elif kind == 'struct':
+            raise NotImplementedError("unnamed struct (%s) can't be inlined" % node['name'])
+        raise NotImplementedError("unknown type graph node: %r" % kind)
+
+    def bind(self, i, identifier):
+        assert not keyword.iskeyword(identifier), "'%s' is a python keyword" % identifier
+        self.identifiers[i] = identifier
+        if not identifier.startswith('_'):
+            self.exports.append(identifier)
+
+    def write_node(self, i):
+        node = self.nodes[i]
+        names = self.names[i]
+        if node['kind'] == 'struct':
+            identifier = names[0] if names else ('_%s_%i' % (node['name'], i))
+            self.blank_lines(2)
+            self.lines.append('class %s(Structure):' % identifier)
+            if node['pack']:
+                self.lines.append('    _pack_ = %i' % node['pack'])
+            field_lines = ["        (%r, %s)," % (str(name), self.expression(f)) for (name, f) in node['fields']]
+            self.lines += ['    _fields_ = ['] + field_lines + ['    ]']
+            self.blank_lines(2)
+            self.bind(i, identifier)
+            aliases = names[1:]
+        elif names:
+            self.lines.append('%s = %s' % (names[0], self.expression(i)))
+            self.bind(i, names[0])
+            aliases = names[1:]
+        else:
+            return  # referenced inline
+        for alias in aliases:
+            self.lines.append('%s = %s' % (alias, names[0]))
+            self.exports.append(alias)
+
+    def blank_lines(self, count):
+        """ensure (exactly) `count` blank lines precede the next line"""
+        while self.lines and (self.lines[-1] == ''):
+            self.lines.pop()
+        self.lines += [''] * count
+
+    def write(self):
+        self.blank_lines(1)
+        self.lines.append('# ---- Types')
+        for i in range(len(self.nodes)):
+            self.write_node(i)
+
+        self.blank_lines(2)
+        self.lines += ['# ---- Functions', 'FUNCTION_TYPES = {']
+        for name in sorted(self.funcdefs):
+            self.lines.append("    %r: %s__t," % (str(name), name))
+        self.lines.append('}')
+        self.exports += ['FUNCTION_TYPES', 'load_library']
+        return self.lines
+
+
+def generate_module(factory, source_name='<unknown>', source=b'', module_name='module'):
+    """
+    Python source of a module defining the factory's classes statically
+    The module only depends on ctypes (no pycparser, or ast2ctypes).
+    Unlike the factory, base ctypes classes aren't renamed; `uint8_t = ctypes.c_uint8`
+    :param factory: CTypeFactory instance
+    :param source_name: name of the preprocessed c file (for the module's docstring)
+    :param source: content of the preprocessed c file (its hash is recorded in the docstring)
+    :param module_name: name the module will be imported as (for the module's docstring)
+    :return: python source (str)
+    """
+    writer = _ModuleWriter(typegraph.dump_graph(factory))
+    body = writer.write()
+    header = MODULE_HEADER.format(
+        source=source_name,
+        digest=hashlib.sha256(source).hexdigest(),
+        module_name=module_name,
+    )
+    lines = [header.rstrip('\n')]
+    lines += ['import %s' % m for m in sorted(writer.modules)]
+    lines += ['', '__all__ = [']
+    lines += ['    %r,' % str(name) for name in writer.exports]
+    lines += [']']
+    lines += body
+    return '\n'.join(lines) + '\n' + LOADER
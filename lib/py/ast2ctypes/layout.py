@@ -0,0 +1,188 @@
+import ctypes
+from collections import namedtuple
+from ctypes import Structure, sizeof
+
+try:
+    from . import typegraph
+except ImportError:  # imported as a top-level module (eg: by tests)
+    import typegraph
+
+
+class Target(object):
+    """
+    Compiler target's data model; how types are sized & aligned when laying out a structure
+
+    Usage:
+        avr = Target('avr', pointer_size=2, max_alignment=1)
+        print(format_layout(struct_layout(mystruct_t, avr)))
+    """
+    def __init__(self, name, pointer_size=None, max_alignment=None):
+        """
+        :param name: name of the target (for reports)
+        :param pointer_size: bytes in a pointer (default: as this host)
+        :param max_alignment: limit of any type's alignment; 1 lays structures out packed
+                              (default: no limit, types are aligned as they are on this host)
+        """
+        self.name = name
+        self.pointer_size = pointer_size or sizeof(ctypes.c_void_p)
+        self.max_alignment = max_alignment
+
+    def align(self, alignment):
+        if self.max_alignment is None:
+            return alignment
+        return min(alignment, self.max_alignment)
+
+    def __repr__(self):
+        return "<Target: %s>" % self.name
+
+
+TARGETS = {
+    'native': Target('native'),
+    'packed': Target('packed', max_alignment=1),
+    'avr': Target('avr', pointer_size=2, max_alignment=1),  # (eg: arduino uno; 8-bit, no alignment)
+}
+
+
+def _is_pointer(cls):
+    return issubclass(cls, (ctypes._Pointer, ctypes._CFuncPtr, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_wchar_p))
+
+
+def type_name(cls):
+    """
+    Readable name of a ctypes class
+    Base classes are shared by the typedefs aliasing them (and renamed by CTypeFactory), so
+    they're named as they are in ctypes (eg: c_uint8)
+    """
+    if cls is None:
+        return 'void'
+    elif issubclass(cls, ctypes._Pointer):
+        return '%s *' % type_name(cls._type_)
+    elif issubclass(cls, ctypes._CFuncPtr):
+        return '%s (*)(%s)' % (type_name(cls._restype_), ', '.join(type_name(a) for a in cls._argtypes_))
+    elif issubclass(cls, ctypes.Array):
+        return '%s[%i]' % (type_name(cls._type_), cls._length_)
+    return typegraph._ctypes_names().get(id(cls), cls.__name__)
+
+
+def type_layout(cls, target):
+    """
+    Size & alignment of a ctypes class on the given target
+    :param cls: ctypes class (scalar, pointer, array or Structure)
+    :param target: Target instance
+    :return: (size, alignment)
+    """
+    if _is_pointer(cls):
+        return (target.pointer_size, target.align(target.pointer_size))
+    elif issubclass(cls, ctypes.Array):
+        (size, alignment) = type_layout(cls._type_, target)
+        return (size * cls._length_, alignment)
+    elif issubclass(cls, Structure):
+        layout = struct_layout(cls, target)
+        return (layout.size, layout.alignment)
+    elif issubclass(cls, ctypes.Union):
+        raise NotImplementedError("unions are not supported: %r" % cls)
+    return (sizeof(cls), target.align(ctypes.alignment(cls)))
+
+
+FieldLayout = namedtuple('FieldLayout', ['name', 'type_name', 'offset', 'size', 'alignment', 'padding'])
+FieldLayout.__doc__ = "Layout of a structure's field (padding: bytes inserted before the field)"
+
+
+class StructLayout(object):
+    """Layout of a Structure on a Target (see struct_layout)"""
+    def __init__(self, cls, target, fields, size, alignment):
+        self.cls = cls
+        self.name = cls.__name__
+        self.target = target
+        self.fields = fields  # list of FieldLayout instances
+        self.size = size
+        self.alignment = alignment
+
+    @property
+    def tail_padding(self):
+        """bytes after the last field (so arrays of the structure are aligned)"""
+        end = (self.fields[-1].offset + self.fields[-1].size) if self.fields else 0
+        return self.size - end
+
+    @property
+    def padding(self):
+        """total bytes of padding (not including that of nested structures)"""
+        return sum(f.padding for f in self.fields) + self.tail_padding
+
+    def suggest_order(self):
+        """
+        Field order with the least padding; fields sorted by descending alignment
+        (ties keep their declared order)
+        :return: StructLayout of the reordered structure, or None if reordering can't reduce its size
+        """
+        order = [f.name for f in sorted(self.fields, key=lambda f: -f.alignment)]
+        layout = struct_layout(self.cls, self.target, order=order)
+        if layout.size < self.size:
+            return layout
+        return None
+
+    def __repr__(self):
+        return "<StructLayout: %s on %s, %i bytes>" % (self.name, self.target.name, self.size)
+
+
+def struct_layout(cls, target, order=None):
+    """
+    Lay out a Structure on the given target
+    A structure's _pack_ (eg: from CTypeFactory(..., pack=True)) is honoured.
+    Nested structures are laid out as whole fields; their internal padding is reported by
+    their own layout.
+    :param cls: ctypes Structure class
+    :param target: Target instance
+    :param order: list of field names to lay out in place of the declared order (see StructLayout.suggest_order)
+    :return: StructLayout instance
+    """
+    assert issubclass(cls, Structure), "%r is not a Structure" % cls
+    field_types = dict(cls._fields_)
+    if order is None:
+        order = [name for (name, field_type) in cls._fields_]
+    assert sorted(order) == sorted(field_types.keys()), "order must list each of %s's fields once" % cls.__name__
+    pack = cls.__dict__.get('_pack_', 0)
+
+    fields = []
+    offset = 0
+    struct_alignment = 1
+    for name in order:
+        field_type = field_types[name]
+        (size, alignment) = type_layout(field_type, target)
+        if pack:
+            alignment = min(alignment, pack)
+        padding = (-offset) % alignment
+        fields.append(FieldLayout(name, type_name(field_type), offset + padding, size, alignment, padding))
+        offset += padding + size
+        struct_alignment = max(struct_alignment, alignment)
+
+    size = offset + ((-offset) % struct_alignment)
+    return StructLayout(cls, target, fields, size, struct_alignment)
+
+
+def format_layout(layout, suggest=True):
+    """
+    Human readable report of a structure's layout
+    :param layout: StructLayout instance
+    :param suggest: if True, a field reordering is suggested (where it would save space)
+    :return: str
+    """
+    lines = ["%s (%s): size %i, alignment %i, padding %i (%.0f%%)" % (
+        layout.name, layout.target.name, layout.size, layout.alignment,
+        layout.padding, (100.0 * layout.padding / layout.size) if layout.size else 0,
+    )]
+    lines.append("    %6s %6s %6s  %s" % ('offset', 'size', 'align', 'field'))
+    for f in layout.fields:
+        if f.padding:
+            lines.append("    %6i %6i %6s  <padding>" % (f.offset - f.padding, f.padding, ''))
+        lines.append("    %6i %6i %6i  %s (%s)" % (f.offset, f.size, f.alignment, f.name, f.type_name))
+    if layout.tail_padding:
+        lines.append("    %6i %6i %6s  <padding>" % (layout.size - layout.tail_padding, layout.tail_padding, ''))
+
+    if suggest:
+        suggested = layout.suggest_order()
+        if suggested is not None:
+            lines.append("    suggested order (size %i, saves %i): %s" % (
+                suggested.size, layout.size - suggested.size, ', '.join(f.name for f in suggested.fields),
+            ))
+    return '\n'.join(lines)
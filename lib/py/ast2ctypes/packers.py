@@ -0,0 +1,165 @@
+import struct
+import ctypes
+from ctypes import Structure
+
+try:
+    from .layout import TARGETS, struct_layout, type_name, _is_pointer
+except ImportError:  # imported as a top-level module (eg: by tests)
+    from layout import TARGETS, struct_layout, type_name, _is_pointer
+
+
+# ---- Format Strings
+# struct module format codes, by ctypes type code kind & size (standard sizes; see the struct module)
+_INTEGER_CODES = {
+    'unsigned': {1: 'B', 2: 'H', 4: 'I', 8: 'Q'},
+    'signed': {1: 'b', 2: 'h', 4: 'i', 8: 'q'},
+}
+_FLOAT_CODES = {4: 'f', 8: 'd'}
+
+
+def _scalar_code(cls):
+    type_code = cls._type_
+    size = ctypes.sizeof(cls)
+    if type_code in 'BHILQ':
+        return _INTEGER_CODES['unsigned'][size]
+    elif type_code in 'bhilq':
+        return _INTEGER_CODES['signed'][size]
+    elif (type_code in 'fd') and (size in _FLOAT_CODES):
+        return _FLOAT_CODES[size]
+    elif type_code in 'c?':
+        return type_code
+    raise NotImplementedError("%s has no struct format equivalent" % type_name(cls))
+
+
+def _format_fields(cls, target, prefix=''):
+    """
+    Format codes & (flattened) field names of a structure's content
+    :return: (list of format codes, list of field names); one name per unpacked value
+    """
+    layout = struct_layout(cls, target)
+    field_types = dict(cls._fields_)
+    (codes, names) = ([], [])
+    for field in layout.fields:
+        if field.padding:
+            codes.append('%ix' % field.padding)
+        (field_codes, field_names) = _format_type(field_types[field.name], target, prefix + field.name)
+        codes += field_codes
+        names += field_names
+    if layout.tail_padding:
+        codes.append('%ix' % layout.tail_padding)
+    return (codes, names)
+
+
+def _format_type(cls, target, name):
+    if _is_pointer(cls):
+        raise NotImplementedError("pointer field %s (%s) can't be packed" % (name, type_name(cls)))
+    elif issubclass(cls, ctypes.Array):
+        if issubclass(cls._type_, ctypes.c_char):
+            return (['%is' % cls._length_], [name])  # char array: a single bytes value
+        (codes, names) = ([], [])
+        for i in range(cls._length_):
+            (element_codes, element_names) = _format_type(cls._type_, target, '%s[%i]' % (name, i))
+            codes += element_codes
+            names += element_names
+        return (codes, names)
+    elif issubclass(cls, Structure):
+        return _format_fields(cls, target, prefix=name + '.')
+    return ([_scalar_code(cls)], [name])
+
+
+def struct_format(cls, target=None, byteorder='='):
+    """
+    struct module format string equivalent to a ctypes Structure
+    Padding is explicit ('x'), placed as the structure is laid out on target (see
+    layout.struct_layout; the structure's _pack_ is honoured), so standard sizes are used
+    regardless of host.
+    :param cls: ctypes Structure class (with no pointer fields)
+    :param target: ast2ctypes.layout.Target (default: this host)
+    :param byteorder: '=' native, '<' little, '>' big endian
+    :return: format string
+    """
+    assert byteorder in '=<>!', "byteorder must be one of '=', '<', '>' or '!'"
+    (codes, names) = _format_fields(cls, target or TARGETS['native'])
+    return byteorder + ''.join(codes)
+
+
+# ---- Packers
+class StructPacker(object):
+    """
+    Precompiled struct.Struct equivalent of a ctypes Structure (see struct_packer)
+
+    Values are packed & unpacked as flat tuples, in the order of field_names (nested
+    structures & arrays are flattened: 'inner.a', 'values[0]', ...).
+
+    Usage:
+        packer = struct_packer(myprj_payload_t, target=TARGETS['packed'], byteorder='<')
+        packer.pack_into(buffer, offset, 1, 2, 3)
+        for (a, b, c) in packer.iter_unpack(data):
+            ...
+    """
+    def __init__(self, cls, target=None, byteorder='='):
+        assert byteorder in '=<>!', "byteorder must be one of '=', '<', '>' or '!'"
+        self.cls = cls
+        self.target = target or TARGETS['native']
+        self.byteorder = byteorder
+        (codes, self.field_names) = _format_fields(cls, self.target)
+        self.struct = struct.Struct(byteorder + ''.join(codes))
+        self.format = self.struct.format
+        self.size = self.struct.size
+
+        # bound directly to the struct.Struct (no python wrapper per call)
+        self.pack = self.struct.pack
+        self.pack_into = self.struct.pack_into
+        self.unpack = self.struct.unpack
+        self.unpack_from = self.struct.unpack_from
+        self.iter_unpack = self.struct.iter_unpack
+
+    def pack_batch(self, records):
+        """
+        Pack many records into a single buffer
+        :param records: sequence of tuples (each in the order of field_names)
+        :return: bytearray of len(records) * size bytes
+        """
+        buffer = bytearray(len(records) * self.size)
+        (pack_into, size) = (self.pack_into, self.size)
+        for (i, record) in enumerate(records):
+            pack_into(buffer, i * size, *record)
+        return buffer
+
+    def unpack_dict(self, buffer, offset=0):
+        """Unpack a single record as a dict of {field name: value} (convenient, not fast)"""
+        return dict(zip(self.field_names, self.unpack_from(buffer, offset)))
+
+    def __repr__(self):
+        return "<StructPacker: %s %r>" % (self.cls.__name__, self.format)
+
+
+def struct_packer(cls, target=None, byteorder='='):
+    """
+    StructPacker for a ctypes Structure (cached on the class, per target & byte order)
+    :param cls: ctypes Structure class (with no pointer fields)
+    :param target: ast2ctypes.layout.Target (default: this host)
+    :param byteorder: '=' native, '<' little, '>' big endian
+    :return: StructPacker instance
+    """
+    assert issubclass(cls, Structure), "%r is not a Structure" % cls
+    target = target or TARGETS['native']
+    packers = cls.__dict__.get('_struct_packers_', None)
+    if packers is None:
+        packers = {}
+        cls._struct_packers_ = packers
+    key = (target.pointer_size, target.max_alignment, byteorder)
+    if key not in packers:
+        packers[key] = StructPacker(cls, target=target, byteorder=byteorder)
+    return packers[key]
+
+
+def has_pointers(cls):
+    """True if a ctypes class is, or contains, a pointer (ie: can't be packed)"""
+    if _is_pointer(cls):
+        return True
+    elif issubclass(cls, ctypes.Array):
+        return has_pointers(cls._type_)
+    elif issubclass(cls, Structure):
+        return any(has_pointers(field_type) for (name, field_type) in cls._fields_)
+    return False
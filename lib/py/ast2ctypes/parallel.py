@@ -0,0 +1,118 @@
+import os
+import logging
+import pycparser
+from pycparser.c_ast import NodeVisitor, FileAST
+from pycparser.c_generator import CGenerator
+
+log = logging.getLogger(__name__)
+
+
+class _DefinitionCollector(NodeVisitor):
+    """
+    Collects the typedefs & function definitions in an AST, as CTypeFactory's visitors would
+    (first occurrence of each name is kept)
+    """
+    def __init__(self):
+        self.definitions = []  # [(kind, name, node), ...] in order of occurrence
+        self.names = set()
+
+    def add(self, kind, name, node):
+        if (kind, name) not in self.names:
+            self.names.add((kind, name))
+            self.definitions.append((kind, name, node))
+
+    def visit_Typedef(self, node):
+        self.add('typedef', node.name, node)
+
+    def visit_FuncDef(self, node):
+        self.add('funcdef', node.decl.name, node)
+
+
+def _parse_file(filename):
+    """
+    Parse a preprocessed c file, returning only what CTypeFactory needs from it
+    (run in a worker process; the result is pickled back to the parent)
+    :param filename: preprocessed c file
+    :return: list of (kind, name, signature, node); function definition bodies are removed
+    """
+    with open(filename, 'r') as fh:
+        ast = pycparser.c_parser.CParser().parse(fh.read(), filename)
+    collector = _DefinitionCollector()
+    collector.visit(ast)
+
+    generator = CGenerator()
+    definitions = []
+    for (kind, name, node) in collector.definitions:
+        if kind == 'funcdef':
+            node.body = None  # only the declaration is mapped (and bodies are the bulk of a file)
+            signature = generator.visit(node.decl)
+        else:
+            signature = generator.visit(node)
+        _strip_coords(node)
+        definitions.append((kind, name, signature, node))
+    return definitions
+
+
+def _strip_coords(node):
+    # remove the coordinates of a node's descendants (only the node's own is reported);
+    # they're a large proportion of what's pickled, and unpickling happens serially
+    stack = [child for (child_name, child) in node.children()]
+    while stack:
+        n = stack.pop()
+        n.coord = None
+        stack += [child for (child_name, child) in n.children()]
+
+
+def merge_definitions(definitions_list):
+    """
+    Merge definitions from multiple files into a single AST
+    Duplicates (eg: from a header included by several files) are dropped; the first occurrence
+    (in file order) is kept, so the result doesn't depend on which process finished first.
+    Duplicates that differ from the kept definition are logged as warnings.
+    :param definitions_list: list of _parse_file results (in file order)
+    :return: pycparser.c_ast.FileAST instance
+    """
+    kept = {}  # {(kind, name): (signature, node)}
+    ext = []
+    for definitions in definitions_list:
+        for (kind, name, signature, node) in definitions:
+            if (kind, name) not in kept:
+                kept[(kind, name)] = (signature, node)
+                ext.append(node)
+            elif kept[(kind, name)][0] != signature:
+                log.warning(
+                    "conflicting %s %s: %s (kept), %s (ignored)",
+                    kind, name, kept[(kind, name)][1].coord, node.coord,
+                )
+    return FileAST(ext)
+
+
+def parse_files(filenames, processes=None):
+    """
+    Parse multiple preprocessed c files (translation units) in parallel, merging their
+    typedefs & function definitions into a single AST (see merge_definitions)
+
+    Usage:
+        ast = parse_files(['module1-preproc.c', 'module2-preproc.c'])
+        factory = CTypeFactory(ast)
+    or:
+        factory = CTypeFactory.from_files(['module1-preproc.c', 'module2-preproc.c'])
+
+    :param filenames: list of preprocessed c files
+    :param processes: number of worker processes (default: os.cpu_count()); if 1, files are
+                      parsed in this process
+    :return: pycparser.c_ast.FileAST instance (function definitions have no body)
+    """
+    filenames = list(filenames)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(filenames))
+
+    if processes <= 1:
+        definitions_list = [_parse_file(f) for f in filenames]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            definitions_list = list(executor.map(_parse_file, filenames))  # (in file order)
+
+    return merge_definitions(definitions_list)
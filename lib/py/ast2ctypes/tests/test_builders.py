@@ -0,0 +1,113 @@
+import sys
+import os
+import inspect
+import array
+import unittest
+
+from ctypes import (
+    c_uint8, c_uint16, c_uint32,
+    c_int8, c_int16,
+    c_float,
+    POINTER,
+    Structure,
+    sizeof,
+)
+
+
+# Units Under Test
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from builders import build_struct, build_array
+
+
+class Simple(Structure):
+    _fields_ = [
+        ('a', c_uint8),
+        ('b', c_uint16),
+        ('data', POINTER(c_uint8)),
+    ]
+
+
+class Extended(Simple):
+    _fields_ = [
+        ('c', c_uint32),
+    ]
+
+
+class TestBuildStruct(unittest.TestCase):
+    def test_basic(self):
+        obj = build_struct(Simple, a=1, b=0x1234)
+        self.assertEqual((obj.a, obj.b), (1, 0x1234))
+
+    def test_exact(self):
+        data = build_array(c_uint8, [1, 2, 3])
+        obj = build_struct(Simple, data__exact=data)
+        self.assertEqual(obj.data[2], 3)
+
+    def test_bad_field(self):
+        with self.assertRaises(KeyError):
+            build_struct(Simple, z=1)
+        with self.assertRaises(AssertionError):
+            build_struct(Simple, z__exact=1)
+
+    def test_subclass(self):
+        obj = build_struct(Extended, a=1, c=2)
+        self.assertEqual((obj.a, obj.c), (1, 2))
+        build_struct(Simple, a=1)  # cached field map of subclass doesn't affect base
+        with self.assertRaises(KeyError):
+            build_struct(Simple, c=1)
+
+    def test_field_map_cached(self):
+        build_struct(Simple, a=1)
+        self.assertEqual(set(Simple.__dict__['_field_types_'].keys()), {'a', 'b', 'data'})
+
+
+class TestBuildArray(unittest.TestCase):
+    def test_list(self):
+        for cls in [c_uint8, c_int8, c_uint16, c_float]:
+            arr = build_array(cls, [1, 2, 3])
+            self.assertEqual(sizeof(arr), sizeof(cls) * 3)
+            self.assertEqual(list(arr), [1, 2, 3])
+
+    def test_list_truncated(self):
+        # values are truncated to the type (as ctypes does)
+        self.assertEqual(list(build_array(c_uint8, [0x100, 0x1FF, -1])), [0x00, 0xFF, 0xFF])
+        self.assertEqual(list(build_array(c_uint8, (1, 2))), [1, 2])
+
+    def test_empty(self):
+        self.assertEqual(len(build_array(c_uint8, [])), 0)
+        self.assertEqual(len(build_array(c_uint8, b'')), 0)
+
+    def test_structs(self):
+        arr = build_array(Simple, [build_struct(Simple, a=1), build_struct(Simple, a=2)])
+        self.assertEqual([s.a for s in arr], [1, 2])
+
+    def test_bytes(self):
+        for source in [b'\x01\x02\xFF', bytearray(b'\x01\x02\xFF'), memoryview(b'\x01\x02\xFF'), (c_uint8 * 3)(1, 2, 0xFF)]:
+            self.assertEqual(list(build_array(c_uint8, source)), [1, 2, 0xFF])
+        self.assertEqual(list(build_array(c_int8, b'\x01\xFF')), [1, -1])
+
+    def test_copied(self):
+        source = bytearray(b'\x01\x02')
+        arr = build_array(c_uint8, source)
+        source[0] = 0xFF
+        self.assertEqual(arr[0], 1)
+
+    def test_array(self):
+        self.assertEqual(list(build_array(c_uint16, array.array('H', [1, 0xFFFF]))), [1, 0xFFFF])
+        self.assertEqual(list(build_array(c_int16, array.array('h', [1, -1]))), [1, -1])
+        self.assertEqual(list(build_array(c_float, array.array('f', [1.5, -2.0]))), [1.5, -2.0])
+
+    def test_non_contiguous(self):
+        source = memoryview(array.array('H', [1, 2, 3, 4]))[::2]
+        self.assertEqual(list(build_array(c_uint16, source)), [1, 3])
+
+    def test_mismatched(self):
+        with self.assertRaises(AssertionError):
+            build_array(c_uint16, b'\x01\x02')  # item size
+        with self.assertRaises(AssertionError):
+            build_array(c_uint16, array.array('h', [1]))  # signedness
+        with self.assertRaises(AssertionError):
+            build_array(c_uint32, array.array('f', [1]))  # float
+        with self.assertRaises(AssertionError):
+            build_array(Simple, b'\x00' * sizeof(Simple))  # not a scalar
@@ -0,0 +1,136 @@
+import sys
+import os
+import inspect
+import unittest
+import pycparser
+
+import ctypes
+from ctypes import (
+    c_uint8, c_uint16,
+    Structure,
+    sizeof,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Utility Function(s)
+def code2ast(c_code):
+    parser = pycparser.c_parser.CParser()
+    return parser.parse(c_code)
+
+
+# Units Under Test
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from ctypefactory import CTypeFactory
+from layout import Target
+import dtypes
+
+
+C_CODE = """
+    typedef unsigned char uint8_t;
+    typedef unsigned short int uint16_t;
+    typedef unsigned int uint32_t;
+    typedef struct {
+        uint8_t serviceIndex;
+        uint8_t subServiceIndex;
+        uint16_t length;
+        uint8_t *data;
+        uint8_t checksum;
+    } datagram_t;
+    typedef struct {
+        datagram_t datagram;
+        uint32_t timestamp;
+    } record_t;
+    typedef uint16_t (*getter_t)(void);
+    uint8_t func(datagram_t d) {
+        return 0;
+    }
+"""
+
+
+class Samples(Structure):
+    _fields_ = [
+        ('count', c_uint8),
+        ('values', c_uint16 * 4),
+    ]
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestStructDtype(unittest.TestCase):
+    def records(self, cls, count):
+        array = (cls * count)()
+        for (i, record) in enumerate(array):
+            record.serviceIndex = i % 8
+            record.length = i * 3
+            record.checksum = 0xFF - (i % 0x100)
+        return array
+
+    def test_columns(self):
+        factory = CTypeFactory(code2ast(C_CODE))
+        datagram_t = factory['datagram_t']
+        array = self.records(datagram_t, 100)
+        records = numpy.frombuffer(array, dtype=factory.numpy_dtype('datagram_t'))
+        self.assertEqual(len(records), 100)
+        self.assertEqual(records.dtype.itemsize, sizeof(datagram_t))
+        self.assertEqual(list(records['serviceIndex']), [r.serviceIndex for r in array])
+        self.assertEqual(list(records['length']), [r.length for r in array])
+        self.assertEqual(list(records['checksum']), [r.checksum for r in array])
+
+    def test_packed(self):
+        factory = CTypeFactory(code2ast(C_CODE), pack=True)
+        datagram_t = factory['datagram_t']
+        dtype = factory.numpy_dtype('datagram_t')
+        self.assertEqual(dtype.itemsize, sizeof(datagram_t))
+        self.assertEqual(dtype.fields['checksum'][1], datagram_t.checksum.offset)
+        array = self.records(datagram_t, 10)
+        self.assertEqual(list(numpy.frombuffer(array, dtype=dtype)['length']), [r.length for r in array])
+
+    def test_pointers(self):
+        factory = CTypeFactory(code2ast(C_CODE))
+        self.assertNotIn('data', factory.numpy_dtype('datagram_t').names)  # skipped by default
+        dtype = factory.numpy_dtype('datagram_t', pointers='address')
+        self.assertEqual(dtype.fields['data'][0].itemsize, sizeof(ctypes.c_void_p))
+        self.assertEqual(dtype.fields['data'][0].metadata, {'pointer': 'c_uint8 *'})
+        with self.assertRaises(NotImplementedError):
+            factory.numpy_dtype('datagram_t', pointers='error')
+
+    def test_nested(self):
+        factory = CTypeFactory(code2ast(C_CODE))
+        record_t = factory['record_t']
+        array = (record_t * 3)()
+        array[2].datagram.length = 0x1234
+        array[2].timestamp = 0xDEADBEEF
+        records = numpy.frombuffer(array, dtype=factory.numpy_dtype('record_t'))
+        self.assertEqual(records['datagram']['length'][2], 0x1234)
+        self.assertEqual(records['timestamp'][2], 0xDEADBEEF)
+
+    def test_arrays(self):
+        array = (Samples * 2)()
+        array[1].values[3] = 0xABCD
+        records = numpy.frombuffer(array, dtype=dtypes.struct_dtype(Samples))
+        self.assertEqual(records['values'].shape, (2, 4))
+        self.assertEqual(records['values'][1][3], 0xABCD)
+
+    def test_target(self):
+        # little-endian 8-bit target, captured as bytes
+        factory = CTypeFactory(code2ast(C_CODE))
+        avr = Target('avr', pointer_size=2, max_alignment=1)
+        dtype = factory.numpy_dtype('datagram_t', target=avr, byteorder='<')
+        self.assertEqual(dtype.itemsize, 1 + 1 + 2 + 2 + 1)
+        records = numpy.frombuffer(bytes([3, 1, 0x34, 0x12, 0, 0, 0xAA]), dtype=dtype)
+        self.assertEqual(records['length'][0], 0x1234)
+        self.assertEqual(records['checksum'][0], 0xAA)
+
+    def test_all_structs(self):
+        factory = CTypeFactory(code2ast(C_CODE))
+        self.assertEqual(set(factory.numpy_dtypes().keys()), {'datagram_t', 'record_t'})
+        lazy = CTypeFactory(code2ast(C_CODE), lazy=True)
+        lazy['datagram_t']
+        self.assertEqual(set(lazy.numpy_dtypes().keys()), {'datagram_t'})
+        with self.assertRaises(AssertionError):
+            factory.numpy_dtype('getter_t')
@@ -0,0 +1,152 @@
+import sys
+import os
+import shutil
+import inspect
+import tempfile
+import unittest
+import importlib.util
+import subprocess
+import ctypes.util
+import pycparser
+
+import ctypes
+from ctypes import (
+    c_uint8, c_uint16,
+    Structure,
+    sizeof,
+)
+
+
+# Utility Function(s)
+def code2ast(c_code):
+    parser = pycparser.c_parser.CParser()
+    return parser.parse(c_code)
+
+
+def describe(cls):
+    """Structural description of a ctypes class (for comparison, names of base classes ignored)"""
+    if cls is None:
+        return None
+    elif issubclass(cls, Structure):
+        return ('struct', sizeof(cls), [
+            (name, describe(field_class), getattr(cls, name).offset)
+            for (name, field_class) in cls._fields_
+        ])
+    elif issubclass(cls, ctypes._Pointer):
+        return ('pointer', describe(cls._type_))
+    elif issubclass(cls, ctypes.Array):
+        return ('array', describe(cls._type_), cls._length_)
+    elif issubclass(cls, ctypes._CFuncPtr):
+        return ('function', describe(cls._restype_), [describe(c) for c in cls._argtypes_])
+    return ('base', cls._type_)
+
+
+# Units Under Test
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from ctypefactory import CTypeFactory
+from generator import generate_module
+
+
+C_CODE = """
+    typedef unsigned char uint8_t;
+    typedef unsigned short int uint16_t;
+    typedef uint8_t data_t;
+    typedef struct {
+        uint8_t a;
+        uint16_t b;
+    } inner_t;
+    typedef struct {
+        inner_t inner;
+        inner_t *inner_ptr;
+        data_t *data;
+        void (*callback)(uint8_t, inner_t);
+        uint16_t counts[2][3u];
+    } outer_t;
+    typedef uint16_t (*getter_t)(void);
+    uint8_t func(outer_t *outer, uint16_t value) {
+        return 0;
+    }
+"""
+
+
+class GeneratorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def import_code(self, code, module_name='generated'):
+        filename = os.path.join(self.temp_dir, '%s.py' % module_name)
+        with open(filename, 'w') as fh:
+            fh.write(code)
+        spec = importlib.util.spec_from_file_location(module_name, filename)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+
+class TestGenerateModule(GeneratorTestCase):
+    def test_classes(self):
+        factory = CTypeFactory(code2ast(C_CODE))
+        module = self.import_code(generate_module(factory))
+        for (name, cls) in factory.ctypes_map.items():
+            if name in factory.funcdef_map:
+                name += '__t'
+            self.assertEqual(describe(getattr(module, name)), describe(cls), name)
+
+    def test_shared_classes(self):
+        module = self.import_code(generate_module(CTypeFactory(code2ast(C_CODE))))
+        self.assertIs(module.uint8_t, c_uint8)  # not renamed, or re-created
+        self.assertIs(module.data_t, module.uint8_t)
+        self.assertIs(dict(module.outer_t._fields_)['inner'], module.inner_t)
+        self.assertEqual(module.inner_t.__name__, 'inner_t')
+
+    def test_packed(self):
+        module = self.import_code(generate_module(CTypeFactory(code2ast(C_CODE), pack=True)))
+        self.assertEqual(sizeof(module.inner_t), 3)
+
+    def test_exports(self):
+        module = self.import_code(generate_module(CTypeFactory(code2ast(C_CODE))))
+        for name in ['uint8_t', 'data_t', 'inner_t', 'outer_t', 'getter_t', 'func__t', 'load_library']:
+            self.assertIn(name, module.__all__)
+        self.assertEqual(set(module.FUNCTION_TYPES.keys()), {'func'})
+
+    def test_no_parser_dependency(self):
+        code = generate_module(CTypeFactory(code2ast(C_CODE)))
+        script = "import sys; exec(sys.stdin.read()); assert 'pycparser' not in sys.modules"
+        process = subprocess.Popen([sys.executable, '-c', script], stdin=subprocess.PIPE)
+        process.communicate(code.encode('utf-8'))
+        self.assertEqual(process.returncode, 0)
+        self.assertNotIn('ast2ctypes', code.split('"""')[2])  # only in the docstring
+
+    def test_source_digest(self):
+        code = generate_module(CTypeFactory(code2ast(C_CODE)), source_name='code-preproc.c', source=b'abc')
+        self.assertIn('code-preproc.c', code)
+        self.assertIn('ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad', code)  # sha256(b'abc')
+
+    @unittest.skipIf(ctypes.util.find_library('c') is None, "libc not found")
+    def test_load_library(self):
+        module = self.import_code(generate_module(CTypeFactory(code2ast("int abs(int value) { return 0; }"))))
+        namespace = {}
+        library = module.load_library(ctypes.util.find_library('c'), namespace)
+        self.assertEqual(library.abs.argtypes, (ctypes.c_int32,))
+        self.assertEqual(namespace['abs'](-5), 5)
+
+
+class TestCommandLine(GeneratorTestCase):
+    def test_generate(self):
+        source_filename = os.path.join(self.temp_dir, 'code-preproc.c')
+        with open(source_filename, 'w') as fh:
+            fh.write(C_CODE)
+        output_filename = os.path.join(self.temp_dir, 'code_types.py')
+        subprocess.check_call(
+            [sys.executable, '-m', 'ast2ctypes', 'generate', source_filename, '--pack', '-o', output_filename],
+            cwd=os.path.join(_this_path, '..', '..'),
+        )
+        with open(output_filename, 'r') as fh:
+            module = self.import_code(fh.read(), 'code_types')
+        self.assertIn('code_types.load_library', module.__doc__)
+        self.assertEqual(sizeof(module.inner_t), 3)
+        self.assertEqual(module.getter_t._restype_, c_uint16)
@@ -0,0 +1,145 @@
+import sys
+import os
+import shutil
+import inspect
+import tempfile
+import unittest
+import subprocess
+import pycparser
+
+import ctypes
+from ctypes import (
+    c_uint8, c_uint16, c_uint32, c_uint64, c_double,
+    Structure,
+    sizeof,
+)
+
+
+# Utility Function(s)
+def code2ast(c_code):
+    parser = pycparser.c_parser.CParser()
+    return parser.parse(c_code)
+
+
+# Units Under Test
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from ctypefactory import CTypeFactory
+from layout import Target, TARGETS, struct_layout, type_layout, format_layout
+
+
+C_CODE = """
+    typedef unsigned char uint8_t;
+    typedef unsigned short int uint16_t;
+    typedef unsigned int uint32_t;
+    typedef struct {
+        uint8_t a;
+        uint32_t b;
+        uint8_t c;
+    } wasteful_t;
+    typedef struct {
+        uint8_t flag;
+        wasteful_t inner;
+        uint16_t count;
+        uint8_t *data;
+        void (*callback)(uint8_t);
+    } outer_t;
+"""
+
+
+class Mixed(Structure):
+    _fields_ = [
+        ('a', c_uint8),
+        ('b', c_double),
+        ('c', c_uint16 * 3),
+        ('d', c_uint64),
+        ('e', c_uint8),
+    ]
+
+
+class TestLayout(unittest.TestCase):
+    def assertMatchesCtypes(self, cls):
+        layout = struct_layout(cls, TARGETS['native'])
+        self.assertEqual(layout.size, sizeof(cls))
+        self.assertEqual(layout.alignment, ctypes.alignment(cls))
+        for field in layout.fields:
+            self.assertEqual(field.offset, getattr(cls, field.name).offset, field.name)
+
+    def test_native(self):
+        factory = CTypeFactory(code2ast(C_CODE))
+        self.assertMatchesCtypes(factory['wasteful_t'])
+        self.assertMatchesCtypes(factory['outer_t'])
+        self.assertMatchesCtypes(Mixed)
+
+    def test_native_packed_struct(self):
+        factory = CTypeFactory(code2ast(C_CODE), pack=True)
+        self.assertMatchesCtypes(factory['wasteful_t'])
+        self.assertMatchesCtypes(factory['outer_t'])
+
+    def test_padding(self):
+        layout = struct_layout(CTypeFactory(code2ast(C_CODE))['wasteful_t'], TARGETS['native'])
+        self.assertEqual([f.padding for f in layout.fields], [0, 3, 0])
+        self.assertEqual(layout.tail_padding, 3)
+        self.assertEqual(layout.padding, 6)
+
+    def test_packed(self):
+        layout = struct_layout(CTypeFactory(code2ast(C_CODE))['outer_t'], TARGETS['packed'])
+        pointer_size = sizeof(ctypes.c_void_p)
+        self.assertEqual(layout.size, 1 + 6 + 2 + (2 * pointer_size))
+        self.assertEqual(layout.padding, 0)
+
+    def test_target(self):
+        avr = Target('avr', pointer_size=2, max_alignment=1)
+        self.assertEqual(struct_layout(CTypeFactory(code2ast(C_CODE))['outer_t'], avr).size, 1 + 6 + 2 + 2 + 2)
+        self.assertEqual(type_layout(c_uint16 * 4, avr), (8, 1))
+        self.assertEqual(type_layout(ctypes.POINTER(c_uint32), Target('32bit', pointer_size=4)), (4, 4))
+
+    def test_suggest_order(self):
+        layout = struct_layout(CTypeFactory(code2ast(C_CODE))['wasteful_t'], TARGETS['native'])
+        suggested = layout.suggest_order()
+        self.assertEqual([f.name for f in suggested.fields], ['b', 'a', 'c'])
+        self.assertEqual(suggested.size, 8)
+        self.assertIsNone(suggested.suggest_order())  # (can't improve on it)
+        self.assertIsNone(struct_layout(Mixed, TARGETS['packed']).suggest_order())
+
+    def test_type_names(self):
+        layout = struct_layout(CTypeFactory(code2ast(C_CODE))['outer_t'], TARGETS['native'])
+        names = dict((f.name, f.type_name) for f in layout.fields)
+        self.assertEqual(names['flag'], 'c_uint8')
+        self.assertEqual(names['inner'], 'wasteful_t')
+        self.assertEqual(names['data'], 'c_uint8 *')
+        self.assertEqual(names['callback'], 'void (*)(c_uint8)')
+
+    def test_format(self):
+        report = format_layout(struct_layout(CTypeFactory(code2ast(C_CODE))['wasteful_t'], TARGETS['native']))
+        self.assertIn('wasteful_t (native): size 12, alignment 4, padding 6', report)
+        self.assertIn('<padding>', report)
+        self.assertIn('suggested order (size 8, saves 4): b, a, c', report)
+
+
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.temp_dir, 'code-preproc.c')
+        with open(self.filename, 'w') as fh:
+            fh.write(C_CODE)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def layout(self, *args):
+        return subprocess.check_output(
+            [sys.executable, '-m', 'ast2ctypes', 'layout', self.filename] + list(args),
+            cwd=os.path.join(_this_path, '..', '..'),
+        ).decode('utf-8')
+
+    def test_default(self):
+        output = self.layout()
+        for header in ['wasteful_t (native)', 'wasteful_t (packed)', 'outer_t (native)', 'outer_t (packed)']:
+            self.assertIn(header, output)
+        self.assertIn('suggested order', output)
+
+    def test_filtered(self):
+        output = self.layout('--struct', 'wasteful_*', '--target', 'avr')
+        self.assertEqual(output.count('(avr)'), 1)
+        self.assertNotIn('outer_t', output)
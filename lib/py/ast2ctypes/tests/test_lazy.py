@@ -0,0 +1,135 @@
+import sys
+import os
+import shutil
+import inspect
+import tempfile
+import unittest
+import pycparser
+
+from ctypes import (
+    c_uint8, c_uint16,
+    Structure,
+    sizeof,
+)
+
+
+# Utility Function(s)
+def code2ast(c_code):
+    parser = pycparser.c_parser.CParser()
+    return parser.parse(c_code)
+
+
+# Units Under Test
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from ctypefactory import CTypeFactory
+
+
+C_CODE = """
+    typedef unsigned char uint8_t;
+    typedef unsigned short int uint16_t;
+    typedef unsigned int uint32_t;
+    typedef uint8_t data_t;
+    typedef struct {
+        uint8_t a;
+        uint16_t b;
+    } inner_t;
+    typedef struct {
+        inner_t inner;
+        data_t *data;
+    } outer_t;
+    typedef struct {
+        uint32_t x;
+    } unused_t;
+    uint8_t func(outer_t *outer) {
+        return 0;
+    }
+    void other_func(void) {
+    }
+"""
+
+
+class TestLazy(unittest.TestCase):
+    def test_nothing_built(self):
+        factory = CTypeFactory(code2ast(C_CODE), lazy=True)
+        self.assertEqual(factory.ctypes_map, {})
+        self.assertIn('outer_t', factory.typedef_map)
+
+    def test_dependencies_built(self):
+        factory = CTypeFactory(code2ast(C_CODE), lazy=True)
+        outer_t = factory['outer_t']
+        self.assertTrue(issubclass(outer_t, Structure))
+        self.assertEqual(set(factory.ctypes_map.keys()), {'outer_t', 'inner_t', 'data_t', 'uint8_t', 'uint16_t'})
+        self.assertIs(dict(outer_t._fields_)['inner'], factory.ctypes_map['inner_t'])
+
+    def test_memoised(self):
+        factory = CTypeFactory(code2ast(C_CODE), lazy=True)
+        self.assertIs(factory['inner_t'], factory['inner_t'])
+        self.assertIs(dict(factory['outer_t']._fields_)['inner'], factory['inner_t'])
+
+    def test_attribute(self):
+        factory = CTypeFactory(code2ast(C_CODE), lazy=True)
+        self.assertIs(factory.inner_t, factory['inner_t'])
+        self.assertEqual(factory.func._restype_, c_uint8)
+        self.assertTrue(issubclass(factory.uint16_t, c_uint16))
+        with self.assertRaises(AttributeError):
+            factory.not_a_type
+
+    def test_missing(self):
+        factory = CTypeFactory(code2ast(C_CODE), lazy=True)
+        with self.assertRaises(KeyError):
+            factory['not_a_type']
+        self.assertNotIn('not_a_type', factory)
+        self.assertIn('unused_t', factory)
+
+    def test_equivalent_to_eager(self):
+        eager = CTypeFactory(code2ast(C_CODE))
+        lazy = CTypeFactory(code2ast(C_CODE), lazy=True)
+        for name in sorted(eager.ctypes_map.keys()):
+            self.assertEqual(sizeof(lazy[name]), sizeof(eager[name]), name)
+        self.assertEqual(set(lazy.ctypes_map.keys()), set(eager.ctypes_map.keys()))
+
+    def test_build_all(self):
+        factory = CTypeFactory(code2ast(C_CODE), lazy=True)
+        factory.build_all()
+        self.assertEqual(set(factory.ctypes_map.keys()), set(CTypeFactory(code2ast(C_CODE)).ctypes_map.keys()))
+
+
+class TestPatterns(unittest.TestCase):
+    def test_typedef_patterns(self):
+        factory = CTypeFactory(code2ast(C_CODE), typedef_patterns=['inner_t'], funcdef_patterns=[])
+        self.assertEqual(set(factory.ctypes_map.keys()), {'inner_t', 'uint8_t', 'uint16_t'})
+
+    def test_funcdef_patterns(self):
+        factory = CTypeFactory(code2ast(C_CODE), typedef_patterns=[], funcdef_patterns=['other_*'])
+        self.assertEqual(set(factory.ctypes_map.keys()), {'other_func'})
+
+    def test_lazy_patterns(self):
+        factory = CTypeFactory(code2ast(C_CODE), funcdef_patterns=['other_*'], lazy=True)
+        self.assertIsNotNone(factory['other_func'])
+        with self.assertRaises(KeyError):
+            factory['func']
+
+
+class TestLazyFromFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.filename = os.path.join(self.temp_dir, 'code-preproc.c')
+        with open(self.filename, 'w') as fh:
+            fh.write(C_CODE)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_not_cached(self):
+        factory = CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir, lazy=True)
+        self.assertEqual(factory.ctypes_map, {})
+        self.assertFalse(os.path.exists(self.cache_dir))  # an incomplete graph isn't written
+
+    def test_cache_used(self):
+        eager = CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir)
+        factory = CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir, lazy=True)
+        self.assertIsNone(factory.ast)
+        self.assertEqual(sizeof(factory['outer_t']), sizeof(eager['outer_t']))
+        self.assertIs(factory.inner_t, factory.ctypes_map['inner_t'])
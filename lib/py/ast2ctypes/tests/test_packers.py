@@ -0,0 +1,119 @@
+import sys
+import os
+import inspect
+import unittest
+import pycparser
+
+import ctypes
+from ctypes import (
+    c_char, c_uint8, c_int16, c_uint16, c_float,
+    Structure,
+    sizeof,
+)
+
+
+# Utility Function(s)
+def code2ast(c_code):
+    parser = pycparser.c_parser.CParser()
+    return parser.parse(c_code)
+
+
+# Units Under Test
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from ctypefactory import CTypeFactory
+from layout import TARGETS
+import packers
+
+
+C_CODE = """
+    typedef unsigned char uint8_t;
+    typedef unsigned short int uint16_t;
+    typedef unsigned int uint32_t;
+    typedef short int int16_t;
+    typedef struct {
+        uint8_t id;
+        uint32_t position;
+        int16_t velocity;
+    } position_t;
+    typedef struct {
+        uint8_t count;
+        position_t latest;
+    } report_t;
+    typedef struct {
+        uint8_t length;
+        uint8_t *data;
+    } with_pointer_t;
+"""
+
+
+class Samples(Structure):
+    _fields_ = [
+        ('name', c_char * 4),
+        ('values', c_int16 * 3),
+        ('gain', c_float),
+    ]
+
+
+class TestStructPacker(unittest.TestCase):
+    def setUp(self):
+        self.factory = CTypeFactory(code2ast(C_CODE))
+
+    def test_matches_ctypes(self):
+        position_t = self.factory['position_t']
+        packer = self.factory.struct_packer('position_t')
+        self.assertEqual(packer.size, sizeof(position_t))
+        self.assertEqual(packer.field_names, ['id', 'position', 'velocity'])
+        obj = position_t(id=3, position=0x12345678, velocity=-2)
+        self.assertEqual(packer.pack(3, 0x12345678, -2), bytes(obj))
+        self.assertEqual(packer.unpack(bytes(obj)), (3, 0x12345678, -2))
+
+    def test_packed(self):
+        factory = CTypeFactory(code2ast(C_CODE), pack=True)
+        packer = factory.struct_packer('position_t')
+        self.assertEqual(packer.format, '=BIh')
+        self.assertEqual(packer.size, sizeof(factory['position_t']))
+        wire = self.factory.struct_packer('position_t', target=TARGETS['packed'], byteorder='>')
+        self.assertEqual(wire.pack(1, 2, 3), b'\x01\x00\x00\x00\x02\x00\x03')
+
+    def test_nested(self):
+        report_t = self.factory['report_t']
+        packer = self.factory.struct_packer('report_t')
+        self.assertEqual(packer.field_names, ['count', 'latest.id', 'latest.position', 'latest.velocity'])
+        obj = report_t(count=1)
+        obj.latest.position = 1000
+        self.assertEqual(packer.unpack(bytes(obj)), (1, 0, 1000, 0))
+        self.assertEqual(packer.unpack_dict(bytes(obj))['latest.position'], 1000)
+
+    def test_arrays(self):
+        packer = packers.struct_packer(Samples)
+        self.assertEqual(packer.field_names, ['name', 'values[0]', 'values[1]', 'values[2]', 'gain'])
+        obj = Samples(name=b'abc', gain=0.5)
+        obj.values[2] = -7
+        self.assertEqual(packer.unpack(bytes(obj)), (b'abc\x00', 0, 0, -7, 0.5))
+
+    def test_batch(self):
+        position_t = self.factory['position_t']
+        packer = self.factory.struct_packer('position_t')
+        records = [(i, i * 1000, -i) for i in range(50)]
+        buffer = packer.pack_batch(records)
+        array = (position_t * 50).from_buffer(buffer)
+        self.assertEqual(array[49].position, 49000)
+        self.assertEqual(list(packer.iter_unpack(buffer)), records)
+        self.assertEqual(packer.unpack_from(buffer, 10 * packer.size), records[10])
+
+    def test_cached(self):
+        self.assertIs(self.factory.struct_packer('position_t'), self.factory.struct_packer('position_t'))
+        self.assertIsNot(
+            self.factory.struct_packer('position_t'),
+            self.factory.struct_packer('position_t', byteorder='<'),
+        )
+
+    def test_pointers(self):
+        with self.assertRaises(NotImplementedError):
+            self.factory.struct_packer('with_pointer_t')
+        self.assertEqual(set(self.factory.struct_packers().keys()), {'position_t', 'report_t'})
+
+    def test_format(self):
+        self.assertEqual(packers.struct_format(self.factory['position_t']), '=B3xIh2x')
+        self.assertEqual(packers.struct_format(self.factory['position_t'], target=TARGETS['packed'], byteorder='<'), '<BIh')
@@ -0,0 +1,120 @@
+import sys
+import os
+import shutil
+import inspect
+import tempfile
+import unittest
+import subprocess
+
+from ctypes import (
+    c_uint8, c_uint16, c_uint32,
+    sizeof,
+)
+
+
+# Units Under Test
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from ctypefactory import CTypeFactory
+import parallel
+
+
+HEADER = """
+    typedef unsigned char uint8_t;
+    typedef unsigned short int uint16_t;
+    typedef struct {
+        uint8_t a;
+        uint16_t b;
+    } shared_t;
+"""
+
+MODULE_A = HEADER + """
+    typedef shared_t a_t;
+    uint8_t a_func(shared_t *s) {
+        uint8_t x = 0;
+        return x;
+    }
+"""
+
+MODULE_B = HEADER + """
+    typedef struct {
+        shared_t s;
+        uint8_t c;
+    } b_t;
+    uint16_t b_func(b_t *b) {
+        return 0;
+    }
+"""
+
+MODULE_CONFLICT = """
+    typedef unsigned int uint8_t;
+    typedef uint8_t conflict_t;
+"""
+
+
+class TestParseFiles(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.filenames = {}
+        for (name, source) in [('a', MODULE_A), ('b', MODULE_B), ('conflict', MODULE_CONFLICT)]:
+            self.filenames[name] = os.path.join(self.temp_dir, '%s-preproc.c' % name)
+            with open(self.filenames[name], 'w') as fh:
+                fh.write(source)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_merged(self):
+        factory = CTypeFactory.from_files([self.filenames['a'], self.filenames['b']], processes=2)
+        self.assertEqual(
+            set(factory.ctypes_map.keys()),
+            {'uint8_t', 'uint16_t', 'shared_t', 'a_t', 'b_t', 'a_func', 'b_func'},
+        )
+        self.assertIs(dict(factory['b_t']._fields_)['s'], factory['shared_t'])
+        self.assertIs(factory['a_t'], factory['shared_t'])
+        self.assertEqual(factory['b_func']._restype_, c_uint16)
+
+    def test_deduplicated(self):
+        ast = parallel.parse_files([self.filenames['a'], self.filenames['b']], processes=2)
+        names = [n.name if hasattr(n, 'name') else n.decl.name for n in ast.ext]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(names, ['uint8_t', 'uint16_t', 'shared_t', 'a_t', 'a_func', 'b_t', 'b_func'])
+
+    def test_function_bodies_removed(self):
+        ast = parallel.parse_files([self.filenames['a']], processes=1)
+        self.assertIsNone(ast.ext[-1].body)
+
+    def test_serial_equivalent(self):
+        filenames = [self.filenames['a'], self.filenames['b']]
+        serial = CTypeFactory.from_files(filenames, processes=1)
+        pooled = CTypeFactory.from_files(filenames, processes=2)
+        self.assertEqual(list(serial.ctypes_map.keys()), list(pooled.ctypes_map.keys()))
+        self.assertEqual(sizeof(serial['b_t']), sizeof(pooled['b_t']))
+
+    def test_conflict_first_wins(self):
+        with self.assertLogs(parallel.log, level='WARNING'):
+            factory = CTypeFactory.from_files([self.filenames['a'], self.filenames['conflict']], processes=2)
+        self.assertTrue(issubclass(factory['conflict_t'], c_uint8))
+        with self.assertLogs(parallel.log, level='WARNING'):
+            factory = CTypeFactory.from_files([self.filenames['conflict'], self.filenames['a']], processes=2)
+        self.assertTrue(issubclass(factory['conflict_t'], c_uint32))
+
+    def test_cached(self):
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+        filenames = [self.filenames['a'], self.filenames['b']]
+        cold = CTypeFactory.from_files(filenames, cache_dir=cache_dir, processes=1)
+        warm = CTypeFactory.from_files(filenames, cache_dir=cache_dir, processes=1)
+        self.assertIsNotNone(cold.ast)
+        self.assertIsNone(warm.ast)
+        self.assertEqual(sizeof(warm['b_t']), sizeof(cold['b_t']))
+        reordered = CTypeFactory.from_files(list(reversed(filenames)), cache_dir=cache_dir, processes=1)
+        self.assertIsNotNone(reordered.ast)  # order matters (first definition is used)
+
+    def test_command_line(self):
+        output = subprocess.check_output(
+            [sys.executable, '-m', 'ast2ctypes', 'generate', self.filenames['a'], self.filenames['b'], '-j', '2'],
+            cwd=os.path.join(_this_path, '..', '..'),
+        ).decode('utf-8')
+        self.assertIn('a-preproc.c, b-preproc.c', output)
+        self.assertIn('class b_t(Structure):', output)
+        self.assertIn("'a_func': a_func__t,", output)
@@ -52,6 +52,27 @@ class TestTypedef(unittest.TestCase):
         self.assertTrue(issubclass(dict(f.ctypes_map['struct_t']._fields_)['a'], c_uint8))
         self.assertTrue(issubclass(dict(f.ctypes_map['struct_t']._fields_)['b'], c_int16))
 
+    def test_array(self):
+        f = CTypeFactory(code2ast("""
+            typedef unsigned char uint8_t;
+            typedef struct {
+                uint8_t a[3];
+                short int b[(2u) * 2];
+                uint8_t c[0x2][4u];
+            } struct_t;
+        """))
+        fields = dict(f.ctypes_map['struct_t']._fields_)
+        self.assertTrue(issubclass(fields['a']._type_, c_uint8))
+        self.assertEqual(fields['a']._length_, 3)
+        self.assertTrue(issubclass(fields['b']._type_, c_int16))
+        self.assertEqual(fields['b']._length_, 4)
+        self.assertEqual((fields['c']._length_, fields['c']._type_._length_), (2, 4))  # c[2][4]: 2 arrays of 4
+        self.assertEqual(sizeof(f.ctypes_map['struct_t']), 3 + 1 + (4 * 2) + 8)  # (b is aligned)
+
+    def test_array_unsized(self):
+        with self.assertRaises(NotImplementedError):
+            CTypeFactory(code2ast('typedef struct { unsigned char a[]; } struct_t;'))
+
     def test_func_ptr_void_void(self):
         f = CTypeFactory(code2ast('typedef void (*callback_t)(void);'))
         self.assertEqual(set(f.ctypes_map.keys()), {'callback_t'})
@@ -161,3 +182,36 @@ class TestTypedef(unittest.TestCase):
         # -- With Packing
         f2 = CTypeFactory(code2ast(c_code_sample), pack=True)
         self.assertTrue(sizeof(f2.ctypes_map['struct_t']), 3)
+
+    def test_deep_chain(self):
+        """Long chains of typedefs are resolved (without exceeding the recursion limit)"""
+        depth = max(sys.getrecursionlimit(), 1000) * 2
+        c_code = 'typedef unsigned char t0;\n'
+        c_code += ''.join('typedef t%i t%i;\n' % (i - 1, i) for i in range(1, depth))
+        c_code += 'typedef struct { t%i a; t%i *b; } struct_t;\n' % (depth - 1, depth // 2)
+        f = CTypeFactory(code2ast(c_code))
+        self.assertEqual(len(f.ctypes_map), depth + 1)  # typedefs & struct
+        self.assertIs(f.ctypes_map['t%i' % (depth - 1)], f.ctypes_map['t0'])
+        self.assertIs(dict(f.ctypes_map['struct_t']._fields_)['a'], f.ctypes_map['t0'])
+
+    def test_memoised(self):
+        """Typedefs referred to more than once are built once"""
+        f = CTypeFactory(code2ast("""
+            typedef unsigned char uint8_t;
+            typedef struct {
+                uint8_t a;
+            } inner_t;
+            typedef struct {
+                inner_t x;
+                inner_t y;
+            } left_t;
+            typedef struct {
+                inner_t z;
+                left_t left;
+            } right_t;
+        """), lazy=True)
+        right_t = f['right_t']
+        inner_t = f.ctypes_map['inner_t']
+        self.assertIs(dict(right_t._fields_)['z'], inner_t)
+        self.assertIs(dict(dict(right_t._fields_)['left']._fields_)['y'], inner_t)
+        self.assertIs(f['left_t'], dict(right_t._fields_)['left'])
@@ -0,0 +1,164 @@
+import sys
+import os
+import json
+import shutil
+import inspect
+import tempfile
+import unittest
+import pycparser
+
+import ctypes
+from ctypes import (
+    c_uint8, c_uint16, c_uint32,
+    Structure,
+    sizeof,
+)
+
+
+# Utility Function(s)
+def code2ast(c_code):
+    parser = pycparser.c_parser.CParser()
+    return parser.parse(c_code)
+
+
+def describe(cls):
+    """Structural description of a ctypes class (for comparison)"""
+    if cls is None:
+        return None
+    elif issubclass(cls, Structure):
+        return ('struct', cls.__name__, sizeof(cls), [
+            (name, describe(field_class), getattr(cls, name).offset)
+            for (name, field_class) in cls._fields_
+        ])
+    elif issubclass(cls, ctypes._Pointer):
+        return ('pointer', describe(cls._type_))
+    elif issubclass(cls, ctypes.Array):
+        return ('array', describe(cls._type_), cls._length_)
+    elif issubclass(cls, ctypes._CFuncPtr):
+        return ('function', describe(cls._restype_), [describe(c) for c in cls._argtypes_])
+    return ('base', cls._type_, cls.__name__)
+
+
+# Units Under Test
+_this_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.append(os.path.join(_this_path, '..'))
+from ctypefactory import CTypeFactory
+import typegraph
+
+
+C_CODE = """
+    typedef unsigned char uint8_t;
+    typedef unsigned short int uint16_t;
+    typedef uint8_t data_t;
+    typedef struct {
+        uint8_t a;
+        uint16_t b;
+    } inner_t;
+    typedef struct {
+        inner_t inner;
+        inner_t *inner_ptr;
+        data_t *data;
+        void (*callback)(uint8_t, inner_t);
+        uint16_t counts[2][3u];
+    } outer_t;
+    typedef uint16_t (*getter_t)(void);
+    uint8_t func(outer_t *outer, uint16_t value) {
+        return 0;
+    }
+"""
+
+
+class TestTypeGraph(unittest.TestCase):
+    def test_round_trip(self):
+        factory = CTypeFactory(code2ast(C_CODE))
+        graph = json.loads(json.dumps(typegraph.dump_graph(factory)))  # must be json serialisable
+        ctypes_map = typegraph.load_graph(graph)
+        self.assertEqual(set(ctypes_map.keys()), set(factory.ctypes_map.keys()))
+        for name in factory.ctypes_map:
+            self.assertEqual(describe(ctypes_map[name]), describe(factory.ctypes_map[name]), name)
+
+    def test_shared_classes(self):
+        factory = CTypeFactory(code2ast(C_CODE))
+        ctypes_map = typegraph.load_graph(typegraph.dump_graph(factory))
+        self.assertIs(ctypes_map['uint8_t'], c_uint8)  # base classes are not re-created
+        self.assertIs(ctypes_map['data_t'], ctypes_map['uint8_t'])
+        self.assertIs(dict(ctypes_map['outer_t']._fields_)['inner'], ctypes_map['inner_t'])
+
+    def test_packed(self):
+        factory = CTypeFactory(code2ast(C_CODE), pack=True)
+        ctypes_map = typegraph.load_graph(typegraph.dump_graph(factory))
+        self.assertEqual(sizeof(ctypes_map['inner_t']), 3)
+
+    def test_names(self):
+        factory = CTypeFactory(code2ast(C_CODE))
+        graph = typegraph.dump_graph(factory)
+        self.assertEqual(graph['funcdefs'], ['func'])
+        self.assertIn('outer_t', graph['typedefs'])
+
+    def test_class_reference(self):
+        self.assertIs(typegraph.resolve_reference(typegraph.class_reference(c_uint32)), c_uint32)
+        self.assertIs(typegraph.resolve_reference(typegraph.class_reference(TestTypeGraph)), TestTypeGraph)
+
+
+class TestFromFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.filename = os.path.join(self.temp_dir, 'code-preproc.c')
+        self.write_source(C_CODE)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_source(self, source):
+        with open(self.filename, 'w') as fh:
+            fh.write(source)
+
+    def cache_files(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return sorted(os.listdir(self.cache_dir))
+
+    def test_no_cache(self):
+        factory = CTypeFactory.from_file(self.filename)
+        self.assertIsNotNone(factory.ast)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_warm(self):
+        cold = CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir)
+        self.assertIsNotNone(cold.ast)
+        self.assertEqual(len(self.cache_files()), 1)
+        warm = CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir)
+        self.assertIsNone(warm.ast)  # not parsed
+        self.assertEqual(set(warm.ctypes_map.keys()), set(cold.ctypes_map.keys()))
+        self.assertEqual(set(warm.funcdef_map.keys()), {'func'})
+        self.assertEqual(set(warm.typedef_map.keys()), set(cold.typedef_map.keys()))
+        for name in cold.ctypes_map:
+            self.assertEqual(describe(warm.ctypes_map[name]), describe(cold.ctypes_map[name]), name)
+
+    def test_source_changed(self):
+        CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir)
+        self.write_source(C_CODE + "typedef unsigned int uint32_t;")
+        factory = CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir)
+        self.assertIsNotNone(factory.ast)
+        self.assertIn('uint32_t', factory.ctypes_map)
+        self.assertEqual(len(self.cache_files()), 2)
+
+    def test_options_changed(self):
+        CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir)
+        factory = CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir, pack=True)
+        self.assertIsNotNone(factory.ast)
+        self.assertEqual(sizeof(factory.ctypes_map['inner_t']), 3)
+        self.assertEqual(len(self.cache_files()), 2)
+        warm = CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir, pack=True)
+        self.assertIsNone(warm.ast)
+        self.assertEqual(sizeof(warm.ctypes_map['inner_t']), 3)
+
+    def test_corrupt_cache(self):
+        CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir)
+        for name in self.cache_files():
+            with open(os.path.join(self.cache_dir, name), 'w') as fh:
+                fh.write('{"version": ')  # truncated
+        factory = CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir)
+        self.assertIsNotNone(factory.ast)  # re-parsed
+        self.assertIsNone(CTypeFactory.from_file(self.filename, cache_dir=self.cache_dir).ast)  # and re-cached
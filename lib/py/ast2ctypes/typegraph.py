@@ -0,0 +1,193 @@
+import os
+import re
+import sys
+import json
+import ctypes
+import hashlib
+import logging
+import importlib
+from ctypes import Structure, POINTER, CFUNCTYPE
+
+log = logging.getLogger(__name__)
+
+# Bump when the serialised format changes (invalidates existing cache files)
+FORMAT_VERSION = 1
+
+
+# ---- Class References
+#   Base classes (those in a factory's ctypes_class_map) are referred to by where they can be
+#   imported from, not by __name__; the factory renames them to the typedefs that alias them.
+def _ctypes_names():
+    names = {}
+    # last alias wins; fixed width names are preferred (eg: c_uint8 over c_ubyte)
+    for (name, obj) in sorted(vars(ctypes).items(), key=lambda item: (bool(re.match(r'^c_u?int\d+$', item[0])), item[0])):
+        if isinstance(obj, type):
+            names[id(obj)] = name
+    return names
+
+
+def class_reference(cls):
+    """
+    Importable reference to a base class
+    :param cls: class to reference
+    :return: [module, qualified name]
+    """
+    name = _ctypes_names().get(id(cls), None)
+    if name is not None:
+        return ['ctypes', name]
+    return [cls.__module__, cls.__qualname__]
+
+
+def resolve_reference(reference):
+    """
+    Class referred to by class_reference
+    :param reference: [module, qualified name]
+    :return: class
+    """
+    (module_name, qualname) = reference
+    obj = importlib.import_module(module_name)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+# ---- Serialise
+class _Serialiser(object):
+    def __init__(self, base_classes):
+        self.base_ids = set(id(c) for c in base_classes if c is not None)
+        self.nodes = []  # dependencies always precede their dependants
+        self.node_ids = {}  # {id(class): index in self.nodes}
+        self.classes = []  # retained so ids aren't recycled
+
+    def node(self, cls):
+        if cls is None:
+            return None
+        if id(cls) in self.node_ids:
+            return self.node_ids[id(cls)]
+
+        if id(cls) in self.base_ids:
+            node = {'kind': 'base', 'ref': class_reference(cls)}
+        elif issubclass(cls, Structure):
+            node = {
+                'kind': 'struct',
+                'pack': cls.__dict__.get('_pack_', 0),
+                'fields': [[name, self.node(field_class)] for (name, field_class) in cls._fields_],
+            }
+        elif issubclass(cls, ctypes._Pointer):
+            node = {'kind': 'pointer', 'type': self.node(cls._type_)}
+        elif issubclass(cls, ctypes.Array):
+            node = {'kind': 'array', 'type': self.node(cls._type_), 'length': cls._length_}
+        elif issubclass(cls, ctypes._CFuncPtr):
+            node = {
+                'kind': 'function',
+                'restype': self.node(cls._restype_),
+                'argtypes': [self.node(c) for c in cls._argtypes_],
+            }
+        else:
+            raise NotImplementedError("can't serialise %r" % cls)
+        node['name'] = cls.__name__
+
+        self.node_ids[id(cls)] = len(self.nodes)
+        self.nodes.append(node)
+        self.classes.append(cls)
+        return self.node_ids[id(cls)]
+
+
+def dump_graph(factory):
+    """
+    Serialisable representation of a factory's class graph
+    Classes shared between names (eg: `typedef uint8_t data_t;`) are stored once, so they're
+    shared again when loaded.
+    :param factory: CTypeFactory instance
+    :return: dict (json serialisable)
+    """
+    serialiser = _Serialiser(factory.ctypes_class_map.values())
+    ctypes_map = dict((name, serialiser.node(cls)) for (name, cls) in factory.ctypes_map.items())
+    return {
+        'version': FORMAT_VERSION,
+        'nodes': serialiser.nodes,
+        'ctypes_map': ctypes_map,
+        'typedefs': sorted(factory.typedef_map.keys()),
+        'funcdefs': sorted(factory.funcdef_map.keys()),
+    }
+
+
+# ---- Load
+def load_graph(graph):
+    """
+    Rebuild the classes in a graph returned by dump_graph
+    :param graph: dict returned by dump_graph
+    :return: dict of {name: ctype class} (equivalent of CTypeFactory.ctypes_map)
+    """
+    assert graph['version'] == FORMAT_VERSION, "unsupported type graph version: %r" % graph['version']
+    classes = []
+    for node in graph['nodes']:
+        lookup = lambda i: classes[i] if (i is not None) else None
+        kind = node['kind']
+        if kind == 'base':
+            cls = resolve_reference(node['ref'])
+        elif kind == 'struct':
+            cls = type(str(node['name']), (Structure,), {
+                '_fields_': [(str(name), lookup(i)) for (name, i) in node['fields']],
+                '_pack_': node['pack'],
+            })
+        elif kind == 'pointer':
+            cls = POINTER(lookup(node['type']))
+        elif kind == 'array':
+            cls = lookup(node['type']) * node['length']
+        elif kind == 'function':
+            cls = CFUNCTYPE(*([lookup(node['restype'])] + [lookup(i) for i in node['argtypes']]))
+        else:
+            raise NotImplementedError("unknown type graph node: %r" % kind)
+        classes.append(cls)
+
+    # names as left by the factory (base classes included, they're renamed by the factory too)
+    for (node, cls) in zip(graph['nodes'], classes):
+        cls.__name__ = str(node['name'])
+
+    return dict((name, classes[i]) for (name, i) in graph['ctypes_map'].items())
+
+
+# ---- Cache Files
+def cache_key(source, options):
+    """
+    Key identifying a factory's output
+    :param source: preprocessed c source (bytes)
+    :param options: dict of factory options (json serialisable)
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(source)
+    digest.update(json.dumps([FORMAT_VERSION, sys.version_info[:2], options], sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_filename(cache_dir, key):
+    return os.path.join(cache_dir, 'ast2ctypes-%s.json' % key)
+
+
+def read_cache(cache_dir, key):
+    """
+    :return: cached graph, or None if there isn't one (or it can't be read)
+    """
+    filename = cache_filename(cache_dir, key)
+    try:
+        with open(filename, 'r') as fh:
+            return json.load(fh)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write_cache(cache_dir, key, graph):
+    """Write graph to cache (atomically; concurrent readers never see a partial file)"""
+    import tempfile  # only needed on a cache miss (kept out of warm start-up)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    (fd, temp_filename) = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(graph, fh)
+        os.replace(temp_filename, cache_filename(cache_dir, key))
+    except Exception:
+        os.unlink(temp_filename)
+        raise
@@ -0,0 +1,31 @@
+__all__ = [
+    'LatestValueStore', 'LatestValueBusy',
+    'Dispatcher',
+    'DiagnosticsClient', 'DiagnosticsTimeout',
+    'DatagramView', 'view_handler',
+    'DatagramPool', 'DatagramPoolExhausted',
+    'init_state',
+    'RamBudget', 'ram_budget',
+    'Simulator', 'Traffic', 'SimulationReport', 'ServiceReport',
+    'CaptureWriter', 'CaptureReader', 'CaptureError', 'reindex',
+    'ArrayDecoder', 'DecodedFrames', 'DecodedDatagrams',
+    'AnalysisReport', 'analyze_file', 'analyze_paths',
+    'Replayer', 'ReplayReport',
+    'profile_counters', 'profiling_enabled',
+    'HandlerWatchdog', 'HandlerStats',
+]
+
+from .latest import LatestValueStore, LatestValueBusy
+from .dispatch import Dispatcher
+from .diagnostics import DiagnosticsClient, DiagnosticsTimeout
+from .datagram import DatagramView, view_handler
+from .pool import DatagramPool, DatagramPoolExhausted
+from .arena import init_state
+from .budget import RamBudget, ram_budget
+from .simulator import Simulator, Traffic, SimulationReport, ServiceReport
+from .capture import CaptureWriter, CaptureReader, CaptureError, reindex
+from .decoder import ArrayDecoder, DecodedFrames, DecodedDatagrams
+from .analyze import AnalysisReport, analyze_file, analyze_paths
+from .replay import Replayer, ReplayReport
+from .profile import profile_counters, profiling_enabled
+from .watchdog import HandlerWatchdog, HandlerStats
@@ -0,0 +1,109 @@
+"""
+prlsc command-line
+
+    python -m prlsc analyze captures/ --jobs 8
+    python -m prlsc analyze controller1/*.cap --datagram-length-max 511 --json
+    python -m prlsc replay field.cap --output /dev/ttyUSB0 --speed 2
+    python -m prlsc replay field.cap --pty --wait 5 --throughput
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import logging
+
+from .analyze import DECODERS, analyze_paths, available_decoder
+from .replay import DIRECTIONS, Replayer, fd_sink, open_pty
+
+
+# ---- Commands
+def analyze(args):
+    def progress(report):
+        for path in report.failed:
+            sys.stderr.write("failed: %s\n" % path)
+    report = analyze_paths(
+        args.paths, pattern=args.pattern, processes=args.jobs,
+        datagram_length_max=args.datagram_length_max, decoder=args.decoder, progress=progress,
+    )
+    if args.json:
+        sys.stdout.write(json.dumps(report.as_dict(), indent=2, sort_keys=True) + '\n')
+    else:
+        sys.stdout.write(str(report) + '\n')
+    return 1 if report.failed else 0
+
+
+def replay(args):
+    if args.pty:
+        (fd, slave, device) = open_pty()
+        fds = [fd, slave]
+        sys.stderr.write("replaying into %s in %gs\n" % (device, args.wait))
+    else:
+        fd = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_NOCTTY, 0o644)
+        fds = [fd]
+    try:
+        time.sleep(args.wait)
+        report = Replayer(
+            args.capture, fd_sink(fd), direction=args.direction, speed=None if args.throughput else args.speed,
+        ).run()
+    finally:
+        for fd in fds:
+            os.close(fd)
+    if args.json:
+        sys.stdout.write(json.dumps(report.as_dict(), indent=2, sort_keys=True) + '\n')
+    else:
+        sys.stdout.write(str(report) + '\n')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m prlsc', description="prlsc tools")
+    parser.add_argument('--verbose', '-v', action='store_true', default=False, help="debug logging")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    # analyze
+    analyze_parser = subparsers.add_parser(
+        'analyze', help="per-service statistics (datagrams, errors, rate & jitter) of capture files",
+    )
+    analyze_parser.add_argument('paths', nargs='+', metavar='path',
+                                help="capture file(s), or directories (searched recursively)")
+    analyze_parser.add_argument('--pattern', default='*.cap',
+                                help="capture filenames to find in directories (fnmatch, default: %(default)s)")
+    analyze_parser.add_argument('--jobs', '-j', type=int, default=None,
+                                help="processes analysing captures in parallel (default: cpu count)")
+    analyze_parser.add_argument('--datagram-length-max', type=lambda v: int(v, 0), default=0xFF,
+                                help="receiver's datagramLengthMax (default: 0xFF)")
+    analyze_parser.add_argument('--decoder', choices=DECODERS, default='auto',
+                                help="decoder (default: auto, the fastest available: %s)" % available_decoder())
+    analyze_parser.add_argument('--json', action='store_true', default=False, help="report as json")
+    analyze_parser.set_defaults(func=analyze)
+
+    # replay
+    replay_parser = subparsers.add_parser(
+        'replay', help="replay a capture's bytes (with their recorded timing) into a device, file or pty",
+    )
+    replay_parser.add_argument('capture', help="capture file")
+    output_group = replay_parser.add_mutually_exclusive_group(required=True)
+    output_group.add_argument('--output', '-o', help="device (eg: serial port) or file to write to")
+    output_group.add_argument('--pty', action='store_true', default=False,
+                              help="write to a new pseudo-terminal (its device is printed, for a consumer to open)")
+    replay_parser.add_argument('--direction', choices=sorted(DIRECTIONS), default='rx',
+                               help="recorded bytes to replay (default: %(default)s)")
+    timing_group = replay_parser.add_mutually_exclusive_group()
+    timing_group.add_argument('--speed', type=float, default=1.0,
+                              help="timing factor; 2 replays twice as fast (default: %(default)s)")
+    timing_group.add_argument('--throughput', action='store_true', default=False,
+                              help="replay as fast as possible (ignore recorded timing)")
+    replay_parser.add_argument('--wait', type=float, default=0.0,
+                               help="seconds to wait before replaying (eg: for a consumer to open the pty)")
+    replay_parser.add_argument('--json', action='store_true', default=False, help="report as json")
+    replay_parser.set_defaults(func=replay)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,367 @@
+import os
+import math
+import fnmatch
+import logging
+
+from .capture import CaptureReader, CaptureError, RX, TX, _FrameScanner
+from .constants import (
+    ERRORCODE_NONE, ERRORCODE_DATAGRAM_BAD_CHECKSUM, ERRORCODE_DATAGRAM_TOO_LONG, ERRORCODE_NAMES,
+    twos_complement_checksum,
+)
+
+log = logging.getLogger(__name__)
+
+DIRECTION_NAMES = {RX: 'rx', TX: 'tx'}
+DECODERS = ('auto', 'numpy', 'python')
+
+
+def available_decoder():
+    """:return: fastest decoder available: 'numpy' (see ArrayDecoder) if numpy is installed, otherwise 'python'"""
+    try:
+        import numpy
+    except ImportError:
+        return 'python'
+    return 'numpy'
+
+
+class RunningStats(object):
+    """
+    Count, mean, variance, min & max of values, without keeping them; mergeable (so files can be
+    summarised in parallel, and their summaries combined in any order)
+    """
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """add a value (Welford's update)"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def add_values(self, values):
+        """add a sequence of values (list, or numpy array)"""
+        count = len(values)
+        if not count:
+            return
+        other = RunningStats()
+        other.count = count
+        if hasattr(values, 'var'):  # numpy array
+            (other.mean, other.m2) = (float(values.mean()), float(values.var() * count))
+            (other.min, other.max) = (float(values.min()), float(values.max()))
+        else:
+            other.mean = float(sum(values)) / count
+            other.m2 = float(sum((v - other.mean) ** 2 for v in values))
+            (other.min, other.max) = (min(values), max(values))
+        self.merge(other)
+
+    def merge(self, other):
+        if not other.count:
+            return
+        if not self.count:
+            (self.count, self.mean, self.m2, self.min, self.max) = (other.count, other.mean, other.m2, other.min, other.max)
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += (delta * other.count) / count
+        self.m2 += other.m2 + ((delta ** 2) * self.count * other.count) / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+
+class ServiceStats(object):
+    """A service's datagrams (in one direction)"""
+    def __init__(self):
+        self.datagrams = 0  # valid
+        self.data_bytes = 0
+        self.errors = {}  # {datagram error code: count}
+        self.interval = RunningStats()  # seconds between valid datagrams (within a capture)
+        self.span = 0.0  # seconds from first to last valid datagram (summed over captures)
+
+    def merge(self, other):
+        self.datagrams += other.datagrams
+        self.data_bytes += other.data_bytes
+        for (code, count) in other.errors.items():
+            self.errors[code] = self.errors.get(code, 0) + count
+        self.interval.merge(other.interval)
+        self.span += other.span
+
+    @property
+    def rate(self):
+        """valid datagrams per second (while the service was active)"""
+        return self.interval.count / self.span if self.span else 0.0
+
+    @property
+    def jitter(self):
+        """standard deviation of the interval between datagrams (seconds)"""
+        return self.interval.std
+
+
+class LinkStats(object):
+    """A direction's bytes & frames"""
+    def __init__(self):
+        self.bytes = 0
+        self.frames = 0
+        self.errors = {}  # {frame error code: count}
+
+    def merge(self, other):
+        self.bytes += other.bytes
+        self.frames += other.frames
+        for (code, count) in other.errors.items():
+            self.errors[code] = self.errors.get(code, 0) + count
+
+
+class AnalysisReport(object):
+    """
+    Statistics of one or more captures; merging reports is how a corpus' is accumulated
+
+    :ivar links: {direction: LinkStats}
+    :ivar services: {(direction, service index): ServiceStats}
+    :ivar failed: {path: reason} captures that couldn't be read
+    """
+    def __init__(self):
+        self.files = 0
+        self.links = {}
+        self.services = {}
+        self.failed = {}
+
+    def link(self, direction):
+        return self.links.setdefault(direction, LinkStats())
+
+    def service(self, direction, service_index):
+        return self.services.setdefault((direction, service_index), ServiceStats())
+
+    def merge(self, other):
+        self.files += other.files
+        for (direction, stats) in other.links.items():
+            self.link(direction).merge(stats)
+        for ((direction, service_index), stats) in other.services.items():
+            self.service(direction, service_index).merge(stats)
+        self.failed.update(other.failed)
+
+    def as_dict(self):
+        errors = lambda errors: dict((ERRORCODE_NAMES.get(code, str(code)), count) for (code, count) in sorted(errors.items()))
+        return {
+            'files': self.files,
+            'failed': self.failed,
+            'links': dict((DIRECTION_NAMES[d], {'bytes': s.bytes, 'frames': s.frames, 'errors': errors(s.errors)}) for (d, s) in sorted(self.links.items())),
+            'services': dict(('%s[%i]' % (DIRECTION_NAMES[d], i), {
+                'datagrams': s.datagrams, 'data_bytes': s.data_bytes, 'errors': errors(s.errors),
+                'rate': s.rate, 'interval_mean': s.interval.mean, 'jitter': s.jitter,
+                'interval_min': s.interval.min, 'interval_max': s.interval.max,
+            }) for ((d, i), s) in sorted(self.services.items())),
+        }
+
+    def __str__(self):
+        lines = ["analysis: %i captures (%i failed)" % (self.files, len(self.failed))]
+        lines.append("    %-4s %12s %10s  %s" % ('link', 'bytes', 'frames', 'frame errors'))
+        for (direction, stats) in sorted(self.links.items()):
+            lines.append("    %-4s %12i %10i  %s" % (
+                DIRECTION_NAMES[direction], stats.bytes, stats.frames, _format_errors(stats.errors),
+            ))
+        lines.append("    %-9s %10s %12s %10s %12s %12s  %s" % (
+            'service', 'datagrams', 'data bytes', 'rate /s', 'interval ms', 'jitter ms', 'datagram errors',
+        ))
+        for ((direction, service_index), stats) in sorted(self.services.items()):
+            lines.append("    %-9s %10i %12i %10.2f %12.2f %12.2f  %s" % (
+                '%s[%i]' % (DIRECTION_NAMES[direction], service_index), stats.datagrams, stats.data_bytes,
+                stats.rate, stats.interval.mean * 1e3, stats.jitter * 1e3, _format_errors(stats.errors),
+            ))
+        for (path, reason) in sorted(self.failed.items()):
+            lines.append("    failed: %s: %s" % (path, reason))
+        return '\n'.join(lines)
+
+
+def _format_errors(errors):
+    return ', '.join('%s=%i' % (ERRORCODE_NAMES.get(code, code), count) for (code, count) in sorted(errors.items()) if count) or '-'
+
+
+# ---- Decoding (a capture's direction: timestamps & raw byte chunks)
+def _add_service(report, direction, service_index, timestamps, lengths):
+    """add a service's valid datagrams (timestamps in ns, in order)"""
+    stats = report.service(direction, service_index)
+    stats.datagrams += len(timestamps)
+    stats.data_bytes += int(sum(lengths))
+    if len(timestamps) > 1:
+        intervals = [(b - a) * 1e-9 for (a, b) in zip(timestamps[:-1], timestamps[1:])] if isinstance(timestamps, list) else (timestamps[1:] - timestamps[:-1]) * 1e-9
+        stats.interval.add_values(intervals)
+        stats.span += int(timestamps[-1] - timestamps[0]) * 1e-9
+
+
+def _decode_numpy(report, direction, encoding, datagram_length_max, timestamps, chunks):
+    import numpy
+    from .decoder import ArrayDecoder
+    raw = numpy.frombuffer(b''.join(chunks), dtype=numpy.uint8)
+    chunk_starts = numpy.cumsum([0] + [len(c) for c in chunks[:-1]])
+    decoder = ArrayDecoder(encoding=encoding, datagram_length_max=datagram_length_max)
+    frames = decoder.frames(raw)
+    datagrams = decoder.datagrams(frames)
+
+    link = report.link(direction)
+    link.bytes += len(raw)
+    link.frames += len(frames)
+    (codes, counts) = numpy.unique(frames.frames['error'], return_counts=True)
+    for (code, count) in zip(codes.tolist(), counts.tolist()):
+        link.errors[code] = link.errors.get(code, 0) + count
+
+    # a datagram's time: that of the chunk its last frame started in
+    record = numpy.searchsorted(chunk_starts, frames.frames['offset'][datagrams.datagrams['frame']], side='right') - 1
+    datagram_times = numpy.asarray(timestamps, dtype=numpy.int64)[record]
+    service_index = datagrams.datagrams['service_code'] >> 5
+    for index in numpy.unique(service_index).tolist():
+        selected = datagrams.datagrams[service_index == index]
+        valid = selected['error'] == ERRORCODE_NONE
+        _add_service(report, direction, index, datagram_times[service_index == index][valid], selected['length'][valid].astype(numpy.int64))
+        stats = report.service(direction, index)
+        for code in (ERRORCODE_DATAGRAM_BAD_CHECKSUM, ERRORCODE_DATAGRAM_TOO_LONG):
+            count = int((selected['error'] == code).sum())
+            if count:
+                stats.errors[code] = stats.errors.get(code, 0) + count
+
+
+def _decode_python(report, direction, encoding, datagram_length_max, timestamps, chunks):
+    # as ArrayDecoder, per frame (frames are found by capture's _FrameScanner, as when indexing)
+    (frame_length_max, stream_mask) = (encoding[4], encoding[6])
+    scanner = _FrameScanner(encoding, twos_complement_checksum)
+    link = report.link(direction)
+    assembling = {}  # {service index: [length, checksum sum]}
+    valid = {}  # {service index: ([timestamp, ...], [length, ...])}
+    errors = {}  # {service index: {code: count}}
+
+    frames = []
+    for (record, chunk) in enumerate(chunks):
+        link.bytes += len(chunk)
+        frames += scanner.feed(chunk, timestamps[record], record)
+    frames += scanner.close(timestamps[-1])
+
+    for (finished, record, position, decoded, flags, error) in frames:
+        timestamp = timestamps[record]  # (that of the chunk the frame started in, as _decode_numpy)
+        link.frames += 1
+        link.errors[error] = link.errors.get(error, 0) + 1
+        if error != ERRORCODE_NONE:
+            continue
+        (service_index, length) = (decoded[0] >> 5, decoded[1])
+        stream = bool(stream_mask & (1 << service_index))
+        datagram = assembling.setdefault(service_index, [0, 0])
+        datagram[0] += length
+        datagram[1] += sum(decoded[2:2 + length])
+        if (length < frame_length_max) or stream:
+            (total, total_sum) = datagram
+            del assembling[service_index]
+            diagnostic = (not stream) and (total > 0)
+            if (total - 1) > datagram_length_max:
+                code = ERRORCODE_DATAGRAM_TOO_LONG
+            elif diagnostic and (total_sum & 0xFF):
+                code = ERRORCODE_DATAGRAM_BAD_CHECKSUM
+            else:
+                (times, lengths) = valid.setdefault(service_index, ([], []))
+                times.append(timestamp)
+                lengths.append(total - 1 if diagnostic else total)
+                continue
+            counts = errors.setdefault(service_index, {})
+            counts[code] = counts.get(code, 0) + 1
+
+    for service_index in sorted(set(valid) | set(errors)):
+        (times, lengths) = valid.get(service_index, ([], []))
+        _add_service(report, direction, service_index, times, lengths)
+        report.service(direction, service_index).errors.update(errors.get(service_index, {}))
+
+
+def analyze_file(path, datagram_length_max=0xFF, decoder='auto'):
+    """
+    Statistics of a capture file (see CaptureWriter)
+
+    :param path: capture file path
+    :param datagram_length_max: receiver's datagramLengthMax (it isn't in the capture)
+    :param decoder: 'numpy', 'python' or 'auto' (the fastest available)
+    :return: AnalysisReport instance
+    """
+    assert decoder in DECODERS, "decoder must be one of %r" % (DECODERS,)
+    if decoder == 'auto':
+        decoder = available_decoder()
+    decode = {'numpy': _decode_numpy, 'python': _decode_python}[decoder]
+    report = AnalysisReport()
+    report.files = 1
+    try:
+        with CaptureReader(path, index=False) as reader:
+            streams = {RX: ([], []), TX: ([], [])}
+            for (timestamp, direction, chunk) in reader.records():
+                streams[direction][0].append(timestamp)
+                streams[direction][1].append(chunk)
+            for (direction, (timestamps, chunks)) in sorted(streams.items()):
+                if chunks:
+                    decode(report, direction, reader.encoding, datagram_length_max, timestamps, chunks)
+    except (CaptureError, IOError, ValueError) as e:
+        log.warning("%s: %s", path, e)
+        report = AnalysisReport()
+        report.files = 1
+        report.failed[path] = str(e)
+    return report
+
+
+def find_captures(paths, pattern='*.cap'):
+    """Yield capture files: paths that are files, and files matching pattern in (sub)directories"""
+    for path in paths:
+        if os.path.isdir(path):
+            for (root, dirs, files) in os.walk(path):
+                dirs.sort()
+                for name in sorted(fnmatch.filter(files, pattern)):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _analyze_file(job):
+    (path, datagram_length_max, decoder) = job
+    return analyze_file(path, datagram_length_max=datagram_length_max, decoder=decoder)
+
+
+def analyze_paths(paths, pattern='*.cap', processes=None, datagram_length_max=0xFF, decoder='auto', progress=None):
+    """
+    Statistics of many captures, merged into one report
+
+    Captures are analysed by a pool of processes; each's report is merged as soon as it's
+    returned (in whatever order they finish), so memory doesn't grow with the number of captures.
+
+    :param paths: capture files and/or directories (searched recursively for `pattern`)
+    :param processes: number of worker processes (default: os.cpu_count()); if 1, captures are
+                      analysed in this process
+    :param progress: function(report) called as each capture's report is merged
+    :return: AnalysisReport instance
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    jobs = ((path, datagram_length_max, decoder) for path in find_captures(paths, pattern))
+    total = AnalysisReport()
+
+    def merge(report):
+        total.merge(report)
+        if progress is not None:
+            progress(report)
+
+    if processes <= 1:
+        for job in jobs:
+            merge(_analyze_file(job))
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            for report in pool.imap_unordered(_analyze_file, jobs):
+                merge(report)
+        finally:
+            pool.close()
+            pool.join()
+    return total
@@ -0,0 +1,38 @@
+import ctypes
+from ctypes import pointer, sizeof
+
+
+def init_state(bindings, config, state=None):
+    """
+    Allocate a bus' state with a single buffer (see prlsc_stateSize & prlsc_initState)
+
+    Every buffer the state references is carved from one ctypes allocation, sized by the C
+    library from `config`; so there are no buffer sizes to get wrong.
+    The arena is retained by the returned state (as `state.arena`), so it lives as long as
+    the state does.
+
+    Usage:
+        config = build_struct(prlsc_config_t, ...)
+        state = prlsc.init_state(data_types, config)
+
+    :param bindings: namespace (eg: module) of the compiled library's bindings, exposing
+                     prlsc_state_t, prlsc_stateSize & prlsc_initState
+    :param config: prlsc_config_t instance
+    :param state: prlsc_state_t instance to initialise (a new one is created if not given)
+    :return: initialised prlsc_state_t instance
+    """
+    size = bindings.prlsc_stateSize(pointer(config))
+    assert size > 0, "invalid bus configuration"
+
+    # allocated as an array of pointers to satisfy PRLSC_ARENA_ALIGNMENT
+    arena = (ctypes.c_void_p * ((size + sizeof(ctypes.c_void_p) - 1) // sizeof(ctypes.c_void_p)))()
+
+    if state is None:
+        state = bindings.prlsc_state_t()
+    initialised = bindings.prlsc_initState(
+        pointer(config), pointer(state),
+        ctypes.cast(arena, ctypes.POINTER(ctypes.c_uint8)), sizeof(arena),
+    )
+    assert initialised, "prlsc_initState failed"
+    state.arena = arena  # retain
+    return state
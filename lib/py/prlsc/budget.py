@@ -0,0 +1,96 @@
+from ctypes import pointer
+
+from ast2ctypes.layout import TARGETS, Target, type_layout
+
+
+class RamBudget(object):
+    """
+    RAM used by a bus (see ram_budget); a list of allocations, in bytes
+
+    Each entry is (name, size, padding), where padding is the bytes added after the
+    allocation to keep the next one aligned (only arena buffers are padded).
+    """
+    def __init__(self, target):
+        self.target = target
+        self.entries = []
+
+    def add(self, name, size, padding=0):
+        self.entries.append((name, size, padding))
+
+    @property
+    def total(self):
+        return sum(size + padding for (name, size, padding) in self.entries)
+
+    @property
+    def padding(self):
+        return sum(padding for (name, size, padding) in self.entries)
+
+    def __str__(self):
+        lines = ["RAM budget (%s): %i bytes (%i padding)" % (self.target.name, self.total, self.padding)]
+        lines.append("    %6s %8s  %s" % ('size', 'padding', 'allocation'))
+        for (name, size, padding) in self.entries:
+            lines.append("    %6i %8s  %s" % (size, padding or '', name))
+        return '\n'.join(lines)
+
+
+def ram_budget(bindings, config, target='native'):
+    """
+    RAM required by a bus with the given configuration
+
+    Adds up the config & state structures, the config's services & handlers arrays, and every
+    buffer prlsc_initState carves from the arena (sized by the compiled library; see
+    prlsc_stateSize). Structures are laid out for `target`, so the budget of a target
+    (eg: an 8-bit 'avr') can be estimated on a host that isn't one; a 'native' budget's arena
+    matches prlsc_stateSize.
+
+    Usage:
+        print(prlsc.ram_budget(data_types, config, target='avr'))
+
+    :param bindings: namespace (eg: module) of the compiled library's bindings, exposing
+                     prlsc_config_t, prlsc_state_t (and the types they reference),
+                     prlsc_stateSize, prlsc_rxDatagramBufferSize, prlsc_txBufferSize
+                     & PRLSC_SUBSERVICE_COUNT
+    :param config: prlsc_config_t instance
+    :param target: name of an ast2ctypes.layout target, or an ast2ctypes.layout.Target instance
+    :return: RamBudget instance
+    """
+    if not isinstance(target, Target):
+        target = TARGETS[target]
+    assert bindings.prlsc_stateSize(pointer(config)) > 0, "invalid bus configuration"
+    sizeof = lambda cls: type_layout(cls, target)[0]
+    service_count = config.serviceCount
+    budget = RamBudget(target)
+
+    # Config (may be placed in flash by some targets; it's never written by the library)
+    budget.add('config (prlsc_config_t)', sizeof(bindings.prlsc_config_t))
+    budget.add('config.services (%i x prlsc_serviceConfig_t)' % service_count,
+               service_count * sizeof(bindings.prlsc_serviceConfig_t))
+    if config.handlers:
+        handler_count = service_count * bindings.PRLSC_SUBSERVICE_COUNT
+        budget.add('config.handlers (%i x prlsc_datagramHandler_t)' % handler_count,
+                   handler_count * sizeof(bindings.prlsc_datagramHandler_t))
+
+    # State
+    budget.add('state (prlsc_state_t)', sizeof(bindings.prlsc_state_t))
+
+    # Arena (in the order it's carved by prlsc_initState, each buffer aligned to PRLSC_ARENA_ALIGNMENT)
+    alignment = target.pointer_size  # sizeof(void *)
+    def add_buffer(name, size):
+        budget.add('arena: %s' % name, size, (-size) % alignment)
+
+    add_buffer('state.receiver.datagram (%i x prlsc_rxDatagramState_t)' % service_count,
+               service_count * sizeof(bindings.prlsc_rxDatagramState_t))
+    add_buffer('state.transmitterBuffer (%i x prlsc_transmitterBuffer_t)' % service_count,
+               service_count * sizeof(bindings.prlsc_transmitterBuffer_t))
+    add_buffer('state.lastTransmitted (%i x prlsc_time_t)' % service_count,
+               service_count * sizeof(bindings.prlsc_time_t))
+    frame_buffer_size = config.frameLengthMax + 4  # PRLSC_FRAMEBUFFER_SIZE
+    for name in ['state.receiver.frame.buffer', 'state.transmitter.frameBuffer', 'state.transmitter.transmitBuffer']:
+        add_buffer(name, frame_buffer_size)
+    for service_index in range(service_count):
+        add_buffer('state.receiver.datagram[%i].buffer' % service_index,
+                   bindings.prlsc_rxDatagramBufferSize(pointer(config), service_index))
+        add_buffer('state.transmitterBuffer[%i].buffer' % service_index,
+                   bindings.prlsc_txBufferSize(pointer(config), service_index))
+
+    return budget
@@ -0,0 +1,531 @@
+import os
+import mmap
+import time
+import struct
+
+from .constants import (
+    ERRORCODE_NONE, ERRORCODE_RXFRAME_BAD_ESC, ERRORCODE_RXFRAME_SERVICEINDEX_BOUNDS, ERRORCODE_RXFRAME_TOO_LONG,
+    ERRORCODE_RXFRAME_BAD_CHECKSUM, ERRORCODE_INCOMPLETE,
+)
+
+# Capture file (append-only):
+#   header, then records; each record is a chunk of raw line bytes, in one direction
+#   (bytes are exactly as they were on the line: start bytes, escapes, corruption & all)
+CAPTURE_MAGIC = b'PRLSCCAP'
+CAPTURE_VERSION = 1
+CAPTURE_HEADER = struct.Struct('<8sHBBBBBBB3x')  # magic, version, start, esc, escStart, escEsc, frameLengthMax, serviceCount, stream mask
+RECORD_HEADER = struct.Struct('<QBxH')  # timestamp (ns) of the chunk's first byte, direction, length
+
+# Index file (sidecar, `<capture>.idx`):
+#   header, then an entry per frame (per start byte), in the order they finished in the capture;
+#   an entry's timestamp is that of the record the frame finished in, `datagrams` is the
+#   number of datagrams completed up to (and including) the frame, and `first` is the number of
+#   the first frame of the datagram the frame belongs to (its own, if it's invalid)
+INDEX_MAGIC = b'PRLSCIDX'
+INDEX_VERSION = 2
+INDEX_HEADER = struct.Struct('<8sH6x')
+INDEX_ENTRY = struct.Struct('<QQIHBBBBI')  # timestamp, record offset, datagrams, position in record, direction, serviceCode, length, flags, first
+
+# Directions
+RX = 0
+TX = 1
+
+# Index entry flags
+FRAME_VALID = 0x01  #: complete, and well formed (and checksum matched, if checked)
+FRAME_CHECKED = 0x02  #: checksum was checked (a checksum function was given)
+FRAME_DATAGRAM_END = 0x04  #: valid, and the last frame of a datagram
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+class CaptureError(Exception):
+    """capture (or index) file is not in the expected format"""
+    pass
+
+
+class CapturedFrame(object):
+    """A frame read from a capture (with its data decoded)"""
+
+    __slots__ = ('timestamp', 'direction', 'service_code', 'data', 'flags')
+
+    def __init__(self, timestamp, direction, service_code, data, flags):
+        self.timestamp = timestamp
+        self.direction = direction
+        self.service_code = service_code
+        self.data = data
+        self.flags = flags
+
+    service_index = property(lambda self: self.service_code >> 5)
+    subservice_index = property(lambda self: self.service_code & 0x1F)
+    valid = property(lambda self: bool(self.flags & FRAME_VALID))
+
+    def __repr__(self):
+        return "<%s %s %i.%i [%i bytes]%s>" % (
+            type(self).__name__, ('rx', 'tx')[self.direction], self.service_index, self.subservice_index,
+            len(self.data), '' if self.valid else ' invalid',
+        )
+
+
+class CapturedDatagram(CapturedFrame):
+    """A datagram read from a capture; its data is that of all its frames (timestamp is the last frame's)"""
+    __slots__ = ()
+
+
+class _FrameScanner(object):
+    """
+    Finds the frames in one direction's raw bytes (fed in chunks), as prlsc_receiveByte would
+
+    Bytes between frames are skipped with bytes.find, frame bytes are decoded one at a time.
+    A frame's timestamp is that of the chunk it finished in (so frames are in time order).
+    """
+
+    def __init__(self, encoding, checksum=None):
+        (self.start, self.esc, self.esc_start, self.esc_esc, self.frame_length_max, self.service_count, self.stream_mask) = encoding
+        self.checksum = checksum
+        self.frame = None  # [record offset, position, decoded bytearray, escaped]
+        self.timestamp = 0
+
+    def feed(self, data, timestamp, record_offset, position=0, limit=None):
+        """
+        :param data: raw bytes (from 1 record)
+        :param position: index of data[0] in the record
+        :param limit: stop once this many frames have finished (None to scan all of data)
+        :return: list of finished frames: (timestamp, record offset, position, decoded, flags, error code)
+        """
+        self.timestamp = timestamp
+        finished = []
+        i = 0
+        while (i < len(data)) and (len(finished) != limit):
+            if self.frame is None:
+                i = data.find(self.start, i)
+                if i < 0:
+                    break
+                self.frame = [record_offset, position + i, bytearray(), False]
+                i += 1
+                continue
+            byte = data[i]
+            frame = self.frame
+            if byte == self.start:
+                finished.append(self._finish(ERRORCODE_INCOMPLETE))
+                continue  # starts the next frame
+            i += 1
+            if frame[3]:
+                frame[3] = False
+                if byte == self.esc_esc:
+                    byte = self.esc
+                elif byte == self.esc_start:
+                    byte = self.start
+                else:
+                    finished.append(self._finish(ERRORCODE_RXFRAME_BAD_ESC))
+                    continue
+            elif byte == self.esc:
+                frame[3] = True
+                continue
+            decoded = frame[2]
+            decoded.append(byte)
+            if len(decoded) == 1 and (byte >> 5) >= self.service_count:
+                finished.append(self._finish(ERRORCODE_RXFRAME_SERVICEINDEX_BOUNDS))
+            elif len(decoded) == 2 and byte > self.frame_length_max:
+                finished.append(self._finish(ERRORCODE_RXFRAME_TOO_LONG))
+            elif len(decoded) >= 3 and len(decoded) == decoded[1] + 3:
+                finished.append(self._finish(ERRORCODE_NONE))
+        return finished
+
+    def close(self, timestamp):
+        """:return: list of finished frames (the last, if it's incomplete)"""
+        self.timestamp = timestamp
+        return [self._finish(ERRORCODE_INCOMPLETE)] if self.frame is not None else []
+
+    def _finish(self, error):
+        (record_offset, position, decoded) = self.frame[:3]
+        self.frame = None
+        flags = 0
+        if (error == ERRORCODE_NONE) and (self.checksum is not None):
+            flags |= FRAME_CHECKED
+            if (self.checksum(bytes(decoded[:-1])) & 0xFF) != decoded[-1]:
+                error = ERRORCODE_RXFRAME_BAD_CHECKSUM
+        if error == ERRORCODE_NONE:
+            flags |= FRAME_VALID
+            if (decoded[1] < self.frame_length_max) or (self.stream_mask & (1 << (decoded[0] >> 5))):
+                flags |= FRAME_DATAGRAM_END
+        return (self.timestamp, record_offset, position, decoded, flags, error)
+
+
+class _IndexState(object):
+    """
+    Totals of an index being built: frames & datagrams so far, and the first frame of each
+    service's datagram in progress
+
+    Datagrams are assembled per direction & service index, from valid frames only, as
+    prlsc_receiveFrame does (invalid frames don't reach it, so they don't end a datagram).
+    """
+    def __init__(self):
+        self.frames = 0
+        self.datagrams = 0
+        self.first = {}  # {(direction, service index): first frame number}
+
+
+def _index_entries(direction, frames, state):
+    """:return: index entries (bytes) of the finished frames; state (_IndexState) is updated"""
+    entries = []
+    for (timestamp, record_offset, position, decoded, flags, error) in frames:
+        first = state.frames
+        if flags & FRAME_VALID:
+            key = (direction, decoded[0] >> 5)
+            first = state.first.setdefault(key, first)
+            if flags & FRAME_DATAGRAM_END:
+                state.datagrams += 1
+                del state.first[key]
+        entries.append(INDEX_ENTRY.pack(
+            timestamp, record_offset, state.datagrams, position, direction,
+            decoded[0] if len(decoded) > 0 else 0,
+            decoded[1] if len(decoded) > 1 else 0,
+            flags, first,
+        ))
+        state.frames += 1
+    return b''.join(entries)
+
+
+class CaptureWriter(object):
+    """
+    Records a link's raw traffic (both directions) to a capture file, and its frame index
+
+    Bytes are buffered into chunks; a chunk is written (as a record, stamped with the time of
+    its first byte) when it reaches `chunk_size` bytes, is older than `chunk_interval`, or the
+    direction changes. So per-byte overhead is an append and a clock read; and the frame
+    timestamps' resolution is `chunk_interval`.
+    Frames are found (for the index) as each chunk is written.
+
+    Usage:
+        with prlsc.CaptureWriter('link.cap', config) as capture:
+            config.callbackSendByte = config_field['callbackSendByte'](capture.tap(uart_write))
+            ...
+            for byte in uart_read():
+                capture.rx(byte)
+                prlsc_receiveByte(config_p, state_p, byte)
+
+    :param path: capture file path (index is written to `<path>.idx`)
+    :param config: prlsc_config_t of the link (frame bytes, frameLengthMax & stream services),
+                   None for default encoding (0xC0, 0xDB, 0xDC, 0xDD) and lengths (0xFF)
+    :param checksum: function(bytes) -> checksum, to validate frames in the index (as the
+                     config's callbackChecksumCalc does), None to not check them
+    :param index: if False, no index is written (see reindex)
+    :param chunk_size: max bytes per record
+    :param chunk_interval: max seconds between a record's first & last bytes
+    :param clock: function() -> timestamp in nanoseconds
+    """
+    def __init__(self, path, config=None, checksum=None, index=True, chunk_size=4096, chunk_interval=0.01, clock=time.time_ns):
+        assert 0 < chunk_size <= 0xFFFF, "chunk_size must be 1 to 0xFFFF"
+        self.encoding = encoding_from_config(config)
+        self.chunk_size = chunk_size
+        self.chunk_interval_ns = int(chunk_interval * 1e9)
+        self.clock = clock
+
+        self.file = open(path, 'wb')
+        self.file.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, *self.encoding))
+        self.offset = CAPTURE_HEADER.size
+        self.index_file = None
+        if index:
+            self.index_file = open(index_path(path), 'wb')
+            self.index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION))
+        self.scanners = [_FrameScanner(self.encoding, checksum) for d in (RX, TX)]
+        self.index_state = _IndexState()
+
+        self.chunk = bytearray()
+        self.chunk_direction = RX
+        self.chunk_timestamp = 0
+        self.last_timestamp = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def rx(self, data):
+        """Record received byte(s) (int, or bytes-like)"""
+        self.record(RX, data)
+
+    def tx(self, data):
+        """Record transmitted byte(s) (int, or bytes-like)"""
+        self.record(TX, data)
+
+    def tap(self, send_byte):
+        """:return: send_byte function that records the byte, then calls `send_byte(byte)`"""
+        record = self.record
+        def send_byte_tap(byte):
+            record(TX, byte)
+            send_byte(byte)
+        return send_byte_tap
+
+    def record(self, direction, data):
+        now = self.clock()
+        chunk = self.chunk
+        if chunk and ((direction != self.chunk_direction) or ((now - self.chunk_timestamp) > self.chunk_interval_ns)):
+            self.flush()
+        if not chunk:
+            self.chunk_direction = direction
+            self.chunk_timestamp = now
+        if isinstance(data, int):
+            chunk.append(data)
+        else:
+            chunk += data
+        if len(chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered chunk(s)"""
+        while self.chunk:
+            data = bytes(self.chunk[:self.chunk_size])
+            del self.chunk[:self.chunk_size]
+            self._write_record(self.chunk_direction, self.chunk_timestamp, data)
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        if self.index_file is not None:
+            for (direction, scanner) in enumerate(self.scanners):
+                self._write_index(direction, scanner.close(self.last_timestamp))
+            self.index_file.close()
+        self.file.close()
+        self.file = None
+
+    def _write_record(self, direction, timestamp, data):
+        record_offset = self.offset
+        self.last_timestamp = timestamp
+        self.file.write(RECORD_HEADER.pack(timestamp, direction, len(data)))
+        self.file.write(data)
+        self.offset += RECORD_HEADER.size + len(data)
+        if self.index_file is not None:
+            self._write_index(direction, self.scanners[direction].feed(data, timestamp, record_offset))
+
+    def _write_index(self, direction, frames):
+        if frames:
+            self.index_file.write(_index_entries(direction, frames, self.index_state))
+
+
+def encoding_from_config(config=None):
+    """:return: capture header's encoding fields, for a prlsc_config_t (or defaults, if None)"""
+    if config is None:
+        return (0xC0, 0xDB, 0xDC, 0xDD, 0xFF, 8, 0)
+    stream_mask = 0
+    for i in range(config.serviceCount):
+        if config.services[i].stream:
+            stream_mask |= 1 << i
+    return (
+        config.frameByteStartFrame, config.frameByteEsc, config.frameByteEscStart, config.frameByteEscEsc,
+        config.frameLengthMax, config.serviceCount, stream_mask,
+    )
+
+
+def _read_records(data, offset=CAPTURE_HEADER.size):
+    """Yield each record from offset: (record offset, timestamp, direction, memoryview of data)"""
+    view = memoryview(data)
+    while offset + RECORD_HEADER.size <= len(data):
+        (timestamp, direction, length) = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        if start + length > len(data):
+            break  # (truncated; the writer didn't close)
+        yield (offset, timestamp, direction, view[start:start + length])
+        offset = start + length
+
+
+def _build_index(data, encoding, checksum=None):
+    """:return: index (as bytes) of a capture's data"""
+    scanners = [_FrameScanner(encoding, checksum) for d in (RX, TX)]
+    index = [INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION)]
+    state = _IndexState()
+    last_timestamp = 0
+    for (record_offset, timestamp, direction, chunk) in _read_records(data):
+        index.append(_index_entries(direction, scanners[direction].feed(chunk.tobytes(), timestamp, record_offset), state))
+        last_timestamp = timestamp
+    for (direction, scanner) in enumerate(scanners):
+        index.append(_index_entries(direction, scanner.close(last_timestamp), state))
+    return b''.join(index)
+
+
+def reindex(path, checksum=None):
+    """(Re)write a capture's index file, by scanning the capture"""
+    with CaptureReader(path, index=False) as reader:
+        index = _build_index(reader.data, reader.encoding, checksum)
+    with open(index_path(path), 'wb') as index_file:
+        index_file.write(index)
+
+
+class CaptureReader(object):
+    """
+    Reads a capture file (and its index) with mmap
+
+    With an index, a frame (or datagram) is found by its number or time with a binary search
+    of the index, then only its own records are read; the capture isn't scanned.
+
+    Usage:
+        with prlsc.CaptureReader('link.cap') as capture:
+            datagram = capture.datagram(1000)
+            for frame in capture.frames(start=t0, end=t0 + 10**9):
+                ...
+
+    :param path: capture file path
+    :param index: True to use the `<path>.idx` index (built in memory, if there isn't one),
+                  False to not use an index (frames & datagrams aren't available)
+    :param checksum: checksum function, used if an index is built (see CaptureWriter)
+    """
+    def __init__(self, path, index=True, checksum=None):
+        (self.index, self.index_file, self.data) = (None, None, None)
+        self.file = open(path, 'rb')
+        if os.fstat(self.file.fileno()).st_size < CAPTURE_HEADER.size:  # (eg: its writer was killed)
+            self.close()
+            raise CaptureError("%s is too short to be a capture (no header)" % path)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version) = struct.unpack_from('<8sH', self.data, 0)
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            self.close()
+            raise CaptureError("%s is not a version %i capture" % (path, CAPTURE_VERSION))
+        self.encoding = CAPTURE_HEADER.unpack_from(self.data, 0)[2:]
+
+        if index:
+            if os.path.exists(index_path(path)) and os.path.getsize(index_path(path)) > INDEX_HEADER.size:
+                self.index_file = open(index_path(path), 'rb')
+                self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+                (magic, version) = INDEX_HEADER.unpack_from(self.index, 0)
+                if (magic == INDEX_MAGIC) and (version < INDEX_VERSION):
+                    # written by an older version; used in memory, as if there were none (see reindex)
+                    self.index.close()
+                    self.index_file.close()
+                    self.index_file = None
+                    self.index = None
+            if self.index is None:
+                self.index = _build_index(self.data, self.encoding, checksum)
+            (magic, version) = INDEX_HEADER.unpack_from(self.index, 0)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                self.close()
+                raise CaptureError("%s is not a version %i capture index" % (index_path(path), INDEX_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for obj in (self.index, self.index_file, self.data, self.file):
+            if hasattr(obj, 'close'):
+                obj.close()
+
+    # --- Raw records
+    def records(self, start=None, end=None):
+        """
+        Yield raw chunks (timestamp, direction, bytes) with timestamps in [start, end)
+        (ns, None for unbounded); with an index, the records before `start` aren't read
+        """
+        offset = CAPTURE_HEADER.size
+        if (start is not None) and (self.index is not None):
+            i = self._bisect_time(start)
+            if i > 0:
+                offset = self._entry(i - 1)[1]  # record of the frame before start (records between frames are in it or after it)
+        for (record_offset, timestamp, direction, chunk) in _read_records(self.data, offset):
+            if (start is not None) and (timestamp < start):
+                continue
+            if (end is not None) and (timestamp >= end):
+                break
+            yield (timestamp, direction, chunk.tobytes())
+
+    # --- Frames
+    @property
+    def frame_count(self):
+        self._assert_index()
+        return (len(self.index) - INDEX_HEADER.size) // INDEX_ENTRY.size
+
+    def frame(self, n):
+        """:return: CapturedFrame, the n'th in the capture (both directions)"""
+        if not (0 <= n < self.frame_count):
+            raise IndexError("frame %i of %i" % (n, self.frame_count))
+        (timestamp, record_offset, datagrams, position, direction, service_code, length, flags, first) = self._entry(n)
+        data = self._frame_data(record_offset, position, direction)
+        return CapturedFrame(timestamp, direction, service_code, data[2:2 + length] if flags & FRAME_VALID else data[2:], flags)
+
+    def frames(self, start=None, end=None):
+        """Yield each CapturedFrame with a timestamp in [start, end) (ns, None for unbounded)"""
+        first = self._bisect_time(start) if start is not None else 0
+        last = self._bisect_time(end) if end is not None else self.frame_count
+        for n in range(first, last):
+            yield self.frame(n)
+
+    # --- Datagrams
+    @property
+    def datagram_count(self):
+        return self._entry(self.frame_count - 1)[2] if self.frame_count else 0
+
+    def datagram(self, n):
+        """:return: CapturedDatagram, the n'th received or transmitted (in the order they completed)"""
+        if not (0 <= n < self.datagram_count):
+            raise IndexError("datagram %i of %i" % (n, self.datagram_count))
+        # the frame that completed it: the first with > n datagrams completed
+        (low, high) = (0, self.frame_count)
+        while low < high:
+            mid = (low + high) // 2
+            if self._entry(mid)[2] > n:
+                high = mid
+            else:
+                low = mid + 1
+        last = self._entry(low)
+        (timestamp, direction, service_code, first) = (last[0], last[4], last[5], last[8])
+
+        # its frames: the valid frames of the same direction & service index, from its first (other
+        # services' frames, and invalid frames, may be between them)
+        frames = []
+        for i in range(first, low):
+            entry = self._entry(i)
+            if (entry[7] & FRAME_VALID) and (entry[4] == direction) and ((entry[5] >> 5) == (service_code >> 5)):
+                frames.append(i)
+        frames.append(low)
+        data = b''.join(self.frame(i).data for i in frames)
+        return CapturedDatagram(timestamp, direction, service_code, data, last[7])
+
+    def datagrams(self, start=None, end=None):
+        """Yield each CapturedDatagram completed in [start, end) (ns, None for unbounded)"""
+        first = self._datagrams_before(self._bisect_time(start)) if start is not None else 0
+        last = self._datagrams_before(self._bisect_time(end)) if end is not None else self.datagram_count
+        for n in range(first, last):
+            yield self.datagram(n)
+
+    # --- Index
+    def _assert_index(self):
+        if self.index is None:
+            raise CaptureError("capture was opened without an index")
+
+    def _entry(self, n):
+        return INDEX_ENTRY.unpack_from(self.index, INDEX_HEADER.size + (n * INDEX_ENTRY.size))
+
+    def _datagrams_before(self, frame_number):
+        """:return: number of datagrams completed by frames before frame_number"""
+        return self._entry(frame_number - 1)[2] if frame_number > 0 else 0
+
+    def _bisect_time(self, timestamp):
+        """:return: number of frames with a timestamp < `timestamp`"""
+        (low, high) = (0, self.frame_count)
+        while low < high:
+            mid = (low + high) // 2
+            if self._entry(mid)[0] < timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def _frame_data(self, record_offset, position, direction):
+        """:return: decoded frame (serviceCode, length, data & checksum) starting in a record"""
+        scanner = _FrameScanner(self.encoding)
+        for (offset, timestamp, record_direction, chunk) in _read_records(self.data, record_offset):
+            if record_direction != direction:
+                continue
+            if offset == record_offset:
+                frames = scanner.feed(chunk[position:].tobytes(), timestamp, offset, position, limit=1)
+            else:
+                frames = scanner.feed(chunk.tobytes(), timestamp, offset, limit=1)
+            if frames:
+                return bytes(frames[0][3])
+        frames = scanner.close(0)
+        return bytes(frames[0][3]) if frames else b''
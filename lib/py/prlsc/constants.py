@@ -0,0 +1,25 @@
+# Error codes (as prlsc.h's PRLSC_ERRORCODE_*, the C receiver sets the same for the same bytes)
+ERRORCODE_NONE = 0
+ERRORCODE_RXFRAME_BAD_ESC = 1
+ERRORCODE_RXFRAME_SERVICEINDEX_BOUNDS = 2
+ERRORCODE_RXFRAME_TOO_LONG = 3
+ERRORCODE_RXFRAME_BAD_CHECKSUM = 4
+ERRORCODE_DATAGRAM_BAD_CHECKSUM = 5
+ERRORCODE_DATAGRAM_TOO_LONG = 6
+ERRORCODE_INCOMPLETE = 0xFF  #: frame was interrupted by a start byte (or the end of the stream); the C receiver sets no error
+
+ERRORCODE_NAMES = {
+    ERRORCODE_NONE: 'NONE',
+    ERRORCODE_RXFRAME_BAD_ESC: 'RXFRAME_BAD_ESC',
+    ERRORCODE_RXFRAME_SERVICEINDEX_BOUNDS: 'RXFRAME_SERVICEINDEX_BOUNDS',
+    ERRORCODE_RXFRAME_TOO_LONG: 'RXFRAME_TOO_LONG',
+    ERRORCODE_RXFRAME_BAD_CHECKSUM: 'RXFRAME_BAD_CHECKSUM',
+    ERRORCODE_DATAGRAM_BAD_CHECKSUM: 'DATAGRAM_BAD_CHECKSUM',
+    ERRORCODE_DATAGRAM_TOO_LONG: 'DATAGRAM_TOO_LONG',
+    ERRORCODE_INCOMPLETE: 'INCOMPLETE',
+}
+
+
+def twos_complement_checksum(data):
+    """checksum of bytes, as dummy_checksum_calc & prlsc_loopback_checksumCalc"""
+    return (-sum(data)) & 0xFF
@@ -0,0 +1,88 @@
+import ctypes
+
+_EMPTY = memoryview(b'')
+
+
+class DatagramView(object):
+    """
+    Zero-copy view of a prlsc_datagram_t's payload
+
+    `data` is a read-only memoryview directly over the datagram's `uint8_t *data` buffer; no
+    bytes are copied, and no per-byte ctypes indexing is done.
+
+    A received datagram's buffer is re-used by the receiver for the next datagram, so a view
+    is only valid during the callbackReceivedDatagram (or handler) call it was created in.
+    Use copy() or retain() for anything that must outlive the callback.
+
+    Usage:
+        def handler(datagram):
+            with DatagramView(datagram) as view:
+                if view.data[0] == 0x01:
+                    keep = view.retain()  # detached; safe to keep
+    """
+
+    __slots__ = ('service_index', 'subservice_index', 'checksum', 'data')
+
+    def __init__(self, datagram):
+        """
+        :param datagram: prlsc_datagram_t instance (or anything with the same fields)
+        """
+        self.service_index = datagram.serviceIndex
+        self.subservice_index = datagram.subServiceIndex
+        self.checksum = datagram.checksum
+        length = datagram.length
+        if length:
+            buffer = (ctypes.c_uint8 * length).from_address(ctypes.addressof(datagram.data.contents))
+            self.data = memoryview(buffer).cast('B').toreadonly()
+        else:
+            self.data = _EMPTY  # data may be NULL
+
+    def __len__(self):
+        return self.data.nbytes
+
+    def __repr__(self):
+        return "<%s %i.%i [%i bytes]>" % (
+            type(self).__name__, self.service_index, self.subservice_index, len(self),
+        )
+
+    def copy(self):
+        """
+        :return: payload as bytes (valid after the callback returns)
+        """
+        return self.data.tobytes()
+
+    def retain(self):
+        """
+        :return: DatagramView detached from the receive buffer (valid after the callback returns)
+        """
+        retained = object.__new__(type(self))
+        retained.service_index = self.service_index
+        retained.subservice_index = self.subservice_index
+        retained.checksum = self.checksum
+        retained.data = memoryview(self.data.tobytes())
+        return retained
+
+    def release(self):
+        """Release the view; any further use of `data` raises ValueError"""
+        self.data.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+def view_handler(handler):
+    """
+    Wraps a handler taking a DatagramView, so it can be used as a datagram callback
+    (eg: registered with a Dispatcher, or as callbackReceivedDatagram)
+    The view is released when the handler returns.
+    :param handler: callable(DatagramView)
+    :return: callable(prlsc_datagram_t)
+    """
+    def wrapped(datagram):
+        with DatagramView(datagram) as view:
+            return handler(view)
+    wrapped.__wrapped__ = handler
+    return wrapped
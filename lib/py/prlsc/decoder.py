@@ -0,0 +1,242 @@
+from .capture import encoding_from_config
+from .constants import (
+    ERRORCODE_NONE, ERRORCODE_RXFRAME_BAD_ESC, ERRORCODE_RXFRAME_SERVICEINDEX_BOUNDS, ERRORCODE_RXFRAME_TOO_LONG,
+    ERRORCODE_RXFRAME_BAD_CHECKSUM, ERRORCODE_DATAGRAM_BAD_CHECKSUM, ERRORCODE_DATAGRAM_TOO_LONG, ERRORCODE_INCOMPLETE,
+)
+
+# Structured array fields
+FRAME_FIELDS = [
+    ('offset', 'u8'),  # index of the frame's start byte (in the raw stream)
+    ('service_code', 'u1'),
+    ('length', 'u1'),  # data bytes
+    ('checksum', 'u1'),
+    ('data', 'u8'),  # index of the frame's data (in DecodedFrames.data)
+    ('error', 'u1'),
+]
+DATAGRAM_FIELDS = [
+    ('frame', 'u8'),  # index of the frame that completed the datagram (in DecodedFrames.frames)
+    ('service_code', 'u1'),  # (the last frame's)
+    ('length', 'u2'),  # data bytes (excluding a diagnostic datagram's checksum)
+    ('checksum', 'u1'),  # 0 for streams (and empty datagrams)
+    ('data', 'u8'),  # index of the datagram's data (in DecodedDatagrams.data)
+    ('error', 'u1'),
+]
+
+
+def _numpy():
+    # numpy is optional; it's only imported when something is decoded
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("numpy is required for array decoding (pip install numpy)")
+    return numpy
+
+
+class DecodedFrames(object):
+    """
+    Frames found in a raw byte stream (see ArrayDecoder.frames)
+
+    :ivar frames: structured array (see FRAME_FIELDS), a record per start byte
+    :ivar data: uint8 array of the stream's decoded (unescaped) bytes
+    """
+    def __init__(self, frames, data):
+        self.frames = frames
+        self.data = data
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def valid(self):
+        """frames (structured array) with no error"""
+        return self.frames[self.frames['error'] == ERRORCODE_NONE]
+
+    def frame_data(self, i):
+        """:return: data (uint8 array view) of the i'th frame"""
+        frame = self.frames[i]
+        return self.data[frame['data']:frame['data'] + frame['length']]
+
+
+class DecodedDatagrams(object):
+    """
+    Datagrams assembled from valid frames, in the order they completed (see ArrayDecoder.datagrams)
+
+    :ivar datagrams: structured array (see DATAGRAM_FIELDS)
+    :ivar data: uint8 array of all datagrams' data
+    """
+    def __init__(self, datagrams, data):
+        self.datagrams = datagrams
+        self.data = data
+
+    def __len__(self):
+        return len(self.datagrams)
+
+    @property
+    def valid(self):
+        """datagrams (structured array) the C receiver would have passed to its handler"""
+        return self.datagrams[self.datagrams['error'] == ERRORCODE_NONE]
+
+    def datagram_data(self, i):
+        """:return: data (uint8 array view) of the i'th datagram"""
+        datagram = self.datagrams[i]
+        return self.data[datagram['data']:datagram['data'] + datagram['length']]
+
+
+class ArrayDecoder(object):
+    """
+    Offline decoder of a raw PRLSC byte stream (one direction), using whole-array operations
+
+    Gives the same frames & datagrams as feeding the stream through prlsc_receiveByte, without
+    a per-byte loop; for decoding long captures. Checksums are two's complement sums (as
+    dummy_checksum_calc & prlsc_loopback_checksumCalc), the only algorithm that can be checked
+    without calling back per frame.
+
+    One difference: the C receiver's datagram index is a uint8_t, so it can't assemble
+    datagrams of more than 255 bytes (including a diagnostic checksum); they're assembled here.
+
+    Usage:
+        decoder = prlsc.ArrayDecoder(config)
+        frames = decoder.frames(numpy.fromfile('uart.bin', dtype=numpy.uint8))
+        datagrams = decoder.datagrams(frames)
+        for (i, datagram) in enumerate(datagrams.datagrams):
+            ...datagrams.datagram_data(i)
+
+    :param config: prlsc_config_t of the link (frame bytes, lengths & stream services),
+                   None for defaults (0xC0, 0xDB, 0xDC, 0xDD, 8 services, lengths of 0xFF)
+    :param encoding: instead of config; a capture's encoding (see CaptureReader.encoding)
+    :param datagram_length_max: instead of config's datagramLengthMax
+    """
+    def __init__(self, config=None, encoding=None, datagram_length_max=None):
+        if encoding is None:
+            encoding = encoding_from_config(config)
+        if datagram_length_max is None:
+            datagram_length_max = config.datagramLengthMax if config is not None else 0xFF
+        (self.start, self.esc, self.esc_start, self.esc_esc, self.frame_length_max, self.service_count, self.stream_mask) = encoding
+        self.datagram_length_max = datagram_length_max
+
+    def frames(self, raw):
+        """
+        :param raw: bytes-like, or uint8 array of the received bytes
+        :return: DecodedFrames instance
+        """
+        numpy = _numpy()
+        raw = numpy.frombuffer(raw, dtype=numpy.uint8) if not isinstance(raw, numpy.ndarray) else raw.astype(numpy.uint8, copy=False)
+        n = len(raw)
+        starts = numpy.flatnonzero(raw == self.start)
+
+        # --- Unescape (the whole stream)
+        is_esc = (raw == self.esc)
+        following = numpy.empty_like(raw)
+        following[:-1] = raw[1:]
+        following[-1:] = self.start  # (an escape at the end is incomplete, not bad)
+        bad_esc = is_esc & (following != self.esc_esc) & (following != self.esc_start) & (following != self.start)
+        escaped = numpy.zeros(n, dtype=bool)
+        escaped[1:] = is_esc[:-1]
+        values = raw.copy()
+        values[escaped & (raw == self.esc_esc)] = self.esc
+        values[escaped & (raw == self.esc_start)] = self.start
+        keep = ~is_esc & (raw != self.start)
+        kept = numpy.cumsum(keep, dtype=numpy.int64 if n >= (1 << 32) else numpy.uint32)  # decoded bytes up to (and including) each raw byte
+        decoded = values[keep]
+        # (bytes after a bad escape are garbage, but a frame is rejected before it would use them)
+
+        # --- Frames: decoded bytes from each start byte to the next
+        first = kept[starts] if n else numpy.zeros(0, dtype=numpy.int64)
+        last = numpy.append(first[1:], kept[-1] if n else 0)
+        available = last - first
+        bad_index = numpy.full(len(starts), numpy.iinfo(numpy.int64).max)
+        bad_positions = numpy.flatnonzero(bad_esc)
+        bad_frames = numpy.searchsorted(starts, bad_positions, side='right') - 1
+        (bad_frames, firsts) = numpy.unique(bad_frames, return_index=True)
+        mask = bad_frames >= 0
+        bad_index[bad_frames[mask]] = kept[bad_positions[firsts[mask]]] - first[bad_frames[mask]]
+        available = numpy.minimum(available, bad_index)
+
+        padded = numpy.append(decoded, numpy.zeros(2, dtype=numpy.uint8))
+        service_code = numpy.where(available >= 1, padded[first], 0).astype(numpy.uint8)
+        length = numpy.where(available >= 2, padded[numpy.minimum(first + 1, len(padded) - 1)], 0).astype(numpy.int64)
+        need = length + 3  # serviceCode, length, data & checksum
+        sums = numpy.concatenate((numpy.zeros(1, dtype=numpy.uint8), numpy.cumsum(decoded, dtype=numpy.uint8)))  # (mod 256, as checksums are)
+        end = numpy.minimum(first + need, len(decoded))
+        checksum = padded[numpy.maximum(end - 1, 0)]
+
+        error = numpy.full(len(starts), ERRORCODE_INCOMPLETE, dtype=numpy.uint8)
+        complete = available >= need
+        checksum_ok = (sums[end] - sums[first]) == 0
+        error[complete & checksum_ok] = ERRORCODE_NONE
+        error[complete & ~checksum_ok] = ERRORCODE_RXFRAME_BAD_CHECKSUM
+        error[~complete & (bad_index < need)] = ERRORCODE_RXFRAME_BAD_ESC
+        # (checked by the C receiver as each is received, so they take precedence)
+        error[(available >= 2) & (length > self.frame_length_max)] = ERRORCODE_RXFRAME_TOO_LONG
+        error[(available >= 1) & ((service_code >> 5) >= self.service_count)] = ERRORCODE_RXFRAME_SERVICEINDEX_BOUNDS
+
+        frames = numpy.zeros(len(starts), dtype=FRAME_FIELDS)
+        frames['offset'] = starts
+        frames['service_code'] = service_code
+        frames['length'] = length
+        frames['checksum'] = numpy.where(complete, checksum, 0)
+        frames['data'] = first + 2
+        frames['error'] = error
+        return DecodedFrames(frames, decoded)
+
+    def datagrams(self, frames):
+        """
+        Assemble datagrams from valid frames (as prlsc_receiveFrame does, per service index)
+
+        :param frames: DecodedFrames instance
+        :return: DecodedDatagrams instance
+        """
+        numpy = _numpy()
+        valid_index = numpy.flatnonzero(frames.frames['error'] == ERRORCODE_NONE)
+        valid = frames.frames[valid_index]
+        service_index = (valid['service_code'] >> 5).astype(numpy.int64)
+        stream = ((self.stream_mask >> service_index) & 1).astype(bool)
+        last_frame = (valid['length'] < self.frame_length_max) | stream
+
+        # group each service's frames into datagrams (frames of other services may be between them)
+        order = numpy.argsort(service_index, kind='stable')
+        (service_index, stream, last_frame, valid_index, valid) = (
+            service_index[order], stream[order], last_frame[order], valid_index[order], valid[order],
+        )
+        count = len(valid)
+        group_first = numpy.ones(count, dtype=bool)
+        group_first[1:] = last_frame[:-1] | (service_index[1:] != service_index[:-1])
+        firsts = numpy.flatnonzero(group_first)
+        lasts = numpy.append(firsts[1:] - 1, count - 1) if count else firsts
+        complete = last_frame[lasts]  # (trailing frames of an unfinished datagram are dropped)
+        (firsts, lasts) = (firsts[complete], lasts[complete])
+
+        # gather each datagram's bytes (frame data is scattered in frames.data)
+        lengths = valid['length'].astype(numpy.int64)
+        frame_in_datagram = numpy.zeros(count, dtype=bool)
+        if count:
+            membership = numpy.zeros(count + 1, dtype=numpy.int64)
+            numpy.add.at(membership, firsts, 1)
+            numpy.add.at(membership, lasts + 1, -1)
+            frame_in_datagram = numpy.cumsum(membership[:-1]) > 0
+        cumulative = numpy.concatenate(([0], numpy.cumsum(lengths)))
+        totals = cumulative[lasts + 1] - cumulative[firsts]
+        member_lengths = numpy.where(frame_in_datagram, lengths, 0)
+        offsets = numpy.cumsum(member_lengths) - member_lengths  # each frame's data offset in the gathered bytes
+        gather = numpy.repeat(valid['data'].astype(numpy.int64) - offsets, member_lengths) + numpy.arange(member_lengths.sum())
+        data = frames.data[gather]
+        starts = offsets[firsts] if len(firsts) else numpy.zeros(0, dtype=numpy.int64)
+
+        # checksums
+        diagnostic = ~stream[lasts] & (totals > 0)
+        sums = numpy.concatenate((numpy.zeros(1, dtype=numpy.uint8), numpy.cumsum(data, dtype=numpy.uint8)))
+        checksum_ok = (sums[starts + totals] - sums[starts]) == 0
+
+        datagrams = numpy.zeros(len(firsts), dtype=DATAGRAM_FIELDS)
+        datagrams['frame'] = valid_index[lasts]
+        datagrams['service_code'] = valid['service_code'][lasts]
+        datagrams['length'] = numpy.where(diagnostic, totals - 1, totals)
+        datagrams['checksum'] = numpy.where(diagnostic, data[numpy.maximum(starts + totals - 1, 0)] if len(data) else 0, 0)
+        datagrams['data'] = starts
+        error = numpy.where(diagnostic & ~checksum_ok, ERRORCODE_DATAGRAM_BAD_CHECKSUM, ERRORCODE_NONE)
+        error = numpy.where((totals - 1) > self.datagram_length_max, ERRORCODE_DATAGRAM_TOO_LONG, error)
+        datagrams['error'] = error
+
+        # in the order they completed
+        datagrams = datagrams[numpy.argsort(datagrams['frame'], kind='stable')]
+        return DecodedDatagrams(datagrams, data)
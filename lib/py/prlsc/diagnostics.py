@@ -0,0 +1,155 @@
+import time
+import ctypes
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from .dispatch import SUBSERVICE_COUNT
+
+log = logging.getLogger(__name__)
+
+
+class DiagnosticsTimeout(Exception):
+    """Raised by a request's future when no response is received in time"""
+    pass
+
+
+class _Request(object):
+    __slots__ = ('future', 'data', 'deadline', 'tag')
+
+    def __init__(self, future, data, deadline):
+        self.future = future
+        self.data = data
+        self.deadline = deadline
+        self.tag = None
+
+
+class DiagnosticsClient(object):
+    """
+    Pipelined request / response correlation over a diagnostics service
+
+    Each request is tagged with a free subServiceIndex (the server must respond with the
+    same subServiceIndex), so up to 32 requests may be outstanding at once. Requests beyond
+    that, or that don't fit in the transmit buffer yet, are queued and sent by poll().
+
+    Usage:
+        client = DiagnosticsClient(1, transmit)
+        client.attach(dispatcher)  # responses are received through the dispatcher
+        futures = [client.request(payload) for payload in payloads]
+        while not all(f.done() for f in futures):
+            client.poll()  # (along with the bus' usual byte servicing)
+        responses = [f.result() for f in futures]  # bytes, or raises DiagnosticsTimeout
+
+    A tag isn't re-used for `holdoff` seconds after its request times out, so a late response
+    can't be mistaken for the response to a newer request.
+    """
+
+    def __init__(self, service_index, transmit, timeout=1.0, holdoff=None, get_time=time.monotonic):
+        """
+        :param service_index: diagnostics service to send requests on
+        :param transmit: callable(service_index, subservice_index, data) -> True if the datagram
+                         was buffered for transmission (eg: prlsc_transmitDatagram returned > 0)
+        :param timeout: default seconds to wait for each response (measured from request())
+        :param holdoff: seconds a timed-out tag is left unused (defaults to timeout)
+        :param get_time: returns current time in seconds
+        """
+        self.service_index = service_index
+        self.transmit = transmit
+        self.timeout = timeout
+        self.holdoff = timeout if (holdoff is None) else holdoff
+        self.get_time = get_time
+
+        self._lock = threading.RLock()
+        self._queued = deque()  # requests waiting to be transmitted
+        self._outstanding = {}  # {tag: _Request} awaiting response
+        self._free_tags = deque(range(SUBSERVICE_COUNT))
+        self._held_tags = deque()  # (release_time, tag) of timed-out requests
+
+    @property
+    def outstanding(self):
+        """Number of requests transmitted, and awaiting a response"""
+        return len(self._outstanding)
+
+    @property
+    def queued(self):
+        """Number of requests waiting to be transmitted"""
+        return len(self._queued)
+
+    def attach(self, dispatcher):
+        """Receive this service's responses through the given prlsc.Dispatcher"""
+        dispatcher.register_service(self.service_index, self.receive)
+
+    def request(self, data, timeout=None):
+        """
+        Send a request (or queue it if it can't be sent yet)
+        :param data: request payload (bytes-like)
+        :param timeout: seconds to wait for a response (defaults to self.timeout)
+        :return: concurrent.futures.Future, resolves to the response's data (bytes)
+        """
+        future = Future()
+        deadline = self.get_time() + (self.timeout if (timeout is None) else timeout)
+        with self._lock:
+            self._queued.append(_Request(future, bytes(data), deadline))
+            self._transmit_queued()
+        return future
+
+    def poll(self):
+        """
+        Expire timed-out requests, and transmit queued requests while tags & buffer space allow
+        Call this periodically, from the same loop that services the bus.
+        """
+        now = self.get_time()
+        expired = []
+        with self._lock:
+            while self._held_tags and (self._held_tags[0][0] <= now):
+                self._free_tags.append(self._held_tags.popleft()[1])
+            for (tag, request) in list(self._outstanding.items()):
+                if request.deadline <= now:
+                    del self._outstanding[tag]
+                    self._held_tags.append((now + self.holdoff, tag))
+                    expired.append(request)
+            # (requests may have different timeouts, so any queued request may have expired)
+            expired += [request for request in self._queued if request.deadline <= now]
+            self._queued = deque(request for request in self._queued if request.deadline > now)
+            self._transmit_queued()
+
+        for request in expired:
+            if not request.future.done():
+                request.future.set_exception(DiagnosticsTimeout(
+                    "no response to diagnostics request (service %i, tag %r)" % (self.service_index, request.tag)
+                ))
+
+    def receive(self, datagram):
+        """
+        Response handler (signature suits callbackReceivedDatagram / Dispatcher)
+        :param datagram: prlsc_datagram_t instance
+        """
+        tag = datagram.subServiceIndex
+        with self._lock:
+            request = self._outstanding.pop(tag, None)
+            if request is not None:
+                self._free_tags.append(tag)
+        if request is None:
+            log.warning("unsolicited diagnostics response (service %i, tag %i) ignored", datagram.serviceIndex, tag)
+            return
+        # datagram's data is only valid during this call; copy it
+        request.future.set_result(ctypes.string_at(datagram.data, datagram.length) if datagram.length else b'')
+        with self._lock:
+            self._transmit_queued()  # tag has been freed
+
+    def _transmit_queued(self):
+        # must be called while self._lock is held
+        while self._queued and self._free_tags:
+            request = self._queued[0]
+            if (not request.future.running()) and (not request.future.set_running_or_notify_cancel()):
+                self._queued.popleft()  # cancelled
+                continue
+            tag = self._free_tags[0]
+            if not self.transmit(self.service_index, tag, request.data):
+                # transmit buffer is full; future is no longer cancellable, but it's first in line
+                break
+            self._queued.popleft()
+            self._free_tags.popleft()
+            request.tag = tag
+            self._outstanding[tag] = request
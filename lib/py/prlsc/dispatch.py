@@ -0,0 +1,124 @@
+import logging
+
+log = logging.getLogger(__name__)
+
+
+# Service code space (mirrors prlsc.h)
+SERVICE_COUNT_MAX = 8  # PRLSC_SERVICE_COUNT_MAX
+SUBSERVICE_COUNT = 32  # PRLSC_SUBSERVICE_COUNT
+
+
+def service_code(service_index, subservice_index):
+    """Service code (as transmitted in each frame) of the given indexes"""
+    assert 0 <= service_index < SERVICE_COUNT_MAX, "serviceIndex out of range: %r" % service_index
+    assert 0 <= subservice_index < SUBSERVICE_COUNT, "subServiceIndex out of range: %r" % subservice_index
+    return (service_index * SUBSERVICE_COUNT) + subservice_index
+
+
+class Dispatcher(object):
+    """
+    Routes received datagrams to handlers by (serviceIndex, subServiceIndex)
+
+    Python mirror of the C `config.handlers` table; delivery is a single list lookup.
+    A handler is any callable accepting a prlsc_datagram_t instance.
+
+    Usage:
+        dispatcher = Dispatcher(default=handle_anything_else)
+        dispatcher.register(0, 0, handle_position)
+        dispatcher.register_service(1, handle_diagnostics)  # all sub-services
+        dispatcher.install(config)
+
+    Once installed, the C table only routes registered service codes (and everything, if there's
+    a default handler) to this dispatcher; anything else is dropped by the C receiver before its
+    data is buffered.
+    """
+
+    def __init__(self, default=None):
+        self._handlers = [None] * (SERVICE_COUNT_MAX * SUBSERVICE_COUNT)  # as registered
+        self._table = list(self._handlers)  # as delivered (default handler filled in)
+        self._default = None
+        # installed C table (see install)
+        self._config = None
+        self._c_callback = None
+        self._c_default = None
+        self._c_table = None
+
+        self.default = default
+
+    # --- Registration
+    @property
+    def default(self):
+        return self._default
+
+    @default.setter
+    def default(self, handler):
+        self._default = handler
+        self._table = [h if (h is not None) else handler for h in self._handlers]
+        self._update_installed()
+
+    def register(self, service_index, subservice_index, handler):
+        """
+        Register a handler for a service code (replaces any existing handler)
+        :param service_index: datagram's serviceIndex
+        :param subservice_index: datagram's subServiceIndex
+        :param handler: callable taking a datagram, or None to unregister
+        """
+        code = service_code(service_index, subservice_index)
+        self._handlers[code] = handler
+        self._table[code] = handler if (handler is not None) else self._default
+        self._update_installed(code)
+
+    def unregister(self, service_index, subservice_index):
+        self.register(service_index, subservice_index, None)
+
+    def register_service(self, service_index, handler):
+        """Register a handler for all of a service's sub-services"""
+        for subservice_index in range(SUBSERVICE_COUNT):
+            self.register(service_index, subservice_index, handler)
+
+    def handler(self, service_index, subservice_index):
+        """
+        Handler that will receive datagrams for the given indexes
+        :return: callable, or None if they will be dropped
+        """
+        return self._table[service_code(service_index, subservice_index)]
+
+    # --- Delivery
+    def __call__(self, datagram):
+        """
+        Deliver a datagram to its handler (signature suits callbackReceivedDatagram)
+        :param datagram: prlsc_datagram_t instance
+        """
+        handler = self._table[(datagram.serviceIndex * SUBSERVICE_COUNT) + datagram.subServiceIndex]
+        if handler is not None:
+            handler(datagram)
+        else:
+            log.debug("datagram dropped (no handler): %i.%i", datagram.serviceIndex, datagram.subServiceIndex)
+
+    # --- C Integration
+    def install(self, config):
+        """
+        Configure the bus to deliver datagrams through this dispatcher
+        Sets both `config.handlers` and `config.callbackReceivedDatagram`; the table is kept
+        up to date with subsequent registrations.
+        :param config: prlsc_config_t instance (serviceCount must already be set)
+        """
+        fields = dict(type(config)._fields_)
+        handler_class = fields['handlers']._type_
+
+        self._config = config
+        # references retained: c function pointers must not be garbage collected
+        self._c_callback = handler_class(self)
+        self._c_default = fields['callbackReceivedDatagram'](self)
+        self._c_table = (handler_class * (config.serviceCount * SUBSERVICE_COUNT))()
+        config.handlers = self._c_table
+        self._update_installed()
+
+    def _update_installed(self, code=None):
+        if self._c_table is None:
+            return
+        codes = range(len(self._c_table)) if (code is None) else [code]
+        for code in codes:
+            if code < len(self._c_table):
+                self._c_table[code] = self._c_callback if (self._handlers[code] is not None) else type(self._c_callback)()
+        self._config.callbackReceivedDatagram = self._c_default if (self._default is not None) else type(self._c_default)()
@@ -0,0 +1,224 @@
+import mmap
+import time
+import struct
+import logging
+import ctypes
+from ctypes import (
+    Structure,
+    c_char, c_uint8, c_uint16, c_uint32,
+    addressof, sizeof,
+)
+
+log = logging.getLogger(__name__)
+
+
+# A service code is 1 byte: serviceIndex (3 bits) + subServiceIndex (5 bits)
+# (see PRLSC_SERVICEINDEX & PRLSC_SUBSERVICEINDEX in prlsc.h)
+SLOT_COUNT = 0x100
+
+MAGIC = b'PRLSCLV1'
+_HEADER_FORMAT = '=8sHH'  # magic, valueSizeMax, slotCount (must match _table_class)
+
+READ_SPINS = 100  # read retries before the reader starts yielding (to a writer mid-update)
+READ_RETRIES = 10000  # default retries before a read gives up (see LatestValueStore.read)
+
+
+class LatestValueBusy(Exception):
+    """Raised by LatestValueStore.read when no consistent value could be read (the writer stalled, or died, mid-update)"""
+    pass
+
+
+def _slot_index(service_index, subservice_index):
+    assert 0 <= service_index <= 0x07, "serviceIndex out of range: %r" % service_index
+    assert 0 <= subservice_index <= 0x1F, "subServiceIndex out of range: %r" % subservice_index
+    return (service_index << 5) | subservice_index
+
+
+def _next_version(version):
+    # versions are even while stable, and 0 is reserved for "never written"
+    return ((version + 2) & 0xFFFFFFFF) or 2
+
+
+def _table_class(value_size_max):
+    """
+    Build the shared memory layout for the given maximum value size
+    :param value_size_max: maximum number of bytes stored per value
+    :return: ctypes Structure class spanning the whole table
+    """
+    slot_class = type('prlsc_latestSlot_t', (Structure,), {
+        '_fields_': [
+            ('version', c_uint32),  # seqlock: odd while being written
+            ('length', c_uint16),
+            ('data', c_uint8 * value_size_max),
+        ],
+    })
+    return type('prlsc_latestTable_t', (Structure,), {
+        '_fields_': [
+            ('magic', c_char * len(MAGIC)),
+            ('valueSizeMax', c_uint16),
+            ('slotCount', c_uint16),
+            ('slots', slot_class * SLOT_COUNT),
+        ],
+    })
+
+
+class LatestValueStore(object):
+    """
+    Latest received value per (serviceIndex, subServiceIndex), held in shared memory
+
+    Intended for stream services, where only the newest datagram is of any interest.
+    A single writer (typically the bus' received datagram callback) overwrites each
+    slot, and any number of readers (threads, or processes attached to the same
+    file) may sample values at any time without locking.
+
+    Each slot is protected by a seqlock: the writer increments the slot's version
+    before and after writing (so it's odd while a write is in progress), a reader
+    retries if the version is odd, or has changed while the value was copied.
+
+    Usage:
+        # receiving process
+        store = LatestValueStore.create('/dev/shm/prlsc-latest')
+        config.callbackReceivedDatagram = callback_type(store.update_datagram)
+
+        # any other process
+        store = LatestValueStore.attach('/dev/shm/prlsc-latest')
+        (version, value) = store.read(0, 0)
+    """
+
+    def __init__(self, mem, value_size_max, filename=None):
+        self._mem = mem
+        self.filename = filename
+        self.value_size_max = value_size_max
+        self._table = _table_class(value_size_max).from_buffer(mem)
+        self._slots = self._table.slots
+        # one byte-view per slot's data (saves re-casting on every access)
+        self._data_views = [memoryview(slot.data).cast('B') for slot in self._slots]
+
+    @classmethod
+    def create(cls, filename=None, value_size_max=0xFF):
+        """
+        Create (or truncate) a store
+        :param filename: file to back the shared memory with (eg: under /dev/shm),
+                         if None, anonymous memory is used (only shared with threads, and forked processes)
+        :param value_size_max: maximum number of data bytes stored per value
+        :return: LatestValueStore instance (the writer's end)
+        """
+        size = sizeof(_table_class(value_size_max))
+        if filename is None:
+            mem = mmap.mmap(-1, size)
+        else:
+            with open(filename, 'w+b') as fh:
+                fh.truncate(size)
+                mem = mmap.mmap(fh.fileno(), size)
+        store = cls(mem, value_size_max, filename=filename)
+        ctypes.memset(addressof(store._table), 0, size)
+        store._table.valueSizeMax = value_size_max
+        store._table.slotCount = SLOT_COUNT
+        store._table.magic = MAGIC  # set last; marks the table as initialised
+        return store
+
+    @classmethod
+    def attach(cls, filename):
+        """
+        Attach to a store created by another process
+        :param filename: file given to LatestValueStore.create
+        :return: LatestValueStore instance
+        """
+        with open(filename, 'r+b') as fh:
+            mem = mmap.mmap(fh.fileno(), 0)
+        (magic, value_size_max, slot_count) = struct.unpack_from(_HEADER_FORMAT, mem)
+        if magic != MAGIC or slot_count != SLOT_COUNT:
+            mem.close()
+            raise ValueError("%s is not a latest-value store" % filename)
+        return cls(mem, value_size_max, filename=filename)
+
+    def close(self):
+        # ctypes objects export the buffer; they must be released before mmap may close
+        for view in self._data_views:
+            view.release()
+        self._data_views = None
+        self._slots = None
+        self._table = None
+        self._mem.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    # --- Writer
+    def update(self, service_index, subservice_index, data):
+        """
+        Store a new value (single writer only)
+        :param service_index: datagram's serviceIndex
+        :param subservice_index: datagram's subServiceIndex
+        :param data: bytes-like object
+        """
+        length = len(data)
+        assert length <= self.value_size_max, "value too long (%i > %i)" % (length, self.value_size_max)
+        index = _slot_index(service_index, subservice_index)
+        slot = self._slots[index]
+        version = slot.version
+        slot.version = version + 1  # odd: write in progress
+        self._data_views[index][:length] = data
+        slot.length = length
+        slot.version = _next_version(version)
+
+    def update_datagram(self, datagram):
+        """
+        Store a received datagram's data (signature suits callbackReceivedDatagram)
+        :param datagram: prlsc_datagram_t instance
+        """
+        length = datagram.length
+        if length > self.value_size_max:
+            log.warning("datagram dropped; too long for store (%i > %i)", length, self.value_size_max)
+            return
+        slot = self._slots[_slot_index(datagram.serviceIndex, datagram.subServiceIndex)]
+        version = slot.version
+        slot.version = version + 1  # odd: write in progress
+        if length:
+            ctypes.memmove(addressof(slot.data), datagram.data, length)
+        slot.length = length
+        slot.version = _next_version(version)
+
+    # --- Readers
+    def version(self, service_index, subservice_index):
+        """
+        Current version of a value; cheap to poll for changes
+        :return: version number, 0 if never written, odd if a write is in progress
+        """
+        return self._slots[_slot_index(service_index, subservice_index)].version
+
+    def read(self, service_index, subservice_index, retries=READ_RETRIES):
+        """
+        Take a consistent copy of the latest value
+
+        A read is retried while the writer is mid-update; the first READ_SPINS retries spin,
+        later ones yield (time.sleep(0)) so a writer in this process can finish. A slot whose
+        writer stalls (or dies) mid-update raises LatestValueBusy after `retries` retries.
+
+        :param service_index: datagram's serviceIndex
+        :param subservice_index: datagram's subServiceIndex
+        :param retries: retries before giving up
+        :return: tuple of (version, bytes), or None if nothing has been stored
+        :raises LatestValueBusy: if no consistent value was read
+        """
+        index = _slot_index(service_index, subservice_index)
+        slot = self._slots[index]
+        view = self._data_views[index]
+        for attempt in range(retries + 1):
+            if attempt > READ_SPINS:
+                time.sleep(0)
+            version = slot.version
+            if version == 0:
+                return None
+            if version & 1:
+                continue  # writer is mid-update
+            length = min(slot.length, self.value_size_max)  # length may be torn; re-checked below
+            value = view[:length].tobytes()
+            if slot.version == version:
+                return (version, value)
+        raise LatestValueBusy("slot %i.%i is mid-update (version %i) after %i retries" % (
+            service_index, subservice_index, slot.version, retries,
+        ))
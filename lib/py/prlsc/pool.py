@@ -0,0 +1,99 @@
+import ctypes
+from collections import deque
+
+
+class DatagramPoolExhausted(Exception):
+    """Raised by DatagramPool.acquire when every datagram is in use"""
+    pass
+
+
+class DatagramPool(object):
+    """
+    Fixed pool of re-usable datagrams for the transmit path
+
+    Every datagram struct, and its `length_max` byte data buffer, is allocated up-front;
+    acquire() fills one with a payload (a single memmove from any bytes-like object), so
+    a steady-state sender creates no ctypes objects.
+
+    prlsc_transmitDatagram copies the datagram into the service's transmit buffer before it
+    returns, so a datagram can be released as soon as it's been transmitted.
+
+    Usage:
+        pool = DatagramPool(prlsc_datagram_t, 4, config.datagramLengthMax, config.callbackChecksumCalc)
+        datagram = pool.acquire(0, 1, payload)
+        try:
+            prlsc_transmitDatagram(pointer(config), pointer(state), datagram)
+        finally:
+            pool.release(datagram)
+    """
+
+    def __init__(self, datagram_class, count, length_max, checksum_calc=None):
+        """
+        :param datagram_class: prlsc_datagram_t class
+        :param count: number of datagrams in the pool
+        :param length_max: data buffer size of each datagram (ie: config.datagramLengthMax)
+        :param checksum_calc: callable(data, length) -> checksum, used to set each datagram's
+                              checksum on acquire (eg: config.callbackChecksumCalc)
+        """
+        assert count > 0, "pool must have at least 1 datagram"
+        self.length_max = length_max
+        self.checksum_calc = checksum_calc
+
+        self._buffers = {}  # {address of datagram: (buffer, buffer's memoryview)}
+        self._datagrams = []
+        for i in range(count):
+            buffer = (ctypes.c_uint8 * length_max)()
+            datagram = datagram_class()
+            datagram.data = buffer
+            self._buffers[ctypes.addressof(datagram)] = (buffer, memoryview(buffer).cast('B'))
+            self._datagrams.append(datagram)
+        self._free = deque(self._datagrams)
+        self._in_use = set()  # addresses of acquired datagrams
+
+    def __len__(self):
+        return len(self._datagrams)
+
+    @property
+    def available(self):
+        """Number of datagrams that may be acquired"""
+        return len(self._free)
+
+    def acquire(self, service_index, subservice_index, data, checksum=None):
+        """
+        Take a datagram from the pool, populated with the given payload
+        :param service_index: datagram's serviceIndex
+        :param subservice_index: datagram's subServiceIndex
+        :param data: payload (bytes, bytearray, memoryview, or anything else supporting the buffer protocol)
+        :param checksum: datagram's checksum (calculated with checksum_calc if not given)
+        :return: datagram instance (must be given back with release())
+        """
+        data = memoryview(data).cast('B')
+        length = data.nbytes
+        assert length <= self.length_max, "datagram data too long: %i > %i" % (length, self.length_max)
+        try:
+            datagram = self._free.popleft()
+        except IndexError:
+            raise DatagramPoolExhausted("all %i datagrams are in use" % len(self._datagrams))
+
+        address = ctypes.addressof(datagram)
+        self._in_use.add(address)
+        (buffer, view) = self._buffers[address]
+        view[:length] = data
+        datagram.serviceIndex = service_index
+        datagram.subServiceIndex = subservice_index
+        datagram.length = length
+        if checksum is None:
+            checksum = self.checksum_calc(buffer, length) if (self.checksum_calc is not None) else 0
+        datagram.checksum = checksum
+        return datagram
+
+    def release(self, datagram):
+        """
+        Return a datagram to the pool
+        :param datagram: datagram previously returned by acquire()
+        """
+        address = ctypes.addressof(datagram)
+        assert address in self._buffers, "datagram is not from this pool"
+        assert address in self._in_use, "datagram released twice"
+        self._in_use.remove(address)
+        self._free.append(datagram)
@@ -0,0 +1,39 @@
+from collections import OrderedDict
+from ctypes import pointer, string_at
+
+
+def profiling_enabled(bindings):
+    """
+    :param bindings: namespace (eg: module) of the compiled library's bindings
+    :return: True if the library was compiled with PRLSC_PROFILE (its state has operation counters)
+    """
+    return 'profile' in dict(bindings.prlsc_state_t._fields_)
+
+
+def profile_counters(bindings, state):
+    """
+    A bus' operation counters (see prlsc_profileDump), counting since prlsc_initState
+
+    Counters are named as their prlsc_profile_t field; table counters' names are suffixed
+    with their keys, eg: 'memcpyBytes.txFrame', 'rxFrameTransitions.COLLECTING.ESC'.
+    Every counter is included (in the order they're dumped), so counters of two runs can
+    be compared (or subtracted) key by key.
+
+    Usage:
+        for (name, value) in prlsc.profile_counters(data_types, state).items():
+            print("%-40s %i" % (name, value))
+
+    :param bindings: namespace (eg: module) of the compiled library's bindings, exposing
+                     prlsc_profileDump & prlsc_profileWriter_t (compiled with PRLSC_PROFILE)
+    :param state: prlsc_state_t instance
+    :return: OrderedDict of {name: count}
+    """
+    assert profiling_enabled(bindings), "library was not compiled with PRLSC_PROFILE"
+    counters = OrderedDict()
+
+    def write(counter, key, sub_key, value):
+        name = '.'.join(string_at(k).decode('ascii') for k in (counter, key, sub_key) if k)  # (NULL keys are skipped)
+        counters[name] = value
+    callback = bindings.prlsc_profileWriter_t(write)  # (referenced until the dump returns)
+    bindings.prlsc_profileDump(pointer(state), callback)
+    return counters
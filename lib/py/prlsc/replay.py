@@ -0,0 +1,174 @@
+import os
+import time
+import ctypes
+import logging
+
+from .capture import CaptureReader, RX, TX
+from .analyze import RunningStats
+
+log = logging.getLogger(__name__)
+
+DIRECTIONS = {'rx': (RX,), 'tx': (TX,), 'both': (RX, TX)}
+SPIN_NS = 200000  # sleep until this close to a chunk's time, then spin (sleep's wake-up latency is ~50-100us)
+
+
+def receive_byte_sink(bindings, config, state):
+    """
+    Sink feeding each byte to prlsc_receiveByte (of an endpoint in this process)
+
+    :param bindings: namespace (eg: module) of the compiled library's bindings
+    :param config: endpoint's prlsc_config_t
+    :param state: endpoint's prlsc_state_t
+    """
+    (config_p, state_p) = (ctypes.pointer(config), ctypes.pointer(state))
+    receive_byte = bindings.prlsc_receiveByte
+
+    def sink(data):
+        for byte in bytearray(data):
+            receive_byte(config_p, state_p, byte)
+    return sink
+
+
+def fd_sink(fd):
+    """Sink writing to a file descriptor (eg: a serial port, or pty master; see open_pty)"""
+    def sink(data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    return sink
+
+
+def open_pty():
+    """
+    Open a pseudo-terminal for a consumer to read replayed bytes from (as it would a serial port)
+
+    Both ends are left open, and must be closed by the caller; keep the slave fd open until
+    the replay is done (so the pty stays in raw mode, and buffers bytes, whether or not the
+    consumer has opened the device yet).
+
+    :return: (master fd, slave fd, slave device path); replay into fd_sink(master)
+    """
+    import tty
+    (master, slave) = os.openpty()
+    tty.setraw(slave)  # (no echo, or line editing)
+    return (master, slave, os.ttyname(slave))
+
+
+class ReplayReport(object):
+    """
+    Achieved timing of a Replayer.run; lateness is how long after its target each chunk was
+    passed to the sink (seconds; sink time is included, as it delays the following chunks)
+    """
+    def __init__(self, speed):
+        self.speed = speed  # None: throughput mode
+        self.records = 0
+        self.bytes = 0
+        self.target_duration = 0.0  # seconds (recorded duration / speed)
+        self.duration = 0.0  # seconds, achieved
+        self.lateness = RunningStats()
+
+    @property
+    def throughput(self):
+        """bytes per second (achieved)"""
+        return self.bytes / self.duration if self.duration else 0.0
+
+    @property
+    def timing_error(self):
+        """achieved - target duration (seconds)"""
+        return self.duration - self.target_duration
+
+    def as_dict(self):
+        return {
+            'speed': self.speed, 'records': self.records, 'bytes': self.bytes,
+            'target_duration': self.target_duration, 'duration': self.duration, 'throughput': self.throughput,
+            'lateness_mean': self.lateness.mean, 'lateness_std': self.lateness.std,
+            'lateness_max': self.lateness.max,
+        }
+
+    def __str__(self):
+        us = lambda value: ('%.1f' % (value * 1e6)) if value is not None else '-'
+        lines = ["replay: %i records, %i bytes in %.3fs (%s); %.0f bytes/s" % (
+            self.records, self.bytes, self.duration,
+            ('target %.3fs at x%g' % (self.target_duration, self.speed)) if self.speed else 'throughput mode',
+            self.throughput,
+        )]
+        if self.speed:
+            lines.append("    lateness (us): mean %s, std %s, max %s" % (
+                us(self.lateness.mean), us(self.lateness.std), us(self.lateness.max),
+            ))
+        return '\n'.join(lines)
+
+
+class Replayer(object):
+    """
+    Replays a capture's recorded bytes into a sink, with their recorded timing
+
+    Each record (chunk) is passed to the sink at its recorded time (relative to the first
+    replayed record) divided by `speed`. Waits sleep until SPIN_NS before a chunk's time,
+    then spin on the monotonic clock; so chunks are typically passed within a few
+    microseconds of their target, and lateness doesn't accumulate (targets are from the
+    start, not the previous chunk). With speed=None, chunks are passed as fast as the sink
+    takes them (throughput mode; eg: as a load generator).
+
+    Usage:
+        (master, slave, device) = prlsc.replay.open_pty()  # consumer opens `device`
+        replayer = prlsc.Replayer('field.cap', prlsc.replay.fd_sink(master), direction='rx', speed=2)
+        print(replayer.run())
+
+    :param path: capture file path
+    :param sink: callable(bytes) given each chunk
+    :param direction: recorded bytes to replay; 'rx', 'tx' or 'both'
+    :param speed: timing factor (2: twice as fast), None to replay as fast as possible
+    :param start: replay records from this recorded time (ns, None: from the first)
+    :param end: replay records before this recorded time (ns, None: to the last)
+    :param clock: monotonic clock (ns)
+    :param sleep: sleep function (seconds)
+    """
+    def __init__(self, path, sink, direction='rx', speed=1.0, start=None, end=None,
+                 clock=time.perf_counter_ns, sleep=time.sleep):
+        assert direction in DIRECTIONS, "direction must be one of %r" % sorted(DIRECTIONS)
+        assert (speed is None) or (speed > 0), "speed must be > 0 (or None)"
+        self.path = path
+        self.sink = sink
+        self.directions = DIRECTIONS[direction]
+        self.speed = speed
+        self.start = start
+        self.end = end
+        self.clock = clock
+        self.sleep = sleep
+
+    def run(self):
+        """
+        Replay the capture (blocks until it's replayed)
+        :return: ReplayReport instance
+        """
+        report = ReplayReport(self.speed)
+        (clock, sink) = (self.clock, self.sink)
+        first = None  # (recorded ns, clock ns) of the first record
+        target = 0
+        with CaptureReader(self.path, index=False) as reader:
+            for (timestamp, direction, chunk) in reader.records(start=self.start, end=self.end):
+                if direction not in self.directions:
+                    continue
+                if first is None:
+                    first = (timestamp, clock())
+                if self.speed:
+                    target = first[1] + int((timestamp - first[0]) / self.speed)
+                    self._wait_until(target)
+                    report.lateness.add((clock() - target) * 1e-9)
+                sink(chunk)
+                report.records += 1
+                report.bytes += len(chunk)
+                if self.speed:
+                    report.target_duration = (target - first[1]) * 1e-9
+        if first is not None:
+            report.duration = (clock() - first[1]) * 1e-9
+        log.debug("%s: %s", self.path, report)
+        return report
+
+    def _wait_until(self, target):
+        remaining = target - self.clock()
+        if remaining > SPIN_NS:
+            self.sleep((remaining - SPIN_NS) * 1e-9)
+        while self.clock() < target:
+            pass
@@ -0,0 +1,280 @@
+import math
+import heapq
+import random
+import struct
+import ctypes
+from ctypes import pointer
+
+from .arena import init_state
+
+SOURCES = ('a', 'b')
+SEQUENCE = struct.Struct('<I')  # every simulated datagram's data starts with its sequence number
+
+
+class Traffic(object):
+    """
+    An application's datagrams, enqueued periodically on one service of an endpoint
+
+    :param service_index: service the datagrams are sent on
+    :param period: seconds between datagrams
+    :param length: datagram data bytes (>= 4; data starts with a sequence number)
+    :param jitter: each period is varied by up to +/- this fraction of itself (uniformly)
+    :param deadline: seconds a datagram may take to be received before it's late (default: period)
+    :param offset: seconds before the first datagram (default: 0)
+    :param source: endpoint sending the datagrams ('a' or 'b')
+    :param sub_service_index: datagrams' subServiceIndex
+    """
+    def __init__(self, service_index, period, length, jitter=0.0, deadline=None, offset=0.0, source='a', sub_service_index=0):
+        assert period > 0, "period must be > 0"
+        assert length >= SEQUENCE.size, "length must be >= %i (for a sequence number)" % SEQUENCE.size
+        assert 0 <= jitter < 1, "jitter must be 0 <= jitter < 1"
+        assert source in SOURCES, "source must be one of %r" % (SOURCES,)
+        self.service_index = service_index
+        self.period = period
+        self.length = length
+        self.jitter = jitter
+        self.deadline = deadline if deadline is not None else period
+        self.offset = offset
+        self.source = source
+        self.sub_service_index = sub_service_index
+
+
+class ServiceReport(object):
+    """
+    Simulated performance of a service (from one endpoint)
+
+    Datagrams enqueued by the application are either: delivered, dropped (the service's tx
+    ring was full), or undelivered (still queued, or superseded by a later datagram; see
+    onlyTxLatest). Latency is from being enqueued, to being received by the other endpoint.
+    """
+    def __init__(self, source, service_index, buffer_size):
+        self.source = source
+        self.service_index = service_index
+        self.buffer_size = buffer_size
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.late = 0  # delivered after their traffic's deadline
+        self.data_bytes = 0  # data bytes delivered
+        self.latencies = []  # seconds, per delivered datagram
+        self.occupancy = []  # tx ring bytes used, sampled as each datagram is enqueued
+        self.duration = 0.0
+
+    @property
+    def undelivered(self):
+        return self.enqueued - self.delivered - self.dropped
+
+    @property
+    def starved(self):
+        """datagrams that weren't delivered in time (late, dropped, or undelivered)"""
+        return self.late + self.dropped + self.undelivered
+
+    @property
+    def throughput(self):
+        """data bytes delivered per second"""
+        return self.data_bytes / self.duration if self.duration else 0.0
+
+    def latency(self, percentile):
+        """latency (seconds) at a percentile (0 to 100, nearest-rank) of delivered datagrams, None if none were delivered"""
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        index = max(0, min(len(latencies) - 1, int(math.ceil((percentile * len(latencies)) / 100.0)) - 1))
+        return latencies[index]
+
+    @property
+    def occupancy_mean(self):
+        return float(sum(self.occupancy)) / len(self.occupancy) if self.occupancy else 0.0
+
+    @property
+    def occupancy_max(self):
+        return max(self.occupancy) if self.occupancy else 0
+
+
+class SimulationReport(object):
+    """Results of Simulator.run; a ServiceReport per (source, service index) with traffic"""
+    def __init__(self, duration, baud, bits_per_byte):
+        self.duration = duration
+        self.baud = baud
+        self.bits_per_byte = bits_per_byte
+        self.services = []
+        self.bytes_sent = dict((source, 0) for source in SOURCES)
+
+    def service(self, source, service_index):
+        for report in self.services:
+            if (report.source, report.service_index) == (source, service_index):
+                return report
+        raise KeyError((source, service_index))
+
+    def utilisation(self, source='a'):
+        """fraction of the line's capacity used by an endpoint's transmissions"""
+        capacity = (self.duration * self.baud) / self.bits_per_byte
+        return self.bytes_sent[source] / capacity if capacity else 0.0
+
+    def __str__(self):
+        ms = lambda value: ('%.1f' % (value * 1e3)) if value is not None else '-'
+        lines = ["simulation: %gs at %i baud; utilisation a->b %.1f%%, b->a %.1f%%" % (
+            self.duration, self.baud, self.utilisation('a') * 100, self.utilisation('b') * 100,
+        )]
+        lines.append("    %-9s %8s %9s %8s %8s %10s %8s %8s %8s %12s" % (
+            'service', 'enqueued', 'delivered', 'dropped', 'starved', 'bytes/s',
+            'p50 ms', 'p99 ms', 'max ms', 'ring mean/max',
+        ))
+        for r in self.services:
+            lines.append("    %-9s %8i %9i %8i %8i %10.0f %8s %8s %8s %12s" % (
+                '%s[%i]' % (r.source, r.service_index), r.enqueued, r.delivered, r.dropped, r.starved,
+                r.throughput, ms(r.latency(50)), ms(r.latency(99)), ms(r.latency(100)),
+                '%.0f/%i' % (r.occupancy_mean, r.occupancy_max),
+            ))
+        return '\n'.join(lines)
+
+
+class Simulator(object):
+    """
+    Discrete-event simulation of 2 endpoints connected by a UART (a prlsc_loopback link)
+
+    Virtual time advances 1 byte-time (bits_per_byte / baud seconds) per pump step, and each
+    endpoint's callbackGetTime returns virtual time in ticks of `tick` seconds (so rateLimit
+    values are in the same units as they are on the target). Bytes are moved by the C library;
+    Python only runs per datagram (to enqueue it, and to time its reception), so idle & long
+    simulations are cheap.
+
+    Usage:
+        sim = prlsc.Simulator(data_types, config, baud=115200, tick=1e-3)
+        sim.add_traffic(prlsc.Traffic(0, period=0.01, length=16))         # stream, 100Hz
+        sim.add_traffic(prlsc.Traffic(1, period=1.0, length=200, jitter=0.5))
+        print(sim.run(3600))  # 1 hour
+
+    Both endpoints' callbackSendByte, callbackGetTime & callbackReceivedDatagram are replaced;
+    their callbackChecksumCalc is used as it is.
+
+    :param bindings: namespace (eg: module) of the compiled library's bindings, exposing
+                     prlsc_* functions & types, including prlsc_loopback's
+    :param config_a: endpoint a's prlsc_config_t
+    :param config_b: endpoint b's prlsc_config_t (default: a copy of config_a)
+    :param baud: line speed (bits per second)
+    :param bits_per_byte: bits on the line per byte (8N1: 10)
+    :param tick: seconds per prlsc_time_t tick
+    :param seed: random seed (for traffic jitter)
+    """
+    def __init__(self, bindings, config_a, config_b=None, baud=115200, bits_per_byte=10, tick=1e-3, seed=0):
+        self.bindings = bindings
+        self.baud = baud
+        self.bits_per_byte = bits_per_byte
+        self.step_ns = int(round((bits_per_byte * 1e9) / baud))
+        self.tick_ns = int(round(tick * 1e9))
+        assert self.step_ns > 0 and self.tick_ns > 0, "baud & tick give a resolution below 1ns"
+        self.random = random.Random(seed)
+        self.traffic = []
+
+        if config_b is None:
+            config_b = type(config_a).from_buffer_copy(config_a)
+            config_b._config_a = config_a  # (retains anything config_a references)
+        self.configs = {'a': config_a, 'b': config_b}
+
+    def add_traffic(self, traffic):
+        config = self.configs[traffic.source]
+        assert traffic.service_index < config.serviceCount, "no service %i" % traffic.service_index
+        self.traffic.append(traffic)
+
+    def run(self, duration):
+        """
+        Simulate `duration` seconds of traffic (from a fresh state)
+        :return: SimulationReport instance
+        """
+        b = self.bindings
+        config_field = dict(b.prlsc_config_t._fields_)
+        states = dict((source, init_state(b, config)) for (source, config) in self.configs.items())
+        config_p = dict((source, pointer(config)) for (source, config) in self.configs.items())
+        state_p = dict((source, pointer(state)) for (source, state) in states.items())
+
+        link = b.prlsc_loopback_t()
+        link_p = pointer(link)
+        fifo = (ctypes.c_uint8 * 4)()
+        b.prlsc_loopback_init(
+            link_p, config_p['a'], state_p['a'], config_p['b'], state_p['b'],
+            ctypes.cast(fifo, ctypes.POINTER(ctypes.c_uint8)), 2, None,
+        )
+        b.prlsc_loopback_setTiming(link_p, self.step_ns, self.tick_ns)
+
+        report = SimulationReport(duration, self.baud, self.bits_per_byte)
+        reports = {}
+        for traffic in self.traffic:
+            key = (traffic.source, traffic.service_index)
+            if key not in reports:
+                reports[key] = ServiceReport(traffic.source, traffic.service_index, states[traffic.source].transmitterBuffer[traffic.service_index].bufferSize)
+                report.services.append(reports[key])
+        pending = {}  # {sequence: (enqueued ns, traffic)}
+
+        # --- Reception (by either endpoint; sequence numbers are unique to the run)
+        def received_datagram(datagram):
+            if datagram.length < SEQUENCE.size:
+                return
+            (sequence,) = SEQUENCE.unpack(ctypes.string_at(datagram.data, SEQUENCE.size))
+            if sequence not in pending:
+                return
+            (enqueued, traffic) = pending.pop(sequence)
+            service_report = reports[(traffic.source, traffic.service_index)]
+            latency = (link.nanoseconds - enqueued) * 1e-9
+            service_report.delivered += 1
+            service_report.data_bytes += datagram.length
+            service_report.latencies.append(latency)
+            if latency > traffic.deadline:
+                service_report.late += 1
+        callback = config_field['callbackReceivedDatagram'](received_datagram)
+        for config in self.configs.values():
+            config.callbackReceivedDatagram = callback
+
+        # --- Datagrams (1 per traffic, re-used)
+        datagrams = []
+        for traffic in self.traffic:
+            data = (ctypes.c_uint8 * traffic.length)(*[i & 0xFF for i in range(traffic.length)])
+            datagram = b.prlsc_datagram_t()
+            datagram.serviceIndex = traffic.service_index
+            datagram.subServiceIndex = traffic.sub_service_index
+            datagram.length = traffic.length
+            datagram.data = ctypes.cast(data, type(datagram.data))
+            datagrams.append((datagram, data))
+
+        # --- Events: (time ns, traffic index), in time order
+        events = [(int(traffic.offset * 1e9), i) for (i, traffic) in enumerate(self.traffic)]
+        heapq.heapify(events)
+        end = int(duration * 1e9)
+        sequence = 0
+        while events and (events[0][0] < end):
+            (event_time, index) = heapq.heappop(events)
+            self._pump_until(link, link_p, event_time)
+
+            traffic = self.traffic[index]
+            (datagram, data) = datagrams[index]
+            service_report = reports[(traffic.source, traffic.service_index)]
+            tx_buffer = states[traffic.source].transmitterBuffer[traffic.service_index]
+            service_report.occupancy.append((tx_buffer.bufferIdx - tx_buffer.txIdx) % tx_buffer.bufferSize)
+
+            SEQUENCE.pack_into(data, 0, sequence)
+            datagram.checksum = b.prlsc_calcDatagramChecksum(config_p[traffic.source], datagram)
+            service_report.enqueued += 1
+            if b.prlsc_transmitDatagram(config_p[traffic.source], state_p[traffic.source], datagram):
+                pending[sequence] = (link.nanoseconds, traffic)
+            else:
+                service_report.dropped += 1
+            sequence = (sequence + 1) & 0xFFFFFFFF
+
+            period = traffic.period * (1 + (traffic.jitter * self.random.uniform(-1, 1)))
+            heapq.heappush(events, (event_time + int(period * 1e9), index))
+
+        self._pump_until(link, link_p, end)
+
+        for service_report in report.services:
+            service_report.duration = duration
+        report.bytes_sent['a'] = link.endpointA.bytesSent
+        report.bytes_sent['b'] = link.endpointB.bytesSent
+        self._callback = callback  # (retained while configs reference it)
+        return report
+
+    def _pump_until(self, link, link_p, time_ns):
+        steps = (time_ns - link.nanoseconds + self.step_ns - 1) // self.step_ns
+        while steps > 0:
+            chunk = min(steps, 0xFFFFFFFF)
+            self.bindings.prlsc_loopback_pump(link_p, chunk)
+            steps -= chunk
@@ -0,0 +1,145 @@
+import time
+import bisect
+import logging
+
+from .analyze import RunningStats
+from .dispatch import SERVICE_COUNT_MAX
+
+log = logging.getLogger(__name__)
+
+# histogram bucket edges, in byte periods (a bucket counts durations from its lower edge, up to its upper)
+HISTOGRAM_EDGES = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+
+def byte_period(baud, bits_per_byte=10):
+    """:return: seconds to receive a byte at the given line speed (8N1: 10 bits per byte)"""
+    return float(bits_per_byte) / baud
+
+
+class HandlerStats(object):
+    """
+    Durations of a service's handler invocations
+
+    :ivar histogram: counts per bucket; len(HISTOGRAM_EDGES) + 1 buckets, the first below
+                     HISTOGRAM_EDGES[0] byte periods, the last at or above HISTOGRAM_EDGES[-1]
+    :ivar duration: RunningStats of durations (seconds)
+    :ivar overruns: invocations that exceeded the watchdog's budget
+    """
+    def __init__(self):
+        self.histogram = [0] * (len(HISTOGRAM_EDGES) + 1)
+        self.duration = RunningStats()
+        self.overruns = 0
+
+    def as_dict(self):
+        return {
+            'invocations': self.duration.count, 'overruns': self.overruns, 'histogram': list(self.histogram),
+            'duration_mean': self.duration.mean, 'duration_max': self.duration.max,
+        }
+
+
+class HandlerWatchdog(object):
+    """
+    Times a datagram handler, to find those slow enough to stall the receiver
+
+    callbackReceivedDatagram is called by prlsc_receiveByte, so while a handler runs, no bytes
+    are taken from the UART; one that runs for longer than the UART can buffer bytes (its
+    receive FIFO's depth, in byte periods) loses data, and nothing records it. The watchdog
+    calls the handler it wraps, keeps a histogram (in byte periods) of each service's handler
+    durations, and warns when an invocation exceeds its budget (`budget_bytes` byte periods);
+    handlers that do should defer their work (eg: to a DatagramPool & a queue).
+
+    Durations are those of the Python handler (not the ctypes call into it); the budget
+    should allow for that overhead, and the rest of the byte's processing.
+
+    Usage:
+        watchdog = prlsc.HandlerWatchdog(dispatcher, baud=115200, budget_bytes=16)  # 16 byte FIFO
+        watchdog.install(config)  # (instead of dispatcher.install(config))
+        ...
+        print(watchdog)
+
+    :param handler: callable taking a prlsc_datagram_t (eg: a Dispatcher)
+    :param baud: line speed (bits per second)
+    :param bits_per_byte: bits on the line per byte (8N1: 10)
+    :param budget_bytes: byte periods a handler may take before it's an overrun (typically
+                         the UART's receive FIFO depth)
+    :param on_overrun: called for each overrun with (datagram, seconds), eg: to record a metric;
+                       None to only log a warning
+    :param clock: monotonic clock (ns)
+    """
+    def __init__(self, handler, baud=115200, bits_per_byte=10, budget_bytes=1, on_overrun=None,
+                 clock=time.perf_counter_ns):
+        assert budget_bytes > 0, "budget_bytes must be > 0"
+        self.handler = handler
+        self.byte_period = byte_period(baud, bits_per_byte)
+        self.budget = budget_bytes * self.byte_period  # seconds
+        self.on_overrun = on_overrun
+        self.clock = clock
+        self._edges = [edge * self.byte_period for edge in HISTOGRAM_EDGES]  # (seconds)
+        self.services = [HandlerStats() for i in range(SERVICE_COUNT_MAX)]
+        self._c_callback = None
+
+    def __call__(self, datagram):
+        """
+        Call the handler, timing it (signature suits callbackReceivedDatagram)
+        :param datagram: prlsc_datagram_t instance
+        """
+        start = self.clock()
+        try:
+            self.handler(datagram)
+        finally:
+            self._record(datagram, (self.clock() - start) * 1e-9)
+
+    def _record(self, datagram, seconds):
+        stats = self.services[datagram.serviceIndex]
+        stats.histogram[bisect.bisect_right(self._edges, seconds)] += 1
+        stats.duration.add(seconds)
+        if seconds > self.budget:
+            stats.overruns += 1
+            log.warning(
+                "handler of %i.%i took %.1fus (%.1f byte periods; budget %.1fus): received bytes may have been lost",
+                datagram.serviceIndex, datagram.subServiceIndex, seconds * 1e6, seconds / self.byte_period,
+                self.budget * 1e6,
+            )
+            if self.on_overrun is not None:
+                self.on_overrun(datagram, seconds)
+
+    @property
+    def overruns(self):
+        """overruns of all services"""
+        return sum(stats.overruns for stats in self.services)
+
+    # --- C Integration
+    def install(self, config):
+        """
+        Configure the bus to deliver every datagram through this watchdog
+        A handlers table would route datagrams around it, so config.handlers must be NULL; wrap
+        a Dispatcher, rather than installing it.
+        :param config: prlsc_config_t instance
+        """
+        assert not config.handlers, "config has a handlers table (wrap its Dispatcher instead of installing it)"
+        # reference retained: c function pointers must not be garbage collected
+        self._c_callback = dict(type(config)._fields_)['callbackReceivedDatagram'](self)
+        config.callbackReceivedDatagram = self._c_callback
+
+    def as_dict(self):
+        return {
+            'byte_period': self.byte_period, 'budget': self.budget, 'histogram_edges': list(self._edges),
+            'services': dict((i, stats.as_dict()) for (i, stats) in enumerate(self.services) if stats.duration.count),
+        }
+
+    def __str__(self):
+        us = lambda value: ('%.1f' % (value * 1e6)) if value is not None else '-'
+        lines = ["handler watchdog: budget %sus (%g byte periods of %sus); %i overruns" % (
+            us(self.budget), self.budget / self.byte_period, us(self.byte_period), self.overruns,
+        )]
+        labels = ['<%g' % edge for edge in HISTOGRAM_EDGES] + ['>=%g' % HISTOGRAM_EDGES[-1]]  # (byte periods)
+        lines.append("    %-7s %8s %8s %10s %10s  %s" % (
+            'service', 'calls', 'overruns', 'mean (us)', 'max (us)', ' '.join('%5s' % label for label in labels),
+        ))
+        for (i, stats) in enumerate(self.services):
+            if stats.duration.count:
+                lines.append("    %-7i %8i %8i %10s %10s  %s" % (
+                    i, stats.duration.count, stats.overruns, us(stats.duration.mean), us(stats.duration.max),
+                    ' '.join('%5i' % count for count in stats.histogram),
+                ))
+        return '\n'.join(lines)
@@ -10,6 +10,140 @@
 
 // ========================= Functions: Initialization ===========================
 
+/*! @brief Receiver datagram buffer size required by a service
+ *
+ *  @param config bus configuration
+ *  @param serviceIndex service
+ *  @return bytes required for `state.receiver.datagram[serviceIndex].buffer`
+ */
+size_t prlsc_rxDatagramBufferSize(prlsc_config_t *config, prlsc_serviceIndex_t serviceIndex) {
+    size_t l_size;
+    if (config->services[serviceIndex].stream == true) {
+        l_size = config->frameLengthMax; // 1 frame per datagram
+    } else {
+        l_size = (size_t)config->datagramLengthMax + sizeof(prlsc_checksum_t);
+    }
+    return l_size;
+}
+
+
+/*! @brief Transmitter ring-buffer size required by a service
+ *
+ *  Sized to hold `txDatagramDepth` maximum length datagrams (as frames), with
+ *  the byte that's always left free (see `prlsc_transmitDatagram`).
+ *
+ *  @param config bus configuration
+ *  @param serviceIndex service
+ *  @return bytes required for `state.transmitterBuffer[serviceIndex].buffer`, 0 if it can't be addressed by `bufferSize`
+ */
+uint16_t prlsc_txBufferSize(prlsc_config_t *config, prlsc_serviceIndex_t serviceIndex) {
+    prlsc_serviceConfig_t *l_serviceConfig = &(config->services[serviceIndex]);
+    uint32_t l_datagramBytes;
+    uint32_t l_depth = (l_serviceConfig->txDatagramDepth > 0u) ? l_serviceConfig->txDatagramDepth : 1u;
+    uint32_t l_size;
+
+    if (l_serviceConfig->stream == true) {
+        l_datagramBytes = PRLSC_FRAMEBUFFER_SIZE((uint32_t)config->frameLengthMax);
+    } else {
+        // same as prlsc_bufferBytesRequired for a datagram of datagramLengthMax bytes
+        uint32_t l_totalFrameBytes = (uint32_t)config->datagramLengthMax + sizeof(prlsc_checksum_t);
+        uint32_t l_requiredFrames = (l_totalFrameBytes + config->frameLengthMax) / config->frameLengthMax;
+        l_datagramBytes = l_totalFrameBytes + (l_requiredFrames * 4u);
+    }
+    l_size = (l_datagramBytes * l_depth) + 1u;
+
+    return (l_size <= 0xFFFFu) ? (uint16_t)l_size : 0u;
+}
+
+
+/*! @brief Size of the arena required by `prlsc_initState`
+ *
+ *  @param config bus configuration
+ *  @return number of bytes, 0 if the configuration is invalid
+ */
+size_t prlsc_stateSize(prlsc_config_t *config) {
+    size_t l_size = 0u;
+    prlsc_serviceIndex_t l_serviceIndex;
+
+    if ((config->serviceCount == 0u) || (config->serviceCount > PRLSC_SERVICE_COUNT_MAX) || (config->frameLengthMax == 0u)) {
+        return 0u;
+    }
+
+    // Per-service state
+    l_size += PRLSC_ARENA_ALIGN(config->serviceCount * sizeof(prlsc_rxDatagramState_t));
+    l_size += PRLSC_ARENA_ALIGN(config->serviceCount * sizeof(prlsc_transmitterBuffer_t));
+    l_size += PRLSC_ARENA_ALIGN(config->serviceCount * sizeof(prlsc_time_t));
+
+    // Frame buffers: receiver.frame.buffer, transmitter.frameBuffer & transmitter.transmitBuffer
+    l_size += 3u * PRLSC_ARENA_ALIGN(PRLSC_FRAMEBUFFER_SIZE((size_t)config->frameLengthMax));
+
+    // Per-service buffers
+    for (l_serviceIndex = 0u; l_serviceIndex < config->serviceCount; l_serviceIndex++) {
+        uint16_t l_txBufferSize = prlsc_txBufferSize(config, l_serviceIndex);
+        if (l_txBufferSize == 0u) {
+            return 0u;
+        }
+        l_size += PRLSC_ARENA_ALIGN(prlsc_rxDatagramBufferSize(config, l_serviceIndex));
+        l_size += PRLSC_ARENA_ALIGN((size_t)l_txBufferSize);
+    }
+
+    return l_size;
+}
+
+
+/*! @brief Initialise a bus' state, with all of its buffers carved from a single arena
+ *
+ *  Every buffer referenced by `state` is sized from `config` and allocated from `arena`,
+ *  in the order they're laid out by `prlsc_stateSize`. All state is reset (arena is zeroed).
+ *
+ *  @param config bus configuration
+ *  @param state state to initialise (completely overwritten)
+ *  @param arena memory block of at least `prlsc_stateSize(config)` bytes, aligned to `PRLSC_ARENA_ALIGNMENT`
+ *  @param arenaSize number of bytes in `arena`
+ *  @return `true` if initialised, `false` if the config is invalid, or arena is too small or misaligned
+ */
+bool prlsc_initState(prlsc_config_t *config, prlsc_state_t *state, uint8_t *arena, size_t arenaSize) {
+    size_t l_requiredSize = prlsc_stateSize(config);
+    uint8_t *l_next = arena;
+    prlsc_serviceIndex_t l_serviceIndex;
+
+    if ((l_requiredSize == 0u) || (arenaSize < l_requiredSize) || (((size_t)arena % PRLSC_ARENA_ALIGNMENT) != 0u)) {
+        return false;
+    }
+
+    // Every initial state value is 0 (PRLSC_ERRORCODE_NONE, PRLSC_RXFRAMESTATE_WAIT_STARTBYTE, etc)
+    memset(state, 0, sizeof(prlsc_state_t));
+    memset(arena, 0, l_requiredSize);
+
+    // Per-service state
+    state->receiver.datagram = (prlsc_rxDatagramState_t *)l_next;
+    l_next += PRLSC_ARENA_ALIGN(config->serviceCount * sizeof(prlsc_rxDatagramState_t));
+    state->transmitterBuffer = (prlsc_transmitterBuffer_t *)l_next;
+    l_next += PRLSC_ARENA_ALIGN(config->serviceCount * sizeof(prlsc_transmitterBuffer_t));
+    state->lastTransmitted = (prlsc_time_t *)l_next;
+    l_next += PRLSC_ARENA_ALIGN(config->serviceCount * sizeof(prlsc_time_t));
+
+    // Frame buffers
+    state->receiver.frame.buffer = l_next;
+    l_next += PRLSC_ARENA_ALIGN(PRLSC_FRAMEBUFFER_SIZE((size_t)config->frameLengthMax));
+    state->transmitter.frameBuffer = l_next;
+    l_next += PRLSC_ARENA_ALIGN(PRLSC_FRAMEBUFFER_SIZE((size_t)config->frameLengthMax));
+    state->transmitter.transmitBuffer = l_next;
+    l_next += PRLSC_ARENA_ALIGN(PRLSC_FRAMEBUFFER_SIZE((size_t)config->frameLengthMax));
+
+    // Per-service buffers
+    for (l_serviceIndex = 0u; l_serviceIndex < config->serviceCount; l_serviceIndex++) {
+        state->receiver.datagram[l_serviceIndex].buffer = l_next;
+        l_next += PRLSC_ARENA_ALIGN(prlsc_rxDatagramBufferSize(config, l_serviceIndex));
+        state->transmitterBuffer[l_serviceIndex].bufferSize = prlsc_txBufferSize(config, l_serviceIndex);
+        state->transmitterBuffer[l_serviceIndex].buffer = l_next;
+        l_next += PRLSC_ARENA_ALIGN((size_t)state->transmitterBuffer[l_serviceIndex].bufferSize);
+    }
+
+    return true;
+}
+
+
 // ========================= Functions: Utilities ===========================
 
 /*! @brief Calculate frame checksum from buffer
@@ -135,6 +269,46 @@ prlsc_time_t prlsc_timeDiff(prlsc_time_t fromTime, prlsc_time_t toTime) {
 }
 
 
+// ========================= Functions: Dispatch ===========================
+
+/*! @brief Register a datagram handler for a service code
+ *
+ *  @param config bus configuration (with a `handlers` table)
+ *  @param serviceIndex service the handler will receive datagrams from
+ *  @param subServiceIndex sub-service the handler will receive datagrams from
+ *  @param handler function to call with received datagrams (NULL to unregister)
+ *  @return `true` if registered, `false` if there's no table, or indexes are out of bounds
+ */
+bool prlsc_registerHandler(prlsc_config_t *config, prlsc_serviceIndex_t serviceIndex, prlsc_subServiceIndex_t subServiceIndex, prlsc_datagramHandler_t handler) {
+    bool l_registered = false;
+    if ((config->handlers != NULL) && (serviceIndex < config->serviceCount) && (subServiceIndex < PRLSC_SUBSERVICE_COUNT)) {
+        config->handlers[(serviceIndex * PRLSC_SUBSERVICE_COUNT) + subServiceIndex] = handler;
+        l_registered = true;
+    }
+    return l_registered;
+}
+
+
+/*! @brief Find the handler for a service code
+ *
+ *  A single table lookup, falling back to `callbackReceivedDatagram`
+ *
+ *  @param config bus configuration
+ *  @param serviceCode service code of received frame/datagram
+ *  @return handler to call (NULL if there's nobody to receive it)
+ */
+prlsc_datagramHandler_t prlsc_datagramHandler(prlsc_config_t *config, uint8_t serviceCode) {
+    prlsc_datagramHandler_t l_handler = NULL;
+    if ((config->handlers != NULL) && (PRLSC_SERVICEINDEX(serviceCode) < config->serviceCount)) {
+        l_handler = config->handlers[serviceCode]; // service code == (serviceIndex * PRLSC_SUBSERVICE_COUNT) + subServiceIndex
+    }
+    if (l_handler == NULL) {
+        l_handler = config->callbackReceivedDatagram;
+    }
+    return l_handler;
+}
+
+
 // ========================= Functions: Receiving ===========================
 
 /*! @brief Push byte from serial bus into PRLSC interpreter
@@ -152,6 +326,9 @@ void prlsc_receiveByte(prlsc_config_t *config, prlsc_state_t *state, uint8_t byt
     // push
     bool l_push = false;
     uint8_t l_byte = byte;
+#ifdef PRLSC_PROFILE
+    prlsc_rxFrameStateMachineState_t l_fromState = frameState->state;
+#endif
 
     // State machine
     if (byte == config->frameByteStartFrame) {
@@ -229,6 +406,8 @@ void prlsc_receiveByte(prlsc_config_t *config, prlsc_state_t *state, uint8_t byt
         // Frame Completion
         if (frameState->curIdx >= frameState->byteCount) {
             // Last byte received
+            PRLSC_PROFILE_INCREMENT(state, callbackChecksumCalc);
+            PRLSC_PROFILE_ADD(state, checksumBytes, PRLSC_FRAMEBUFFER_LENGTH(frameState->buffer) + 2u);
             if (prlsc_frameChecksumValid(config, frameState->buffer)) {
                 prlsc_frame_t l_frame;
 
@@ -253,6 +432,7 @@ void prlsc_receiveByte(prlsc_config_t *config, prlsc_state_t *state, uint8_t byt
             frameState->state = PRLSC_RXFRAMESTATE_WAIT_STARTBYTE;
         }
     }
+    PRLSC_PROFILE_TRANSITION(state->profile.rxFrameTransitions, l_fromState, frameState->state, PRLSC_RXFRAMESTATE_COUNT);
 }
 
 
@@ -267,11 +447,17 @@ void prlsc_receiveByte(prlsc_config_t *config, prlsc_state_t *state, uint8_t byt
 void prlsc_receiveFrame(prlsc_config_t *config, prlsc_state_t *state, prlsc_frame_t frame) {
     prlsc_rxDatagramState_t *l_state = &(state->receiver.datagram[frame.serviceIndex]);
     prlsc_serviceConfig_t *serviceConfig = &(config->services[frame.serviceIndex]);
+    prlsc_datagramHandler_t l_handler = prlsc_datagramHandler(config, PRLSC_FRAME_SERVICECODE(frame));
 
     switch (l_state->state) {
         case PRLSC_RXDATAGRAMSTATE_POPULATING:
             {
-                if ((l_state->curIdx + frame.length - 1) > config->datagramLengthMax) {
+                if (l_handler == NULL) {
+                    // Nothing will receive this datagram; drop frame without buffering its data
+                    if ((frame.length < config->frameLengthMax) || (serviceConfig->stream == true)) {
+                        l_state->curIdx = 0;
+                    }
+                } else if ((l_state->curIdx + frame.length - 1) > config->datagramLengthMax) {
                     l_state->curIdx = 0;
                     if ((frame.length >= config->frameLengthMax) && (serviceConfig->stream != true)) {
                         l_state->state = PRLSC_RXDATAGRAMSTATE_ERROR;
@@ -282,6 +468,7 @@ void prlsc_receiveFrame(prlsc_config_t *config, prlsc_state_t *state, prlsc_fram
                     // Append frame's data to datagram's buffer
                     if (frame.length > 0) {
                         memcpy(&(l_state->buffer[l_state->curIdx]), frame.data, frame.length);
+                        PRLSC_PROFILE_MEMCPY(state, PRLSC_PROFILE_MEMCPY_RXDATAGRAM, frame.length);
                         l_state->curIdx += frame.length;
                     }
 
@@ -302,9 +489,14 @@ void prlsc_receiveFrame(prlsc_config_t *config, prlsc_state_t *state, prlsc_fram
                         }
 
                         // Checksum verification (if relevant)
+                        if (serviceConfig->stream != true) {
+                            PRLSC_PROFILE_INCREMENT(state, callbackChecksumCalc);
+                            PRLSC_PROFILE_ADD(state, checksumBytes, l_datagram.length);
+                        }
                         if ((serviceConfig->stream == true) || prlsc_datagramChecksumValid(config, l_datagram)) {
-                            // Call configured datagram receiver callback (application dependent)
-                            config->callbackReceivedDatagram(l_datagram);
+                            // Call registered datagram handler (application dependent)
+                            PRLSC_PROFILE_INCREMENT(state, callbackReceivedDatagram);
+                            l_handler(l_datagram);
                         } else {
                             state->errorCode = PRLSC_ERRORCODE_DATAGRAM_BAD_CHECKSUM;
                         }
@@ -453,6 +645,7 @@ uint16_t prlsc_transmitDatagram(prlsc_config_t *config, prlsc_state_t *state, pr
                 l_dataChunkSize = config->frameLengthMax;
             }
             memcpy(&(PRLSC_FRAMEBUFFER_DATA(l_frameBuffer)[0]), &(datagram.data[l_datagramDataIdx]), l_dataChunkSize);
+            PRLSC_PROFILE_MEMCPY(state, PRLSC_PROFILE_MEMCPY_TXFRAME, l_dataChunkSize);
             l_datagramDataIdx += l_dataChunkSize;
             l_frameDataIndex = l_dataChunkSize;
 
@@ -484,6 +677,8 @@ uint16_t prlsc_transmitDatagram(prlsc_config_t *config, prlsc_state_t *state, pr
             PRLSC_FRAMEBUFFER_LENGTH(l_frameBuffer) = l_frameDataIndex;
             // checksum must be done last, as it uses all other frame bytes (except the start byte)
             PRLSC_FRAMEBUFFER_CHECKSUM(l_frameBuffer) = prlsc_calcFrameBufferChecksum(config, l_frameBuffer);
+            PRLSC_PROFILE_INCREMENT(state, callbackChecksumCalc);
+            PRLSC_PROFILE_ADD(state, checksumBytes, l_frameDataIndex + 2u);
 
             l_thisFrameNetBytes = PRLSC_FRAMEBUFFER_LENGTH(l_frameBuffer) + 4;
 
@@ -495,6 +690,7 @@ uint16_t prlsc_transmitDatagram(prlsc_config_t *config, prlsc_state_t *state, pr
                 l_state->buffer, // destArr
                 l_state->bufferSize // destSize
             );
+            PRLSC_PROFILE_MEMCPY(state, PRLSC_PROFILE_MEMCPY_FLAT2CIRCULAR, l_thisFrameNetBytes);
             if (l_serviceConfig->stream == true && l_serviceConfig->onlyTxLatest == true) {
                 // effectively empty the buffer (so that the newly added frame is all that's there)
                 l_state->txIdx = l_state->bufferIdx;
@@ -543,6 +739,7 @@ bool prlsc_prepareServiceTransmission(prlsc_config_t *config, prlsc_state_t *sta
     prlsc_time_t l_timeSinceLastFrame;
     prlsc_time_t l_curServiceRateLimit;
 
+    PRLSC_PROFILE_INCREMENT(state, callbackGetTime);
     *timeToRateLimitLifted = 0u;
 
     // --- Loop through each service (from highest priority to lowest)
@@ -593,6 +790,7 @@ bool prlsc_prepareServiceTransmission(prlsc_config_t *config, prlsc_state_t *sta
             &(l_txState->transmitBuffer[0]), &(l_txBuffer->buffer[l_txBuffer->txIdx]),
             l_frameLength, l_txBuffer->buffer, l_txBuffer->bufferSize
         );
+        PRLSC_PROFILE_MEMCPY(state, PRLSC_PROFILE_MEMCPY_CIRCULAR2FLAT, l_frameLength);
 
         l_txState->transmitLength = l_frameLength;
         l_txState->transmitServiceIndex = *serviceIndex;
@@ -623,6 +821,9 @@ bool prlsc_txByte(prlsc_config_t *config, prlsc_state_t *state) {
     bool l_transmitByte = false;
     bool l_moreToSend = true;
     uint8_t l_byte;
+#ifdef PRLSC_PROFILE
+    prlsc_txByteState_t l_fromState = l_state->state;
+#endif
 
     // State machine
     // cases ordered from most common, to least (for efficiency of execution)
@@ -652,6 +853,7 @@ bool prlsc_txByte(prlsc_config_t *config, prlsc_state_t *state) {
                 l_state->bufferIndex++;
                 // start of frame, set the time
                 state->lastTransmitted[l_state->transmitServiceIndex] = config->callbackGetTime();
+                PRLSC_PROFILE_INCREMENT(state, callbackGetTime);
                 l_state->state = PRLSC_TXBYTESTATE_NORMAL_BYTE;
             } break;
         case PRLSC_TXBYTESTATE_ESCAPED_BYTE:
@@ -689,7 +891,60 @@ bool prlsc_txByte(prlsc_config_t *config, prlsc_state_t *state) {
 
     if (l_transmitByte) {
         // transmit byte
+        PRLSC_PROFILE_INCREMENT(state, callbackSendByte);
         config->callbackSendByte(l_byte);
     }
+    PRLSC_PROFILE_TRANSITION(state->profile.txByteTransitions, l_fromState, l_state->state, PRLSC_TXBYTESTATE_COUNT);
     return l_moreToSend;
 }
+
+
+// ========================= Functions: Profiling ===========================
+#ifdef PRLSC_PROFILE
+
+static const char *const g_prlscProfileMemcpyNames[PRLSC_PROFILE_MEMCPY_COUNT] = {
+    "rxDatagram", "txFrame", "flat2circular", "circular2flat",
+};
+static const char *const g_prlscRxFrameStateNames[PRLSC_RXFRAMESTATE_COUNT] = {
+    "WAIT_STARTBYTE", "COLLECTING", "ESC",
+};
+static const char *const g_prlscTxByteStateNames[PRLSC_TXBYTESTATE_COUNT] = {
+    "DO_NOTHING", "START", "NORMAL_BYTE", "ESCAPED_BYTE",
+};
+
+/*! @brief Pass each of a bus' operation counters to `callbackWrite`
+ *
+ *  Every counter is written (including those that are 0), always in the same order, so
+ *  dumps of different versions (or workloads) can be compared line by line.
+ *  Counters are named as their `prlsc_profile_t` field; table counters are keyed by their
+ *  index's name (`memcpyBytes` by copy, eg: "txFrame"; transitions by from & to state).
+ *
+ *  @param state bus state (counting since `prlsc_initState`)
+ *  @param callbackWrite called per counter
+ */
+void prlsc_profileDump(prlsc_state_t *state, prlsc_profileWriter_t callbackWrite) {
+    prlsc_profile_t *l_profile = &(state->profile);
+    uint8_t l_idx, l_to;
+
+    callbackWrite("callbackGetTime", NULL, NULL, l_profile->callbackGetTime);
+    callbackWrite("callbackChecksumCalc", NULL, NULL, l_profile->callbackChecksumCalc);
+    callbackWrite("checksumBytes", NULL, NULL, l_profile->checksumBytes);
+    callbackWrite("callbackSendByte", NULL, NULL, l_profile->callbackSendByte);
+    callbackWrite("callbackReceivedDatagram", NULL, NULL, l_profile->callbackReceivedDatagram);
+    for (l_idx = 0u; l_idx < PRLSC_PROFILE_MEMCPY_COUNT; l_idx++) {
+        callbackWrite("memcpyCalls", g_prlscProfileMemcpyNames[l_idx], NULL, l_profile->memcpyCalls[l_idx]);
+        callbackWrite("memcpyBytes", g_prlscProfileMemcpyNames[l_idx], NULL, l_profile->memcpyBytes[l_idx]);
+    }
+    for (l_idx = 0u; l_idx < PRLSC_RXFRAMESTATE_COUNT; l_idx++) {
+        for (l_to = 0u; l_to < PRLSC_RXFRAMESTATE_COUNT; l_to++) {
+            callbackWrite("rxFrameTransitions", g_prlscRxFrameStateNames[l_idx], g_prlscRxFrameStateNames[l_to], l_profile->rxFrameTransitions[l_idx][l_to]);
+        }
+    }
+    for (l_idx = 0u; l_idx < PRLSC_TXBYTESTATE_COUNT; l_idx++) {
+        for (l_to = 0u; l_to < PRLSC_TXBYTESTATE_COUNT; l_to++) {
+            callbackWrite("txByteTransitions", g_prlscTxByteStateNames[l_idx], g_prlscTxByteStateNames[l_to], l_profile->txByteTransitions[l_idx][l_to]);
+        }
+    }
+}
+
+#endif
@@ -3,6 +3,7 @@
 
 #include <inttypes.h>
 #include <stdbool.h>
+#include <stddef.h>
 
 
 // ==================== Constants ====================
@@ -41,6 +42,21 @@
 #define PRLSC_TXBYTESTATE_NORMAL_BYTE       (2u)
 #define PRLSC_TXBYTESTATE_ESCAPED_BYTE      (3u)
 
+// State counts (for tables indexed by state)
+#define PRLSC_RXFRAMESTATE_COUNT    (3u)
+#define PRLSC_TXBYTESTATE_COUNT     (4u)
+
+// prlsc_profile_t.memcpyCalls & .memcpyBytes indices (see PRLSC_PROFILE)
+#define PRLSC_PROFILE_MEMCPY_RXDATAGRAM     (0u) //!< `prlsc_receiveFrame`: frame data appended to a datagram (memcpy)
+#define PRLSC_PROFILE_MEMCPY_TXFRAME        (1u) //!< `prlsc_transmitDatagram`: datagram data copied into a frame (memcpy)
+#define PRLSC_PROFILE_MEMCPY_FLAT2CIRCULAR  (2u) //!< `prlsc_transmitDatagram`: frame copied to a service's tx ring (`prlsc_memcpy_flat2circular`)
+#define PRLSC_PROFILE_MEMCPY_CIRCULAR2FLAT  (3u) //!< `prlsc_prepareServiceTransmission`: frame copied from a tx ring (`prlsc_memcpy_circular2flat`)
+#define PRLSC_PROFILE_MEMCPY_COUNT          (4u)
+
+// Service code space
+#define PRLSC_SERVICE_COUNT_MAX     (8u)  //!< serviceIndex is 3 bits of the service code
+#define PRLSC_SUBSERVICE_COUNT      (32u) //!< subServiceIndex is 5 bits of the service code
+
 
 // ==================== Macros ====================
 #define PRLSC_FRAMEBUFFER_STARTBYTE(buffer)         ((buffer)[0])
@@ -57,6 +73,27 @@
 #define PRLSC_FRAME_SERVICECODE(frame)          ((((frame.serviceIndex & 0b00000111u) << 5) | (frame.subServiceIndex & 0b00011111u)) & 0xFFu)
 #define PRLSC_DATAGRAM_SERVICECODE(datagram)    ((((datagram.serviceIndex & 0b00000111u) << 5) | (datagram.subServiceIndex & 0b00011111u)) & 0xFFu)
 
+#define PRLSC_HANDLERS_SIZE(serviceCount)       ((serviceCount) * PRLSC_SUBSERVICE_COUNT) //!< number of elements required in `config.handlers`
+
+#define PRLSC_FRAMEBUFFER_SIZE(frameLengthMax)  ((frameLengthMax) + 4u) //!< bytes in a frame buffer: start byte, serviceCode, length, data, checksum
+
+// Operation counting (compiled out unless PRLSC_PROFILE is defined)
+#ifdef PRLSC_PROFILE
+#define PRLSC_PROFILE_INCREMENT(state, counter)         ((state)->profile.counter++)
+#define PRLSC_PROFILE_ADD(state, counter, n)            ((state)->profile.counter += (prlsc_profileCounter_t)(n))
+#define PRLSC_PROFILE_MEMCPY(state, idx, n)             ((state)->profile.memcpyCalls[idx]++, (state)->profile.memcpyBytes[idx] += (prlsc_profileCounter_t)(n))
+#define PRLSC_PROFILE_TRANSITION(table, from, to, count) \
+    do { if (((from) < (count)) && ((to) < (count))) { (table)[from][to]++; } } while (0)
+#else
+#define PRLSC_PROFILE_INCREMENT(state, counter)         ((void)0)
+#define PRLSC_PROFILE_ADD(state, counter, n)            ((void)0)
+#define PRLSC_PROFILE_MEMCPY(state, idx, n)             ((void)0)
+#define PRLSC_PROFILE_TRANSITION(table, from, to, count) ((void)0)
+#endif
+
+#define PRLSC_ARENA_ALIGNMENT                   (sizeof(void *)) //!< alignment of the arena given to `prlsc_initState`, and of each buffer carved from it
+#define PRLSC_ARENA_ALIGN(size)                 ((((size) + PRLSC_ARENA_ALIGNMENT) - 1u) & ~(PRLSC_ARENA_ALIGNMENT - 1u))
+
 
 // ==================== Type Definitions ====================
 typedef uint8_t prlsc_serviceIndex_t;
@@ -91,6 +128,8 @@ typedef struct {
     prlsc_checksum_t checksum;
 } prlsc_datagram_t;
 
+typedef void (*prlsc_datagramHandler_t)(prlsc_datagram_t); //!< application's datagram receiver
+
 
 // --- State (volatile, initialised to the same initial state each time)
 typedef struct {
@@ -103,7 +142,7 @@ typedef struct {
 
 typedef struct {
     prlsc_rxDatagramStateMachineState_t state;
-    uint8_t *buffer; //!< buffer for datagram, must have a length of `datagramLengthMax` + 1 for diagnostic service, or `frameLengthMax` for streaming service
+    uint8_t *buffer; //!< buffer for datagram, must have `prlsc_rxDatagramBufferSize(config, serviceIndex)` bytes (`datagramLengthMax` + 1 for diagnostic service, or `frameLengthMax` for streaming service)
     uint8_t curIdx; //!< current index in buffer, should initially be 0u
 } prlsc_rxDatagramState_t;
 
@@ -113,9 +152,9 @@ typedef struct {
 } prlsc_receiverState_t;
 
 typedef struct {
-    //! bufferSize: number of bytes in buffer, must be >=
+    //! bufferSize: number of bytes in buffer, must be >= `prlsc_txBufferSize(config, serviceIndex)` for 1 datagram
     //!     streaming service: frameLengthMax + 4 + 1
-    //!     diagnostics service: datagramLengthMax + ((datagramLengthMax / frameLengthMax) * 4) + 1
+    //!     diagnostics service: datagramLengthMax + 1 + (((datagramLengthMax + 1 + frameLengthMax) / frameLengthMax) * 4) + 1
     uint16_t bufferSize;
     uint8_t *buffer; //!< ring-buffer of bytes to be transmitted (unencoded), must have bufferSize bytes available.
     uint16_t bufferIdx; //!< index of next byte to buffer (incremented when buffering)
@@ -134,6 +173,29 @@ typedef struct {
     uint16_t bufferIndex; //!< current transmitting index (init to 0u)
 } prlsc_transmitterState_t;
 
+#ifdef PRLSC_PROFILE
+typedef uint32_t prlsc_profileCounter_t;
+
+//! Operation counts of a bus (since `prlsc_initState`); a measure of the engine's cost that's independent of the CPU
+typedef struct {
+    // Callbacks
+    prlsc_profileCounter_t callbackGetTime;
+    prlsc_profileCounter_t callbackChecksumCalc;
+    prlsc_profileCounter_t checksumBytes; //!< bytes passed to `callbackChecksumCalc`
+    prlsc_profileCounter_t callbackSendByte;
+    prlsc_profileCounter_t callbackReceivedDatagram; //!< datagrams passed to the application (`callbackReceivedDatagram`, or a registered handler)
+    // Copies (indexed by PRLSC_PROFILE_MEMCPY_*)
+    prlsc_profileCounter_t memcpyCalls[PRLSC_PROFILE_MEMCPY_COUNT];
+    prlsc_profileCounter_t memcpyBytes[PRLSC_PROFILE_MEMCPY_COUNT];
+    // State-machines: [from][to] state, counted per call (so a state remaining the same is counted)
+    prlsc_profileCounter_t rxFrameTransitions[PRLSC_RXFRAMESTATE_COUNT][PRLSC_RXFRAMESTATE_COUNT]; //!< `prlsc_receiveByte`
+    prlsc_profileCounter_t txByteTransitions[PRLSC_TXBYTESTATE_COUNT][PRLSC_TXBYTESTATE_COUNT]; //!< `prlsc_txByte`
+} prlsc_profile_t;
+
+//! receives each counter from `prlsc_profileDump`; `key` & `subKey` index counter tables (else they're NULL)
+typedef void (*prlsc_profileWriter_t)(const char *counter, const char *key, const char *subKey, prlsc_profileCounter_t value);
+#endif
+
 typedef struct {
     prlsc_errorCode_t errorCode; //!< contains the latest error encountered
     // Receiver State
@@ -145,6 +207,9 @@ typedef struct {
     prlsc_time_t *lastTransmitted; //!< time each service was last transmitted
     // TODO: clock overflow could incorrectly trigger rate-limiting, is this risk worth mitigating?
     bool newTxDataFlag; //!< flag is set to true when a new frame is added to the tx buffer of any service (may be consumed by application)
+#ifdef PRLSC_PROFILE
+    prlsc_profile_t profile; //!< operation counters (zeroed by `prlsc_initState`)
+#endif
 } prlsc_state_t;
 
 
@@ -154,6 +219,7 @@ typedef struct {
     bool            stream;
     prlsc_time_t    rateLimit; //!< uses main config's `timerPtr`
     bool            onlyTxLatest; //!< if set, only the last buffered frame will be transmitted, (only applicable for a stream)
+    uint8_t         txDatagramDepth; //!< number of maximum length datagrams `prlsc_initState` sizes the transmit buffer for (0 is treated as 1)
 } prlsc_serviceConfig_t;
 
 //! PRLSC Configuration
@@ -168,7 +234,13 @@ typedef struct {
     prlsc_time_t (*callbackGetTime)(void); //!< returns current time
     prlsc_checksum_t (*callbackChecksumCalc)(uint8_t *arr, uint16_t length); //!< called to calculate frame & datagram checksums
     void (*callbackSendByte)(uint8_t byte); //!< called to physically transmit `byte` over the serial bus
-    void (*callbackReceivedDatagram)(prlsc_datagram_t); //!< called when a datagram is received (from any service)
+    void (*callbackReceivedDatagram)(prlsc_datagram_t); //!< called when a datagram is received (from any service without a handler), may be NULL
+
+    // Dispatch
+    //! optional table of handlers indexed by service code (must have `PRLSC_HANDLERS_SIZE(serviceCount)` elements).
+    //! A NULL element defers to `callbackReceivedDatagram`; if both are NULL, frames are dropped before being buffered.
+    //! If `handlers` is NULL, all datagrams are passed to `callbackReceivedDatagram`
+    prlsc_datagramHandler_t *handlers;
 
     // Size limits
     uint8_t         frameLengthMax; //!< maximum number of data bytes in a frame {0 < `frameLengthMax` <= 0xFF}
@@ -184,6 +256,12 @@ typedef struct {
 
 
 // ==================== Function Prototypes ====================
+// Initialization
+extern size_t prlsc_rxDatagramBufferSize(prlsc_config_t *config, prlsc_serviceIndex_t serviceIndex);
+extern uint16_t prlsc_txBufferSize(prlsc_config_t *config, prlsc_serviceIndex_t serviceIndex);
+extern size_t prlsc_stateSize(prlsc_config_t *config);
+extern bool prlsc_initState(prlsc_config_t *config, prlsc_state_t *state, uint8_t *arena, size_t arenaSize);
+
 // Utilities
 extern prlsc_checksum_t prlsc_calcFrameBufferChecksum(prlsc_config_t *config, uint8_t *buffer);
 extern bool prlsc_frameChecksumValid(prlsc_config_t *config, uint8_t *buffer);
@@ -193,6 +271,10 @@ extern void prlsc_memcpy_flat2circular(uint8_t *dest, uint8_t *source, uint16_t
 extern void prlsc_memcpy_circular2flat(uint8_t *dest, uint8_t *source, uint16_t length, uint8_t *sourceArr, uint16_t sourceSize);
 extern prlsc_time_t prlsc_timeDiff(prlsc_time_t fromTime, prlsc_time_t toTime);
 
+// Dispatch
+extern bool prlsc_registerHandler(prlsc_config_t *config, prlsc_serviceIndex_t serviceIndex, prlsc_subServiceIndex_t subServiceIndex, prlsc_datagramHandler_t handler);
+extern prlsc_datagramHandler_t prlsc_datagramHandler(prlsc_config_t *config, uint8_t serviceCode);
+
 // Receivers
 extern void prlsc_receiveByte(prlsc_config_t *config, prlsc_state_t *state, uint8_t byte);
 extern void prlsc_receiveFrame(prlsc_config_t *config, prlsc_state_t *state, prlsc_frame_t frame);
@@ -203,4 +285,9 @@ extern uint16_t prlsc_transmitDatagram(prlsc_config_t *config, prlsc_state_t *st
 extern bool prlsc_prepareServiceTransmission(prlsc_config_t *config, prlsc_state_t *state, prlsc_serviceIndex_t *serviceIndex, prlsc_time_t *timeToRateLimitLifted);
 extern bool prlsc_txByte(prlsc_config_t *config, prlsc_state_t *state);
 
+#ifdef PRLSC_PROFILE
+// Profiling
+extern void prlsc_profileDump(prlsc_state_t *state, prlsc_profileWriter_t callbackWrite);
+#endif
+
 #endif // header protection: _PRLSC_H
@@ -0,0 +1,276 @@
+#include "prlsc_loopback.h"
+
+#include <string.h>
+
+// ========================== Global Variables ============================
+// prlsc's callbacks carry no context, so they're routed to the link most recently
+// initialised, or pumped (only 1 link can be used at a time).
+prlsc_loopback_t *g_prlscLoopback = NULL;
+
+
+// ========================= Functions: Setup ===========================
+
+/*! @brief Connect 2 endpoints, each transmitting to the other
+ *
+ *  Both configurations' `callbackSendByte` & `callbackGetTime` are set to the link's;
+ *  all other callbacks are left as they are (`prlsc_loopback_receivedDatagram` may be set as
+ *  `callbackReceivedDatagram` to count received datagrams).
+ *  Both states are expected to be initialised (see `prlsc_initState`).
+ *
+ *  @param link link to initialise (completely overwritten)
+ *  @param configA endpoint A's configuration
+ *  @param stateA endpoint A's state
+ *  @param configB endpoint B's configuration
+ *  @param stateB endpoint B's state
+ *  @param fifoBuffer memory for the bytes in flight, must have `2 * fifoSize` bytes available
+ *  @param fifoSize bytes that can be in flight in each direction (1 byte is sent per step, so 1 is enough)
+ *  @param impairments line impairments (applied in both directions), NULL for a perfect line
+ */
+void prlsc_loopback_init(prlsc_loopback_t *link, prlsc_config_t *configA, prlsc_state_t *stateA, prlsc_config_t *configB, prlsc_state_t *stateB, uint8_t *fifoBuffer, uint16_t fifoSize, prlsc_loopbackImpairments_t *impairments) {
+    memset(link, 0, sizeof(prlsc_loopback_t));
+    link->endpointA.config = configA;
+    link->endpointA.state = stateA;
+    link->endpointA.fifo.buffer = &(fifoBuffer[0]);
+    link->endpointA.fifo.size = fifoSize;
+    link->endpointB.config = configB;
+    link->endpointB.state = stateB;
+    link->endpointB.fifo.buffer = &(fifoBuffer[fifoSize]);
+    link->endpointB.fifo.size = fifoSize;
+
+    configA->callbackSendByte = &prlsc_loopback_sendByte;
+    configA->callbackGetTime = &prlsc_loopback_getTime;
+    configB->callbackSendByte = &prlsc_loopback_sendByte;
+    configB->callbackGetTime = &prlsc_loopback_getTime;
+
+    prlsc_loopback_setImpairments(link, impairments);
+    g_prlscLoopback = link;
+}
+
+
+/*! @brief Change a link's impairments (PRNG is re-seeded)
+ *
+ *  @param link link to change
+ *  @param impairments line impairments, NULL for a perfect line
+ */
+void prlsc_loopback_setImpairments(prlsc_loopback_t *link, prlsc_loopbackImpairments_t *impairments) {
+    if (impairments != NULL) {
+        link->impairments = *impairments;
+    } else {
+        memset(&(link->impairments), 0, sizeof(prlsc_loopbackImpairments_t));
+    }
+    link->prngState = (link->impairments.seed != 0u) ? link->impairments.seed : PRLSC_LOOPBACK_DEFAULT_SEED;
+}
+
+
+/*! @brief Set a link's virtual timing (eg: to model a UART's baud rate)
+ *
+ *  Each pump step advances virtual time by `stepNanoseconds` (the time taken to send 1 byte),
+ *  and `callbackGetTime` returns virtual time in ticks of `tickNanoseconds`.
+ *  eg: 115200 baud, 8N1 (10 bits per byte), with a 1ms clock: `prlsc_loopback_setTiming(link, 86806u, 1000000u)`
+ *
+ *  @param link link to change
+ *  @param stepNanoseconds virtual time per pump step
+ *  @param tickNanoseconds virtual time per `prlsc_time_t` tick, 0 to revert to 1 tick per step
+ */
+void prlsc_loopback_setTiming(prlsc_loopback_t *link, uint32_t stepNanoseconds, uint32_t tickNanoseconds) {
+    link->stepNanoseconds = stepNanoseconds;
+    link->tickNanoseconds = tickNanoseconds;
+}
+
+
+// ========================= Functions: Running ===========================
+
+/*! @brief Impair (or not) a byte, and pass it to an endpoint's receiver
+ *
+ *  @param link link
+ *  @param endpointIndex receiving endpoint
+ *  @param byte byte as it was sent
+ */
+void prlsc_loopback_deliverByte(prlsc_loopback_t *link, uint8_t endpointIndex, uint8_t byte) {
+    prlsc_loopbackEndpoint_t *l_endpoint = prlsc_loopback_endpoint(link, endpointIndex);
+    prlsc_loopbackImpairments_t *l_impairments = &(link->impairments);
+
+    if ((l_impairments->dropPeriod > 0u) && ((prlsc_loopback_random(link) % l_impairments->dropPeriod) == 0u)) {
+        link->stats.bytesDropped++;
+        return;
+    }
+    if ((l_impairments->bitFlipPeriod > 0u) && ((prlsc_loopback_random(link) % l_impairments->bitFlipPeriod) == 0u)) {
+        byte ^= (uint8_t)(1u << (prlsc_loopback_random(link) & 0x07u));
+        link->stats.bitFlips++;
+    }
+    if ((l_impairments->insertStartPeriod > 0u) && ((prlsc_loopback_random(link) % l_impairments->insertStartPeriod) == 0u)) {
+        prlsc_receiveByte(l_endpoint->config, l_endpoint->state, l_endpoint->config->frameByteStartFrame);
+        l_endpoint->bytesDelivered++;
+        link->stats.startBytesInserted++;
+    }
+    prlsc_receiveByte(l_endpoint->config, l_endpoint->state, byte);
+    l_endpoint->bytesDelivered++;
+}
+
+
+/*! @brief Run the link for a number of steps
+ *
+ *  Each step is 1 tick of link time (or `stepNanoseconds`, see `prlsc_loopback_setTiming`), in which each endpoint transmits up to 1 byte
+ *  (preparing its next frame if it's idle), then every byte in flight is delivered to the
+ *  other endpoint (impaired, if configured). Datagrams are received (and handlers called)
+ *  from within this function.
+ *
+ *  @param link link to run
+ *  @param steps number of steps (ticks)
+ *  @return number of bytes sent (by both endpoints); 0 if neither had anything to send
+ */
+uint32_t prlsc_loopback_pump(prlsc_loopback_t *link, uint32_t steps) {
+    uint32_t l_step;
+    uint32_t l_bytesSent = link->endpointA.bytesSent + link->endpointB.bytesSent;
+    uint8_t l_endpointIndex;
+    prlsc_loopbackEndpoint_t *l_endpoint;
+    prlsc_serviceIndex_t l_serviceIndex;
+    prlsc_time_t l_timeToRateLimitLifted;
+
+    g_prlscLoopback = link;
+
+    for (l_step = 0u; l_step < steps; l_step++) {
+        link->nanoseconds += link->stepNanoseconds;
+        if (link->tickNanoseconds > 0u) {
+            link->time = (prlsc_time_t)(link->nanoseconds / link->tickNanoseconds);
+        } else {
+            link->time++;
+        }
+
+        // --- Transmit (up to 1 byte per endpoint)
+        for (l_endpointIndex = PRLSC_LOOPBACK_ENDPOINT_A; l_endpointIndex <= PRLSC_LOOPBACK_ENDPOINT_B; l_endpointIndex++) {
+            l_endpoint = prlsc_loopback_endpoint(link, l_endpointIndex);
+            link->activeEndpoint = l_endpointIndex;
+            if (l_endpoint->state->transmitter.state == PRLSC_TXBYTESTATE_DO_NOTHING) {
+                prlsc_prepareServiceTransmission(l_endpoint->config, l_endpoint->state, &l_serviceIndex, &l_timeToRateLimitLifted);
+            }
+            if (l_endpoint->state->transmitter.state != PRLSC_TXBYTESTATE_DO_NOTHING) {
+                prlsc_txByte(l_endpoint->config, l_endpoint->state);
+            }
+        }
+
+        // --- Deliver bytes in flight to the other endpoint
+        for (l_endpointIndex = PRLSC_LOOPBACK_ENDPOINT_A; l_endpointIndex <= PRLSC_LOOPBACK_ENDPOINT_B; l_endpointIndex++) {
+            prlsc_loopbackFifo_t *l_fifo = &(prlsc_loopback_endpoint(link, l_endpointIndex)->fifo);
+            uint8_t l_receiverIndex = (l_endpointIndex == PRLSC_LOOPBACK_ENDPOINT_A) ? PRLSC_LOOPBACK_ENDPOINT_B : PRLSC_LOOPBACK_ENDPOINT_A;
+            link->activeEndpoint = l_receiverIndex;
+            while (l_fifo->count > 0u) {
+                uint8_t l_byte = l_fifo->buffer[l_fifo->head];
+                l_fifo->head = (l_fifo->head + 1u) % l_fifo->size;
+                l_fifo->count--;
+                prlsc_loopback_deliverByte(link, l_receiverIndex, l_byte);
+            }
+        }
+    }
+
+    return (link->endpointA.bytesSent + link->endpointB.bytesSent) - l_bytesSent;
+}
+
+
+/*! @brief Determine if a link has nothing left to send
+ *
+ *  @param link link
+ *  @return `true` if no bytes are in flight, and neither endpoint is transmitting, or has frames buffered
+ */
+bool prlsc_loopback_idle(prlsc_loopback_t *link) {
+    uint8_t l_endpointIndex;
+    prlsc_serviceIndex_t l_serviceIndex;
+
+    for (l_endpointIndex = PRLSC_LOOPBACK_ENDPOINT_A; l_endpointIndex <= PRLSC_LOOPBACK_ENDPOINT_B; l_endpointIndex++) {
+        prlsc_loopbackEndpoint_t *l_endpoint = prlsc_loopback_endpoint(link, l_endpointIndex);
+        if ((l_endpoint->fifo.count > 0u) || (l_endpoint->state->transmitter.state != PRLSC_TXBYTESTATE_DO_NOTHING)) {
+            return false;
+        }
+        for (l_serviceIndex = 0u; l_serviceIndex < l_endpoint->config->serviceCount; l_serviceIndex++) {
+            if (l_endpoint->state->transmitterBuffer[l_serviceIndex].txIdx != l_endpoint->state->transmitterBuffer[l_serviceIndex].bufferIdx) {
+                return false;
+            }
+        }
+    }
+    return true;
+}
+
+
+// ========================= Functions: Callbacks ===========================
+
+/*! @brief `callbackSendByte`: queue a byte from the sending endpoint to the other
+ *
+ *  @param byte byte to send
+ */
+void prlsc_loopback_sendByte(uint8_t byte) {
+    prlsc_loopbackEndpoint_t *l_endpoint = prlsc_loopback_endpoint(g_prlscLoopback, g_prlscLoopback->activeEndpoint);
+    prlsc_loopbackFifo_t *l_fifo = &(l_endpoint->fifo);
+
+    l_endpoint->bytesSent++;
+    if (l_fifo->count >= l_fifo->size) {
+        g_prlscLoopback->stats.fifoOverflows++;
+    } else {
+        l_fifo->buffer[(l_fifo->head + l_fifo->count) % l_fifo->size] = byte;
+        l_fifo->count++;
+    }
+}
+
+
+/*! @brief `callbackGetTime`: link time
+ *
+ *  @return time of the link (0 if none has been initialised)
+ */
+prlsc_time_t prlsc_loopback_getTime(void) {
+    return (g_prlscLoopback != NULL) ? g_prlscLoopback->time : 0u;
+}
+
+
+/*! @brief `callbackReceivedDatagram` (optional): count datagrams received by the receiving endpoint
+ *
+ *  @param datagram received datagram
+ */
+void prlsc_loopback_receivedDatagram(prlsc_datagram_t datagram) {
+    prlsc_loopbackEndpoint_t *l_endpoint = prlsc_loopback_endpoint(g_prlscLoopback, g_prlscLoopback->activeEndpoint);
+    l_endpoint->datagramsReceived++;
+    l_endpoint->datagramBytesReceived += datagram.length;
+}
+
+
+/*! @brief `callbackChecksumCalc` (optional): two's complement of the sum of bytes
+ *
+ *  For runs without any callbacks outside of C.
+ *
+ *  @param arr bytes
+ *  @param length number of bytes
+ *  @return checksum
+ */
+prlsc_checksum_t prlsc_loopback_checksumCalc(uint8_t *arr, uint16_t length) {
+    uint8_t l_sum = 0u;
+    uint16_t l_idx;
+    for (l_idx = 0u; l_idx < length; l_idx++) {
+        l_sum += arr[l_idx];
+    }
+    return (prlsc_checksum_t)(~l_sum + 1u);
+}
+
+
+// ========================= Functions: Utilities ===========================
+
+/*! @brief An endpoint of a link
+ *
+ *  @param link link
+ *  @param endpointIndex `PRLSC_LOOPBACK_ENDPOINT_A` or `PRLSC_LOOPBACK_ENDPOINT_B`
+ *  @return endpoint
+ */
+prlsc_loopbackEndpoint_t *prlsc_loopback_endpoint(prlsc_loopback_t *link, uint8_t endpointIndex) {
+    return (endpointIndex == PRLSC_LOOPBACK_ENDPOINT_A) ? &(link->endpointA) : &(link->endpointB);
+}
+
+/*! @brief Next number from a link's PRNG (xorshift32)
+ *
+ *  @param link link
+ *  @return pseudo-random number
+ */
+uint32_t prlsc_loopback_random(prlsc_loopback_t *link) {
+    uint32_t l_value = link->prngState;
+    l_value ^= l_value << 13;
+    l_value ^= l_value >> 17;
+    l_value ^= l_value << 5;
+    link->prngState = l_value;
+    return l_value;
+}
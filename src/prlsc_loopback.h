@@ -0,0 +1,83 @@
+#ifndef _PRLSC_LOOPBACK_H
+#define _PRLSC_LOOPBACK_H
+
+#include "prlsc.h"
+
+// ==================== Constants ====================
+#define PRLSC_LOOPBACK_DEFAULT_SEED     (0x2545F491u) //!< used when `impairments.seed` is 0 (xorshift's state can't be 0)
+
+// endpoint indexes (see `prlsc_loopback_endpoint`)
+#define PRLSC_LOOPBACK_ENDPOINT_A       (0u)
+#define PRLSC_LOOPBACK_ENDPOINT_B       (1u)
+
+
+// ==================== Type Definitions ====================
+//! Deterministic line impairments, each applied to a byte with a probability of 1 in `period` (0 disables)
+typedef struct {
+    uint32_t seed; //!< PRNG seed; the same seed (and traffic) gives the same impairments
+    uint32_t bitFlipPeriod; //!< a random bit of the byte is inverted
+    uint32_t dropPeriod; //!< the byte is lost
+    uint32_t insertStartPeriod; //!< a (spurious) start byte is delivered before the byte
+} prlsc_loopbackImpairments_t;
+
+typedef struct {
+    uint8_t *buffer; //!< ring-buffer of bytes in flight, must have `size` bytes available
+    uint16_t size;
+    uint16_t head; //!< index of next byte to pop
+    uint16_t count; //!< number of bytes in flight
+} prlsc_loopbackFifo_t;
+
+typedef struct {
+    prlsc_config_t *config;
+    prlsc_state_t *state;
+    prlsc_loopbackFifo_t fifo; //!< bytes sent by this endpoint, on their way to the other
+    uint32_t bytesSent;
+    uint32_t bytesDelivered; //!< bytes passed to this endpoint's `prlsc_receiveByte`
+    uint32_t datagramsReceived; //!< counted by `prlsc_loopback_receivedDatagram` (if used)
+    uint32_t datagramBytesReceived; //!< data bytes of the datagrams counted (goodput)
+} prlsc_loopbackEndpoint_t;
+
+typedef struct {
+    uint32_t bitFlips;
+    uint32_t bytesDropped;
+    uint32_t startBytesInserted;
+    uint32_t fifoOverflows; //!< bytes lost because a fifo was full
+} prlsc_loopbackStats_t;
+
+//! Two (config, state) endpoints, each transmitting to the other
+typedef struct {
+    prlsc_loopbackEndpoint_t endpointA;
+    prlsc_loopbackEndpoint_t endpointB;
+    prlsc_loopbackImpairments_t impairments;
+    prlsc_loopbackStats_t stats;
+    uint32_t prngState;
+    prlsc_time_t time; //!< link time (see `prlsc_loopback_getTime`), 1 tick per pump step (unless timing is set)
+    uint64_t nanoseconds; //!< virtual time elapsed (if timing is set, see `prlsc_loopback_setTiming`)
+    uint32_t stepNanoseconds; //!< virtual time per pump step (ie: per byte on the line)
+    uint32_t tickNanoseconds; //!< virtual time per `prlsc_time_t` tick, 0: 1 tick per step
+    uint8_t activeEndpoint; //!< endpoint currently sending (or receiving), used to route callbacks
+} prlsc_loopback_t;
+
+
+// ==================== Function Prototypes ====================
+// Setup
+extern void prlsc_loopback_init(prlsc_loopback_t *link, prlsc_config_t *configA, prlsc_state_t *stateA, prlsc_config_t *configB, prlsc_state_t *stateB, uint8_t *fifoBuffer, uint16_t fifoSize, prlsc_loopbackImpairments_t *impairments);
+extern void prlsc_loopback_setImpairments(prlsc_loopback_t *link, prlsc_loopbackImpairments_t *impairments);
+extern void prlsc_loopback_setTiming(prlsc_loopback_t *link, uint32_t stepNanoseconds, uint32_t tickNanoseconds);
+
+// Running
+extern uint32_t prlsc_loopback_pump(prlsc_loopback_t *link, uint32_t steps);
+extern void prlsc_loopback_deliverByte(prlsc_loopback_t *link, uint8_t endpointIndex, uint8_t byte);
+extern bool prlsc_loopback_idle(prlsc_loopback_t *link);
+
+// Callbacks (routed to the link being pumped)
+extern void prlsc_loopback_sendByte(uint8_t byte);
+extern prlsc_time_t prlsc_loopback_getTime(void);
+extern void prlsc_loopback_receivedDatagram(prlsc_datagram_t datagram);
+extern prlsc_checksum_t prlsc_loopback_checksumCalc(uint8_t *arr, uint16_t length);
+
+// Utilities
+extern prlsc_loopbackEndpoint_t *prlsc_loopback_endpoint(prlsc_loopback_t *link, uint8_t endpointIndex);
+extern uint32_t prlsc_loopback_random(prlsc_loopback_t *link);
+
+#endif // header protection: _PRLSC_LOOPBACK_H
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Benchmark: analysing a directory of captures; 1 process vs a pool (python -m prlsc analyze)
+
+Captures are periodic stream & diagnostic frames in both directions, written with
+CaptureWriter (to a temporary directory).
+
+Usage (from ./test, after `make preproc build`):
+    python benchmarks/bench_analyze.py [--files N] [--megabytes N] [--jobs N]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../tests'))
+from utilities import *  # data_types & prlsc
+
+from prlsc import CaptureWriter, analyze_paths
+from prlsc.capture import RX, TX
+from bench_decoder import build_config, encode_frame
+
+
+def write_capture(path, config, size, rand):
+    now = [0]
+    with CaptureWriter(path, config, index=False, clock=lambda: now[0]) as writer:
+        written = 0
+        while written < size:
+            now[0] += rand.randint(500000, 1500000)  # ~1ms
+            if rand.random() < 0.8:
+                data = bytes(encode_frame(0x01, [rand.randint(0, 0xFF) for i in range(16)]))
+            else:
+                data = [rand.randint(0, 0xFF) for i in range(rand.randint(0, 0x3E))]
+                data = bytes(encode_frame(0x21, data + [(-sum(data)) & 0xFF]))
+            writer.record(rand.choice([RX, TX]), data)
+            written += len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="batch capture analysis benchmark")
+    parser.add_argument('--files', type=int, default=16, help="captures")
+    parser.add_argument('--megabytes', type=int, default=4, help="size of each capture")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="processes of the pool")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        config = build_config()
+        rand = random.Random(0)
+        for i in range(args.files):
+            write_capture(os.path.join(directory, '%03i.cap' % i), config, args.megabytes << 20, rand)
+        total = args.files * args.megabytes
+
+        for processes in sorted(set([1, args.jobs])):
+            start = time.perf_counter()
+            report = analyze_paths([directory], processes=processes)
+            elapsed = time.perf_counter() - start
+            print("%2i process(es): %6.1f MB/s  (%i MB in %i files; %i rx + %i tx frames)" % (
+                processes, total / elapsed, total, report.files, report.link(RX).frames, report.link(TX).frames,
+            ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
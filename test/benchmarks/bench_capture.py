@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Benchmark: capture writer overhead, and reader random access
+
+    writer: bytes recorded per second, 1 byte per call (as from callbackSendByte), and
+            in 64 byte reads (as from a UART driver)
+    reader: time to fetch a datagram by number, and frames in a time range, from captures of
+            increasing size (should be ~constant; the capture isn't scanned)
+
+Usage (from ./test):
+    python benchmarks/bench_capture.py [--datagrams N]
+"""
+import os
+import sys
+import time
+import shutil
+import random
+import tempfile
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../lib/py'))
+
+from prlsc import CaptureWriter, CaptureReader
+
+FRAME = bytes([0xC0, 0x21, 0x08] + list(range(8)) + [(-(0x21 + 0x08 + sum(range(8)))) & 0xFF])
+SIZES = [1000, 10000, 100000]
+
+
+def checksum(data):
+    return (-sum(data)) & 0xFF
+
+
+def write_capture(path, datagrams, per_call):
+    """:return: seconds taken to record `datagrams` frames"""
+    clock = iter(range(0, 10**18, 10**5))  # 100us per call
+    data = FRAME * 8
+    start = time.perf_counter()
+    with CaptureWriter(path, checksum=checksum, clock=lambda: next(clock)) as writer:
+        if per_call == 1:
+            record = writer.tap(lambda byte: None)
+            for i in range(datagrams // 8):
+                for byte in data:
+                    record(byte)
+        else:
+            for i in range(datagrams // 8):
+                for j in range(0, len(data), per_call):
+                    writer.rx(data[j:j + per_call])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="capture benchmark")
+    parser.add_argument('--datagrams', type=int, default=20000, help="datagrams written per writer measurement")
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'bench.cap')
+        print("writer: %i frames of %i bytes" % (args.datagrams, len(FRAME)))
+        print("%-14s%14s" % ('bytes/call', 'MB/s'))
+        for per_call in (1, 64):
+            elapsed = write_capture(path, args.datagrams, per_call)
+            print("%-14i%14.2f" % (per_call, (args.datagrams * len(FRAME)) / (elapsed * 1e6)))
+
+        print("")
+        print("reader: random access (index + mmap)")
+        print("%-12s%14s%20s%20s" % ('datagrams', 'file bytes', 'datagram(n) us', 'frames(10ms) us'))
+        for size in SIZES:
+            write_capture(path, size, 64)
+            with CaptureReader(path) as reader:
+                numbers = [random.randrange(reader.datagram_count) for i in range(1000)]
+                start = time.perf_counter()
+                for n in numbers:
+                    reader.datagram(n)
+                per_datagram = (time.perf_counter() - start) / len(numbers)
+
+                last = reader.frame(reader.frame_count - 1).timestamp
+                times = [random.randrange(last) for i in range(1000)]
+                start = time.perf_counter()
+                for t in times:
+                    list(reader.frames(start=t, end=t + 10**7))
+                per_range = (time.perf_counter() - start) / len(times)
+            print("%-12i%14i%20.1f%20.1f" % (size, os.path.getsize(path), per_datagram * 1e6, per_range * 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
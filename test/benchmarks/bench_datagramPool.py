@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Benchmark: building datagrams for transmission
+
+Compares a freshly built prlsc_datagram_t per payload (as PrlscEngineTest.build_datagram
+does) against re-using datagrams from a prlsc.DatagramPool.
+
+Usage (from ./test, after `make preproc`):
+    python benchmarks/bench_datagramPool.py [--number N]
+"""
+import os
+import sys
+import timeit
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../tests'))
+from utilities import *  # data_types & prlsc
+
+from prlsc import DatagramPool
+
+LENGTHS = [1, 16, 64, 255]
+
+
+def build(payload):
+    return build_struct(
+        prlsc_datagram_t,
+        serviceIndex=0,
+        subServiceIndex=1,
+        length=len(payload),
+        data__exact=build_array(uint8_t, list(payload)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="datagram building benchmark")
+    parser.add_argument('--number', type=int, default=10000, help="calls per measurement")
+    args = parser.parse_args()
+
+    pool = DatagramPool(prlsc_datagram_t, 1, max(LENGTHS))
+
+    def pooled(payload):
+        pool.release(pool.acquire(0, 1, payload))
+
+    print("datagram build (microseconds per datagram)")
+    print("%-20s" % 'length' + ''.join("%10i" % length for length in LENGTHS))
+    payloads = [bytes(i & 0xFF for i in range(length)) for length in LENGTHS]
+    for (name, method) in [('build_struct', build), ('DatagramPool', pooled)]:
+        times = [
+            min(timeit.repeat(lambda: method(payload), number=args.number, repeat=3)) / args.number
+            for payload in payloads
+        ]
+        print("%-20s" % name + ''.join("%10.2f" % (t * 1e6) for t in times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Benchmark: datagram payload access from Python
+
+Compares the list comprehension previously used to read a datagram's payload
+(one ctypes index per byte) against prlsc.DatagramView.
+
+Usage (from ./test, after `make preproc`):
+    python benchmarks/bench_datagramView.py [--number N]
+"""
+import os
+import sys
+import timeit
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../tests'))
+from utilities import *  # data_types & prlsc
+
+from prlsc import DatagramView
+
+LENGTHS = [1, 16, 64, 255, 1024]
+
+METHODS = [
+    ('list comprehension', lambda d: [d.data[i] for i in range(d.length)]),
+    ('view', lambda d: DatagramView(d).data),
+    ('view -> list', lambda d: list(DatagramView(d).data)),
+    ('view.copy()', lambda d: DatagramView(d).copy()),
+    ('view.retain()', lambda d: DatagramView(d).retain()),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="datagram payload access benchmark")
+    parser.add_argument('--number', type=int, default=10000, help="calls per measurement")
+    args = parser.parse_args()
+
+    print("datagram payload access (microseconds per datagram)")
+    print("%-20s" % 'length' + ''.join("%10i" % length for length in LENGTHS))
+    datagrams = [
+        build_struct(
+            prlsc_datagram_t,
+            length=length,
+            data__exact=(uint8_t * length)(*[i & 0xFF for i in range(length)]),
+        )
+        for length in LENGTHS
+    ]
+    for (name, method) in METHODS:
+        times = [
+            min(timeit.repeat(lambda: method(datagram), number=args.number, repeat=3)) / args.number
+            for datagram in datagrams
+        ]
+        print("%-20s" % name + ''.join("%10.2f" % (t * 1e6) for t in times))
+
+
+if __name__ == '__main__':
+    main()
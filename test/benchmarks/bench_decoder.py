@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Benchmark: decoding a captured byte stream; ArrayDecoder vs prlsc_receiveByte (per byte, via ctypes)
+
+The stream is diagnostic datagrams of random lengths & data (so ~1% of bytes are escaped),
+with a bit flipped every ~10k bytes.
+
+Usage (from ./test, after `make preproc build`):
+    python benchmarks/bench_decoder.py [--megabytes N]
+"""
+import os
+import sys
+import time
+import random
+import ctypes
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../tests'))
+from utilities import *  # data_types & prlsc
+
+import numpy
+from prlsc import ArrayDecoder, init_state
+
+config_field = dict(prlsc_config_t._fields_)
+C_SAMPLE_BYTES = 1 << 20  # bytes decoded by prlsc_receiveByte (it's measured on a sample)
+
+
+def build_config():
+    return build_struct(
+        prlsc_config_t,
+        frameByteStartFrame=0xC0,
+        frameByteEsc=0xDB,
+        frameByteEscStart=0xDC,
+        frameByteEscEsc=0xDD,
+        callbackChecksumCalc=config_field['callbackChecksumCalc'](ctypes.cast(prlsc_loopback_checksumCalc, ctypes.c_void_p).value),
+        frameLengthMax=0x40,
+        datagramLengthMax=0xF0,
+        serviceCount=2,
+        services__exact=build_array(prlsc_serviceConfig_t, [
+            build_struct(prlsc_serviceConfig_t, stream=TRUE),
+            build_struct(prlsc_serviceConfig_t, stream=FALSE),
+        ]),
+    )
+
+
+def encode_frame(service_code, data):
+    body = [service_code, len(data)] + data
+    body.append((-sum(body)) & 0xFF)
+    encoded = [0xC0]
+    for byte in body:
+        encoded += {0xC0: [0xDB, 0xDC], 0xDB: [0xDB, 0xDD]}.get(byte, [byte])
+    return encoded
+
+
+def build_stream(size, rand):
+    # a pool of encoded datagrams, repeated to size
+    pool = []
+    for i in range(500):
+        data = [rand.randint(0, 0xFF) for j in range(rand.randint(0, 0xEF))]
+        data.append((-sum(data)) & 0xFF)
+        encoded = []
+        for j in range(0, len(data) + 1, 0x40):
+            encoded += encode_frame(0x21, data[j:j + 0x40])
+        pool.append(bytes(encoded))
+    block = b''.join(pool)
+    stream = numpy.frombuffer((block * ((size // len(block)) + 1))[:size], dtype=numpy.uint8).copy()
+    flips = numpy.arange(0, size, 10000)
+    stream[flips] ^= 0x10
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline decoder benchmark")
+    parser.add_argument('--megabytes', type=int, default=64, help="stream size")
+    args = parser.parse_args()
+    stream = build_stream(args.megabytes << 20, random.Random(0))
+    config = build_config()
+    decoder = ArrayDecoder(config)
+
+    start = time.perf_counter()
+    frames = decoder.frames(stream)
+    datagrams = decoder.datagrams(frames)
+    elapsed = time.perf_counter() - start
+    print("ArrayDecoder:     %6.1f MB/s  (%i MB; %i frames, %i datagrams, %i valid)" % (
+        len(stream) / (elapsed * 1e6), args.megabytes, len(frames), len(datagrams), len(datagrams.valid),
+    ))
+
+    # prlsc_receiveByte, per byte from python (as decoding a capture would be without ArrayDecoder)
+    state = init_state(data_types, config)
+    received = [0]
+    def receive_datagram(datagram):
+        received[0] += 1
+    config.callbackReceivedDatagram = config_field['callbackReceivedDatagram'](receive_datagram)
+    (config_p, state_p) = (pointer(config), pointer(state))
+    sample = stream[:C_SAMPLE_BYTES].tolist()
+    start = time.perf_counter()
+    for byte in sample:
+        prlsc_receiveByte(config_p, state_p, byte)
+    elapsed = time.perf_counter() - start
+    print("prlsc_receiveByte: %6.1f MB/s  (%i MB sample)" % (len(sample) / (elapsed * 1e6), len(sample) >> 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+/*! @file bench_engine.c
+ *  @brief Native benchmark driver for the prlsc engine's hot paths (no Python in the loop)
+ *
+ *  Each case is given as `<op>:<payload>:<escape>:<services>:<rateLimit>`
+ *      op:        `tx`     prlsc_transmitDatagram + prlsc_prepareServiceTransmission + prlsc_txByte
+ *                 `rx`     prlsc_receiveByte over a pre-encoded byte stream
+ *                 `memcpy` prlsc_memcpy_flat2circular + prlsc_memcpy_circular2flat
+ *                 `loop`   tx to rx through a prlsc_loopback link (the full stack, as goodput)
+ *      payload:   datagram data bytes (diagnostic services; may span several frames)
+ *      escape:    fraction of payload bytes that must be escaped on the wire (0.0 to 1.0)
+ *      services:  number of services datagrams are spread over (round-robin)
+ *      rateLimit: every service's rate limit (time is simulated; 1 tick per byte sent)
+ *
+ *  Each repetition buffers about `--bytes` (unencoded) frame bytes for tx & rx, or copies about
+ *  `--bytes` for memcpy. Reported bytes are those on the wire (encoded) for tx, rx & loop.
+ *  Note: the receiver can't reassemble datagrams of more than 254 bytes (rx datagram `curIdx` is
+ *  8 bits), so rx cases with larger payloads fail.
+ *
+ *  Results are written to stdout as JSON, one object per case, in the format read by
+ *  bench_engine.py (which also defines the default sweep; see `make benchmark`).
+ *
+ *  Build & run (from ./test):
+ *      make bench-native
+ *      ./bench_engine [--bytes N] [--repeat N] [case ...]
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+#include "../../src/prlsc.h"
+#include "../../src/prlsc_loopback.h"
+
+#define BENCH_FRAME_LENGTH_MAX      (0xFFu)
+#define BENCH_DATAGRAM_LENGTH_MAX   (0x400u)
+#define BENCH_TX_DATAGRAM_DEPTH     (2u)
+#define BENCH_DEFAULT_BYTES         (4u * 1024u * 1024u)
+#define BENCH_DEFAULT_REPEAT        (5u)
+#define BENCH_LOOPBACK_FIFO_SIZE    (4u)
+
+typedef struct {
+    char op[8];
+    uint16_t payload;
+    double escape;
+    uint8_t services;
+    prlsc_time_t rateLimit;
+} bench_case_t;
+
+// ---------- Globals (used by the engine's callbacks)
+prlsc_time_t g_benchTime = 0u; //!< simulated clock, 1 tick per byte sent
+uint8_t *g_benchWire = NULL; //!< if set, sent bytes are recorded here (used to build `rx` streams)
+size_t g_benchWireLength = 0u;
+size_t g_benchWireSize = 0u;
+size_t g_benchBytesSent = 0u;
+size_t g_benchDatagramsReceived = 0u;
+
+const char *g_benchDefaultCases[] = {
+    "tx:64:0.0:1:0", "rx:64:0.0:1:0", "memcpy:64:0.0:1:0", "loop:64:0.0:1:0",
+};
+
+prlsc_time_t bench_getTime(void) {
+    return g_benchTime;
+}
+
+prlsc_checksum_t bench_checksumCalc(uint8_t *arr, uint16_t length) {
+    uint8_t l_sum = 0u;
+    uint16_t l_idx;
+    for (l_idx = 0u; l_idx < length; l_idx++) {
+        l_sum += arr[l_idx];
+    }
+    return (uint8_t)(~l_sum + 1u);
+}
+
+void bench_sendByte(uint8_t byte) {
+    g_benchBytesSent++;
+    g_benchTime++;
+    if ((g_benchWire != NULL) && (g_benchWireLength < g_benchWireSize)) {
+        g_benchWire[g_benchWireLength++] = byte;
+    }
+}
+
+void bench_receivedDatagram(prlsc_datagram_t datagram) {
+    (void)datagram;
+    g_benchDatagramsReceived++;
+}
+
+/*! @brief Monotonic time in seconds */
+double bench_now(void) {
+    struct timespec l_time;
+    clock_gettime(CLOCK_MONOTONIC, &l_time);
+    return (double)l_time.tv_sec + ((double)l_time.tv_nsec * 1e-9);
+}
+
+/*! @brief Parse `<op>:<payload>:<escape>:<services>:<rateLimit>` into `benchCase`
+ *  @return `true` if valid
+ */
+bool bench_parseCase(const char *spec, bench_case_t *benchCase) {
+    unsigned int l_payload, l_services, l_rateLimit;
+    if (sscanf(spec, "%7[^:]:%u:%lf:%u:%u", benchCase->op, &l_payload, &benchCase->escape, &l_services, &l_rateLimit) != 5) {
+        return false;
+    }
+    if ((strcmp(benchCase->op, "tx") != 0) && (strcmp(benchCase->op, "rx") != 0) && (strcmp(benchCase->op, "memcpy") != 0) && (strcmp(benchCase->op, "loop") != 0)) {
+        return false;
+    }
+    if ((l_payload == 0u) || (l_payload > BENCH_DATAGRAM_LENGTH_MAX) || (l_services == 0u) || (l_services > PRLSC_SERVICE_COUNT_MAX)) {
+        return false;
+    }
+    if ((benchCase->escape < 0.0) || (benchCase->escape > 1.0) || (l_rateLimit > 0xFFFFu)) {
+        return false;
+    }
+    benchCase->payload = (uint16_t)l_payload;
+    benchCase->services = (uint8_t)l_services;
+    benchCase->rateLimit = (prlsc_time_t)l_rateLimit;
+    return true;
+}
+
+/*! @brief Fill `data` with `length` bytes, of which (about) `escape` of them are escaped on the wire
+ *  Escaped bytes are spread evenly, alternating between the start & escape bytes.
+ */
+void bench_fillPayload(prlsc_config_t *config, uint8_t *data, uint16_t length, double escape) {
+    uint16_t l_idx;
+    uint32_t l_escapes = 0u;
+    for (l_idx = 0u; l_idx < length; l_idx++) {
+        if ((uint32_t)(escape * (double)(l_idx + 1u)) > l_escapes) {
+            data[l_idx] = (l_escapes & 1u) ? config->frameByteEsc : config->frameByteStartFrame;
+            l_escapes++;
+        } else {
+            data[l_idx] = (uint8_t)((l_idx * 7u) + 1u);
+            if ((data[l_idx] == config->frameByteStartFrame) || (data[l_idx] == config->frameByteEsc)) {
+                data[l_idx]++;
+            }
+        }
+    }
+}
+
+/*! @brief Configure a bus for `benchCase`, and initialise its state (arena is allocated)
+ *  @return arena (to be freed by the caller), NULL on failure
+ */
+uint8_t *bench_initBus(bench_case_t *benchCase, prlsc_config_t *config, prlsc_serviceConfig_t *services, prlsc_state_t *state) {
+    uint8_t l_serviceIndex;
+    size_t l_arenaSize;
+    uint8_t *l_arena;
+
+    memset(config, 0, sizeof(prlsc_config_t));
+    config->frameByteStartFrame = 0xC0u;
+    config->frameByteEsc = 0xDBu;
+    config->frameByteEscStart = 0xDCu;
+    config->frameByteEscEsc = 0xDDu;
+    config->callbackGetTime = &bench_getTime;
+    config->callbackChecksumCalc = &bench_checksumCalc;
+    config->callbackSendByte = &bench_sendByte;
+    config->callbackReceivedDatagram = &bench_receivedDatagram;
+    config->frameLengthMax = BENCH_FRAME_LENGTH_MAX;
+    config->datagramLengthMax = BENCH_DATAGRAM_LENGTH_MAX;
+    config->serviceCount = benchCase->services;
+    config->services = services;
+    for (l_serviceIndex = 0u; l_serviceIndex < benchCase->services; l_serviceIndex++) {
+        services[l_serviceIndex].stream = false;
+        services[l_serviceIndex].rateLimit = benchCase->rateLimit;
+        services[l_serviceIndex].onlyTxLatest = false;
+        services[l_serviceIndex].txDatagramDepth = BENCH_TX_DATAGRAM_DEPTH;
+    }
+
+    l_arenaSize = prlsc_stateSize(config);
+    if ((l_arenaSize == 0u) || (posix_memalign((void **)&l_arena, PRLSC_ARENA_ALIGNMENT, l_arenaSize) != 0)) {
+        return NULL;
+    }
+    if (!prlsc_initState(config, state, l_arena, l_arenaSize)) {
+        free(l_arena);
+        return NULL;
+    }
+    g_benchTime = 0u;
+    return l_arena;
+}
+
+/*! @brief Transmit one frame if a service is ready (advancing time past a rate limit if none are)
+ *  @return `false` if there's nothing left to transmit
+ */
+bool bench_txFrame(prlsc_config_t *config, prlsc_state_t *state) {
+    prlsc_serviceIndex_t l_serviceIndex;
+    prlsc_time_t l_timeToRateLimitLifted;
+
+    if (prlsc_prepareServiceTransmission(config, state, &l_serviceIndex, &l_timeToRateLimitLifted)) {
+        while (prlsc_txByte(config, state)) {
+        }
+        return true;
+    } else if (l_timeToRateLimitLifted > 0u) {
+        g_benchTime += l_timeToRateLimitLifted; // idle line
+        return true;
+    }
+    return false;
+}
+
+/*! @brief Buffer & transmit `count` datagrams (round-robin over services)
+ *  @return `false` if a datagram couldn't be buffered
+ */
+bool bench_txDatagrams(prlsc_config_t *config, prlsc_state_t *state, prlsc_datagram_t *datagram, size_t count) {
+    size_t l_count;
+    for (l_count = 0u; l_count < count; l_count++) {
+        datagram->serviceIndex = (prlsc_serviceIndex_t)(l_count % config->serviceCount);
+        while (prlsc_transmitDatagram(config, state, *datagram) == 0u) {
+            if (state->errorCode != PRLSC_ERRORCODE_NONE) {
+                return false;
+            }
+            bench_txFrame(config, state); // tx buffer is full; make room
+        }
+    }
+    while (bench_txFrame(config, state)) {
+    }
+    return true;
+}
+
+/*! @brief Time a case (best of `repeat`)
+ *  @param bytes [out] bytes processed per repetition
+ *  @return best time (seconds), negative on failure
+ */
+double bench_run(bench_case_t *benchCase, size_t targetBytes, unsigned int repeat, size_t *bytes) {
+    prlsc_config_t l_config;
+    prlsc_serviceConfig_t l_services[PRLSC_SERVICE_COUNT_MAX];
+    prlsc_state_t l_state;
+    prlsc_datagram_t l_datagram;
+    uint8_t l_data[BENCH_DATAGRAM_LENGTH_MAX];
+    uint8_t *l_arena;
+    size_t l_count;
+    double l_best = -1.0;
+    double l_start, l_elapsed;
+    unsigned int l_repeat;
+    size_t l_idx;
+    uint16_t l_frameBytes;
+
+    l_arena = bench_initBus(benchCase, &l_config, l_services, &l_state);
+    if (l_arena == NULL) {
+        return -1.0;
+    }
+    bench_fillPayload(&l_config, l_data, benchCase->payload, benchCase->escape);
+    l_datagram.subServiceIndex = 1u;
+    l_datagram.length = benchCase->payload;
+    l_datagram.data = l_data;
+    l_datagram.checksum = prlsc_calcDatagramChecksum(&l_config, l_datagram);
+    l_datagram.serviceIndex = 0u;
+    l_frameBytes = prlsc_bufferBytesRequired(&l_config, &l_state, &l_datagram); // unencoded
+    l_count = (strcmp(benchCase->op, "memcpy") == 0) ? (targetBytes / benchCase->payload) : (targetBytes / l_frameBytes);
+    l_count = (l_count > 0u) ? l_count : 1u;
+
+    if (strcmp(benchCase->op, "tx") == 0) {
+        for (l_repeat = 0u; l_repeat < repeat; l_repeat++) {
+            prlsc_initState(&l_config, &l_state, l_arena, prlsc_stateSize(&l_config));
+            g_benchBytesSent = 0u;
+            l_start = bench_now();
+            if (!bench_txDatagrams(&l_config, &l_state, &l_datagram, l_count)) {
+                l_best = -1.0;
+                break;
+            }
+            l_elapsed = bench_now() - l_start;
+            *bytes = g_benchBytesSent;
+            l_best = ((l_best < 0.0) || (l_elapsed < l_best)) ? l_elapsed : l_best;
+        }
+
+    } else if (strcmp(benchCase->op, "rx") == 0) {
+        // record the encoded stream once, then time its reception
+        g_benchWireSize = l_count * l_frameBytes * 2u; // (if every byte were escaped)
+        g_benchWire = malloc(g_benchWireSize);
+        g_benchWireLength = 0u;
+        if ((g_benchWire != NULL) && bench_txDatagrams(&l_config, &l_state, &l_datagram, l_count) && (g_benchWireLength < g_benchWireSize)) {
+            for (l_repeat = 0u; l_repeat < repeat; l_repeat++) {
+                prlsc_initState(&l_config, &l_state, l_arena, prlsc_stateSize(&l_config));
+                g_benchDatagramsReceived = 0u;
+                l_start = bench_now();
+                for (l_idx = 0u; l_idx < g_benchWireLength; l_idx++) {
+                    prlsc_receiveByte(&l_config, &l_state, g_benchWire[l_idx]);
+                }
+                l_elapsed = bench_now() - l_start;
+                if ((g_benchDatagramsReceived != l_count) || (l_state.errorCode != PRLSC_ERRORCODE_NONE)) {
+                    l_best = -1.0;
+                    break;
+                }
+                *bytes = g_benchWireLength;
+                l_best = ((l_best < 0.0) || (l_elapsed < l_best)) ? l_elapsed : l_best;
+            }
+        }
+        free(g_benchWire);
+        g_benchWire = NULL;
+
+    } else if (strcmp(benchCase->op, "loop") == 0) {
+        // endpoint A transmits to B, which counts what it receives
+        prlsc_config_t l_configB;
+        prlsc_serviceConfig_t l_servicesB[PRLSC_SERVICE_COUNT_MAX];
+        prlsc_state_t l_stateB;
+        prlsc_loopback_t l_link;
+        uint8_t l_fifo[2u * BENCH_LOOPBACK_FIFO_SIZE];
+        uint8_t *l_arenaB = bench_initBus(benchCase, &l_configB, l_servicesB, &l_stateB);
+        if (l_arenaB != NULL) {
+            l_configB.callbackReceivedDatagram = &prlsc_loopback_receivedDatagram;
+            for (l_repeat = 0u; l_repeat < repeat; l_repeat++) {
+                prlsc_initState(&l_config, &l_state, l_arena, prlsc_stateSize(&l_config));
+                prlsc_initState(&l_configB, &l_stateB, l_arenaB, prlsc_stateSize(&l_configB));
+                prlsc_loopback_init(&l_link, &l_config, &l_state, &l_configB, &l_stateB, l_fifo, BENCH_LOOPBACK_FIFO_SIZE, NULL);
+                l_start = bench_now();
+                for (l_idx = 0u; l_idx < l_count; l_idx++) {
+                    l_datagram.serviceIndex = (prlsc_serviceIndex_t)(l_idx % l_config.serviceCount);
+                    while (prlsc_transmitDatagram(&l_config, &l_state, l_datagram) == 0u) {
+                        prlsc_loopback_pump(&l_link, l_frameBytes); // tx buffer is full; make room
+                    }
+                }
+                while (!prlsc_loopback_idle(&l_link)) {
+                    prlsc_loopback_pump(&l_link, l_frameBytes);
+                }
+                l_elapsed = bench_now() - l_start;
+                if ((l_link.endpointB.datagramsReceived != l_count) || (l_stateB.errorCode != PRLSC_ERRORCODE_NONE)) {
+                    l_best = -1.0;
+                    break;
+                }
+                *bytes = l_link.endpointA.bytesSent;
+                l_best = ((l_best < 0.0) || (l_elapsed < l_best)) ? l_elapsed : l_best;
+            }
+            free(l_arenaB);
+        }
+
+    } else { // memcpy
+        // to & from a ring buffer that doesn't divide evenly (so copies wrap)
+        uint16_t l_ringSize = (uint16_t)((benchCase->payload * 2u) + 1u);
+        uint8_t *l_ring = malloc(l_ringSize);
+        uint8_t l_flat[BENCH_DATAGRAM_LENGTH_MAX];
+        uint16_t l_ringIdx;
+        if (l_ring != NULL) {
+            for (l_repeat = 0u; l_repeat < repeat; l_repeat++) {
+                l_ringIdx = 0u;
+                l_start = bench_now();
+                for (l_idx = 0u; l_idx < l_count; l_idx++) {
+                    prlsc_memcpy_flat2circular(&(l_ring[l_ringIdx]), l_data, benchCase->payload, l_ring, l_ringSize);
+                    prlsc_memcpy_circular2flat(l_flat, &(l_ring[l_ringIdx]), benchCase->payload, l_ring, l_ringSize);
+                    l_ringIdx = (uint16_t)((l_ringIdx + benchCase->payload) % l_ringSize);
+                }
+                l_elapsed = bench_now() - l_start;
+                if (memcmp(l_flat, l_data, benchCase->payload) != 0) {
+                    l_best = -1.0;
+                    break;
+                }
+                *bytes = l_count * benchCase->payload * 2u;
+                l_best = ((l_best < 0.0) || (l_elapsed < l_best)) ? l_elapsed : l_best;
+            }
+            free(l_ring);
+        }
+    }
+
+    free(l_arena);
+    return l_best;
+}
+
+int main(int argc, char *argv[]) {
+    size_t l_targetBytes = BENCH_DEFAULT_BYTES;
+    unsigned int l_repeat = BENCH_DEFAULT_REPEAT;
+    const char **l_specs = g_benchDefaultCases;
+    int l_specCount = (int)(sizeof(g_benchDefaultCases) / sizeof(g_benchDefaultCases[0]));
+    int l_argIdx = 1;
+    int l_idx;
+    bench_case_t l_case;
+    size_t l_bytes = 0u;
+    double l_seconds;
+
+    // --- Arguments
+    while ((l_argIdx < argc) && (strncmp(argv[l_argIdx], "--", 2) == 0)) {
+        if ((strcmp(argv[l_argIdx], "--bytes") == 0) && (l_argIdx + 1 < argc)) {
+            l_targetBytes = (size_t)strtoul(argv[l_argIdx + 1], NULL, 0);
+        } else if ((strcmp(argv[l_argIdx], "--repeat") == 0) && (l_argIdx + 1 < argc)) {
+            l_repeat = (unsigned int)strtoul(argv[l_argIdx + 1], NULL, 0);
+        } else {
+            fprintf(stderr, "usage: %s [--bytes N] [--repeat N] [<op>:<payload>:<escape>:<services>:<rateLimit> ...]\n", argv[0]);
+            return 2;
+        }
+        l_argIdx += 2;
+    }
+    if ((l_targetBytes == 0u) || (l_repeat == 0u)) {
+        fprintf(stderr, "--bytes & --repeat must be > 0\n");
+        return 2;
+    }
+    if (l_argIdx < argc) {
+        l_specs = (const char **)&(argv[l_argIdx]);
+        l_specCount = argc - l_argIdx;
+    }
+
+    // --- Cases
+    printf("[\n");
+    for (l_idx = 0; l_idx < l_specCount; l_idx++) {
+        if (!bench_parseCase(l_specs[l_idx], &l_case)) {
+            fprintf(stderr, "invalid case: %s\n", l_specs[l_idx]);
+            return 2;
+        }
+        l_seconds = bench_run(&l_case, l_targetBytes, l_repeat, &l_bytes);
+        if (l_seconds < 0.0) {
+            fprintf(stderr, "case failed: %s\n", l_specs[l_idx]);
+            return 1;
+        }
+        printf(
+            "  {\"case\": \"%s\", \"op\": \"%s\", \"payload\": %u, \"escape\": %g, \"services\": %u, \"rate_limit\": %u, "
+            "\"bytes\": %zu, \"seconds\": %.9f}%s\n",
+            l_specs[l_idx], l_case.op, l_case.payload, l_case.escape, l_case.services, l_case.rateLimit,
+            l_bytes, l_seconds, (l_idx + 1 < l_specCount) ? "," : ""
+        );
+        fflush(stdout);
+    }
+    printf("]\n");
+    return 0;
+}
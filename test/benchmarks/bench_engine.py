@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+"""
+Benchmark: throughput of the prlsc engine's hot paths
+
+Cases (see SWEEP), each swept over payload size, escape density, service count & rate limit:
+    tx:     prlsc_transmitDatagram + prlsc_prepareServiceTransmission + prlsc_txByte
+    rx:     prlsc_receiveByte over a pre-encoded byte stream
+    memcpy: prlsc_memcpy_flat2circular + prlsc_memcpy_circular2flat
+    loop:   tx to rx through a prlsc_loopback link (the full stack, as goodput)
+
+Drivers:
+    native: bench_engine.c, compiled with optimisation (`make bench-native`); no Python in the loop
+    ctypes: the same cases, called through test.so's bindings (as the tests & prlsc lib do)
+
+Results can be saved as JSON (--output), and compared against a saved baseline (--compare);
+a case regresses if its ns/byte exceeds the baseline's by more than --threshold, in which
+case the exit status is 1.
+
+Usage (from ./test, after `make preproc build bench-native`):
+    python benchmarks/bench_engine.py [--driver {all,native,ctypes}] [--output FILE]
+                                      [--compare BASELINE] [--threshold FRACTION]
+"""
+import os
+import sys
+import json
+import time
+import ctypes
+import argparse
+import platform
+import subprocess
+from ctypes import pointer, byref
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../tests'))
+from utilities import *  # data_types & prlsc
+
+from prlsc import init_state
+
+NATIVE_FILENAME = 'bench_engine'
+FRAME_LENGTH_MAX = 0xFF
+DATAGRAM_LENGTH_MAX = 0x400
+TX_DATAGRAM_DEPTH = 2
+LOOPBACK_FIFO_SIZE = 4
+
+
+class Case(object):
+    """A benchmark case, written as <op>:<payload>:<escape>:<services>:<rate_limit> (as bench_engine.c reads it)"""
+    def __init__(self, op, payload=64, escape=0.0, services=1, rate_limit=0):
+        assert op in ('tx', 'rx', 'memcpy', 'loop'), "unknown op: %r" % op
+        self.op = op
+        self.payload = payload
+        self.escape = escape
+        self.services = services
+        self.rate_limit = rate_limit
+
+    @property
+    def name(self):
+        return "%s:%i:%.2f:%i:%i" % (self.op, self.payload, self.escape, self.services, self.rate_limit)
+
+
+def sweep():
+    """Default cases; each parameter swept in turn (the others at their defaults)"""
+    cases = []
+    for op in ('tx', 'rx'):
+        # rx payloads are limited to 254 bytes (see bench_engine.c)
+        cases += [Case(op, payload=payload) for payload in [1, 16, 64, 254]]
+        cases += [Case(op, escape=escape) for escape in [0.1, 0.5, 1.0]]
+        cases += [Case(op, services=services) for services in [4, 8]]
+        cases += [Case(op, rate_limit=rate_limit) for rate_limit in [20, 200]]
+    cases += [Case('tx', payload=1024)]
+    cases += [Case('loop', payload=payload) for payload in [1, 64, 254]]
+    cases += [Case('loop', escape=0.5), Case('loop', services=4), Case('loop', rate_limit=20)]
+    cases += [Case('memcpy', payload=payload) for payload in [1, 16, 64, 254, 1024]]
+    return cases
+
+SWEEP = sweep()
+
+
+# ---- Drivers
+def run_native(cases, filename, number_bytes, repeat):
+    """
+    Run cases with the native driver
+    :return: list of result dicts (as output by bench_engine.c)
+    """
+    output = subprocess.check_output(
+        [filename, '--bytes', str(number_bytes), '--repeat', str(repeat)] + [case.name for case in cases]
+    )
+    return json.loads(output.decode('utf-8'))
+
+
+class CtypesBus(object):
+    """Bus configured for a case, with callbacks recording sent bytes & received datagrams"""
+    def __init__(self, case):
+        self.time = 0
+        self.sent = 0
+        self.wire = None  # set to a list to record sent bytes
+        self.received = 0
+
+        config_t = dict(prlsc_config_t._fields_)
+        self.config = build_struct(
+            prlsc_config_t,
+            frameByteStartFrame=0xC0,
+            frameByteEsc=0xDB,
+            frameByteEscStart=0xDC,
+            frameByteEscEsc=0xDD,
+            callbackGetTime=lambda: self.time,
+            callbackChecksumCalc=dummy_checksum_calc,
+            callbackSendByte=config_t['callbackSendByte'](self.send_byte),
+            callbackReceivedDatagram=config_t['callbackReceivedDatagram'](self.receive_datagram),
+            frameLengthMax=FRAME_LENGTH_MAX,
+            datagramLengthMax=DATAGRAM_LENGTH_MAX,
+            serviceCount=case.services,
+            services__exact=build_array(prlsc_serviceConfig_t, [
+                build_struct(
+                    prlsc_serviceConfig_t,
+                    stream=FALSE,
+                    rateLimit=case.rate_limit,
+                    onlyTxLatest=FALSE,
+                    txDatagramDepth=TX_DATAGRAM_DEPTH,
+                )
+                for i in range(case.services)
+            ]),
+        )
+        self.state = init_state(data_types, self.config)
+        (self.config_p, self.state_p) = (pointer(self.config), pointer(self.state))
+
+    def reset(self):
+        init_state(data_types, self.config, state=self.state)
+        self.time = 0
+
+    def send_byte(self, byte):
+        self.sent += 1
+        self.time = (self.time + 1) & 0xFFFF
+        if self.wire is not None:
+            self.wire.append(byte)
+
+    def receive_datagram(self, datagram):
+        self.received += 1
+
+    def tx_frame(self):
+        # transmit 1 frame if a service is ready (advancing time past a rate limit if none are)
+        service_index = prlsc_serviceIndex_t()
+        time_to_rate_limit_lifted = prlsc_time_t()
+        if prlsc_prepareServiceTransmission(self.config_p, self.state_p, byref(service_index), byref(time_to_rate_limit_lifted)):
+            while prlsc_txByte(self.config_p, self.state_p):
+                pass
+            return True
+        elif time_to_rate_limit_lifted.value:
+            self.time = (self.time + time_to_rate_limit_lifted.value) & 0xFFFF  # idle line
+            return True
+        return False
+
+    def tx_datagrams(self, datagram, count):
+        for i in range(count):
+            datagram.serviceIndex = i % self.config.serviceCount
+            while not prlsc_transmitDatagram(self.config_p, self.state_p, datagram):
+                assert self.state.errorCode == PRLSC_ERRORCODE_NONE, "datagram not buffered (error %i)" % self.state.errorCode
+                self.tx_frame()  # tx buffer is full; make room
+        while self.tx_frame():
+            pass
+
+
+def payload_bytes(length, escape):
+    # (same as bench_engine.c: bench_fillPayload)
+    (data, escapes) = ([], 0)
+    for i in range(length):
+        if int(escape * (i + 1)) > escapes:
+            data.append(0xDB if (escapes & 1) else 0xC0)
+            escapes += 1
+        else:
+            byte = ((i * 7) + 1) & 0xFF
+            data.append(byte + 1 if byte in (0xC0, 0xDB) else byte)
+    return data
+
+
+def run_ctypes_case(case, number_bytes, repeat):
+    """
+    Run a case through test.so's bindings
+    :return: result dict (same keys as the native driver's)
+    """
+    bus = CtypesBus(case)
+    data = payload_bytes(case.payload, case.escape)
+    datagram = build_struct(
+        prlsc_datagram_t,
+        serviceIndex=0,
+        subServiceIndex=1,
+        length=case.payload,
+        data__exact=build_array(uint8_t, data),
+    )
+    datagram.checksum = prlsc_calcDatagramChecksum(bus.config_p, datagram)
+    frame_bytes = prlsc_bufferBytesRequired(bus.config_p, bus.state_p, pointer(datagram))
+    count = max(1, number_bytes // (case.payload if case.op == 'memcpy' else frame_bytes))
+
+    (best, processed) = (None, 0)
+    if case.op == 'tx':
+        for i in range(repeat):
+            bus.reset()
+            bus.sent = 0
+            start = time.perf_counter()
+            bus.tx_datagrams(datagram, count)
+            elapsed = time.perf_counter() - start
+            (best, processed) = (min(best or elapsed, elapsed), bus.sent)
+
+    elif case.op == 'rx':
+        bus.wire = []
+        bus.tx_datagrams(datagram, count)
+        wire = bus.wire
+        receive_byte = prlsc_receiveByte
+        for i in range(repeat):
+            bus.reset()
+            bus.received = 0
+            (config_p, state_p) = (bus.config_p, bus.state_p)
+            start = time.perf_counter()
+            for byte in wire:
+                receive_byte(config_p, state_p, byte)
+            elapsed = time.perf_counter() - start
+            assert (bus.received == count) and (bus.state.errorCode == PRLSC_ERRORCODE_NONE), "%s: reception failed" % case.name
+            (best, processed) = (min(best or elapsed, elapsed), len(wire))
+
+    elif case.op == 'loop':
+        # endpoint A (bus) transmits to B, which counts what it receives (in C)
+        bus_b = CtypesBus(case)
+        bus_b.config.callbackReceivedDatagram = dict(prlsc_config_t._fields_)['callbackReceivedDatagram'](
+            ctypes.cast(prlsc_loopback_receivedDatagram, ctypes.c_void_p).value
+        )
+        link = prlsc_loopback_t()
+        fifo = (uint8_t * (2 * LOOPBACK_FIFO_SIZE))()
+        (link_p, transmit, pump, idle) = (pointer(link), prlsc_transmitDatagram, prlsc_loopback_pump, prlsc_loopback_idle)
+        for i in range(repeat):
+            bus.reset()
+            bus_b.reset()
+            prlsc_loopback_init(link_p, bus.config_p, bus.state_p, bus_b.config_p, bus_b.state_p, fifo, LOOPBACK_FIFO_SIZE, None)
+            start = time.perf_counter()
+            for j in range(count):
+                datagram.serviceIndex = j % case.services
+                while not transmit(bus.config_p, bus.state_p, datagram):
+                    pump(link_p, frame_bytes)  # tx buffer is full; make room
+            while not idle(link_p):
+                pump(link_p, frame_bytes)
+            elapsed = time.perf_counter() - start
+            assert (link.endpointB.datagramsReceived == count) and (bus_b.state.errorCode == PRLSC_ERRORCODE_NONE), "%s: reception failed" % case.name
+            (best, processed) = (min(best or elapsed, elapsed), link.endpointA.bytesSent)
+
+    else:  # memcpy
+        ring_size = (case.payload * 2) + 1
+        ring = (uint8_t * ring_size)()
+        flat = (uint8_t * case.payload)()
+        source = datagram.data
+        ring_ptrs = [ctypes.cast(ctypes.addressof(ring) + j, ctypes.POINTER(uint8_t)) for j in range(ring_size)]
+        for i in range(repeat):
+            ring_idx = 0
+            start = time.perf_counter()
+            for j in range(count):
+                prlsc_memcpy_flat2circular(ring_ptrs[ring_idx], source, case.payload, ring, ring_size)
+                prlsc_memcpy_circular2flat(flat, ring_ptrs[ring_idx], case.payload, ring, ring_size)
+                ring_idx = (ring_idx + case.payload) % ring_size
+            elapsed = time.perf_counter() - start
+            assert list(flat) == data, "%s: copy failed" % case.name
+            (best, processed) = (min(best or elapsed, elapsed), count * case.payload * 2)
+
+    return {
+        'case': case.name, 'op': case.op, 'payload': case.payload, 'escape': case.escape,
+        'services': case.services, 'rate_limit': case.rate_limit,
+        'bytes': processed, 'seconds': best,
+    }
+
+
+def run_ctypes(cases, number_bytes, repeat):
+    return [run_ctypes_case(case, number_bytes, repeat) for case in cases]
+
+
+# ---- Results
+def complete(result, driver):
+    """Add driver & derived rates to a driver's result"""
+    result = dict(result, driver=driver)
+    result['bytes_per_second'] = result['bytes'] / result['seconds'] if result['seconds'] else 0.0
+    result['ns_per_byte'] = (result['seconds'] * 1e9) / result['bytes'] if result['bytes'] else 0.0
+    return result
+
+
+def print_results(results):
+    print("prlsc engine throughput")
+    print("%-8s%-24s%12s%12s%14s" % ('driver', 'case', 'bytes', 'ns/byte', 'MB/s'))
+    for result in results:
+        print("%-8s%-24s%12i%12.1f%14.2f" % (
+            result['driver'], result['case'], result['bytes'],
+            result['ns_per_byte'], result['bytes_per_second'] / 1e6,
+        ))
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline (cases are matched by driver & case)
+    :param threshold: fractional increase in ns/byte that's considered a regression (eg: 0.1 = 10%)
+    :return: list of regressed result dicts
+    """
+    baseline_map = dict(((r['driver'], r['case']), r) for r in baseline['results'])
+    regressions = []
+    print("comparison with baseline (threshold +%.0f%% ns/byte)" % (threshold * 100))
+    print("%-8s%-24s%12s%12s%10s" % ('driver', 'case', 'baseline', 'ns/byte', 'change'))
+    for result in results:
+        reference = baseline_map.get((result['driver'], result['case']), None)
+        if reference is None:
+            print("%-8s%-24s%12s%12.1f%10s" % (result['driver'], result['case'], '-', result['ns_per_byte'], 'new'))
+            continue
+        change = (result['ns_per_byte'] / reference['ns_per_byte']) - 1 if reference['ns_per_byte'] else 0.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(result)
+        print("%-8s%-24s%12.1f%12.1f%+9.1f%%%s" % (
+            result['driver'], result['case'], reference['ns_per_byte'], result['ns_per_byte'],
+            change * 100, '  REGRESSION' if regressed else '',
+        ))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="prlsc engine hot path benchmarks")
+    parser.add_argument('--driver', choices=['all', 'native', 'ctypes'], default='all',
+                        help="driver(s) to run; 'all' skips native if it's not built (default: %(default)s)")
+    parser.add_argument('--native', default=os.path.join(os.getcwd(), NATIVE_FILENAME),
+                        help="native driver executable (default: ./%s)" % NATIVE_FILENAME)
+    parser.add_argument('--case', action='append', dest='cases', default=None,
+                        help="case to run as <op>:<payload>:<escape>:<services>:<rate_limit> (may be repeated; default: sweep)")
+    parser.add_argument('--native-bytes', type=int, default=4 * 1024 * 1024, help="bytes per native measurement")
+    parser.add_argument('--ctypes-bytes', type=int, default=8 * 1024, help="bytes per ctypes measurement")
+    parser.add_argument('--repeat', type=int, default=5, help="best of N")
+    parser.add_argument('--output', default=None, help="save results as JSON")
+    parser.add_argument('--compare', default=None, metavar='BASELINE', help="JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="regression threshold, fraction of ns/byte (default: %(default)s)")
+    args = parser.parse_args()
+
+    cases = SWEEP
+    if args.cases:
+        cases = []
+        for spec in args.cases:
+            (op, payload, escape, services, rate_limit) = spec.split(':')
+            cases.append(Case(op, int(payload), float(escape), int(services), int(rate_limit)))
+
+    results = []
+    if args.driver in ('all', 'native'):
+        if os.path.exists(args.native):
+            results += [complete(r, 'native') for r in run_native(cases, args.native, args.native_bytes, args.repeat)]
+        elif args.driver == 'native':
+            parser.error("native driver not found: %s (make bench-native)" % args.native)
+        else:
+            sys.stderr.write("native driver not found, skipped: %s (make bench-native)\n" % args.native)
+    if args.driver in ('all', 'ctypes'):
+        results += [complete(r, 'ctypes') for r in run_ctypes(cases, args.ctypes_bytes, args.repeat)]
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump({
+                'machine': platform.machine(),
+                'python': platform.python_version(),
+                'results': results,
+            }, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as fh:
+            baseline = json.load(fh)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Benchmark: closed loop datagram transfer, Python closure vs prlsc_loopback
+
+Both push the same diagnostic datagrams from endpoint A to B:
+    closure:  A's callbackSendByte is a Python function calling B's prlsc_receiveByte
+              (as ClosedLoopTestBase does)
+    loopback: A & B are connected by a prlsc_loopback link, driven by prlsc_loopback_pump
+              (checksums & datagram counting are done in C)
+
+Then goodput over an impaired loopback link: the fraction of datagrams (and payload) B
+receives, per impairment period, and whether the link recovers once impairments stop.
+
+Usage (from ./test, after `make preproc build`):
+    python benchmarks/bench_loopback.py [--datagrams N] [--payload N]
+"""
+import os
+import sys
+import time
+import ctypes
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../tests'))
+from utilities import *  # data_types & prlsc
+
+from prlsc import init_state
+
+FIFO_SIZE = 4
+IMPAIRMENT_PERIODS = [10000, 1000, 100]
+config_field = dict(prlsc_config_t._fields_)
+
+
+def c_callback(name, func):
+    return config_field[name](ctypes.cast(func, ctypes.c_void_p).value)
+
+
+def build_config():
+    return build_struct(
+        prlsc_config_t,
+        frameByteStartFrame=0xC0,
+        frameByteEsc=0xDB,
+        frameByteEscStart=0xDC,
+        frameByteEscEsc=0xDD,
+        callbackGetTime=c_callback('callbackGetTime', prlsc_loopback_getTime),
+        callbackChecksumCalc=c_callback('callbackChecksumCalc', prlsc_loopback_checksumCalc),
+        callbackReceivedDatagram=c_callback('callbackReceivedDatagram', prlsc_loopback_receivedDatagram),
+        frameLengthMax=0xFF,
+        datagramLengthMax=0xFF,
+        serviceCount=1,
+        services__exact=build_array(prlsc_serviceConfig_t, [
+            build_struct(prlsc_serviceConfig_t, stream=FALSE, rateLimit=0, txDatagramDepth=4),
+        ]),
+    )
+
+
+class Loop(object):
+    """Endpoints A & B, connected by a prlsc_loopback link"""
+    def __init__(self, impairments=None):
+        (self.config_a, self.config_b) = (build_config(), build_config())
+        self.state_a = init_state(data_types, self.config_a)
+        self.state_b = init_state(data_types, self.config_b)
+        self.link = prlsc_loopback_t()
+        self.fifo = (uint8_t * (2 * FIFO_SIZE))()
+        prlsc_loopback_init(
+            pointer(self.link),
+            pointer(self.config_a), pointer(self.state_a),
+            pointer(self.config_b), pointer(self.state_b),
+            self.fifo, FIFO_SIZE, impairments,
+        )
+
+    def send(self, datagram, count):
+        (config_p, state_p, link_p) = (pointer(self.config_a), pointer(self.state_a), pointer(self.link))
+        for i in range(count):
+            while not prlsc_transmitDatagram(config_p, state_p, datagram):
+                prlsc_loopback_pump(link_p, 0x100)  # tx buffer is full; make room
+        while not prlsc_loopback_idle(link_p):
+            prlsc_loopback_pump(link_p, 0x100)
+
+
+def closure_send(datagram, count):
+    """Transfer datagrams with a Python closure between the endpoints; :return: datagrams received"""
+    loop = Loop()
+    (config_a_p, state_a_p) = (pointer(loop.config_a), pointer(loop.state_a))
+    (config_b_p, state_b_p) = (pointer(loop.config_b), pointer(loop.state_b))
+    received = [0]
+    def send_byte(byte):
+        prlsc_receiveByte(config_b_p, state_b_p, byte)
+    def receive_datagram(datagram):
+        received[0] += 1
+    loop.config_a.callbackSendByte = config_field['callbackSendByte'](send_byte)
+    loop.config_b.callbackReceivedDatagram = config_field['callbackReceivedDatagram'](receive_datagram)
+
+    service_index = prlsc_serviceIndex_t()
+    rate_limit_lifted_in = prlsc_time_t()
+    for i in range(count):
+        prlsc_transmitDatagram(config_a_p, state_a_p, datagram)
+        while prlsc_prepareServiceTransmission(config_a_p, state_a_p, pointer(service_index), pointer(rate_limit_lifted_in)):
+            while prlsc_txByte(config_a_p, state_a_p):
+                pass
+    return received[0]
+
+
+def loopback_send(datagram, count):
+    """Transfer datagrams over a prlsc_loopback link; :return: datagrams received"""
+    loop = Loop()
+    loop.send(datagram, count)
+    return loop.link.endpointB.datagramsReceived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="closed loop benchmark")
+    parser.add_argument('--datagrams', type=int, default=2000, help="datagrams per measurement")
+    parser.add_argument('--payload', type=int, default=64, help="datagram data bytes")
+    args = parser.parse_args()
+
+    data = [i & 0xFF for i in range(args.payload)]
+    datagram = build_struct(
+        prlsc_datagram_t,
+        serviceIndex=0,
+        subServiceIndex=1,
+        length=len(data),
+        data__exact=build_array(uint8_t, data),
+        checksum=prlsc_loopback_checksumCalc(build_array(uint8_t, data), len(data)),
+    )
+
+    print("closed loop: %i datagrams of %i bytes, A -> B" % (args.datagrams, args.payload))
+    print("%-12s%14s%14s%12s" % ('method', 'datagrams/s', 'MB/s (data)', 'received'))
+    for (name, method) in [('closure', closure_send), ('loopback', loopback_send)]:
+        start = time.perf_counter()
+        received = method(datagram, args.datagrams)
+        elapsed = time.perf_counter() - start
+        print("%-12s%14.0f%14.3f%12i" % (name, args.datagrams / elapsed, (received * args.payload) / (elapsed * 1e6), received))
+
+    print("")
+    print("goodput over an impaired link (each impairment 1 in N bytes), and recovery after impairments stop")
+    print("%-10s%-14s%12s%12s%12s" % ('period', 'impairment', 'goodput', 'errorCode', 'recovered'))
+    for period in IMPAIRMENT_PERIODS:
+        for field in ['dropPeriod', 'bitFlipPeriod', 'insertStartPeriod']:
+            loop = Loop(pointer(build_struct(prlsc_loopbackImpairments_t, **{'seed': 1, field: period})))
+            loop.send(datagram, args.datagrams)
+            goodput = float(loop.link.endpointB.datagramsReceived) / args.datagrams
+            error_code = loop.state_b.errorCode
+
+            # recovery: every datagram after the first is received
+            received = loop.link.endpointB.datagramsReceived
+            prlsc_loopback_setImpairments(pointer(loop.link), None)
+            loop.send(datagram, 10)
+            recovered = (loop.link.endpointB.datagramsReceived - received) >= 9
+            print("%-10i%-14s%11.1f%%%12i%12s" % (period, field[:-len('Period')], goodput * 100, error_code, 'yes' if recovered else 'NO'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Benchmark: prlsc.Simulator speed (simulated seconds per wall-clock second)
+
+A mixed workload (a 50Hz stream, and bursty diagnostics both ways) at 115200 baud,
+then the same workload swept over baud rates to show scheduling under saturation.
+
+Usage (from ./test, after `make preproc build`):
+    python benchmarks/bench_simulator.py [--duration SECONDS]
+"""
+import os
+import sys
+import time
+import ctypes
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../tests'))
+from utilities import *  # data_types & prlsc
+
+from prlsc import Simulator, Traffic
+
+BAUD_RATES = [9600, 19200, 57600, 115200]
+config_field = dict(prlsc_config_t._fields_)
+
+
+def build_config():
+    return build_struct(
+        prlsc_config_t,
+        frameByteStartFrame=0xC0,
+        frameByteEsc=0xDB,
+        frameByteEscStart=0xDC,
+        frameByteEscEsc=0xDD,
+        callbackChecksumCalc=config_field['callbackChecksumCalc'](ctypes.cast(prlsc_loopback_checksumCalc, ctypes.c_void_p).value),
+        frameLengthMax=0xFF,
+        datagramLengthMax=0xFF,
+        serviceCount=2,
+        services__exact=build_array(prlsc_serviceConfig_t, [
+            build_struct(prlsc_serviceConfig_t, stream=TRUE, rateLimit=15, txDatagramDepth=2),
+            build_struct(prlsc_serviceConfig_t, stream=FALSE, rateLimit=0, txDatagramDepth=4),
+        ]),
+    )
+
+
+def simulator(baud):
+    sim = Simulator(data_types, build_config(), baud=baud, tick=1e-3)
+    sim.add_traffic(Traffic(0, period=0.02, length=32))
+    sim.add_traffic(Traffic(1, period=0.25, length=200, jitter=0.8))
+    sim.add_traffic(Traffic(1, period=0.5, length=16, jitter=0.8, source='b'))
+    return sim
+
+
+def main():
+    parser = argparse.ArgumentParser(description="simulator benchmark")
+    parser.add_argument('--duration', type=float, default=600, help="simulated seconds per run")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = simulator(115200).run(args.duration)
+    elapsed = time.perf_counter() - start
+    print("%gs simulated in %.2fs wall: %.0fx real time" % (args.duration, elapsed, args.duration / elapsed))
+    print(report)
+
+    print("")
+    print("%-8s%12s%12s%12s%12s" % ('baud', 'util a->b', 'stream p99', 'diag p99', 'starved'))
+    for baud in BAUD_RATES:
+        report = simulator(baud).run(min(args.duration, 60))
+        (stream, diag) = (report.service('a', 0), report.service('a', 1))
+        print("%-8i%11.1f%%%10.1fms%10.1fms%12i" % (
+            baud, report.utilisation('a') * 100,
+            stream.latency(99) * 1e3, diag.latency(99) * 1e3, stream.starved + diag.starved,
+        ))
+
+
+if __name__ == '__main__':
+    main()
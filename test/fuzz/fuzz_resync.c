@@ -0,0 +1,597 @@
+/*! @file fuzz_resync.c
+ *  @brief Seeded fuzzer of the receiver (prlsc_receiveByte): resynchronisation after corruption, and garbage
+ *
+ *  Each trial encodes a stream of valid datagrams (random services, lengths & data, so bytes are
+ *  escaped), corrupts one frame with a mutation, then feeds the stream to a fresh receiver:
+ *      truncate:  the frame is cut short (the rest of it is removed)
+ *      start:     a spurious start byte is inserted in the frame
+ *      escape:    a bad escape sequence (escape, then an invalid byte) is inserted in the frame
+ *      length:    the frame's length byte is made larger than frameLengthMax
+ *      flip:      a bit of the frame is flipped
+ *      burst:     random bytes (1 to 64) are inserted in the frame
+ *      nostart:   the frame's start byte is removed
+ *  Per mutation, it reports:
+ *      bytes to resync:  from the corruption to the start of the first original frame received after it
+ *      frames lost:      original frames (from the corrupted one) lost before resynchronising
+ *                        (0 if the corrupted frame was received anyway)
+ *      datagrams lost:   datagrams that weren't received (collateral: those with no corrupted frame)
+ *      false frames & datagrams: accepted, but not as they were sent (checksum collisions)
+ *  Then it times the receiver over random bytes, and over bytes drawn from the frame bytes
+ *  (start, escape, etc; so the state machine changes state as often as possible).
+ *
+ *  Built with AddressSanitizer & UndefinedBehaviorSanitizer (`make fuzz`); the receiver's state
+ *  buffers are carved from an arena, so each buffer's padding in the arena is poisoned too (an
+ *  overflow of any buffer is caught, not only of the arena).
+ *
+ *  Results are written to stdout as JSON, one object per mutation (then per garbage kind);
+ *  the exit status is 1 if the harness' uncorrupted stream isn't received intact.
+ *
+ *  Build & run (from ./test):
+ *      make fuzz [FUZZ_ARGS="--seed N --trials N --garbage-bytes N"]
+ *
+ *  With clang, -DPRLSC_FUZZ_LIBFUZZER builds a libFuzzer target instead (raw input to a receiver):
+ *      clang -g -O1 -fsanitize=fuzzer,address,undefined -DPRLSC_FUZZ_LIBFUZZER fuzz/fuzz_resync.c ../src/prlsc.c
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+#include "../../src/prlsc.h"
+
+#if defined(__has_feature)
+#if __has_feature(address_sanitizer)
+#define FUZZ_ASAN
+#endif
+#endif
+#if defined(__SANITIZE_ADDRESS__)
+#define FUZZ_ASAN
+#endif
+#ifdef FUZZ_ASAN
+#include <sanitizer/asan_interface.h>
+#define FUZZ_POISON(addr, size)     ASAN_POISON_MEMORY_REGION((addr), (size))
+#define FUZZ_UNPOISON(addr, size)   ASAN_UNPOISON_MEMORY_REGION((addr), (size))
+#else
+#define FUZZ_POISON(addr, size)     ((void)(addr), (void)(size))
+#define FUZZ_UNPOISON(addr, size)   ((void)(addr), (void)(size))
+#endif
+
+// (lengths are chosen so no buffer's size is a multiple of the arena's alignment; each has padding to poison)
+#define FUZZ_FRAME_LENGTH_MAX       (33u)
+#define FUZZ_DATAGRAM_LENGTH_MAX    (201u)
+#define FUZZ_SERVICE_COUNT          (4u)  //!< [0] stream, [1..] diagnostic
+#define FUZZ_DATAGRAMS              (24u) //!< per trial
+#define FUZZ_CORRUPT_FIRST          (8u)  //!< a frame of datagrams [FUZZ_CORRUPT_FIRST, FUZZ_CORRUPT_LAST) is corrupted
+#define FUZZ_CORRUPT_LAST           (16u)
+#define FUZZ_FRAMES_MAX             (FUZZ_DATAGRAMS * (((FUZZ_DATAGRAM_LENGTH_MAX + 1u) / FUZZ_FRAME_LENGTH_MAX) + 1u))
+#define FUZZ_STREAM_SIZE            (FUZZ_FRAMES_MAX * (2u * (FUZZ_FRAME_LENGTH_MAX + 3u) + 1u) + 64u)
+#define FUZZ_BURST_MAX              (64u)
+#define FUZZ_DEFAULT_SEED           (1u)
+#define FUZZ_DEFAULT_TRIALS         (20000u)
+#define FUZZ_DEFAULT_GARBAGE_BYTES  (16u * 1024u * 1024u)
+
+typedef enum {
+    FUZZ_MUTATION_TRUNCATE = 0,
+    FUZZ_MUTATION_START,
+    FUZZ_MUTATION_ESCAPE,
+    FUZZ_MUTATION_LENGTH,
+    FUZZ_MUTATION_FLIP,
+    FUZZ_MUTATION_BURST,
+    FUZZ_MUTATION_NOSTART,
+    FUZZ_MUTATION_COUNT
+} fuzz_mutation_t;
+
+const char *g_fuzzMutationNames[FUZZ_MUTATION_COUNT] = {
+    "truncate", "start", "escape", "length", "flip", "burst", "nostart",
+};
+
+typedef struct {
+    size_t start; //!< offset of the frame's start byte (in the stream)
+    size_t end; //!< offset after its last byte
+    uint8_t datagram; //!< index of the datagram it's part of
+} fuzz_frame_t;
+
+typedef struct {
+    prlsc_serviceIndex_t serviceIndex;
+    uint16_t length;
+    uint8_t data[FUZZ_DATAGRAM_LENGTH_MAX];
+    uint16_t received; //!< times it was received intact
+    bool corrupted;
+} fuzz_datagram_t;
+
+typedef struct {
+    uint8_t stream[FUZZ_STREAM_SIZE];
+    size_t length;
+    fuzz_frame_t frames[FUZZ_FRAMES_MAX];
+    size_t frameCount;
+    fuzz_datagram_t datagrams[FUZZ_DATAGRAMS];
+} fuzz_trial_t;
+
+typedef struct {
+    size_t count;
+    double sum;
+    size_t max;
+} fuzz_stat_t;
+
+typedef struct {
+    size_t trials;
+    size_t unsynced; //!< trials in which no frame after the corruption was received
+    fuzz_stat_t resyncBytes;
+    fuzz_stat_t framesLost;
+    fuzz_stat_t datagramsLost;
+    fuzz_stat_t collateralLost;
+    size_t falseFrames;
+    size_t falseDatagrams;
+} fuzz_report_t;
+
+// ---------- Globals (used by the engine's callbacks)
+uint64_t g_fuzzRandom = FUZZ_DEFAULT_SEED;
+fuzz_trial_t *g_fuzzTrial = NULL; //!< received datagrams are checked against its datagrams
+size_t g_fuzzFalseDatagrams = 0u;
+size_t g_fuzzDatagramsReceived = 0u;
+
+/*! @brief Random number (xorshift64*) */
+uint32_t fuzz_random(void) {
+    g_fuzzRandom ^= g_fuzzRandom >> 12;
+    g_fuzzRandom ^= g_fuzzRandom << 25;
+    g_fuzzRandom ^= g_fuzzRandom >> 27;
+    return (uint32_t)((g_fuzzRandom * 0x2545F4914F6CDD1DULL) >> 32);
+}
+
+/*! @brief Random number in [low, high] */
+uint32_t fuzz_randomRange(uint32_t low, uint32_t high) {
+    return low + (fuzz_random() % (high - low + 1u));
+}
+
+prlsc_checksum_t fuzz_checksumCalc(uint8_t *arr, uint16_t length) {
+    uint8_t l_sum = 0u;
+    uint16_t l_idx;
+    for (l_idx = 0u; l_idx < length; l_idx++) {
+        l_sum += arr[l_idx];
+    }
+    return (uint8_t)(~l_sum + 1u);
+}
+
+prlsc_time_t fuzz_getTime(void) {
+    return 0u;
+}
+
+void fuzz_sendByte(uint8_t byte) {
+    (void)byte;
+}
+
+/*! @brief Check a received datagram against the one sent (identified by its first byte) */
+void fuzz_receivedDatagram(prlsc_datagram_t datagram) {
+    fuzz_datagram_t *l_sent;
+    g_fuzzDatagramsReceived++;
+    if (g_fuzzTrial == NULL) {
+        return;
+    }
+    if ((datagram.length == 0u) || (datagram.data[0] >= FUZZ_DATAGRAMS)) {
+        g_fuzzFalseDatagrams++;
+        return;
+    }
+    l_sent = &(g_fuzzTrial->datagrams[datagram.data[0]]);
+    if ((l_sent->serviceIndex == datagram.serviceIndex) && (l_sent->length == datagram.length) && (memcmp(l_sent->data, datagram.data, datagram.length) == 0)) {
+        l_sent->received++;
+    } else {
+        g_fuzzFalseDatagrams++;
+    }
+}
+
+void fuzz_initConfig(prlsc_config_t *config, prlsc_serviceConfig_t *services) {
+    uint8_t l_serviceIndex;
+    memset(config, 0, sizeof(prlsc_config_t));
+    config->frameByteStartFrame = 0xC0u;
+    config->frameByteEsc = 0xDBu;
+    config->frameByteEscStart = 0xDCu;
+    config->frameByteEscEsc = 0xDDu;
+    config->callbackGetTime = &fuzz_getTime;
+    config->callbackChecksumCalc = &fuzz_checksumCalc;
+    config->callbackSendByte = &fuzz_sendByte;
+    config->callbackReceivedDatagram = &fuzz_receivedDatagram;
+    config->frameLengthMax = FUZZ_FRAME_LENGTH_MAX;
+    config->datagramLengthMax = FUZZ_DATAGRAM_LENGTH_MAX;
+    config->serviceCount = FUZZ_SERVICE_COUNT;
+    config->services = services;
+    for (l_serviceIndex = 0u; l_serviceIndex < FUZZ_SERVICE_COUNT; l_serviceIndex++) {
+        services[l_serviceIndex].stream = (l_serviceIndex == 0u);
+        services[l_serviceIndex].rateLimit = 0u;
+        services[l_serviceIndex].onlyTxLatest = false;
+        services[l_serviceIndex].txDatagramDepth = 1u;
+    }
+}
+
+/*! @brief Initialise a receiver's state, poisoning all of its arena but the buffers it's given
+ *  (done for every trial, as prlsc_initState zeroes the whole arena)
+ */
+bool fuzz_initState(prlsc_config_t *config, prlsc_state_t *state, uint8_t *arena, size_t arenaSize) {
+    uint8_t l_serviceIndex;
+    FUZZ_UNPOISON(arena, arenaSize);
+    if (!prlsc_initState(config, state, arena, arenaSize)) {
+        return false;
+    }
+    FUZZ_POISON(arena, arenaSize);
+    FUZZ_UNPOISON(state->receiver.datagram, config->serviceCount * sizeof(prlsc_rxDatagramState_t));
+    FUZZ_UNPOISON(state->transmitterBuffer, config->serviceCount * sizeof(prlsc_transmitterBuffer_t));
+    FUZZ_UNPOISON(state->lastTransmitted, config->serviceCount * sizeof(prlsc_time_t));
+    FUZZ_UNPOISON(state->receiver.frame.buffer, PRLSC_FRAMEBUFFER_SIZE((size_t)config->frameLengthMax));
+    FUZZ_UNPOISON(state->transmitter.frameBuffer, PRLSC_FRAMEBUFFER_SIZE((size_t)config->frameLengthMax));
+    FUZZ_UNPOISON(state->transmitter.transmitBuffer, PRLSC_FRAMEBUFFER_SIZE((size_t)config->frameLengthMax));
+    for (l_serviceIndex = 0u; l_serviceIndex < config->serviceCount; l_serviceIndex++) {
+        FUZZ_UNPOISON(state->receiver.datagram[l_serviceIndex].buffer, prlsc_rxDatagramBufferSize(config, l_serviceIndex));
+        FUZZ_UNPOISON(state->transmitterBuffer[l_serviceIndex].buffer, state->transmitterBuffer[l_serviceIndex].bufferSize);
+    }
+    return true;
+}
+
+/*! @brief Append a byte to the trial's stream, escaped */
+void fuzz_appendEscaped(prlsc_config_t *config, fuzz_trial_t *trial, uint8_t byte) {
+    if (byte == config->frameByteStartFrame) {
+        trial->stream[trial->length++] = config->frameByteEsc;
+        trial->stream[trial->length++] = config->frameByteEscStart;
+    } else if (byte == config->frameByteEsc) {
+        trial->stream[trial->length++] = config->frameByteEsc;
+        trial->stream[trial->length++] = config->frameByteEscEsc;
+    } else {
+        trial->stream[trial->length++] = byte;
+    }
+}
+
+/*! @brief Append an encoded frame to the trial's stream */
+void fuzz_appendFrame(prlsc_config_t *config, fuzz_trial_t *trial, uint8_t datagramIndex, uint8_t serviceCode, uint8_t *data, uint8_t length) {
+    uint8_t l_buffer[PRLSC_FRAMEBUFFER_SIZE(FUZZ_FRAME_LENGTH_MAX)];
+    uint16_t l_idx;
+    fuzz_frame_t *l_frame = &(trial->frames[trial->frameCount++]);
+
+    l_buffer[0] = config->frameByteStartFrame;
+    l_buffer[1] = serviceCode;
+    l_buffer[2] = length;
+    memcpy(&(l_buffer[3]), data, length);
+    l_buffer[3u + length] = prlsc_calcFrameBufferChecksum(config, l_buffer);
+
+    l_frame->start = trial->length;
+    l_frame->datagram = datagramIndex;
+    trial->stream[trial->length++] = config->frameByteStartFrame;
+    for (l_idx = 1u; l_idx < (4u + length); l_idx++) {
+        fuzz_appendEscaped(config, trial, l_buffer[l_idx]);
+    }
+    l_frame->end = trial->length;
+}
+
+/*! @brief Build a trial's datagrams, and encode them (as prlsc_transmitDatagram would) */
+void fuzz_buildTrial(prlsc_config_t *config, fuzz_trial_t *trial) {
+    uint8_t l_datagramIndex;
+    uint8_t l_bytes[FUZZ_DATAGRAM_LENGTH_MAX + 1u];
+    uint16_t l_idx, l_total;
+    fuzz_datagram_t *l_datagram;
+    prlsc_datagram_t l_checksummed;
+    uint8_t l_serviceCode;
+
+    trial->length = 0u;
+    trial->frameCount = 0u;
+    for (l_datagramIndex = 0u; l_datagramIndex < FUZZ_DATAGRAMS; l_datagramIndex++) {
+        l_datagram = &(trial->datagrams[l_datagramIndex]);
+        l_datagram->serviceIndex = (prlsc_serviceIndex_t)fuzz_randomRange(0u, FUZZ_SERVICE_COUNT - 1u);
+        l_datagram->length = (uint16_t)fuzz_randomRange(1u, config->services[l_datagram->serviceIndex].stream ? FUZZ_FRAME_LENGTH_MAX : FUZZ_DATAGRAM_LENGTH_MAX);
+        l_datagram->received = 0u;
+        l_datagram->corrupted = false;
+        l_datagram->data[0] = l_datagramIndex; // (identifies it when it's received)
+        for (l_idx = 1u; l_idx < l_datagram->length; l_idx++) {
+            // a quarter are frame bytes (so they're escaped)
+            l_datagram->data[l_idx] = (fuzz_random() & 3u) ? (uint8_t)fuzz_random() : (uint8_t)fuzz_randomRange(0xC0u, 0xDDu);
+        }
+        l_serviceCode = (uint8_t)((l_datagram->serviceIndex << 5) | fuzz_randomRange(0u, 0x1Fu));
+
+        l_total = l_datagram->length;
+        memcpy(l_bytes, l_datagram->data, l_total);
+        if (!config->services[l_datagram->serviceIndex].stream) {
+            l_checksummed.serviceIndex = l_datagram->serviceIndex;
+            l_checksummed.data = l_datagram->data;
+            l_checksummed.length = l_datagram->length;
+            l_bytes[l_total++] = prlsc_calcDatagramChecksum(config, l_checksummed);
+        }
+        // frames of frameLengthMax, then a shorter (possibly empty) last frame
+        for (l_idx = 0u; (uint16_t)(l_total - l_idx) >= FUZZ_FRAME_LENGTH_MAX; l_idx += FUZZ_FRAME_LENGTH_MAX) {
+            if (config->services[l_datagram->serviceIndex].stream) {
+                break; // (a stream's frame is always its datagram's last)
+            }
+            fuzz_appendFrame(config, trial, l_datagramIndex, l_serviceCode, &(l_bytes[l_idx]), FUZZ_FRAME_LENGTH_MAX);
+        }
+        fuzz_appendFrame(config, trial, l_datagramIndex, l_serviceCode, &(l_bytes[l_idx]), (uint8_t)(l_total - l_idx));
+    }
+}
+
+/*! @brief Corrupt one frame of a trial's stream
+ *  @param corruptStart [out] offset of the corruption
+ *  @param corruptEnd [out] offset after the corruption (after inserted bytes)
+ *  @return index of the corrupted frame (frames after it are moved to their new offsets)
+ */
+size_t fuzz_mutate(prlsc_config_t *config, fuzz_trial_t *trial, fuzz_mutation_t mutation, size_t *corruptStart, size_t *corruptEnd) {
+    uint8_t l_insert[FUZZ_BURST_MAX];
+    size_t l_insertLength = 0u;
+    size_t l_removeLength = 0u;
+    size_t l_frameIdx, l_idx;
+    long l_shift;
+    fuzz_frame_t *l_frame;
+
+    // a frame of the middle datagrams (so the receiver is in sync before, & there's time after)
+    do {
+        l_frameIdx = fuzz_randomRange(0u, (uint32_t)(trial->frameCount - 1u));
+    } while ((trial->frames[l_frameIdx].datagram < FUZZ_CORRUPT_FIRST) || (trial->frames[l_frameIdx].datagram >= FUZZ_CORRUPT_LAST));
+    l_frame = &(trial->frames[l_frameIdx]);
+    *corruptStart = fuzz_randomRange((uint32_t)l_frame->start + 1u, (uint32_t)l_frame->end - 1u);
+
+    switch (mutation) {
+        case FUZZ_MUTATION_TRUNCATE:
+            l_removeLength = l_frame->end - *corruptStart;
+            break;
+        case FUZZ_MUTATION_START:
+            l_insert[l_insertLength++] = config->frameByteStartFrame;
+            break;
+        case FUZZ_MUTATION_ESCAPE:
+            l_insert[l_insertLength++] = config->frameByteEsc;
+            do {
+                l_insert[l_insertLength] = (uint8_t)fuzz_random();
+            } while ((l_insert[l_insertLength] == config->frameByteEscStart) || (l_insert[l_insertLength] == config->frameByteEscEsc) || (l_insert[l_insertLength] == config->frameByteStartFrame));
+            l_insertLength++;
+            break;
+        case FUZZ_MUTATION_LENGTH:
+            // (service codes & valid lengths are never escaped, so the length is always the 3rd byte)
+            *corruptStart = l_frame->start + 2u;
+            do {
+                trial->stream[*corruptStart] = (uint8_t)fuzz_randomRange(FUZZ_FRAME_LENGTH_MAX + 1u, 0xFFu);
+            } while ((trial->stream[*corruptStart] == config->frameByteStartFrame) || (trial->stream[*corruptStart] == config->frameByteEsc));
+            break;
+        case FUZZ_MUTATION_FLIP:
+            trial->stream[*corruptStart] ^= (uint8_t)(1u << fuzz_randomRange(0u, 7u));
+            break;
+        case FUZZ_MUTATION_BURST:
+            l_insertLength = fuzz_randomRange(1u, FUZZ_BURST_MAX);
+            for (l_idx = 0u; l_idx < l_insertLength; l_idx++) {
+                l_insert[l_idx] = (uint8_t)fuzz_random();
+            }
+            break;
+        case FUZZ_MUTATION_NOSTART:
+        default:
+            *corruptStart = l_frame->start;
+            l_removeLength = 1u;
+            break;
+    }
+
+    memmove(
+        &(trial->stream[*corruptStart + l_insertLength]), &(trial->stream[*corruptStart + l_removeLength]),
+        trial->length - (*corruptStart + l_removeLength)
+    );
+    memcpy(&(trial->stream[*corruptStart]), l_insert, l_insertLength);
+    trial->length = trial->length + l_insertLength - l_removeLength;
+    *corruptEnd = *corruptStart + l_insertLength;
+
+    l_shift = (long)l_insertLength - (long)l_removeLength;
+    l_frame->end = (size_t)((long)l_frame->end + l_shift);
+    for (l_idx = l_frameIdx + 1u; l_idx < trial->frameCount; l_idx++) {
+        trial->frames[l_idx].start = (size_t)((long)trial->frames[l_idx].start + l_shift);
+        trial->frames[l_idx].end = (size_t)((long)trial->frames[l_idx].end + l_shift);
+    }
+    trial->datagrams[l_frame->datagram].corrupted = true;
+    return l_frameIdx;
+}
+
+void fuzz_addStat(fuzz_stat_t *stat, size_t value) {
+    stat->count++;
+    stat->sum += (double)value;
+    stat->max = (value > stat->max) ? value : stat->max;
+}
+
+/*! @brief Feed a trial's stream to a fresh receiver, and measure how it resynchronised
+ *  @param corruptedFrame index of the corrupted frame (FUZZ_FRAMES_MAX if the stream wasn't corrupted)
+ *  @return `false` if the receiver couldn't be initialised
+ */
+bool fuzz_receiveTrial(prlsc_config_t *config, prlsc_state_t *state, uint8_t *arena, size_t arenaSize, fuzz_trial_t *trial,
+                       size_t corruptedFrame, size_t corruptStart, fuzz_report_t *report) {
+    size_t l_idx;
+    size_t l_nextFrame = corruptedFrame; // first original frame that may be received after the corruption
+    bool l_synced = (corruptedFrame >= trial->frameCount);
+    uint8_t l_framesReceived;
+    size_t l_lost = 0u;
+    size_t l_collateral = 0u;
+
+    if (!fuzz_initState(config, state, arena, arenaSize)) {
+        return false;
+    }
+    g_fuzzTrial = trial;
+    g_fuzzFalseDatagrams = 0u;
+    for (l_idx = 0u; l_idx < trial->length; l_idx++) {
+        l_framesReceived = state->receiver.frame.framesReceived;
+        prlsc_receiveByte(config, state, trial->stream[l_idx]);
+        if ((state->receiver.frame.framesReceived != l_framesReceived) && (l_idx >= corruptStart) && !l_synced) {
+            // a frame was received after the corruption: is it an original one?
+            while ((l_nextFrame < trial->frameCount) && (trial->frames[l_nextFrame].end < (l_idx + 1u))) {
+                l_nextFrame++;
+            }
+            if ((l_nextFrame < trial->frameCount) && (trial->frames[l_nextFrame].end == (l_idx + 1u))) {
+                // (the corrupted frame itself is received if the corruption was harmless; eg: a 2nd start byte)
+                l_synced = true;
+                fuzz_addStat(&(report->resyncBytes), (l_nextFrame > corruptedFrame) ? (trial->frames[l_nextFrame].start - corruptStart) : 0u);
+                fuzz_addStat(&(report->framesLost), l_nextFrame - corruptedFrame);
+            } else {
+                report->falseFrames++;
+            }
+        }
+    }
+    g_fuzzTrial = NULL;
+
+    for (l_idx = 0u; l_idx < FUZZ_DATAGRAMS; l_idx++) {
+        if (trial->datagrams[l_idx].received == 0u) {
+            l_lost++;
+            l_collateral += trial->datagrams[l_idx].corrupted ? 0u : 1u;
+        }
+    }
+    report->trials++;
+    report->unsynced += l_synced ? 0u : 1u;
+    report->falseDatagrams += g_fuzzFalseDatagrams;
+    fuzz_addStat(&(report->datagramsLost), l_lost);
+    fuzz_addStat(&(report->collateralLost), l_collateral);
+    return true;
+}
+
+/*! @brief Monotonic time in seconds */
+double fuzz_now(void) {
+    struct timespec l_time;
+    clock_gettime(CLOCK_MONOTONIC, &l_time);
+    return (double)l_time.tv_sec + ((double)l_time.tv_nsec * 1e-9);
+}
+
+/*! @brief Time the receiver over `length` bytes of garbage
+ *  @param frameBytes `true` to draw bytes from the frame bytes (start, escape, etc) & small lengths
+ *  @param datagrams [out] datagrams accepted
+ *  @return seconds, negative on failure
+ */
+double fuzz_garbage(prlsc_config_t *config, prlsc_state_t *state, uint8_t *arena, size_t arenaSize, size_t length, bool frameBytes, size_t *datagrams) {
+    const uint8_t l_frameBytes[] = {0xC0u, 0xDBu, 0xDCu, 0xDDu, 0x00u, 0x01u, 0x02u, 0x21u, 0x41u, 0xFFu};
+    uint8_t *l_garbage = malloc(length);
+    size_t l_idx;
+    double l_start, l_elapsed;
+
+    if ((l_garbage == NULL) || !fuzz_initState(config, state, arena, arenaSize)) {
+        free(l_garbage);
+        return -1.0;
+    }
+    for (l_idx = 0u; l_idx < length; l_idx++) {
+        l_garbage[l_idx] = frameBytes ? l_frameBytes[fuzz_random() % sizeof(l_frameBytes)] : (uint8_t)fuzz_random();
+    }
+    g_fuzzDatagramsReceived = 0u;
+    l_start = fuzz_now();
+    for (l_idx = 0u; l_idx < length; l_idx++) {
+        prlsc_receiveByte(config, state, l_garbage[l_idx]);
+    }
+    l_elapsed = fuzz_now() - l_start;
+    *datagrams = g_fuzzDatagramsReceived;
+    free(l_garbage);
+    return l_elapsed;
+}
+
+#ifdef PRLSC_FUZZ_LIBFUZZER
+int LLVMFuzzerTestOneInput(const uint8_t *data, size_t size) {
+    static prlsc_config_t s_config;
+    static prlsc_serviceConfig_t s_services[FUZZ_SERVICE_COUNT];
+    static prlsc_state_t s_state;
+    static uint8_t *s_arena = NULL;
+    static size_t s_arenaSize = 0u;
+    size_t l_idx;
+
+    if (s_arena == NULL) {
+        fuzz_initConfig(&s_config, s_services);
+        s_arenaSize = prlsc_stateSize(&s_config);
+        if (posix_memalign((void **)&s_arena, PRLSC_ARENA_ALIGNMENT, s_arenaSize) != 0) {
+            abort();
+        }
+    }
+    if (!fuzz_initState(&s_config, &s_state, s_arena, s_arenaSize)) {
+        abort();
+    }
+    for (l_idx = 0u; l_idx < size; l_idx++) {
+        prlsc_receiveByte(&s_config, &s_state, data[l_idx]);
+    }
+    return 0;
+}
+#else
+void fuzz_printStat(const char *name, fuzz_stat_t *stat) {
+    printf("\"%s_mean\": %.3f, \"%s_max\": %zu", name, (stat->count > 0u) ? (stat->sum / (double)stat->count) : 0.0, name, stat->max);
+}
+
+int main(int argc, char *argv[]) {
+    unsigned long l_seed = FUZZ_DEFAULT_SEED;
+    size_t l_trials = FUZZ_DEFAULT_TRIALS;
+    size_t l_garbageBytes = FUZZ_DEFAULT_GARBAGE_BYTES;
+    int l_argIdx = 1;
+    prlsc_config_t l_config;
+    prlsc_serviceConfig_t l_services[FUZZ_SERVICE_COUNT];
+    prlsc_state_t l_state;
+    uint8_t *l_arena;
+    size_t l_arenaSize;
+    fuzz_trial_t *l_trial;
+    fuzz_report_t l_reports[FUZZ_MUTATION_COUNT];
+    fuzz_report_t l_control;
+    size_t l_idx, l_corruptedFrame, l_corruptStart, l_corruptEnd, l_datagrams;
+    int l_mutation;
+    double l_seconds;
+
+    // --- Arguments
+    while ((l_argIdx + 1 < argc) && (strncmp(argv[l_argIdx], "--", 2) == 0)) {
+        if (strcmp(argv[l_argIdx], "--seed") == 0) {
+            l_seed = strtoul(argv[l_argIdx + 1], NULL, 0);
+        } else if (strcmp(argv[l_argIdx], "--trials") == 0) {
+            l_trials = (size_t)strtoul(argv[l_argIdx + 1], NULL, 0);
+        } else if (strcmp(argv[l_argIdx], "--garbage-bytes") == 0) {
+            l_garbageBytes = (size_t)strtoul(argv[l_argIdx + 1], NULL, 0);
+        } else {
+            break;
+        }
+        l_argIdx += 2;
+    }
+    if (l_argIdx < argc) {
+        fprintf(stderr, "usage: %s [--seed N] [--trials N] [--garbage-bytes N]\n", argv[0]);
+        return 2;
+    }
+    g_fuzzRandom = (uint64_t)l_seed * 0x9E3779B97F4A7C15ULL + 1u; // (never 0)
+
+    fuzz_initConfig(&l_config, l_services);
+    l_arenaSize = prlsc_stateSize(&l_config);
+    l_trial = malloc(sizeof(fuzz_trial_t));
+    if ((l_trial == NULL) || (posix_memalign((void **)&l_arena, PRLSC_ARENA_ALIGNMENT, l_arenaSize) != 0)) {
+        fprintf(stderr, "out of memory\n");
+        return 1;
+    }
+    memset(l_reports, 0, sizeof(l_reports));
+
+    // --- Control: the uncorrupted stream is received intact (else the harness is wrong)
+    memset(&l_control, 0, sizeof(l_control));
+    fuzz_buildTrial(&l_config, l_trial);
+    if (!fuzz_receiveTrial(&l_config, &l_state, l_arena, l_arenaSize, l_trial, FUZZ_FRAMES_MAX, 0u, &l_control)
+            || (l_control.datagramsLost.max != 0u) || (l_control.falseDatagrams != 0u) || (l_state.errorCode != PRLSC_ERRORCODE_NONE)) {
+        fprintf(stderr, "uncorrupted stream wasn't received intact\n");
+        return 1;
+    }
+
+    // --- Trials (mutations in turn)
+    for (l_idx = 0u; l_idx < l_trials; l_idx++) {
+        l_mutation = (int)(l_idx % FUZZ_MUTATION_COUNT);
+        fuzz_buildTrial(&l_config, l_trial);
+        l_corruptedFrame = fuzz_mutate(&l_config, l_trial, (fuzz_mutation_t)l_mutation, &l_corruptStart, &l_corruptEnd);
+        fuzz_receiveTrial(&l_config, &l_state, l_arena, l_arenaSize, l_trial, l_corruptedFrame, l_corruptStart, &(l_reports[l_mutation]));
+    }
+
+    printf("[\n");
+    for (l_mutation = 0; l_mutation < FUZZ_MUTATION_COUNT; l_mutation++) {
+        fuzz_report_t *l_report = &(l_reports[l_mutation]);
+        printf("  {\"mutation\": \"%s\", \"seed\": %lu, \"trials\": %zu, \"unsynced\": %zu, ",
+               g_fuzzMutationNames[l_mutation], l_seed, l_report->trials, l_report->unsynced);
+        fuzz_printStat("resync_bytes", &(l_report->resyncBytes));
+        printf(", ");
+        fuzz_printStat("frames_lost", &(l_report->framesLost));
+        printf(", ");
+        fuzz_printStat("datagrams_lost", &(l_report->datagramsLost));
+        printf(", ");
+        fuzz_printStat("collateral_datagrams_lost", &(l_report->collateralLost));
+        printf(", \"false_frames\": %zu, \"false_datagrams\": %zu},\n", l_report->falseFrames, l_report->falseDatagrams);
+    }
+
+    // --- Garbage
+    for (l_idx = 0u; l_idx < 2u; l_idx++) {
+        l_seconds = fuzz_garbage(&l_config, &l_state, l_arena, l_arenaSize, l_garbageBytes, (l_idx == 1u), &l_datagrams);
+        if (l_seconds < 0.0) {
+            fprintf(stderr, "out of memory\n");
+            return 1;
+        }
+        printf("  {\"garbage\": \"%s\", \"bytes\": %zu, \"seconds\": %.6f, \"mb_per_second\": %.2f, \"datagrams_accepted\": %zu}%s\n",
+               (l_idx == 0u) ? "random" : "frame-bytes", l_garbageBytes, l_seconds,
+               (l_seconds > 0.0) ? ((double)l_garbageBytes / (l_seconds * 1e6)) : 0.0, l_datagrams, (l_idx == 0u) ? "," : "");
+    }
+    printf("]\n");
+
+    free(l_arena);
+    free(l_trial);
+    return 0;
+}
+#endif
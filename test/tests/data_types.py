@@ -1,5 +1,4 @@
 import sys
-import pycparser
 import ctypes
 import os
 import inspect
@@ -57,6 +56,14 @@ PRLSC_TXBYTESTATE_ESCAPED_BYTE  = 3
 PRLSC_TYPE_STREAM       = 1
 PRLSC_TYPE_DIAGNOSTICS  = 2
 
+# Service code space
+PRLSC_SERVICE_COUNT_MAX     = 8
+PRLSC_SUBSERVICE_COUNT      = 32
+
+# prlsc_loopback
+PRLSC_LOOPBACK_ENDPOINT_A   = 0
+PRLSC_LOOPBACK_ENDPOINT_B   = 1
+
 # bool
 TRUE  = 1
 FALSE = 0
@@ -69,8 +76,11 @@ __all__ += [
 
 # ========================== typedef ==========================
 # Add factory built classes to global scope
-_ast = pycparser.parse_file(os.path.join(_this_path, '../test-preproc.c'))
-_factory = CTypeFactory(_ast)
+#   (built type graph is cached, keyed by preprocessed source; re-parsed only when it changes)
+_factory = CTypeFactory.from_file(
+    os.path.join(_this_path, '../test-preproc.c'),
+    cache_dir=os.path.join(_this_path, '../.ast2ctypes-cache'),
+)
 
 _dynamic_lib = ctypes.cdll.LoadLibrary(os.path.join(_this_path, '../test.so'))
 
@@ -0,0 +1,155 @@
+import io
+import os
+import json
+import shutil
+import random
+import tempfile
+import contextlib
+
+from utilities import *
+from test_decoder import frame
+
+import prlsc
+from prlsc import CaptureWriter, analyze_file, analyze_paths
+from prlsc.__main__ import main
+from prlsc.analyze import RunningStats, available_decoder
+from prlsc.capture import RX, TX
+from prlsc.constants import (
+    ERRORCODE_NONE, ERRORCODE_INCOMPLETE, ERRORCODE_RXFRAME_BAD_CHECKSUM,
+    ERRORCODE_DATAGRAM_BAD_CHECKSUM, ERRORCODE_DATAGRAM_TOO_LONG,
+)
+
+
+class AnalyzeTest(PrlscEngineTest):
+
+    def setUp(self):
+        super(AnalyzeTest, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.config = self.get_basic_config()  # [0] stream, [1] diagnostics
+        self.config.frameLengthMax = 8
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super(AnalyzeTest, self).tearDown()
+
+    def write_capture(self, name, events):
+        """:param events: [(time (s), direction, bytes), ...]"""
+        now = [0]
+        path = os.path.join(self.dir, name)
+        with CaptureWriter(path, self.config, index=False, clock=lambda: now[0], chunk_interval=0) as writer:
+            for (time, direction, data) in events:
+                now[0] = int(time * 1e9)
+                writer.record(direction, data)
+        return path
+
+    def assertReportsEqual(self, a, b):
+        # (equal, but for floating point rounding; summation & merge order vary)
+        if isinstance(a, dict):
+            self.assertEqual(sorted(a), sorted(b))
+            for key in a:
+                self.assertReportsEqual(a[key], b[key])
+        elif isinstance(a, float):
+            self.assertAlmostEqual(a, b, places=9)
+        else:
+            self.assertEqual(a, b)
+
+    def diagnostic(self, data):
+        data = list(data) + [(-sum(data)) & 0xFF]
+        return b''.join(frame(0x21, data[i:i + 8]) for i in range(0, len(data) + 1, 8))
+
+    def stream_events(self, count, period=0.01, start=0.0):
+        return [(start + i * period, TX, frame(0x01, [i & 0xFF, 2, 3])) for i in range(count)]
+
+    def test_stream_rate(self):
+        path = self.write_capture('a.cap', self.stream_events(101))
+        report = analyze_file(path)
+        stats = report.service(TX, 0)
+        self.assertEqual(stats.datagrams, 101)
+        self.assertEqual(stats.data_bytes, 303)
+        self.assertAlmostEqual(stats.rate, 100.0)
+        self.assertAlmostEqual(stats.interval.mean, 0.01)
+        self.assertAlmostEqual(stats.jitter, 0.0)
+        self.assertEqual(report.link(TX).errors, {ERRORCODE_NONE: 101})
+
+    def test_jitter(self):
+        rand = random.Random(1)
+        times = sorted(rand.uniform(0, 10) for i in range(500))
+        path = self.write_capture('a.cap', [(t, RX, frame(0x01, [1])) for t in times])
+        stats = analyze_file(path).service(RX, 0)
+        intervals = [b - a for (a, b) in zip(times[:-1], times[1:])]
+        mean = sum(intervals) / len(intervals)
+        self.assertAlmostEqual(stats.interval.mean, mean, places=6)
+        self.assertAlmostEqual(stats.jitter, (sum((i - mean) ** 2 for i in intervals) / len(intervals)) ** 0.5, places=6)
+
+    def test_errors(self):
+        path = self.write_capture('a.cap', [
+            (0.0, RX, self.diagnostic(range(20))),
+            (0.1, RX, frame(0x21, [1, 2], checksum=0)),  # frame checksum
+            (0.2, RX, frame(0x21, [1, 2, 3])),  # datagram checksum
+            (0.3, RX, self.diagnostic(range(0x100))),  # too long (datagramLengthMax 0xFF)
+            (0.4, RX, b'\xC0\x21\x05\x01'),  # incomplete
+            (0.5, RX, self.diagnostic([])),
+        ])
+        report = analyze_file(path)
+        stats = report.service(RX, 1)
+        self.assertEqual(stats.datagrams, 2)
+        self.assertEqual(stats.data_bytes, 20)
+        self.assertEqual(stats.errors, {ERRORCODE_DATAGRAM_BAD_CHECKSUM: 1, ERRORCODE_DATAGRAM_TOO_LONG: 1})
+        self.assertEqual(report.link(RX).errors[ERRORCODE_RXFRAME_BAD_CHECKSUM], 1)
+        self.assertEqual(report.link(RX).errors[ERRORCODE_INCOMPLETE], 1)
+
+    def test_decoders(self):
+        # numpy & python decoders give the same statistics
+        rand = random.Random(2)
+        events = []
+        for i in range(300):
+            data = self.diagnostic([rand.randint(0, 0xFF) for j in range(rand.randint(0, 40))]) if rand.random() < 0.5 else frame(0x01, [i & 0xFF])
+            data = bytes(b ^ 0x04 if rand.random() < 0.002 else b for b in data)
+            events.append((i * 0.01, rand.choice([RX, TX]), data))
+        path = self.write_capture('a.cap', events)
+        self.assertEqual(available_decoder(), 'numpy')
+        reports = [analyze_file(path, decoder=decoder).as_dict() for decoder in ('numpy', 'python')]
+        self.assertReportsEqual(reports[0], reports[1])
+        self.assertGreater(reports[0]['services']['rx[1]']['datagrams'], 50)
+
+    def test_paths(self):
+        os.mkdir(os.path.join(self.dir, 'day2'))
+        self.write_capture('1.cap', self.stream_events(50))
+        self.write_capture(os.path.join('day2', '2.cap'), self.stream_events(30, period=0.02))
+        self.write_capture(os.path.join('day2', 'ignored.bin'), self.stream_events(10))
+        with open(os.path.join(self.dir, 'bad.cap'), 'wb') as f:
+            f.write(b'not a capture, but long enough to be read')
+        for (name, content) in (('truncated.cap', b'PRLSC'), ('empty.cap', b'')):  # (writer killed before its header was written)
+            with open(os.path.join(self.dir, name), 'wb') as f:
+                f.write(content)
+        merged = []
+        reports = [analyze_paths([self.dir], processes=p, progress=merged.append) for p in (1, 2)]
+        self.assertEqual(len(merged), 10)
+        self.assertReportsEqual(reports[0].as_dict(), reports[1].as_dict())
+        report = reports[0]
+        self.assertEqual(report.files, 5)
+        self.assertEqual(sorted(report.failed), [os.path.join(self.dir, name) for name in ('bad.cap', 'empty.cap', 'truncated.cap')])
+        stats = report.service(TX, 0)
+        self.assertEqual(stats.datagrams, 80)
+        self.assertEqual(stats.interval.count, 78)  # (not between captures)
+        self.assertAlmostEqual(stats.interval.min, 0.01)
+        self.assertAlmostEqual(stats.interval.max, 0.02)
+        self.assertIn('tx[0]', str(report))
+
+    def test_running_stats(self):
+        values = [random.Random(3).uniform(0, 5) for i in range(100)]
+        (whole, parts) = (RunningStats(), RunningStats())
+        whole.add_values(values)
+        for i in range(0, 100, 30):
+            part = RunningStats()
+            part.add_values(values[i:i + 30])
+            parts.merge(part)
+        for name in ('count', 'mean', 'm2', 'min', 'max'):
+            self.assertAlmostEqual(getattr(whole, name), getattr(parts, name))
+
+    def test_command_line(self):
+        self.write_capture('1.cap', self.stream_events(10))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main(['analyze', self.dir, '--jobs', '1', '--json']), 0)
+        self.assertEqual(json.loads(output.getvalue())['services']['tx[0]']['datagrams'], 10)
@@ -0,0 +1,64 @@
+from utilities import *
+
+from prlsc import ram_budget
+from ast2ctypes import Target
+
+
+class RamBudgetTest(PrlscEngineTest):
+
+    def setUp(self):
+        super(RamBudgetTest, self).setUp()
+        self.config = self.get_basic_config()  # 2 services, frameLengthMax = 0xFF, datagramLengthMax = 0x1FF
+
+    def arena_total(self, budget):
+        return sum(size + padding for (name, size, padding) in budget.entries if name.startswith('arena: '))
+
+    def test_native(self):
+        budget = ram_budget(data_types, self.config)
+        self.assertEqual(self.arena_total(budget), prlsc_stateSize(pointer(self.config)))
+        entries = dict((name, size) for (name, size, padding) in budget.entries)
+        self.assertEqual(entries['state (prlsc_state_t)'], sizeof(prlsc_state_t))
+        self.assertEqual(entries['config (prlsc_config_t)'], sizeof(prlsc_config_t))
+        self.assertEqual(entries['config.services (2 x prlsc_serviceConfig_t)'], 2 * sizeof(prlsc_serviceConfig_t))
+        self.assertEqual(budget.total, sum(size + padding for (name, size, padding) in budget.entries))
+
+    def test_handlers(self):
+        without_handlers = ram_budget(data_types, self.config).total
+        self.config.handlers = (prlsc_datagramHandler_t * (2 * PRLSC_SUBSERVICE_COUNT))()
+        with_handlers = ram_budget(data_types, self.config).total
+        self.assertEqual(with_handlers - without_handlers, 2 * PRLSC_SUBSERVICE_COUNT * sizeof(ctypes.c_void_p))
+
+    def test_avr(self):
+        native = ram_budget(data_types, self.config, target='native')
+        avr = ram_budget(data_types, self.config, target='avr')
+        self.assertLess(avr.total, native.total)
+        entries = dict((name, size) for (name, size, padding) in avr.entries)
+        # errorCode(1), receiver(frame(1+2+2+2+1) + datagram*(2)), transmitterBuffer*(2),
+        # transmitter(2+2+2+1+1+2), lastTransmitted*(2), newTxDataFlag(1)
+        # (+ operation counters, compiled with PRLSC_PROFILE; all uint32_t, so their size is the same on every target)
+        profile_size = sizeof(prlsc_profile_t) if prlsc.profiling_enabled(data_types) else 0
+        self.assertEqual(entries['state (prlsc_state_t)'], 1 + (8 + 2) + 2 + 10 + 2 + 1 + profile_size)
+        self.assertEqual(entries['arena: state.receiver.datagram[0].buffer'], 0xFF)
+        self.assertEqual(sum(padding for (name, size, padding) in avr.entries), self.arena_padding(avr))
+
+    def arena_padding(self, budget):
+        # every arena buffer is aligned to a pointer (2 bytes on avr)
+        return sum((-size) % 2 for (name, size, padding) in budget.entries if name.startswith('arena: '))
+
+    def test_service_buffers(self):
+        self.config.services[0].txDatagramDepth = 3
+        budget = ram_budget(data_types, self.config, target=Target('test', pointer_size=4, max_alignment=4))
+        entries = dict((name, (size, padding)) for (name, size, padding) in budget.entries)
+        self.assertEqual(entries['arena: state.transmitterBuffer[0].buffer'], (((0xFF + 4) * 3) + 1, 2))  # 778 bytes, padded to 780
+        self.assertEqual(entries['arena: state.receiver.datagram[1].buffer'], (0x1FF + 1, 0))
+        self.assertEqual(entries['arena: state.receiver.frame.buffer'], (0xFF + 4, 1))
+
+    def test_invalid_config(self):
+        self.config.serviceCount = 0
+        with self.assertRaises(AssertionError):
+            ram_budget(data_types, self.config)
+
+    def test_report(self):
+        report = str(ram_budget(data_types, self.config, target='avr'))
+        self.assertIn('RAM budget (avr)', report)
+        self.assertIn('arena: state.transmitterBuffer[1].buffer', report)
@@ -0,0 +1,181 @@
+import os
+import shutil
+import tempfile
+
+from utilities import *
+from test_closedLoop import ClosedLoopTestBase
+from test_decoder import frame
+
+import prlsc
+from prlsc import CaptureWriter, CaptureReader, CaptureError, reindex
+from prlsc.capture import RX, TX, FRAME_VALID, FRAME_CHECKED, FRAME_DATAGRAM_END
+
+
+def checksum(data):
+    return (-sum(data)) & 0xFF  # (as dummy_checksum_calc)
+
+
+class CaptureTest(ClosedLoopTestBase):
+
+    def setUp(self):
+        super(CaptureTest, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'link.cap')
+        self.now = 1000
+        self.open_writer()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super(CaptureTest, self).tearDown()
+
+    def open_writer(self, **kwargs):
+        kwargs.setdefault('checksum', checksum)
+        self.writer = CaptureWriter(self.path, self.config_tx, clock=lambda: self.now, **kwargs)
+        receive_byte = lambda byte: prlsc_receiveByte(pointer(self.config_rx), pointer(self.state_rx), byte)
+        self.config_tx.callbackSendByte = dict(prlsc_config_t._fields_)['callbackSendByte'](self.writer.tap(receive_byte))
+
+    def txbyte_loop(self, max_calls=1000):
+        super(CaptureTest, self).txbyte_loop(max_calls=max_calls)
+
+    def send(self, service_index, data):
+        self.send_datagrams([self.build_datagram(service_index=service_index, data=data, config=self.config_tx)])
+
+    def test_frames(self):
+        self.send(1, [1, 2, 3])
+        self.send(0, [4, 5])
+        self.writer.close()
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(reader.frame_count, 2)
+            self.assertEqual(reader.datagram_count, 2)
+            frame = reader.frame(0)
+            self.assertEqual((frame.direction, frame.service_index), (TX, 1))
+            self.assertEqual(frame.flags, FRAME_VALID | FRAME_CHECKED | FRAME_DATAGRAM_END)
+            self.assertEqual(frame.data, bytes([1, 2, 3, checksum([1, 2, 3])]))  # (diagnostics: datagram checksum appended)
+            self.assertEqual(reader.frame(1).data, bytes([4, 5]))
+            self.assertEqual(reader.datagram(1).data, bytes([4, 5]))
+            self.assertRaises(IndexError, reader.frame, 2)
+
+    def test_escaped(self):
+        data = [0xC0, 0xDB, 0xDC, 0xDD, 0xC0]
+        self.send(0, data)
+        self.writer.close()
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(reader.frame(0).data, bytes(data))
+            self.assertTrue(reader.frame(0).valid)
+        self.assertEqual(datagram_data(self.datagrams[0][0]), data)  # (capture didn't disturb the link)
+
+    def test_multiple_frame_datagram(self):
+        data = [i & 0xFF for i in range(300)]
+        self.send(1, data)
+        self.send(1, [7])
+        self.writer.close()
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(reader.frame_count, 3)
+            self.assertFalse(reader.frame(0).flags & FRAME_DATAGRAM_END)
+            self.assertEqual(reader.datagram_count, 2)
+            self.assertEqual(reader.datagram(0).data, bytes(data + [checksum(data)]))
+            self.assertEqual(reader.datagram(1).data, bytes([7, checksum([7])]))
+
+    def test_time_range(self):
+        for i in range(10):
+            self.now = 1000 + (i * 10**8)  # 100ms apart (> chunk_interval)
+            self.send(0, [i])
+        self.writer.close()
+        with CaptureReader(self.path) as reader:
+            frames = list(reader.frames(start=1000 + (3 * 10**8), end=1000 + (6 * 10**8)))
+            self.assertEqual([f.data for f in frames], [bytes([3]), bytes([4]), bytes([5])])
+            datagrams = list(reader.datagrams(start=1000 + (8 * 10**8)))
+            self.assertEqual([d.data for d in datagrams], [bytes([8]), bytes([9])])
+            records = list(reader.records(start=1000 + (9 * 10**8)))
+            self.assertEqual(len(records), 1)
+            self.assertEqual(records[0][:2], (1000 + (9 * 10**8), TX))
+
+    def test_chunks(self):
+        # frames split across records, interleaved with received bytes
+        self.writer.close()
+        self.open_writer(chunk_size=3)
+        self.writer.rx(b'\x00\xC0\x21')
+        self.send(1, [1, 2, 3, 4, 5, 6])
+        self.writer.rx(b'\x03\x01\x02\x03')
+        self.writer.rx(checksum([0x21, 3, 1, 2, 3]))
+        self.writer.close()
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(reader.frame_count, 2)
+            frames = [reader.frame(0), reader.frame(1)]
+            self.assertEqual([f.direction for f in frames], [TX, RX])
+            self.assertEqual(frames[0].data, bytes([1, 2, 3, 4, 5, 6, checksum([1, 2, 3, 4, 5, 6])]))
+            self.assertEqual(frames[1].data, bytes([1, 2, 3]))
+            self.assertEqual(reader.datagram(1).subservice_index, 1)
+
+    def test_invalid(self):
+        self.writer.rx(b'\xC0\x21\x02\x01\x02\x00')  # bad checksum
+        self.writer.rx(b'\xC0\x21\x05\x01')  # interrupted
+        self.writer.rx(b'\xC0\x21\x01\xDB\x00\x00')  # bad escape
+        self.writer.rx(b'\xC0\xE0\x00\x00')  # service index out of bounds
+        self.writer.rx(b'\xC0\x01\x00\xFF')  # valid
+        self.writer.close()
+        with CaptureReader(self.path) as reader:
+            self.assertEqual([reader.frame(i).valid for i in range(reader.frame_count)], [False] * 4 + [True])
+            self.assertEqual(reader.datagram_count, 1)
+            self.assertEqual(reader.datagram(0).service_code, 0x01)
+
+    def test_corrupted_middle_frame(self):
+        for config in (self.config_tx, self.config_rx):
+            config.frameLengthMax = 16
+        self.writer.close()
+        self.open_writer()
+        data = list(range(40))
+        data.append(checksum(data))  # (frames: 16 + 16 + 9 bytes)
+        encoded = (
+            frame(0x21, data[:16]) +
+            frame(0x21, data[16:32], checksum=0x00) +  # bad checksum: dropped
+            frame(0x20, data[16:32]) +  # (retransmitted: same service, another subservice)
+            frame(0x00, [4, 5]) +  # another service, interleaved
+            frame(0x21, [6], checksum=0x00) +  # bad checksum, and not the last frame's length
+            frame(0x21, data[32:])
+        )
+        self.writer.rx(encoded)
+        for byte in bytearray(encoded):
+            prlsc_receiveByte(pointer(self.config_rx), pointer(self.state_rx), byte)
+        self.writer.close()
+
+        # cross-check: as received by the C receiver
+        received = [(i, bytes(datagram_data(d)), d.checksum) for i in (0, 1) for d in self.datagrams[i]]
+        self.assertEqual(received, [(0, bytes([4, 5]), 0), (1, bytes(data[:-1]), data[-1])])
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(reader.frame_count, 6)
+            self.assertEqual([reader.frame(i).valid for i in range(6)], [True, False, True, True, False, True])
+            self.assertEqual(reader.datagram_count, 2)
+            self.assertEqual([(d.service_code, d.data) for d in map(reader.datagram, range(2))], [
+                (0x00, received[0][1]),
+                (0x21, received[1][1] + bytes([received[1][2]])),  # (diagnostics: datagram checksum appended)
+            ])
+
+    def test_no_index(self):
+        self.writer.close()
+        os.remove(self.path + '.idx')
+        self.open_writer(index=False)
+        self.send(1, [1, 2, 3])
+        self.send(0, [4])
+        self.writer.close()
+        self.assertFalse(os.path.exists(self.path + '.idx'))
+        with CaptureReader(self.path, checksum=checksum) as reader:  # (index built in memory)
+            self.assertEqual(reader.datagram(1).data, bytes([4]))
+        with CaptureReader(self.path, index=False) as reader:
+            self.assertEqual(len(list(reader.records())), 1)
+            self.assertRaises(CaptureError, lambda: reader.frame_count)
+
+        reindex(self.path, checksum=checksum)
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(reader.frame_count, 2)
+            self.assertTrue(reader.frame(0).flags & FRAME_CHECKED)
+
+        with open(self.path + '.idx', 'r+b') as f:  # (as written by an older version)
+            f.write(prlsc.capture.INDEX_HEADER.pack(prlsc.capture.INDEX_MAGIC, 1))
+        with CaptureReader(self.path) as reader:  # (rebuilt in memory)
+            self.assertEqual(reader.datagram(1).data, bytes([4]))
+
+    def test_not_a_capture(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\x00' * 32)
+        self.assertRaises(CaptureError, CaptureReader, self.path)
@@ -41,12 +41,13 @@ class ClosedLoopTestBase(PrlscEngineTest):
             # datagram is expected to be consumed by function (because it's memory is re-used for the next
             # incoming datagram... so it's content is copied for the purposes of this test.
             log.debug(datagram2str(datagram, "received frame:"))
+            data = prlsc.DatagramView(datagram).copy()
             self.datagrams[datagram.serviceIndex].append(build_struct(
                 prlsc_datagram_t,
                 serviceIndex=datagram.serviceIndex,
                 subServiceIndex=datagram.subServiceIndex,
                 length=datagram.length,
-                data__exact=build_array(uint8_t, datagram_data(datagram)),
+                data__exact=(uint8_t * len(data)).from_buffer_copy(data),
                 checksum=datagram.checksum,
             ))
         self.config_rx.callbackReceivedDatagram = dict(prlsc_config_t._fields_)['callbackReceivedDatagram'](receive_datagram)
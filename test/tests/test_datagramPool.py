@@ -0,0 +1,79 @@
+from utilities import *
+from test_closedLoop import ClosedLoopTestBase
+
+from prlsc import DatagramPool, DatagramPoolExhausted
+
+
+class DatagramPoolTest(PrlscEngineTest):
+
+    def setUp(self):
+        super(DatagramPoolTest, self).setUp()
+        self.config = self.get_basic_config()
+        self.pool = DatagramPool(prlsc_datagram_t, 2, self.config.datagramLengthMax, self.config.callbackChecksumCalc)
+
+    def test_acquire(self):
+        datagram = self.pool.acquire(1, 3, b'\x01\x02\x03')
+        self.assertEqual((datagram.serviceIndex, datagram.subServiceIndex, datagram.length), (1, 3, 3))
+        self.assertEqual(datagram_data(datagram), [1, 2, 3])
+        self.assertEqual(datagram.checksum, self.calc_checksum(pointer(self.config), [1, 2, 3]))
+        self.assertEqual(self.pool.available, 1)
+
+    def test_buffer_types(self):
+        for data in [bytearray([4, 5]), memoryview(b'\x04\x05'), (c_uint8 * 2)(4, 5)]:
+            datagram = self.pool.acquire(0, 0, data)
+            self.assertEqual(datagram_data(datagram), [4, 5])
+            self.pool.release(datagram)
+
+    def test_explicit_checksum(self):
+        datagram = self.pool.acquire(0, 0, b'\x01', checksum=0x12)
+        self.assertEqual(datagram.checksum, 0x12)
+
+    def test_reuse(self):
+        first = self.pool.acquire(0, 0, b'\x01\x02\x03\x04')
+        address = addressof(first.data.contents)
+        self.pool.release(first)
+        self.pool.acquire(0, 0, b'\x05')
+        second = self.pool.acquire(0, 0, b'\x06\x07')
+        self.assertEqual(addressof(second.data.contents), address)  # same buffer, no allocation
+        self.assertEqual(datagram_data(second), [6, 7])
+
+    def test_exhausted(self):
+        self.pool.acquire(0, 0, b'')
+        self.pool.acquire(0, 0, b'')
+        with self.assertRaises(DatagramPoolExhausted):
+            self.pool.acquire(0, 0, b'')
+
+    def test_too_long(self):
+        with self.assertRaises(AssertionError):
+            self.pool.acquire(0, 0, bytes(self.config.datagramLengthMax + 1))
+        self.assertEqual(self.pool.available, 2)
+
+    def test_foreign_release(self):
+        with self.assertRaises(AssertionError):
+            self.pool.release(self.build_datagram(service_index=0))
+
+    def test_double_release(self):
+        datagram = self.pool.acquire(0, 0, b'\x01')
+        self.pool.release(datagram)
+        with self.assertRaises(AssertionError):
+            self.pool.release(datagram)
+        self.assertEqual(self.pool.available, 2)  # (not on the free list twice)
+        self.pool.acquire(0, 0, b'')
+        self.pool.acquire(0, 0, b'')
+        with self.assertRaises(DatagramPoolExhausted):
+            self.pool.acquire(0, 0, b'')
+
+
+class DatagramPoolClosedLoopTest(ClosedLoopTestBase):
+
+    service_index = 1
+
+    def test_transmit(self):
+        pool = DatagramPool(prlsc_datagram_t, 1, self.config_tx.datagramLengthMax, self.config_tx.callbackChecksumCalc)
+        for payload in [b'\x01\x02\x03', bytes(range(10))]:
+            datagram = pool.acquire(1, 2, payload)
+            try:
+                self.send_datagrams([datagram])
+            finally:
+                pool.release(datagram)
+        self.assertEqual([bytes(datagram_data(d)) for d in self.datagrams[1]], [b'\x01\x02\x03', bytes(range(10))])
@@ -0,0 +1,79 @@
+from utilities import *
+from test_closedLoop import ClosedLoopTestBase
+
+from prlsc import DatagramView, view_handler
+
+
+class DatagramViewTest(unittest.TestCase):
+
+    def build_datagram(self, data, service_index=1, subservice_index=2):
+        return build_struct(
+            prlsc_datagram_t,
+            serviceIndex=service_index,
+            subServiceIndex=subservice_index,
+            length=len(data),
+            data__exact=build_array(uint8_t, list(data)),
+            checksum=0xAB,
+        )
+
+    def test_fields(self):
+        view = DatagramView(self.build_datagram([1, 2, 3]))
+        self.assertEqual((view.service_index, view.subservice_index, view.checksum), (1, 2, 0xAB))
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view.data.tolist(), [1, 2, 3])
+
+    def test_zero_copy(self):
+        datagram = self.build_datagram([1, 2, 3])
+        view = DatagramView(datagram)
+        datagram.data[1] = 0x55  # buffer re-used by receiver
+        self.assertEqual(view.data[1], 0x55)
+        self.assertTrue(view.data.readonly)
+
+    def test_empty(self):
+        datagram = self.build_datagram([])
+        datagram.data = POINTER(uint8_t)()  # NULL
+        view = DatagramView(datagram)
+        self.assertEqual(len(view), 0)
+        self.assertEqual(view.copy(), b'')
+
+    def test_copy(self):
+        datagram = self.build_datagram([1, 2, 3])
+        view = DatagramView(datagram)
+        data = view.copy()
+        datagram.data[0] = 0xFF
+        self.assertEqual(data, b'\x01\x02\x03')
+
+    def test_retain(self):
+        datagram = self.build_datagram([4, 5])
+        with DatagramView(datagram) as view:
+            retained = view.retain()
+        datagram.data[0] = 0xFF
+        self.assertEqual(retained.data.tolist(), [4, 5])
+        self.assertEqual((retained.service_index, retained.subservice_index), (1, 2))
+        with self.assertRaises(ValueError):
+            view.data[0]  # released
+
+    def test_view_handler(self):
+        views = []
+        handler = view_handler(views.append)
+        handler(self.build_datagram([1]))
+        with self.assertRaises(ValueError):
+            views[0].data[0]  # released once handler returned
+
+
+class DatagramViewClosedLoopTest(ClosedLoopTestBase):
+
+    service_index = 1
+
+    def test_callback(self):
+        received = []
+        callback = view_handler(lambda view: received.append(view.retain()))
+        self.config_rx.callbackReceivedDatagram = dict(prlsc_config_t._fields_)['callbackReceivedDatagram'](callback)
+        self.send_datagrams([
+            self.build_datagram(subservice_index=3, data=list(range(10)), config=self.config_tx),
+            self.build_datagram(subservice_index=4, data=[9, 8, 7], config=self.config_tx),
+        ])
+        self.assertEqual([(v.subservice_index, v.copy()) for v in received], [
+            (3, bytes(range(10))),
+            (4, b'\x09\x08\x07'),
+        ])
@@ -0,0 +1,157 @@
+import random
+
+from utilities import *
+from test_closedLoop import ClosedLoopTestBase
+
+import prlsc
+from prlsc.decoder import (
+    ArrayDecoder,
+    ERRORCODE_NONE, ERRORCODE_INCOMPLETE, ERRORCODE_RXFRAME_BAD_ESC, ERRORCODE_RXFRAME_BAD_CHECKSUM,
+    ERRORCODE_RXFRAME_SERVICEINDEX_BOUNDS, ERRORCODE_RXFRAME_TOO_LONG,
+    ERRORCODE_DATAGRAM_BAD_CHECKSUM, ERRORCODE_DATAGRAM_TOO_LONG,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def frame(service_code, data, checksum=None):
+    """:return: encoded frame bytes (checksum is calculated if not given)"""
+    body = [service_code, len(data)] + list(data)
+    body.append(((-sum(body)) & 0xFF) if checksum is None else checksum)
+    encoded = [0xC0]
+    for byte in body:
+        encoded += {0xC0: [0xDB, 0xDC], 0xDB: [0xDB, 0xDD]}.get(byte, [byte])
+    return bytes(encoded)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class ArrayDecoderTest(PrlscEngineTest):
+
+    def setUp(self):
+        super(ArrayDecoderTest, self).setUp()
+        self.decoder = ArrayDecoder(self.get_basic_config())  # [0] stream, [1] diagnostics
+
+    def test_frames(self):
+        frames = self.decoder.frames(b'\x55' + frame(0x21, [1, 0xC0, 0xDB]) + frame(0x02, []))
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(list(frames.frames['offset']), [1, 10])
+        self.assertEqual(list(frames.frames['service_code']), [0x21, 0x02])
+        self.assertEqual(list(frames.frames['error']), [ERRORCODE_NONE] * 2)
+        self.assertEqual(frames.frame_data(0).tolist(), [1, 0xC0, 0xDB])
+        self.assertEqual(frames.frame_data(1).tolist(), [])
+
+    def test_frame_errors(self):
+        frames = self.decoder.frames(b''.join([
+            frame(0x21, [1, 2], checksum=0),  # bad checksum
+            b'\xC0\x21\x05\x01',  # interrupted
+            b'\xC0\x21\x02\x01\xDB\x00\x00',  # bad escape
+            b'\xC0\xE0\x00\x00',  # service index out of bounds
+            frame(0x21, [1, 2]) + b'\xDB\x00\x55',  # valid (bytes after it are ignored)
+            b'\xC0\x21\x03\x01\xDB',  # incomplete (at end)
+        ]))
+        self.assertEqual(list(frames.frames['error']), [
+            ERRORCODE_RXFRAME_BAD_CHECKSUM, ERRORCODE_INCOMPLETE, ERRORCODE_RXFRAME_BAD_ESC,
+            ERRORCODE_RXFRAME_SERVICEINDEX_BOUNDS, ERRORCODE_NONE, ERRORCODE_INCOMPLETE,
+        ])
+        self.assertEqual(len(frames.valid), 1)
+
+    def test_frame_too_long(self):
+        config = self.get_basic_config()
+        config.frameLengthMax = 8
+        frames = ArrayDecoder(config).frames(frame(0x21, range(9)))
+        self.assertEqual(list(frames.frames['error']), [ERRORCODE_RXFRAME_TOO_LONG])
+
+    def test_datagrams(self):
+        config = self.get_basic_config()
+        config.frameLengthMax = 4
+        config.datagramLengthMax = 8
+        data = [1, 2, 3, 4, 5, 6]
+        diagnostic = data + [(-sum(data)) & 0xFF]  # 7 bytes: frames of 4 & 3
+        stream = frame(0x01, [9, 9])  # (between frames of a diagnostic datagram)
+        datagrams = ArrayDecoder(config).datagrams(ArrayDecoder(config).frames(b''.join([
+            frame(0x22, diagnostic[:4]), stream, frame(0x22, diagnostic[4:]),
+            frame(0x21, [1, 2, 3]),  # bad datagram checksum
+            frame(0x21, [1, 2, 3, 4]), frame(0x21, [1, 2, 3, 4]), frame(0x21, [1, 2]),  # too long
+            frame(0x21, []),  # empty
+            frame(0x21, [1, 2, 3, 4]),  # unfinished
+        ])))
+        self.assertEqual(list(datagrams.datagrams['service_code']), [0x01, 0x22, 0x21, 0x21, 0x21])
+        self.assertEqual(list(datagrams.datagrams['error']), [
+            ERRORCODE_NONE, ERRORCODE_NONE, ERRORCODE_DATAGRAM_BAD_CHECKSUM, ERRORCODE_DATAGRAM_TOO_LONG, ERRORCODE_NONE,
+        ])
+        self.assertEqual(datagrams.datagram_data(0).tolist(), [9, 9])
+        self.assertEqual(datagrams.datagram_data(1).tolist(), data)
+        self.assertEqual(datagrams.datagrams['checksum'][1], diagnostic[-1])
+        self.assertEqual(datagrams.datagram_data(4).tolist(), [])
+
+    def test_empty(self):
+        frames = self.decoder.frames(b'')
+        self.assertEqual(len(frames), 0)
+        self.assertEqual(len(self.decoder.datagrams(frames)), 0)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class ArrayDecoderCrossCheckTest(ClosedLoopTestBase):
+    """Array decoding of an impaired stream is the same as prlsc_receiveByte's"""
+    FRAME_MAX_LENGTH = 16  # (diagnostic datagrams span frames)
+    DATAGRAM_MAX_LENGTH = 100
+
+    def setUp(self):
+        super(ArrayDecoderCrossCheckTest, self).setUp()
+        self.config_rx.datagramLengthMax = 80  # (so some datagrams are too long)
+        self.state_tx = prlsc.init_state(data_types, self.config_tx)  # (room for a datagram of any length)
+        self.wire = bytearray()
+        def send_byte(byte):
+            self.wire.append(byte)
+        self.config_tx.callbackSendByte = dict(prlsc_config_t._fields_)['callbackSendByte'](send_byte)
+
+    def txbyte_loop(self, max_calls=1000):
+        super(ArrayDecoderCrossCheckTest, self).txbyte_loop(max_calls=max_calls)
+
+    def build_stream(self, rand, count):
+        for i in range(count):
+            service_index = rand.choice([0, 1, 1])
+            length = rand.randint(0, 15 if service_index == 0 else 99)
+            data = [rand.choice([0xC0, 0xDB, rand.randint(0, 0xFF)]) for j in range(length)]
+            self.send_datagrams([self.build_datagram(service_index=service_index, subservice_index=rand.randint(0, 31), data=data, config=self.config_tx)])
+
+        # impairments: bit flips, dropped & inserted bytes
+        wire = bytearray()
+        for byte in self.wire:
+            r = rand.random()
+            if r < 0.002:
+                continue
+            elif r < 0.004:
+                byte ^= 1 << rand.randint(0, 7)
+            elif r < 0.006:
+                wire.append(rand.choice([0xC0, 0xDB, rand.randint(0, 0xFF)]))
+            wire.append(byte)
+        return bytes(wire)
+
+    def test_cross_check(self):
+        for seed in range(4):
+            self.setUp()
+            received = []  # (in the order they were passed up)
+            def receive_datagram(datagram):
+                received.append((datagram.serviceIndex, datagram.subServiceIndex, tuple(datagram_data(datagram)), datagram.checksum))
+            self.config_rx.callbackReceivedDatagram = dict(prlsc_config_t._fields_)['callbackReceivedDatagram'](receive_datagram)
+
+            wire = self.build_stream(random.Random(seed), 300)
+            for byte in wire:
+                prlsc_receiveByte(pointer(self.config_rx), pointer(self.state_rx), byte)
+
+            decoder = ArrayDecoder(self.config_rx)
+            frames = decoder.frames(wire)
+            datagrams = decoder.datagrams(frames)
+            decoded = [
+                (d['service_code'] >> 5, d['service_code'] & 0x1F, tuple(datagrams.datagram_data(i).tolist()), d['checksum'])
+                for (i, d) in enumerate(datagrams.datagrams) if d['error'] == ERRORCODE_NONE
+            ]
+            self.assertEqual(decoded, received)
+            self.assertEqual(len(frames.valid) & 0xFF, self.state_rx.receiver.frame.framesReceived)
+            self.assertGreater(len(received), 100)
+            self.assertLess(len(frames.valid), len(frames))  # (impairments had an effect)
+            self.assertIn(ERRORCODE_DATAGRAM_TOO_LONG, datagrams.datagrams['error'])
@@ -0,0 +1,174 @@
+from utilities import *
+from test_closedLoop import ClosedLoopTestBase
+
+from prlsc import Dispatcher, DiagnosticsClient, DiagnosticsTimeout
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.value = 0.0
+
+    def __call__(self):
+        return self.value
+
+
+class FakeResponse(object):
+    """Looks enough like a prlsc_datagram_t for DiagnosticsClient.receive"""
+    def __init__(self, service_index, subservice_index, data):
+        self._data = build_array(c_uint8, list(data) or [0])
+        self.serviceIndex = service_index
+        self.subServiceIndex = subservice_index
+        self.length = len(data)
+        self.data = cast(self._data, POINTER(c_uint8))
+
+
+class DiagnosticsClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sent = []  # (subservice_index, data)
+        self.buffer_full = False
+        self.client = DiagnosticsClient(1, self.transmit, timeout=1.0, get_time=self.clock)
+
+    def transmit(self, service_index, subservice_index, data):
+        self.assertEqual(service_index, 1)
+        if self.buffer_full:
+            return False
+        self.sent.append((subservice_index, data))
+        return True
+
+    def respond(self, tag, data):
+        self.client.receive(FakeResponse(1, tag, data))
+
+    def test_single(self):
+        future = self.client.request(b'\x01\x02')
+        self.assertEqual(self.sent, [(0, b'\x01\x02')])
+        self.assertFalse(future.done())
+        self.respond(0, b'\x03')
+        self.assertEqual(future.result(timeout=0), b'\x03')
+        self.assertEqual(self.client.outstanding, 0)
+
+    def test_pipelined(self):
+        futures = [self.client.request([i]) for i in range(5)]
+        self.assertEqual([tag for (tag, _) in self.sent], [0, 1, 2, 3, 4])  # all sent without waiting
+        self.assertEqual(self.client.outstanding, 5)
+        # responses out of order
+        for tag in [3, 0, 4, 1, 2]:
+            self.respond(tag, [tag * 10])
+        self.assertEqual([f.result(timeout=0) for f in futures], [bytes([i * 10]) for i in range(5)])
+
+    def test_tags_exhausted(self):
+        futures = [self.client.request([i]) for i in range(40)]
+        self.assertEqual(self.client.outstanding, 32)
+        self.assertEqual(self.client.queued, 8)
+        self.respond(5, b'')
+        self.assertEqual(futures[5].result(timeout=0), b'')
+        self.assertEqual(self.sent[-1], (5, bytes([32])))  # freed tag is immediately re-used
+        self.assertEqual(self.client.queued, 7)
+
+    def test_buffer_full(self):
+        self.buffer_full = True
+        future = self.client.request(b'\x01')
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.client.queued, 1)
+        self.buffer_full = False
+        self.client.poll()
+        self.assertEqual(self.sent, [(0, b'\x01')])
+        self.assertFalse(future.done())
+
+    def test_timeout(self):
+        slow = self.client.request(b'\x01', timeout=0.5)
+        fast = self.client.request(b'\x02')
+        self.clock.value = 0.6
+        self.client.poll()
+        with self.assertRaises(DiagnosticsTimeout):
+            slow.result(timeout=0)
+        self.assertFalse(fast.done())
+        self.respond(1, b'\x22')
+        self.assertEqual(fast.result(timeout=0), b'\x22')
+
+    def test_timeout_queued(self):
+        self.buffer_full = True
+        future = self.client.request(b'\x01')
+        self.clock.value = 1.0
+        self.client.poll()
+        with self.assertRaises(DiagnosticsTimeout):
+            future.result(timeout=0)
+        self.assertEqual(self.client.queued, 0)
+
+    def test_timeout_queued_mixed(self):
+        # a short timeout queued behind a longer one still expires
+        self.buffer_full = True
+        patient = self.client.request(b'\x01', timeout=100)
+        hasty = self.client.request(b'\x02', timeout=0.1)
+        self.clock.value = 5.0
+        self.client.poll()
+        with self.assertRaises(DiagnosticsTimeout):
+            hasty.result(timeout=0)
+        self.assertFalse(patient.done())
+        self.assertEqual(self.client.queued, 1)
+        self.buffer_full = False
+        self.client.poll()
+        self.assertEqual(self.sent, [(0, b'\x01')])
+
+    def test_late_response(self):
+        first = self.client.request(b'\x01')
+        self.clock.value = 1.0
+        self.client.poll()  # first times out; tag 0 held
+        second = self.client.request(b'\x02')
+        self.assertEqual(self.sent[-1], (1, b'\x02'))  # tag 0 not re-used
+        self.respond(0, b'\xFF')  # late response to first request
+        self.assertFalse(second.done())
+        self.assertIsInstance(first.exception(timeout=0), DiagnosticsTimeout)
+        # tag is released after holdoff
+        self.clock.value = 2.0
+        self.client.poll()
+        self.client.request(b'\x03')
+        self.assertIn(self.sent[-1][0], [0, 2])
+
+    def test_unsolicited(self):
+        self.respond(7, b'\x01')  # ignored
+        self.assertEqual(self.client.outstanding, 0)
+
+    def test_cancelled(self):
+        self.buffer_full = True
+        first = self.client.request(b'\x01')  # first in line: no longer cancellable
+        second = self.client.request(b'\x02')
+        self.assertFalse(first.cancel())
+        self.assertTrue(second.cancel())
+        self.buffer_full = False
+        self.client.poll()
+        self.assertEqual(self.sent, [(0, b'\x01')])
+        self.assertEqual(self.client.queued, 0)
+
+
+class DiagnosticsClientClosedLoopTest(ClosedLoopTestBase):
+
+    service_index = 1
+
+    def setUp(self):
+        super(DiagnosticsClientClosedLoopTest, self).setUp()
+        self.clock = FakeClock()
+        self.client = DiagnosticsClient(1, self.transmit, get_time=self.clock)
+        # server end: collect requests
+        self.requests = []
+        self.dispatcher = Dispatcher()
+        self.dispatcher.register_service(1, lambda d: self.requests.append((d.subServiceIndex, datagram_data(d))))
+        self.dispatcher.install(self.config_rx)
+
+    def transmit(self, service_index, subservice_index, data):
+        datagram = self.build_datagram(
+            service_index=service_index, subservice_index=subservice_index,
+            data=list(data), config=self.config_tx,
+        )
+        return self._prlsc.prlsc_transmitDatagram(pointer(self.config_tx), pointer(self.state_tx), datagram) > 0
+
+    def test_pipelined(self):
+        futures = [self.client.request([i, i]) for i in range(3)]
+        self.send_datagrams([])  # transmit buffered requests
+        self.assertEqual(self.requests, [(0, [0, 0]), (1, [1, 1]), (2, [2, 2])])
+        for (tag, data) in reversed(self.requests):
+            self.client.receive(self.build_datagram(
+                service_index=1, subservice_index=tag, data=[sum(data)], config=self.config_rx,
+            ))
+        self.assertEqual([f.result(timeout=0) for f in futures], [b'\x00', b'\x02', b'\x04'])
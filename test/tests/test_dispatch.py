@@ -0,0 +1,178 @@
+from utilities import *
+from test_receiveFrame import DatagramTest
+from test_closedLoop import ClosedLoopTestBase
+
+from prlsc import Dispatcher
+
+
+class HandlerRecorder(object):
+    """Builds c handlers that record (name, serviceIndex, subServiceIndex, data) of each datagram received"""
+
+    def __init__(self):
+        self.received = []
+        self._handlers = []  # retained to avoid garbage collection
+
+    def handler(self, name):
+        def callback(datagram):
+            self.received.append((name, datagram.serviceIndex, datagram.subServiceIndex, datagram_data(datagram)))
+        c_handler = prlsc_datagramHandler_t(callback)
+        self._handlers.append(c_handler)
+        return c_handler
+
+
+class HandlerTableTest(DatagramTest):
+
+    def setUp(self):
+        super(HandlerTableTest, self).setUp()
+        self.recorder = HandlerRecorder()
+        self.handlers = (prlsc_datagramHandler_t * (self.config.serviceCount * PRLSC_SUBSERVICE_COUNT))()
+        self.config.handlers = self.handlers
+        self.config.callbackReceivedDatagram = self.recorder.handler('default')
+
+    def register(self, service_index, subservice_index, handler):
+        return self._prlsc.prlsc_registerHandler(pointer(self.config), service_index, subservice_index, handler)
+
+    def test_register(self):
+        handler = self.recorder.handler('a')
+        self.assertEqual(self.register(1, 5, handler), TRUE)
+        self.assertTrue(self.handlers[(1 * 32) + 5])
+        self.assertEqual(sum(1 for h in self.handlers if h), 1)
+
+    def test_register_bounds(self):
+        handler = self.recorder.handler('a')
+        self.assertEqual(self.register(2, 0, handler), FALSE)  # serviceCount = 2
+        self.assertEqual(self.register(0, 32, handler), FALSE)
+        self.assertEqual(sum(1 for h in self.handlers if h), 0)
+
+    def test_register_no_table(self):
+        self.config.handlers = None
+        self.assertEqual(self.register(0, 0, self.recorder.handler('a')), FALSE)
+
+    def test_lookup(self):
+        self.register(0, 3, self.recorder.handler('a'))
+        find = lambda code: self._prlsc.prlsc_datagramHandler(pointer(self.config), code)
+        find(build_service_code(0, 3))(self.build_datagram(service_index=0, data=[1]))
+        find(build_service_code(0, 4))(self.build_datagram(service_index=0, data=[2]))  # default
+        find(build_service_code(7, 0))(self.build_datagram(service_index=0, data=[3]))  # out of bounds: default
+        self.assertEqual([r[0] for r in self.recorder.received], ['a', 'default', 'default'])
+
+    def test_stream_dispatch(self):
+        self.register(0, 1, self.recorder.handler('a'))
+        self.register(0, 2, self.recorder.handler('b'))
+        for (subservice_index, data) in [(1, [1]), (2, [2]), (3, [3]), (1, [4])]:
+            frame = self.build_frame(serviceIndex=0, subServiceIndex=subservice_index, data=data)
+            self._prlsc.prlsc_receiveFrame(pointer(self.config), pointer(self.state), frame)
+        self.assertEqual(self.recorder.received, [
+            ('a', 0, 1, [1]),
+            ('b', 0, 2, [2]),
+            ('default', 0, 3, [3]),
+            ('a', 0, 1, [4]),
+        ])
+
+    def test_diag_dispatch(self):
+        self.register(1, 7, self.recorder.handler('a'))
+        self.config.frameLengthMax = 4
+        for frame in self.build_diag_frames(subservice_index=7, frame_max_data=4, data=list(range(10))):
+            self._prlsc.prlsc_receiveFrame(pointer(self.config), pointer(self.state), frame)
+        self.assertEqual(self.recorder.received, [('a', 1, 7, list(range(10)))])
+
+    def test_drop_unhandled(self):
+        self.config.callbackReceivedDatagram = prlsc_datagramHandler_t()  # no default
+        self.register(1, 7, self.recorder.handler('a'))
+        self.config.frameLengthMax = 4
+        # unhandled datagram is not buffered
+        for frame in self.build_diag_frames(subservice_index=6, frame_max_data=4, data=list(range(10))):
+            self._prlsc.prlsc_receiveFrame(pointer(self.config), pointer(self.state), frame)
+            self.assertEqual(self.state.receiver.datagram[1].curIdx, 0)
+        # handled datagram that follows is received intact
+        for frame in self.build_diag_frames(subservice_index=7, frame_max_data=4, data=[1, 2, 3]):
+            self._prlsc.prlsc_receiveFrame(pointer(self.config), pointer(self.state), frame)
+        self.assertEqual(self.recorder.received, [('a', 1, 7, [1, 2, 3])])
+
+
+class DispatcherTest(unittest.TestCase):
+
+    class FakeDatagram(object):
+        def __init__(self, service_index, subservice_index):
+            self.serviceIndex = service_index
+            self.subServiceIndex = subservice_index
+
+    def setUp(self):
+        self.received = []
+        self.dispatcher = Dispatcher()
+
+    def recorder(self, name):
+        return lambda datagram: self.received.append((name, datagram.serviceIndex, datagram.subServiceIndex))
+
+    def test_register(self):
+        self.dispatcher.register(0, 1, self.recorder('a'))
+        self.dispatcher(self.FakeDatagram(0, 1))
+        self.dispatcher(self.FakeDatagram(0, 2))  # dropped
+        self.assertEqual(self.received, [('a', 0, 1)])
+
+    def test_default(self):
+        self.dispatcher.register(0, 1, self.recorder('a'))
+        self.dispatcher.default = self.recorder('default')
+        self.dispatcher(self.FakeDatagram(0, 1))
+        self.dispatcher(self.FakeDatagram(7, 31))
+        self.assertEqual(self.received, [('a', 0, 1), ('default', 7, 31)])
+
+    def test_unregister(self):
+        self.dispatcher.default = self.recorder('default')
+        self.dispatcher.register(3, 3, self.recorder('a'))
+        self.dispatcher.unregister(3, 3)
+        self.dispatcher(self.FakeDatagram(3, 3))
+        self.assertEqual(self.received, [('default', 3, 3)])
+
+    def test_register_service(self):
+        self.dispatcher.register_service(2, self.recorder('a'))
+        self.dispatcher.register(2, 4, self.recorder('b'))
+        for subservice_index in range(32):
+            self.dispatcher(self.FakeDatagram(2, subservice_index))
+        self.assertEqual([r[0] for r in self.received], ['a'] * 4 + ['b'] + ['a'] * 27)
+
+    def test_handler(self):
+        handler = self.recorder('a')
+        self.dispatcher.register(1, 1, handler)
+        self.assertIs(self.dispatcher.handler(1, 1), handler)
+        self.assertIsNone(self.dispatcher.handler(1, 2))
+
+    def test_bounds(self):
+        with self.assertRaises(AssertionError):
+            self.dispatcher.register(8, 0, self.recorder('a'))
+        with self.assertRaises(AssertionError):
+            self.dispatcher.register(0, 32, self.recorder('a'))
+
+
+class DispatcherClosedLoopTest(ClosedLoopTestBase):
+
+    service_index = 0
+
+    def setUp(self):
+        super(DispatcherClosedLoopTest, self).setUp()
+        self.received = []
+        self.dispatcher = Dispatcher()
+        self.dispatcher.install(self.config_rx)
+
+    def recorder(self, name):
+        return lambda datagram: self.received.append((name, datagram.subServiceIndex, datagram_data(datagram)))
+
+    def test_installed(self):
+        self.dispatcher.register(0, 1, self.recorder('a'))
+        self.dispatcher.register(1, 2, self.recorder('b'))  # registered after installation
+        self.send_datagrams([
+            self.build_datagram(service_index=0, subservice_index=1, data=[1], config=self.config_tx),
+            self.build_datagram(service_index=0, subservice_index=2, data=[2], config=self.config_tx),  # dropped
+            self.build_datagram(service_index=1, subservice_index=2, data=[3], config=self.config_tx),
+        ])
+        self.assertEqual(sorted(self.received), [('a', 1, [1]), ('b', 2, [3])])
+        self.assertEqual(self.state_rx.receiver.frame.framesReceived, 3)
+
+    def test_installed_default(self):
+        self.dispatcher.register(0, 1, self.recorder('a'))
+        self.dispatcher.default = self.recorder('default')
+        self.send_datagrams([
+            self.build_datagram(service_index=0, subservice_index=1, data=[1], config=self.config_tx),
+            self.build_datagram(service_index=0, subservice_index=2, data=[2], config=self.config_tx),
+        ])
+        self.assertEqual(self.received, [('a', 1, [1]), ('default', 2, [2])])
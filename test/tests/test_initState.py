@@ -0,0 +1,114 @@
+from utilities import *
+import test_closedLoop
+
+from prlsc import init_state
+
+POINTER_SIZE = sizeof(ctypes.c_void_p)
+align = lambda size: ((size + POINTER_SIZE - 1) // POINTER_SIZE) * POINTER_SIZE
+
+
+class InitStateTest(PrlscEngineTest):
+
+    def setUp(self):
+        super(InitStateTest, self).setUp()
+        self.config = self.get_basic_config()  # frameLengthMax = 0xFF, datagramLengthMax = 0x1FF
+
+    def test_buffer_sizes(self):
+        self.assertEqual(prlsc_rxDatagramBufferSize(pointer(self.config), 0), 0xFF)  # stream
+        self.assertEqual(prlsc_rxDatagramBufferSize(pointer(self.config), 1), 0x1FF + 1)  # diag
+        self.assertEqual(prlsc_txBufferSize(pointer(self.config), 0), 0xFF + 4 + 1)
+        # diag: 0x1FF data + 1 checksum, over 3 frames (last is empty), + 1 unused byte
+        self.assertEqual(prlsc_txBufferSize(pointer(self.config), 1), (0x1FF + 1) + (3 * 4) + 1)
+
+    def test_tx_depth(self):
+        self.config.services[0].txDatagramDepth = 2
+        self.assertEqual(prlsc_txBufferSize(pointer(self.config), 0), ((0xFF + 4) * 2) + 1)
+
+    def test_tx_size_too_large(self):
+        self.config.datagramLengthMax = 0xFFFF
+        self.assertEqual(prlsc_txBufferSize(pointer(self.config), 1), 0)
+        self.assertEqual(prlsc_stateSize(pointer(self.config)), 0)
+
+    def test_state_size(self):
+        expected = sum([
+            align(2 * sizeof(prlsc_rxDatagramState_t)),
+            align(2 * sizeof(prlsc_transmitterBuffer_t)),
+            align(2 * sizeof(prlsc_time_t)),
+            3 * align(0xFF + 4),
+            align(0xFF), align(0xFF + 4 + 1),
+            align(0x1FF + 1), align((0x1FF + 1) + (3 * 4) + 1),
+        ])
+        self.assertEqual(prlsc_stateSize(pointer(self.config)), expected)
+
+    def test_invalid_config(self):
+        self.config.serviceCount = 0
+        self.assertEqual(prlsc_stateSize(pointer(self.config)), 0)
+        self.config.serviceCount = 9
+        self.assertEqual(prlsc_stateSize(pointer(self.config)), 0)
+
+    def test_layout(self):
+        state = init_state(data_types, self.config)
+        arena_start = addressof(state.arena)
+        arena_end = arena_start + sizeof(state.arena)
+        regions = [
+            (addressof(state.receiver.datagram.contents), 2 * sizeof(prlsc_rxDatagramState_t)),
+            (addressof(state.transmitterBuffer.contents), 2 * sizeof(prlsc_transmitterBuffer_t)),
+            (addressof(state.lastTransmitted.contents), 2 * sizeof(prlsc_time_t)),
+            (addressof(state.receiver.frame.buffer.contents), 0xFF + 4),
+            (addressof(state.transmitter.frameBuffer.contents), 0xFF + 4),
+            (addressof(state.transmitter.transmitBuffer.contents), 0xFF + 4),
+        ]
+        for i in range(2):
+            regions.append((addressof(state.receiver.datagram[i].buffer.contents), prlsc_rxDatagramBufferSize(pointer(self.config), i)))
+            regions.append((addressof(state.transmitterBuffer[i].buffer.contents), state.transmitterBuffer[i].bufferSize))
+        regions.sort()
+        for (address, size) in regions:
+            self.assertEqual(address % POINTER_SIZE, 0)  # aligned
+            self.assertGreaterEqual(address, arena_start)
+            self.assertLessEqual(address + size, arena_end)
+        for ((a, a_size), (b, _)) in zip(regions, regions[1:]):
+            self.assertLessEqual(a + a_size, b)  # no overlap
+
+    def test_reset(self):
+        state = self.get_basic_state()
+        state.errorCode = PRLSC_ERRORCODE_RXFRAME_BAD_ESC
+        state.receiver.frame.state = PRLSC_RXFRAMESTATE_COLLECTING
+        state.transmitter.state = PRLSC_TXBYTESTATE_NORMAL_BYTE
+        init_state(data_types, self.config, state)
+        self.assertEqual(state.errorCode, PRLSC_ERRORCODE_NONE)
+        self.assertEqual(state.receiver.frame.state, PRLSC_RXFRAMESTATE_WAIT_STARTBYTE)
+        self.assertEqual(state.transmitter.state, PRLSC_TXBYTESTATE_DO_NOTHING)
+        self.assertEqual((state.transmitterBuffer[1].bufferIdx, state.transmitterBuffer[1].txIdx), (0, 0))
+
+    def test_arena_too_small(self):
+        size = prlsc_stateSize(pointer(self.config))
+        arena = (ctypes.c_void_p * (size // POINTER_SIZE))()
+        state = prlsc_state_t()
+        arena_ptr = cast(arena, POINTER(c_uint8))
+        self.assertEqual(prlsc_initState(pointer(self.config), pointer(state), arena_ptr, size - 1), FALSE)
+        self.assertEqual(prlsc_initState(pointer(self.config), pointer(state), arena_ptr, size), TRUE)
+
+    def test_arena_misaligned(self):
+        size = prlsc_stateSize(pointer(self.config))
+        arena = (ctypes.c_void_p * ((size // POINTER_SIZE) + 1))()
+        misaligned = cast(addressof(arena) + 1, POINTER(c_uint8))
+        self.assertEqual(prlsc_initState(pointer(self.config), pointer(prlsc_state_t()), misaligned, size), FALSE)
+
+
+# --- Closed loop tests, with states allocated by prlsc_initState
+class ArenaStateMixin(object):
+
+    def setUp(self):
+        super(ArenaStateMixin, self).setUp()
+        for config in (self.config_tx, self.config_rx):
+            config.services[0].txDatagramDepth = 2  # streams are double buffered
+        self.state_tx = init_state(data_types, self.config_tx)
+        self.state_rx = init_state(data_types, self.config_rx)
+
+
+class ArenaClosedLoopStreamTest(ArenaStateMixin, test_closedLoop.ClosedLoopStreamTest):
+    pass
+
+
+class ArenaClosedLoopDiagTest(ArenaStateMixin, test_closedLoop.ClosedLoopDiagTest):
+    pass
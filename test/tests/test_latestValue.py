@@ -0,0 +1,107 @@
+import tempfile
+import multiprocessing
+
+from utilities import *
+from test_closedLoop import ClosedLoopTestBase
+
+from prlsc import LatestValueStore, LatestValueBusy
+
+
+def _read_in_subprocess(filename, queue):
+    with LatestValueStore.attach(filename) as store:
+        queue.put(store.read(0, 3))
+
+
+class LatestValueStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = LatestValueStore.create(value_size_max=8)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_empty(self):
+        self.assertIsNone(self.store.read(0, 0))
+        self.assertEqual(self.store.version(0, 0), 0)
+
+    def test_update(self):
+        self.store.update(0, 1, b'\x01\x02\x03')
+        self.assertEqual(self.store.read(0, 1), (2, b'\x01\x02\x03'))
+        self.assertIsNone(self.store.read(0, 0))  # other slots untouched
+        self.assertIsNone(self.store.read(1, 1))
+
+    def test_latest_only(self):
+        self.store.update(2, 0, bytearray([1, 2, 3, 4]))
+        self.store.update(2, 0, memoryview(b'\x05\x06'))
+        self.assertEqual(self.store.read(2, 0), (4, b'\x05\x06'))
+
+    def test_empty_value(self):
+        self.store.update(7, 0x1F, b'')
+        self.assertEqual(self.store.read(7, 0x1F), (2, b''))
+
+    def test_too_long(self):
+        with self.assertRaises(AssertionError):
+            self.store.update(0, 0, b'\x00' * 9)
+
+    def test_stalled_writer(self):
+        self.store.update(0, 2, b'\x01')
+        self.store._slots[2].version = 3  # writer stopped mid-update
+        with self.assertRaises(LatestValueBusy):
+            self.store.read(0, 2, retries=200)  # (spins, then yields)
+        self.store._slots[2].version = 4
+        self.assertEqual(self.store.read(0, 2), (4, b'\x01'))
+
+    def test_version_wrap(self):
+        self.store._slots[0].version = 0xFFFFFFFE
+        self.store.update(0, 0, b'\x01')
+        self.assertEqual(self.store.read(0, 0), (2, b'\x01'))
+
+    def test_attach(self):
+        with tempfile.NamedTemporaryFile() as fh:
+            with LatestValueStore.create(fh.name, value_size_max=4) as writer:
+                with LatestValueStore.attach(fh.name) as reader:
+                    self.assertEqual(reader.value_size_max, 4)
+                    self.assertIsNone(reader.read(0, 3))
+                    writer.update(0, 3, b'\xAA\x55')
+                    self.assertEqual(reader.read(0, 3), (2, b'\xAA\x55'))
+
+    def test_attach_bad_file(self):
+        with tempfile.NamedTemporaryFile() as fh:
+            fh.write(b'\x00' * 64)
+            fh.flush()
+            with self.assertRaises(ValueError):
+                LatestValueStore.attach(fh.name)
+
+    def test_reader_process(self):
+        with tempfile.NamedTemporaryFile() as fh:
+            with LatestValueStore.create(fh.name) as writer:
+                writer.update(0, 3, b'\x10\x20\x30')
+                queue = multiprocessing.Queue()
+                process = multiprocessing.Process(target=_read_in_subprocess, args=(fh.name, queue))
+                process.start()
+                process.join()
+                self.assertEqual(queue.get(timeout=1), (2, b'\x10\x20\x30'))
+
+
+class LatestValueClosedLoopTest(ClosedLoopTestBase):
+
+    service_index = 0
+
+    def setUp(self):
+        super(LatestValueClosedLoopTest, self).setUp()
+        self.store = LatestValueStore.create()
+        self.config_rx.callbackReceivedDatagram = dict(prlsc_config_t._fields_)['callbackReceivedDatagram'](
+            self.store.update_datagram
+        )
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_stream(self):
+        self.send_datagrams([
+            self.build_datagram(data=[1, 2, 3], subservice_index=4, config=self.config_tx),
+            self.build_datagram(data=[4, 5, 6], subservice_index=4, config=self.config_tx),
+            self.build_datagram(data=[7], subservice_index=5, config=self.config_tx),
+        ])
+        self.assertEqual(self.store.read(0, 4), (4, b'\x04\x05\x06'))
+        self.assertEqual(self.store.read(0, 5), (2, b'\x07'))
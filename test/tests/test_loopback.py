@@ -0,0 +1,156 @@
+from utilities import *
+
+from prlsc import init_state
+
+FIFO_SIZE = 4
+config_field = dict(prlsc_config_t._fields_)
+
+
+def c_callback(name, func):
+    """config callback field value for a C function (of the loaded library)"""
+    return config_field[name](ctypes.cast(func, ctypes.c_void_p).value)
+
+
+class LoopbackTestBase(PrlscEngineTest):
+
+    def setUp(self):
+        super(LoopbackTestBase, self).setUp()
+        self.config_a = self.get_basic_config()  # [0] stream (rateLimit = 100), [1] diagnostics
+        self.config_b = self.get_basic_config()
+        self.state_a = init_state(data_types, self.config_a)
+        self.state_b = init_state(data_types, self.config_b)
+        for config in (self.config_a, self.config_b):
+            config.callbackReceivedDatagram = c_callback('callbackReceivedDatagram', prlsc_loopback_receivedDatagram)
+            config.callbackChecksumCalc = c_callback('callbackChecksumCalc', prlsc_loopback_checksumCalc)
+        self.link = prlsc_loopback_t()
+        self.fifo = (uint8_t * (2 * FIFO_SIZE))()
+        self.init_link()
+
+    def init_link(self, impairments=None):
+        prlsc_loopback_init(
+            pointer(self.link),
+            pointer(self.config_a), pointer(self.state_a),
+            pointer(self.config_b), pointer(self.state_b),
+            self.fifo, FIFO_SIZE,
+            pointer(impairments) if impairments is not None else None,
+        )
+
+    def transmit(self, config, state, service_index, data, count=1):
+        datagram = self.build_datagram(service_index=service_index, data=data, config=config)
+        for i in range(count):
+            self.assertGreater(prlsc_transmitDatagram(pointer(config), pointer(state), datagram), 0)
+
+    def run_until_idle(self, max_steps=100000):
+        steps = 0
+        while not prlsc_loopback_idle(pointer(self.link)):
+            prlsc_loopback_pump(pointer(self.link), 100)
+            steps += 100
+            self.assertLess(steps, max_steps, "link never became idle")
+        return steps
+
+
+class LoopbackTest(LoopbackTestBase):
+
+    def test_idle(self):
+        self.assertTrue(prlsc_loopback_idle(pointer(self.link)))
+        self.assertEqual(prlsc_loopback_pump(pointer(self.link), 10), 0)
+        self.assertEqual(self.link.time, 10)
+
+    def test_datagram(self):
+        received = []
+        def receive_datagram(datagram):
+            received.append((datagram.serviceIndex, datagram_data(datagram)))
+        self.config_b.callbackReceivedDatagram = config_field['callbackReceivedDatagram'](receive_datagram)
+
+        self.transmit(self.config_a, self.state_a, 1, [1, 2, 0xC0, 0xDB, 5])
+        self.run_until_idle()
+        self.assertEqual(received, [(1, [1, 2, 0xC0, 0xDB, 5])])
+        self.assertEqual(self.link.endpointA.bytesSent, 4 + 6 + 2)  # start, serviceCode, length & checksum; data & datagram checksum; 2 escapes
+        self.assertEqual(self.link.endpointB.bytesDelivered, self.link.endpointA.bytesSent)
+
+    def test_both_directions(self):
+        self.transmit(self.config_a, self.state_a, 1, list(range(100)), count=3)
+        self.transmit(self.config_b, self.state_b, 1, [1, 2, 3], count=2)
+        self.run_until_idle()
+        self.assertEqual((self.link.endpointB.datagramsReceived, self.link.endpointB.datagramBytesReceived), (3, 300))
+        self.assertEqual((self.link.endpointA.datagramsReceived, self.link.endpointA.datagramBytesReceived), (2, 6))
+        for state in (self.state_a, self.state_b):
+            self.assertEqual(state.errorCode, PRLSC_ERRORCODE_NONE)
+
+    def test_one_byte_per_step(self):
+        self.transmit(self.config_a, self.state_a, 1, [1, 2, 3])
+        self.assertEqual(prlsc_loopback_pump(pointer(self.link), 4), 4)
+        self.assertEqual(self.link.endpointB.bytesDelivered, 4)
+        self.assertFalse(prlsc_loopback_idle(pointer(self.link)))
+
+    def test_rate_limit(self):
+        # stream service: frames are sent (at most) every rateLimit ticks of link time
+        # (from lastTransmitted = 0, so the first frame waits too)
+        for i in range(3):
+            self.transmit(self.config_a, self.state_a, 0, [i])
+            self.run_until_idle()
+        self.assertEqual(self.link.endpointB.datagramsReceived, 3)
+        self.assertGreaterEqual(self.link.time, 3 * self.config_a.services[0].rateLimit)
+
+        # diagnostics service isn't limited
+        time = self.link.time
+        for i in range(3):
+            self.transmit(self.config_a, self.state_a, 1, [i])
+        self.run_until_idle()
+        self.assertEqual(self.link.endpointB.datagramsReceived, 6)
+        self.assertLessEqual(self.link.time - time, 100)
+
+    def test_endpoint(self):
+        self.assertEqual(
+            addressof(prlsc_loopback_endpoint(pointer(self.link), PRLSC_LOOPBACK_ENDPOINT_B).contents),
+            addressof(self.link.endpointB),
+        )
+
+
+class LoopbackImpairmentsTest(LoopbackTestBase):
+
+    def impaired_run(self, **kwargs):
+        self.init_link(build_struct(prlsc_loopbackImpairments_t, **kwargs))
+        for i in range(20):
+            self.transmit(self.config_a, self.state_a, 1, list(range(50)))
+            self.run_until_idle()
+        return self.link.endpointB.datagramsReceived
+
+    def test_drop(self):
+        received = self.impaired_run(seed=1, dropPeriod=200)
+        self.assertGreater(self.link.stats.bytesDropped, 0)
+        self.assertLess(received, 20)
+        self.assertGreater(received, 0)
+
+    def test_bit_flip(self):
+        received = self.impaired_run(seed=1, bitFlipPeriod=200)
+        self.assertGreater(self.link.stats.bitFlips, 0)
+        self.assertLess(received, 20)
+        self.assertNotEqual(self.state_b.errorCode, PRLSC_ERRORCODE_NONE)
+
+    def test_insert_start(self):
+        received = self.impaired_run(seed=1, insertStartPeriod=200)
+        self.assertGreater(self.link.stats.startBytesInserted, 0)
+        self.assertLess(received, 20)
+
+    def test_deterministic(self):
+        results = []
+        for i in range(2):
+            self.setUp()
+            received = self.impaired_run(seed=1234, dropPeriod=300, bitFlipPeriod=300, insertStartPeriod=300)
+            stats = self.link.stats
+            results.append((received, stats.bytesDropped, stats.bitFlips, stats.startBytesInserted))
+        self.assertEqual(results[0], results[1])
+        self.setUp()
+        received = self.impaired_run(seed=4321, dropPeriod=300, bitFlipPeriod=300, insertStartPeriod=300)
+        self.assertNotEqual((received, self.link.stats.bytesDropped), results[0][:2])
+
+    def test_recovery(self):
+        self.impaired_run(seed=7, dropPeriod=100, bitFlipPeriod=100)
+        received = self.link.endpointB.datagramsReceived
+        prlsc_loopback_setImpairments(pointer(self.link), None)
+        for i in range(5):
+            self.transmit(self.config_a, self.state_a, 1, list(range(50)))
+            self.run_until_idle()
+        # (the first may be lost; the receiver may still be part way through a corrupt frame)
+        self.assertGreaterEqual(self.link.endpointB.datagramsReceived - received, 4)
@@ -0,0 +1,55 @@
+from utilities import *
+
+from prlsc import profile_counters, profiling_enabled
+from test_loopback import LoopbackTestBase
+
+
+@unittest.skipUnless(profiling_enabled(data_types), "library not compiled with PRLSC_PROFILE (make test PROFILE=1)")
+class ProfileTest(LoopbackTestBase):
+
+    def counters(self, state):
+        return profile_counters(data_types, state)
+
+    def test_initialised(self):
+        counters = self.counters(self.state_a)
+        self.assertEqual(len(counters), 5 + (2 * 4) + (3 * 3) + (4 * 4))  # every counter is dumped
+        self.assertEqual(list(counters.keys())[:2], ['callbackGetTime', 'callbackChecksumCalc'])
+        self.assertIn('rxFrameTransitions.COLLECTING.ESC', counters)
+        self.assertEqual(set(counters.values()), {0})
+
+    def test_datagram(self):
+        self.transmit(self.config_a, self.state_a, 1, [1, 2, 0xC0, 0xDB, 5])  # diagnostics service (2 escapes)
+        self.run_until_idle()
+        bytes_sent = self.link.endpointA.bytesSent
+        self.assertEqual(bytes_sent, 12)
+
+        tx = self.counters(self.state_a)
+        self.assertEqual(tx['callbackSendByte'], bytes_sent)
+        self.assertEqual(sum(v for (k, v) in tx.items() if k.startswith('txByteTransitions.')), bytes_sent)
+        self.assertEqual(tx['txByteTransitions.NORMAL_BYTE.ESCAPED_BYTE'], 2)
+        self.assertEqual((tx['memcpyCalls.txFrame'], tx['memcpyBytes.txFrame']), (1, 5))
+        self.assertEqual((tx['callbackChecksumCalc'], tx['checksumBytes']), (1, 2 + 6))  # frame: serviceCode, length & data (with datagram checksum)
+        self.assertEqual(tx['memcpyBytes.flat2circular'], 4 + 6)
+        self.assertEqual(tx['callbackReceivedDatagram'], 0)
+
+        rx = self.counters(self.state_b)
+        self.assertEqual(sum(v for (k, v) in rx.items() if k.startswith('rxFrameTransitions.')), bytes_sent)
+        self.assertEqual(rx['rxFrameTransitions.WAIT_STARTBYTE.COLLECTING'], 1)
+        self.assertEqual(rx['rxFrameTransitions.COLLECTING.ESC'], 2)
+        self.assertEqual(rx['rxFrameTransitions.ESC.COLLECTING'], 2)
+        self.assertEqual(rx['rxFrameTransitions.COLLECTING.WAIT_STARTBYTE'], 1)
+        self.assertEqual((rx['memcpyCalls.rxDatagram'], rx['memcpyBytes.rxDatagram']), (1, 6))
+        self.assertEqual(rx['callbackChecksumCalc'], 2)  # frame & datagram
+        self.assertEqual(rx['callbackReceivedDatagram'], 1)
+        self.assertEqual(rx['callbackSendByte'], 0)
+
+    def test_reset(self):
+        self.transmit(self.config_a, self.state_a, 0, [1, 2, 3])
+        self.run_until_idle()
+        self.assertGreater(self.counters(self.state_a)['callbackSendByte'], 0)
+        arena = self.state_a.arena  # (retained by init_state)
+        self.assertTrue(prlsc_initState(
+            pointer(self.config_a), pointer(self.state_a),
+            ctypes.cast(arena, ctypes.POINTER(c_uint8)), sizeof(arena),
+        ))
+        self.assertEqual(set(self.counters(self.state_a).values()), {0})
@@ -0,0 +1,132 @@
+import os
+import io
+import json
+import time
+import shutil
+import tempfile
+import contextlib
+
+from utilities import *
+from test_decoder import frame
+
+import prlsc
+from prlsc import CaptureWriter, Replayer
+from prlsc.__main__ import main
+from prlsc.capture import RX, TX
+from prlsc.replay import SPIN_NS, receive_byte_sink, fd_sink, open_pty
+
+
+class VirtualClock(object):
+    """monotonic clock (ns) advanced by sleeping, and by 1us per reading (so spinning ends)"""
+    def __init__(self):
+        self.now = 10 ** 9
+        self.sleeps = []
+
+    def clock(self):
+        self.now += 1000
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += int(seconds * 1e9)
+
+
+class ReplayTest(PrlscEngineTest):
+
+    def setUp(self):
+        super(ReplayTest, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'a.cap')
+        self.config = self.get_basic_config()
+        # rx: a stream frame every 10ms; tx: a frame every 25ms
+        events = [(i * 10 ** 7, RX, frame(0x01, [i, 1, 2])) for i in range(20)]
+        events += [(i * 25 * 10 ** 6 + 1, TX, frame(0x21, [i, 0xFF - i])) for i in range(8)]
+        now = [0]
+        with CaptureWriter(self.path, self.config, index=False, clock=lambda: now[0] + 5 * 10 ** 9, chunk_interval=0) as writer:
+            for (time, direction, data) in sorted(events):
+                now[0] = time
+                writer.record(direction, data)
+        self.rx_bytes = b''.join(data for (time, direction, data) in sorted(events) if direction == RX)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super(ReplayTest, self).tearDown()
+
+    def replay(self, speed=1.0, **kwargs):
+        virtual = VirtualClock()
+        sent = []
+        sink = lambda data: sent.append((virtual.now, data))
+        report = Replayer(self.path, sink, speed=speed, clock=virtual.clock, sleep=virtual.sleep, **kwargs).run()
+        return (report, sent, virtual)
+
+    def test_timing(self):
+        for speed in (1.0, 2.0, 0.5):
+            (report, sent, virtual) = self.replay(speed=speed)
+            self.assertEqual(b''.join(data for (time, data) in sent), self.rx_bytes)
+            first = sent[0][0]
+            for (i, (time, data)) in enumerate(sent):
+                self.assertAlmostEqual((time - first) * 1e-9, (i * 0.01) / speed, delta=5e-6)
+            self.assertEqual((report.records, report.bytes), (20, len(self.rx_bytes)))
+            self.assertAlmostEqual(report.target_duration, 0.19 / speed)
+            self.assertAlmostEqual(report.timing_error, 0.0, delta=1e-5)
+            self.assertLess(report.lateness.max, 5e-6)
+            # sleeps end SPIN_NS before each chunk (then it spins)
+            self.assertAlmostEqual(virtual.sleeps[0], (0.01 / speed) - (SPIN_NS * 1e-9), delta=5e-6)
+
+    def test_throughput(self):
+        (report, sent, virtual) = self.replay(speed=None)
+        self.assertEqual(virtual.sleeps, [])
+        self.assertEqual(b''.join(data for (time, data) in sent), self.rx_bytes)
+        self.assertEqual(report.lateness.count, 0)
+        self.assertIn('throughput mode', str(report))
+
+    def test_directions(self):
+        (report, sent, virtual) = self.replay(direction='tx')
+        self.assertEqual(report.records, 8)
+        self.assertAlmostEqual(report.target_duration, 0.175)
+        (report, sent, virtual) = self.replay(direction='both')
+        self.assertEqual(report.records, 28)
+        # window of recorded time
+        start = 5 * 10 ** 9
+        (report, sent, virtual) = self.replay(start=start + 5 * 10 ** 7, end=start + 10 ** 8)
+        self.assertEqual([data for (time, data) in sent], [frame(0x01, [i, 1, 2]) for i in range(5, 10)])
+
+    def test_receive_byte(self):
+        config = self.get_basic_config()
+        state = prlsc.init_state(data_types, config)
+        received = []
+        def receive_datagram(datagram):
+            received.append([datagram.data[i] for i in range(datagram.length)])
+        config.callbackReceivedDatagram = dict(prlsc_config_t._fields_)['callbackReceivedDatagram'](receive_datagram)
+        Replayer(self.path, receive_byte_sink(data_types, config, state), speed=None).run()
+        self.assertEqual(received, [[i, 1, 2] for i in range(20)])
+
+    def test_pty(self):
+        open_fds = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+        (master, slave, device) = open_pty()
+        consumer = os.open(device, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            report = Replayer(self.path, fd_sink(master), speed=10).run()
+            self.assertGreaterEqual(report.duration, 0.019)  # (no upper bound; the test may be descheduled)
+            received = b''
+            deadline = time.monotonic() + 5
+            while (len(received) < len(self.rx_bytes)) and (time.monotonic() < deadline):
+                try:
+                    received += os.read(consumer, 4096)
+                except BlockingIOError:
+                    time.sleep(0.001)
+            self.assertEqual(received, self.rx_bytes)
+        finally:
+            for fd in (consumer, slave, master):
+                os.close(fd)
+        if open_fds is not None:
+            self.assertEqual(len(os.listdir('/proc/self/fd')), open_fds)  # (none leaked)
+
+    def test_command_line(self):
+        output_path = os.path.join(self.dir, 'rx.bin')
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main(['replay', self.path, '--output', output_path, '--throughput', '--json']), 0)
+        self.assertEqual(json.loads(output.getvalue())['records'], 20)
+        with open(output_path, 'rb') as f:
+            self.assertEqual(f.read(), self.rx_bytes)
@@ -0,0 +1,105 @@
+from utilities import *
+
+import prlsc
+from prlsc import Simulator, Traffic
+
+config_field = dict(prlsc_config_t._fields_)
+
+
+class SimulatorTest(PrlscEngineTest):
+
+    def setUp(self):
+        super(SimulatorTest, self).setUp()
+        self.config = self.get_basic_config()  # [0] stream (rateLimit = 100), [1] diagnostics
+        self.config.callbackChecksumCalc = config_field['callbackChecksumCalc'](
+            ctypes.cast(prlsc_loopback_checksumCalc, ctypes.c_void_p).value
+        )
+
+    def simulator(self, **kwargs):
+        kwargs.setdefault('baud', 115200)
+        kwargs.setdefault('tick', 1e-3)
+        return Simulator(data_types, self.config, **kwargs)
+
+    def test_idle(self):
+        report = self.simulator().run(60)
+        self.assertEqual(report.services, [])
+        self.assertEqual(report.bytes_sent, {'a': 0, 'b': 0})
+
+    def test_delivered(self):
+        sim = self.simulator()
+        sim.add_traffic(Traffic(1, period=0.1, length=20))
+        report = sim.run(10)
+        service = report.service('a', 1)
+        self.assertEqual(service.enqueued, 100)
+        self.assertEqual(service.delivered, 100)
+        self.assertEqual((service.dropped, service.late), (0, 0))
+        self.assertAlmostEqual(service.throughput, 200, delta=1)
+
+        # latency: the frame's 25 bytes on the line (at ~86.8us per byte)
+        byte_time = 10.0 / 115200
+        self.assertGreater(service.latency(50), 24 * byte_time)
+        self.assertLess(service.latency(100), 27 * byte_time)
+        self.assertAlmostEqual(report.utilisation('a'), (100 * 25) / (10 * 11520.0), delta=0.001)
+
+    def test_latency_percentiles(self):
+        # nearest-rank: the smallest latency with at least percentile% of latencies at or below it
+        service = prlsc.ServiceReport('a', 0, 0)
+        self.assertIsNone(service.latency(50))
+        service.latencies = list(range(150, 0, -1))  # 1..150 (unsorted)
+        self.assertEqual([service.latency(p) for p in (0, 1, 50, 99, 100)], [1, 2, 75, 149, 150])
+        service.latencies = list(range(1, 11))
+        self.assertEqual([service.latency(p) for p in (10, 11, 90, 91)], [1, 2, 9, 10])
+
+    def test_baud(self):
+        latencies = []
+        for baud in (9600, 115200):
+            sim = self.simulator(baud=baud)
+            sim.add_traffic(Traffic(1, period=0.5, length=50))
+            latencies.append(sim.run(5).service('a', 1).latency(50))
+        self.assertAlmostEqual(latencies[0] / latencies[1], 12.0, delta=0.5)
+
+    def test_rate_limit(self):
+        # stream: 1 frame per rateLimit (100ms), enqueued every 10ms; the tx ring fills
+        sim = self.simulator()
+        sim.add_traffic(Traffic(0, period=0.01, length=8))
+        service = sim.run(5).service('a', 0)
+        self.assertGreater(service.dropped, 0)
+        self.assertAlmostEqual(service.delivered, 50, delta=2)
+        self.assertGreater(service.occupancy_max, service.buffer_size // 2)
+
+        # with a faster tick, rateLimit is shorter
+        sim = self.simulator(tick=5e-5)
+        sim.add_traffic(Traffic(0, period=0.01, length=8))
+        service = sim.run(5).service('a', 0)
+        self.assertEqual(service.dropped, 0)
+        self.assertEqual(service.late, 0)
+
+    def test_saturated(self):
+        # diagnostics enqueued faster than the line can carry them
+        sim = self.simulator(baud=9600)
+        sim.add_traffic(Traffic(1, period=0.05, length=100))
+        report = sim.run(10)
+        service = report.service('a', 1)
+        self.assertGreater(service.dropped, 0)
+        self.assertGreater(service.starved, 0)
+        self.assertGreater(report.utilisation('a'), 0.95)
+
+    def test_both_directions(self):
+        sim = self.simulator()
+        sim.add_traffic(Traffic(1, period=0.02, length=30, jitter=0.5))
+        sim.add_traffic(Traffic(1, period=0.03, length=10, source='b'))
+        report = sim.run(3)
+        for source in ('a', 'b'):
+            service = report.service(source, 1)
+            self.assertEqual(service.dropped, 0)
+            self.assertGreaterEqual(service.delivered, service.enqueued - 1)
+        self.assertIn('b[1]', str(report))
+
+    def test_deterministic(self):
+        results = []
+        for seed in (1, 1, 2):
+            sim = self.simulator(seed=seed)
+            sim.add_traffic(Traffic(1, period=0.01, length=40, jitter=0.9))
+            results.append(sim.run(2).service('a', 1).latencies)
+        self.assertEqual(results[0], results[1])
+        self.assertNotEqual(results[0], results[2])
@@ -0,0 +1,115 @@
+from utilities import *
+from test_decoder import frame
+
+from prlsc import Dispatcher, HandlerWatchdog, init_state
+from prlsc.watchdog import HISTOGRAM_EDGES, byte_period
+
+BAUD = 100000  # (byte period: 100us)
+
+
+class VirtualClock(object):
+    """monotonic clock (ns); handlers 'run' by advancing it"""
+    def __init__(self):
+        self.now = 10 ** 9
+
+    def clock(self):
+        return self.now
+
+    def run(self, seconds):
+        self.now += int(round(seconds * 1e9))
+
+
+class HandlerWatchdogTest(PrlscEngineTest):
+
+    def setUp(self):
+        super(HandlerWatchdogTest, self).setUp()
+        self.config = self.get_basic_config()  # [0] stream, [1] diagnostics
+        self.config.callbackReceivedDatagram = type(self.config.callbackReceivedDatagram)()
+        self.state = init_state(data_types, self.config)
+        self.virtual = VirtualClock()
+        self.durations = {0: 0.0, 1: 0.0}  # seconds each service's handler takes
+        self.received = []
+
+    def handle(self, datagram):
+        self.received.append((datagram.serviceIndex, [datagram.data[i] for i in range(datagram.length)]))
+        self.virtual.run(self.durations[datagram.serviceIndex])
+
+    def watchdog(self, handler=None, **kwargs):
+        return HandlerWatchdog(handler or self.handle, baud=BAUD, clock=self.virtual.clock, **kwargs)
+
+    def receive(self, service_index, data):
+        if service_index == 1:  # diagnostics: datagram checksum
+            data = list(data) + [(-sum(data)) & 0xFF]
+        for byte in bytearray(frame(service_index << 5, data)):
+            prlsc_receiveByte(pointer(self.config), pointer(self.state), byte)
+
+    def test_byte_period(self):
+        self.assertAlmostEqual(byte_period(115200), 10 / 115200.0)
+        self.assertAlmostEqual(byte_period(9600, bits_per_byte=11), 11 / 9600.0)
+        watchdog = self.watchdog(budget_bytes=16)
+        self.assertAlmostEqual(watchdog.byte_period, 100e-6)
+        self.assertAlmostEqual(watchdog.budget, 1.6e-3)
+
+    def test_histogram(self):
+        watchdog = self.watchdog(budget_bytes=1000)
+        watchdog.install(self.config)
+        self.durations = {0: 30e-6, 1: 350e-6}  # 0.3 & 3.5 byte periods
+        for i in range(3):
+            self.receive(0, [i])
+        self.receive(1, [1, 2])
+        self.assertEqual(self.received, [(0, [0]), (0, [1]), (0, [2]), (1, [1, 2])])
+
+        (stream, diagnostics) = watchdog.services[:2]
+        bucket = lambda periods: [i for (i, edge) in enumerate(HISTOGRAM_EDGES) if periods < edge][0]
+        self.assertEqual(stream.histogram[bucket(0.3)], 3)
+        self.assertEqual(sum(stream.histogram), 3)
+        self.assertEqual(diagnostics.histogram[bucket(3.5)], 1)
+        self.assertAlmostEqual(stream.duration.mean, 30e-6)
+        self.assertAlmostEqual(diagnostics.duration.max, 350e-6)
+        self.assertEqual(watchdog.overruns, 0)
+        self.assertEqual(sorted(watchdog.as_dict()['services'].keys()), [0, 1])
+
+    def test_slowest_bucket(self):
+        watchdog = self.watchdog()
+        self.durations[0] = HISTOGRAM_EDGES[-1] * 100e-6  # (at the last edge)
+        with self.assertLogs('prlsc.watchdog', level='WARNING'):
+            watchdog(self.build_datagram(service_index=0))
+        self.assertEqual(watchdog.services[0].histogram[-1], 1)
+
+    def test_overrun(self):
+        overruns = []
+        watchdog = self.watchdog(budget_bytes=2, on_overrun=lambda datagram, seconds: overruns.append((datagram.serviceIndex, seconds)))
+        watchdog.install(self.config)
+        self.durations = {0: 150e-6, 1: 250e-6}
+        with self.assertLogs('prlsc.watchdog', level='WARNING') as logs:
+            self.receive(0, [1])  # within budget
+            self.receive(1, [2])
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('handler of 1.0 took 250.0us', logs.output[0])
+        self.assertEqual(len(overruns), 1)
+        self.assertEqual(overruns[0][0], 1)
+        self.assertAlmostEqual(overruns[0][1], 250e-6)
+        self.assertEqual((watchdog.services[0].overruns, watchdog.services[1].overruns), (0, 1))
+        self.assertIn('1 overruns', str(watchdog))
+
+    def test_handler_exception(self):
+        def handler(datagram):
+            self.virtual.run(50e-6)
+            raise ValueError("handler failed")
+        watchdog = self.watchdog(handler)
+        with self.assertRaises(ValueError):
+            watchdog(self.build_datagram(service_index=0))
+        self.assertEqual(watchdog.services[0].duration.count, 1)  # (still timed)
+
+    def test_dispatcher(self):
+        dispatcher = Dispatcher()
+        dispatcher.register(0, 0, self.handle)
+        watchdog = self.watchdog(dispatcher)
+        watchdog.install(self.config)
+        self.receive(0, [7, 8])
+        self.assertEqual(self.received, [(0, [7, 8])])
+        self.assertEqual(watchdog.services[0].duration.count, 1)
+        # an installed dispatcher's table would route around the watchdog
+        dispatcher.install(self.config)
+        with self.assertRaises(AssertionError):
+            watchdog.install(self.config)
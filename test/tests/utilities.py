@@ -11,6 +11,12 @@ from ctypes import pointer, addressof, cast, sizeof
 import data_types
 from data_types import *
 
+try:
+    import prlsc
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../lib/py'))
+    import prlsc
+
 
 # ---- Logging
 log = logging.getLogger(__name__)
@@ -83,30 +89,7 @@ def frame2str(frame, heading="frame:"):
     return "\n".join(lines)
 
 # ---- ctype Builders / Helpers
-def build_struct(cls, **kwargs):
-    """
-    Build a struct with the given class
-    :param cls: ctypes Structure class to populate
-    :param kwargs:
-    :return: populated instance of cls
-    """
-    assert issubclass(cls, ctypes.Structure), "bad paramter"
-    obj = cls()
-    for (key, value) in kwargs.items():
-        if key.endswith('__exact'):
-            key = key[:-len('__exact')]
-            assert key in dict(cls._fields_), "%s struct has no %s attribute" % (cls.__name__, key)
-            setattr(obj, key, value)
-        else:
-            setattr(obj, key, dict(cls._fields_)[key](value))
-    return obj
-
-def build_array(cls, elements):
-    assert isinstance(elements, (tuple, list)), "bad parameter"
-    array = (cls * len(elements))()
-    for (i, value) in enumerate(elements):
-        array[i] = value
-    return array
+from ast2ctypes import build_struct, build_array
 
 
 # ---- Test Classes
@@ -316,5 +299,5 @@ class PrlscEngineTest(DllLoadedTest):
 
 # Assertion Helpers
 frame_data = lambda frame: [frame.data[i] for i in range(frame.length)]
-datagram_data = lambda datagram: [datagram.data[i] for i in range(datagram.length)]
+datagram_data = lambda datagram: list(prlsc.DatagramView(datagram).data)
 build_service_code = lambda service_index, subservice_index: (((service_index & 0x07) << 5) | (subservice_index & 0x1F)) & 0xFF
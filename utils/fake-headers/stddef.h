@@ -1,3 +1,5 @@
 #pragma once
 
 typedef long unsigned int size_t;
+
+#define NULL ((void *)0)
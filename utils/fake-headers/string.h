@@ -3,3 +3,4 @@
 #include <stddef.h>
 extern void *memcpy (void *__dest, const void *__src, size_t __n);
 
+extern void *memset (void *__s, int __c, size_t __n);